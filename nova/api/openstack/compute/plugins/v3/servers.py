@@ -368,11 +368,17 @@ class ServersController(wsgi.Controller):
 
         limit, marker = common.get_limit_and_marker(req)
         sort_keys, sort_dirs = common.get_sort_params(req.params)
+        # NOTE: The index only shows the names and the links of the servers,
+        # so it doesn't need their metadata, network info or security groups.
+        if is_detail:
+            kwargs = {'expected_attrs': ['pci_devices']}
+        else:
+            kwargs = {'load_default_attrs': False}
         try:
             instance_list = self.compute_api.get_all(context,
                     search_opts=search_opts, limit=limit, marker=marker,
-                    want_objects=True, expected_attrs=['pci_devices'],
-                    sort_keys=sort_keys, sort_dirs=sort_dirs)
+                    want_objects=True, sort_keys=sort_keys,
+                    sort_dirs=sort_dirs, **kwargs)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -103,9 +103,11 @@ class SimpleTenantUsageController(wsgi.Controller):
     def _tenant_usages_for_period(self, context, period_start,
                                   period_stop, tenant_id=None, detailed=True):
 
+        # NOTE: Join the flavors, which are otherwise loaded one instance at
+        # a time once they have been migrated out of the system metadata.
         instances = objects.InstanceList.get_active_by_window_joined(
                         context, period_start, period_stop, tenant_id,
-                        expected_attrs=['system_metadata'])
+                        expected_attrs=['flavor', 'system_metadata'])
         rval = {}
         flavors = {}
 
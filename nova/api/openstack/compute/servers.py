@@ -219,6 +219,9 @@ class Controller(wsgi.Controller):
         sort_keys, sort_dirs = None, None
         if self.ext_mgr.is_loaded('os-server-sort-keys'):
             sort_keys, sort_dirs = common.get_sort_params(req.params)
+        # NOTE: The index only shows the names and the links of the servers,
+        # so it doesn't need their metadata, network info or security groups.
+        kwargs = {} if is_detail else {'load_default_attrs': False}
         try:
             instance_list = self.compute_api.get_all(context,
                                                      search_opts=search_opts,
@@ -226,7 +229,8 @@ class Controller(wsgi.Controller):
                                                      marker=marker,
                                                      want_objects=True,
                                                      sort_keys=sort_keys,
-                                                     sort_dirs=sort_dirs)
+                                                     sort_dirs=sort_dirs,
+                                                     **kwargs)
         except exception.MarkerNotFound:
             msg = _('marker [%s] not found') % marker
             raise exc.HTTPBadRequest(explanation=msg)
@@ -27,6 +27,7 @@ import webob
 
 from nova.api.openstack import api_version_request as api_version
 from nova.api.openstack import versioned_method
+from nova.db import profiler as db_profiler
 from nova import exception
 from nova import i18n
 from nova.i18n import _
@@ -752,8 +753,12 @@ class Resource(wsgi.Application):
         #            function.  If we try to audit __call__(), we can
         #            run into troubles due to the @webob.dec.wsgify()
         #            decorator.
-        return self._process_stack(request, action, action_args,
-                               content_type, body, accept)
+        with db_profiler.profile(request.environ.get('nova.context'),
+                                 '%s %s.%s' % (request.method,
+                                               type(self.controller).__name__,
+                                               action)):
+            return self._process_stack(request, action, action_args,
+                                       content_type, body, accept)
 
     def _process_stack(self, request, action, action_args,
                        content_type, body, accept):
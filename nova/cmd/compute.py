@@ -22,7 +22,7 @@ import traceback
 from oslo_config import cfg
 from oslo_log import log as logging
 
-from nova.conductor import rpcapi as conductor_rpcapi
+from nova.conductor import batching as conductor_batching
 from nova import config
 import nova.db.api
 from nova import exception
@@ -65,7 +65,7 @@ def main():
     if not CONF.conductor.use_local:
         block_db_access()
         objects_base.NovaObject.indirection_api = \
-            conductor_rpcapi.ConductorAPI()
+            conductor_batching.BatchingConductorAPI()
 
     server = service.Service.create(binary='nova-compute',
                                     topic=CONF.compute_topic,
@@ -57,6 +57,7 @@ from __future__ import print_function
 import argparse
 import os
 import sys
+import time
 import urllib
 
 import decorator
@@ -79,6 +80,7 @@ from nova import objects
 from nova.openstack.common import cliutils
 from nova import quota
 from nova import rpc
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import servicegroup
 from nova import utils
 from nova import version
@@ -914,7 +916,9 @@ class DbCommands(object):
 
     @args('--max_rows', metavar='<number>',
             help='Maximum number of deleted rows to archive')
-    def archive_deleted_rows(self, max_rows):
+    @args('--verbose', action='store_true', dest='verbose', default=False,
+          help='Print how many rows were archived per table')
+    def archive_deleted_rows(self, max_rows=None, verbose=False):
         """Move up to max_rows deleted rows from production tables to shadow
         tables.
         """
@@ -924,7 +928,19 @@ class DbCommands(object):
                 print(_("Must supply a positive value for max_rows"))
                 return(1)
         admin_context = context.get_admin_context()
-        db.archive_deleted_rows(admin_context, max_rows)
+        start = time.time()
+        table_to_rows_archived = db.archive_deleted_rows(admin_context,
+                                                         max_rows)
+        elapsed = time.time() - start
+        if verbose:
+            rows_archived = sum(table_to_rows_archived.values())
+            print("%-30s\t%s" % (_('Table'), _('Number of Rows Archived')))
+            for tablename, rows in sorted(table_to_rows_archived.items()):
+                print("%-30s\t%d" % (tablename, rows))
+            print(_("Archived %(rows)d rows in %(seconds).1f seconds "
+                    "(%(rate).0f rows/s)") %
+                  {'rows': rows_archived, 'seconds': elapsed,
+                   'rate': rows_archived / max(elapsed, 0.001)})
 
     @args('--delete', action='store_true', dest='delete',
           help='If specified, automatically delete any records found where '
@@ -1127,6 +1143,43 @@ class GetLogCommands(object):
             print(_('No nova entries in syslog!'))
 
 
+class SchedulerCommands(object):
+    """Show the scheduler statistics."""
+
+    @args('--host', metavar='<host>',
+          help='Host of the scheduler, any scheduler if not set')
+    def timings(self, host=None):
+        """Show the time spent in each filter and weigher and in the refresh
+        of the host states by a scheduler during the last
+        scheduler_timing_window seconds.
+        """
+        ctxt = context.get_admin_context()
+        timings = scheduler_rpcapi.SchedulerAPI().get_timings(ctxt,
+                                                               host=host)
+        if not timings:
+            print(_('No scheduler timings recorded.'))
+            return
+        print_format = "%-45s %8s %10s %10s %10s %10s %9s %9s"
+        print(print_format % (
+                    _('Step'),
+                    _('Count'),
+                    _('Mean_ms'),
+                    _('P50_ms'),
+                    _('P99_ms'),
+                    _('Max_ms'),
+                    _('Hosts_in'),
+                    _('Hosts_out')))
+        for name, summary in sorted(timings.items()):
+            print(print_format % (
+                    name, summary['count'],
+                    '%.3f' % summary['mean_ms'],
+                    '%.3f' % summary['p50_ms'],
+                    '%.3f' % summary['p99_ms'],
+                    '%.3f' % summary['max_ms'],
+                    '%.1f' % summary['mean_hosts_in'],
+                    '%.1f' % summary['mean_hosts_out']))
+
+
 class CellCommands(object):
     """Commands for managing cells."""
 
@@ -1256,6 +1309,7 @@ CATEGORIES = {
     'logs': GetLogCommands,
     'network': NetworkCommands,
     'project': ProjectCommands,
+    'scheduler': SchedulerCommands,
     'service': ServiceCommands,
     'shell': ShellCommands,
     'vm': VmCommands,
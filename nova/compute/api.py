@@ -1927,7 +1927,7 @@ class API(base.Base):
 
     def get_all(self, context, search_opts=None, limit=None, marker=None,
                 want_objects=False, expected_attrs=None, sort_keys=None,
-                sort_dirs=None):
+                sort_dirs=None, load_default_attrs=True):
         """Get all instances filtered by one of the given parameters.
 
         If there is no filter and the context is an admin, it will retrieve
@@ -1941,6 +1941,10 @@ class API(base.Base):
         secondary sort ket, etc.). For each sort key, the associated sort
         direction is based on the list of sort directions in the 'sort_dirs'
         parameter.
+
+        The metadata, system metadata, info cache and security groups of the
+        instances are joined unless load_default_attrs is False, in which
+        case only expected_attrs are.
         """
 
         # TODO(bcwaldon): determine the best argument for target here
@@ -2016,10 +2020,14 @@ class API(base.Base):
         if filter_ip and limit:
             LOG.debug('Removing limit for DB query due to IP filter')
             limit = None
+        if filter_ip and not load_default_attrs:
+            # NOTE: The IP filter looks up the addresses in the info cache.
+            expected_attrs = list(expected_attrs or []) + ['info_cache']
 
         inst_models = self._get_instances_by_filters(context, filters,
                 limit=limit, marker=marker, expected_attrs=expected_attrs,
-                sort_keys=sort_keys, sort_dirs=sort_dirs)
+                sort_keys=sort_keys, sort_dirs=sort_dirs,
+                load_default_attrs=load_default_attrs)
 
         if filter_ip:
             inst_models = self._ip_filter(inst_models, filters, orig_limit)
@@ -2062,9 +2070,13 @@ class API(base.Base):
 
     def _get_instances_by_filters(self, context, filters,
                                   limit=None, marker=None, expected_attrs=None,
-                                  sort_keys=None, sort_dirs=None):
-        fields = ['metadata', 'system_metadata', 'info_cache',
-                  'security_groups']
+                                  sort_keys=None, sort_dirs=None,
+                                  load_default_attrs=True):
+        if load_default_attrs:
+            fields = ['metadata', 'system_metadata', 'info_cache',
+                      'security_groups']
+        else:
+            fields = []
         if expected_attrs:
             fields.extend(expected_attrs)
         return objects.InstanceList.get_by_filters(
@@ -62,6 +62,7 @@ from nova.compute import task_states
 from nova.compute import utils as compute_utils
 from nova.compute import vm_states
 from nova import conductor
+from nova.conductor import batching as conductor_batching
 from nova import consoleauth
 import nova.context
 from nova import exception
@@ -644,7 +645,7 @@ class ComputeVirtAPI(virtapi.VirtAPI):
 class ComputeManager(manager.Manager):
     """Manages the running instances from creation to destruction."""
 
-    target = messaging.Target(version='4.0')
+    target = messaging.Target(version='4.1')
 
     # How long to wait in seconds before re-issuing a shutdown
     # signal to a instance during power off.  The overall
@@ -5638,7 +5639,10 @@ class ComputeManager(manager.Manager):
                 self._query_driver_power_state_and_sync(context, db_instance)
 
             try:
-                query_driver_power_state_and_sync()
+                # NOTE: The object calls of the syncs, which share the
+                # context of the task, are sent to the conductor together.
+                with conductor_batching.batched():
+                    query_driver_power_state_and_sync()
             except Exception:
                 LOG.exception(_LE("Periodic sync_power_state task had an "
                                   "error while processing an instance."),
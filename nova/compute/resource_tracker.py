@@ -55,6 +55,12 @@ resource_tracker_opts = [
     cfg.ListOpt('compute_resources',
                 default=['vcpu'],
                 help='The names of the extra resources to track.'),
+    cfg.IntOpt('compute_node_volatile_update_interval',
+               default=0,
+               help='Number of resource updates to hold back when only the '
+                    'metrics or the disk_available_least of the compute '
+                    'node changed. Any other change sends them along. 0 '
+                    'sends every change.'),
 ]
 
 CONF = cfg.CONF
@@ -63,6 +69,10 @@ CONF.register_opts(resource_tracker_opts)
 LOG = logging.getLogger(__name__)
 COMPUTE_RESOURCE_SEMAPHORE = "compute_resources"
 
+# Compute node fields which change on most updates without mattering much
+# to the scheduler, see compute_node_volatile_update_interval.
+VOLATILE_FIELDS = frozenset(['metrics', 'disk_available_least'])
+
 CONF.import_opt('my_ip', 'nova.netconf')
 
 
@@ -87,6 +97,17 @@ class ResourceTracker(object):
         self.ext_resources_handler = \
             ext_resources.ResourceHandler(CONF.compute_resources)
         self.old_resources = {}
+        self.volatile_updates_held = 0
+        # What sending only the changed fields of the compute node saved
+        self.update_savings = {'fields': 0, 'bytes': 0, 'rows': 0}
+        # Ledgers of the claims and of their releases, keyed by instance
+        # uuid, which an audit gathering its data off the lock may have
+        # missed. See _reconcile_pending_claims().
+        self.claim_generation = 0
+        self.pending_claims = {}
+        self.pending_resize_claims = {}
+        self.pending_releases = {}
+        self.pending_resize_releases = {}
         self.scheduler_client = scheduler_client.SchedulerClient()
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
@@ -141,6 +162,10 @@ class ResourceTracker(object):
 
         # Mark resources in-use and update stats
         self._update_usage_from_instance(context, instance_ref)
+        self.claim_generation += 1
+        self.pending_claims[instance_ref['uuid']] = (self.claim_generation,
+                                                     instance_ref)
+        self.pending_releases.pop(instance_ref['uuid'], None)
 
         elevated = context.elevated()
         # persist changes to the compute node:
@@ -190,6 +215,10 @@ class ResourceTracker(object):
         # compute host:
         self._update_usage_from_migration(context, instance_ref, image_meta,
                                           migration)
+        self.claim_generation += 1
+        self.pending_resize_claims[instance_ref['uuid']] = (
+            self.claim_generation, instance_ref, image_meta, migration)
+        self.pending_resize_releases.pop(instance_ref['uuid'], None)
         elevated = context.elevated()
         self._update(elevated)
 
@@ -234,13 +263,30 @@ class ResourceTracker(object):
         # and associated stats:
         instance['vm_state'] = vm_states.DELETED
         self._update_usage_from_instance(context, instance)
+        self._record_release(instance)
 
         self._update(context.elevated())
 
+    def _record_release(self, instance):
+        self.claim_generation += 1
+        self.pending_releases[instance['uuid']] = (self.claim_generation,
+                                                   instance)
+
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
     def drop_resize_claim(self, context, instance, instance_type=None,
                           image_meta=None, prefix='new_'):
         """Remove usage for an incoming/outgoing migration."""
+        self.pending_resize_claims.pop(instance['uuid'], None)
+        if instance['uuid'] in self.tracked_migrations:
+            self.claim_generation += 1
+            self.pending_resize_releases[instance['uuid']] = (
+                self.claim_generation, instance, instance_type, image_meta,
+                prefix)
+        self._drop_resize_claim(context, instance, instance_type, image_meta,
+                                prefix)
+
+    def _drop_resize_claim(self, context, instance, instance_type, image_meta,
+                           prefix):
         if instance['uuid'] in self.tracked_migrations:
             migration, itype = self.tracked_migrations.pop(instance['uuid'])
 
@@ -281,6 +327,8 @@ class ResourceTracker(object):
         # claim first:
         if uuid in self.tracked_instances:
             self._update_usage_from_instance(context, instance)
+            if instance['vm_state'] == vm_states.DELETED:
+                self._record_release(instance)
             self._update(context.elevated())
 
     @property
@@ -427,10 +475,36 @@ class ResourceTracker(object):
 
         self._report_hypervisor_resource_view(resources)
 
-        self._update_available_resource(context, resources)
+        # NOTE: The data of the audit is gathered without holding the lock,
+        # so that claims don't wait for the database and the hypervisor.
+        # Claims made in the meantime are reconciled under the lock.
+        generation = self.claim_generation
+        audit = self._get_audit_data(context)
+
+        self._update_available_resource(context, resources, audit, generation)
+
+    def _get_audit_data(self, context):
+        """Gather what the audit needs from the database, the hypervisor and
+        the monitors.
+        """
+        # Grab all instances assigned to this node:
+        instances = objects.InstanceList.get_by_host_and_node(
+            context, self.host, self.nodename,
+            expected_attrs=['system_metadata',
+                            'numa_topology'])
+
+        # Grab all in-progress migrations:
+        migrations = objects.MigrationList.get_in_progress_by_host_and_node(
+                context, self.host, self.nodename)
+
+        return {'instances': instances,
+                'migrations': migrations,
+                'instance_usage': self.driver.get_per_instance_usage(),
+                'metrics': self._get_host_metrics(context, self.nodename)}
 
     @utils.synchronized(COMPUTE_RESOURCE_SEMAPHORE)
-    def _update_available_resource(self, context, resources):
+    def _update_available_resource(self, context, resources, audit,
+                                   generation):
 
         # initialise the compute node object, creating it
         # if it does not already exist.
@@ -457,24 +531,17 @@ class ResourceTracker(object):
                                                              node_id=n_id)
             self.pci_tracker.set_hvdevs(devs)
 
-        # Grab all instances assigned to this node:
-        instances = objects.InstanceList.get_by_host_and_node(
-            context, self.host, self.nodename,
-            expected_attrs=['system_metadata',
-                            'numa_topology'])
+        instances = audit['instances']
+        migrations = audit['migrations']
 
         # Now calculate usage based on instance utilization:
         self._update_usage_from_instances(context, instances)
-
-        # Grab all in-progress migrations:
-        migrations = objects.MigrationList.get_in_progress_by_host_and_node(
-                context, self.host, self.nodename)
-
         self._update_usage_from_migrations(context, migrations)
+        self._reconcile_pending_claims(context, generation)
 
         # Detect and account for orphaned instances that may exist on the
         # hypervisor, but are not in the DB:
-        orphans = self._find_orphaned_instances()
+        orphans = self._find_orphaned_instances(audit['instance_usage'])
         self._update_usage_from_orphans(orphans)
 
         # NOTE(yjiang5): Because pci device tracker status is not cleared in
@@ -489,8 +556,7 @@ class ResourceTracker(object):
 
         self._report_final_resource_view()
 
-        metrics = self._get_host_metrics(context, self.nodename)
-        self.compute_node['metrics'] = jsonutils.dumps(metrics)
+        self.compute_node['metrics'] = jsonutils.dumps(audit['metrics'])
 
         # TODO(sbauza): Juno compute nodes are missing the host field and
         # the Juno ResourceTracker does not set this field, even if
@@ -603,12 +669,47 @@ class ResourceTracker(object):
                   'used_vcpus': ucpu,
                   'pci_stats': pci_device_pools})
 
-    def _resource_change(self):
-        """Check to see if any resouces have changed."""
-        if cmp(self.compute_node, self.old_resources) != 0:
-            self.old_resources = copy.deepcopy(self.compute_node)
-            return True
-        return False
+    @staticmethod
+    def _comparable_value(key, value):
+        if key == 'pci_device_pools' and value is not None:
+            # NOTE: PciDeviceStats only compares to its own kind, and what
+            # gets persisted are its pools.
+            return list(value)
+        return value
+
+    def _resource_changes(self):
+        """Return the compute node fields which changed since they were
+        last persisted.
+        """
+        changes = {}
+        for key, value in self.compute_node.items():
+            if (key not in self.old_resources or
+                    self._comparable_value(key, value) !=
+                    self.old_resources[key]):
+                changes[key] = value
+        return changes
+
+    def _hold_volatile_update(self, changes):
+        """Return True if sending the changes can wait for a later update."""
+        if (not set(changes) <= VOLATILE_FIELDS or
+                self.volatile_updates_held >=
+                CONF.compute_node_volatile_update_interval):
+            return False
+        self.volatile_updates_held += 1
+        return True
+
+    def _record_update_savings(self, changes):
+        unchanged = set(self.compute_node) - set(changes)
+        saved_bytes = sum(len(jsonutils.dumps(
+            self._comparable_value(key, self.compute_node[key])))
+            for key in unchanged)
+        self.update_savings['fields'] += len(unchanged)
+        self.update_savings['bytes'] += saved_bytes
+        LOG.debug("Updating %(changed)d of the %(total)d compute node fields "
+                  "of %(host)s:%(node)s, %(bytes)d bytes saved",
+                  {'changed': len(changes), 'total': len(self.compute_node),
+                   'host': self.host, 'node': self.nodename,
+                   'bytes': saved_bytes})
 
     def _update(self, context):
         """Update partial stats locally and populate them to Scheduler."""
@@ -619,12 +720,21 @@ class ResourceTracker(object):
         self.compute_node['stats'] = jsonutils.dumps(
             self.compute_node['stats'])
 
-        if not self._resource_change():
-            return
         if "service" in self.compute_node:
             del self.compute_node['service']
-        # Persist the stats to the Scheduler
-        self._update_resource_stats(context, self.compute_node)
+        changes = self._resource_changes()
+        if not changes:
+            return
+        if self._hold_volatile_update(changes):
+            self.update_savings['rows'] += 1
+            return
+        self.volatile_updates_held = 0
+        self._record_update_savings(changes)
+        # Persist the changed stats to the Scheduler
+        self._update_resource_stats(context, changes)
+        for key, value in changes.items():
+            self.old_resources[key] = copy.deepcopy(
+                self._comparable_value(key, value))
         if self.pci_tracker:
             self.pci_tracker.save(context)
 
@@ -779,6 +889,7 @@ class ResourceTracker(object):
 
         if is_deleted_instance:
             self.tracked_instances.pop(uuid)
+            self.pending_claims.pop(uuid, None)
             sign = -1
 
         self.stats.update_stats_for_instance(instance)
@@ -825,7 +936,42 @@ class ResourceTracker(object):
             if instance.vm_state != vm_states.DELETED:
                 self._update_usage_from_instance(context, instance)
 
-    def _find_orphaned_instances(self):
+    def _reconcile_pending_claims(self, context, generation):
+        """Account for the claims and the releases made after the data of
+        the audit was gathered, which it may have missed, and forget about
+        the older ones, which it has seen.
+        """
+        for uuid, (claim_generation, instance) in list(
+                self.pending_claims.items()):
+            if claim_generation <= generation:
+                del self.pending_claims[uuid]
+            elif uuid not in self.tracked_instances:
+                self._update_usage_from_instance(context, instance)
+
+        for uuid, (claim_generation, instance, image_meta, migration) in list(
+                self.pending_resize_claims.items()):
+            if claim_generation <= generation:
+                del self.pending_resize_claims[uuid]
+            elif uuid not in self.tracked_migrations:
+                self._update_usage_from_migration(context, instance,
+                                                  image_meta, migration)
+
+        # NOTE: The data may still have the instances and the migrations
+        # released meanwhile, so their usage is released again.
+        for uuid, (release_generation, instance) in list(
+                self.pending_releases.items()):
+            if release_generation <= generation:
+                del self.pending_releases[uuid]
+            elif uuid in self.tracked_instances:
+                self._update_usage_from_instance(context, instance)
+
+        for uuid, release in list(self.pending_resize_releases.items()):
+            if release[0] <= generation:
+                del self.pending_resize_releases[uuid]
+            else:
+                self._drop_resize_claim(context, *release[1:])
+
+    def _find_orphaned_instances(self, usage=None):
         """Given the set of instances and migrations already account for
         by resource tracker, sanity check the hypervisor to determine
         if there are any "orphaned" instances left hanging around.
@@ -838,7 +984,8 @@ class ResourceTracker(object):
         uuids2 = frozenset(self.tracked_migrations.keys())
         uuids = uuids1 | uuids2
 
-        usage = self.driver.get_per_instance_usage()
+        if usage is None:
+            usage = self.driver.get_per_instance_usage()
         vuuids = frozenset(usage.keys())
 
         orphan_uuids = vuuids - uuids
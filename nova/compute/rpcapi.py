@@ -297,6 +297,7 @@ class ComputeAPI(object):
         3.x for Juno compatibility. All new changes should go against 4.x.
 
         * 4.0  - Remove 3.x compatibility
+        * 4.1  - Accept objects in the compact encoding
     '''
 
     VERSION_ALIASES = {
@@ -310,7 +311,8 @@ class ComputeAPI(object):
         target = messaging.Target(topic=CONF.compute_topic, version='4.0')
         version_cap = self.VERSION_ALIASES.get(CONF.upgrade_levels.compute,
                                                CONF.upgrade_levels.compute)
-        serializer = objects_base.NovaObjectSerializer()
+        serializer = objects_base.NovaObjectSerializer(
+            compact_check=lambda: self.client.can_send_version('4.1'))
         self.client = self.get_client(target, version_cap, serializer)
 
     def _compat_ver(self, current, legacy):
@@ -0,0 +1,184 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Coalescing of the object calls made to the conductor.
+
+The remotable methods of the objects, like Instance.save(), are forwarded
+to the conductor of a service without database access through its
+indirection API, one RPC call each. The BatchingConductorAPI holds the
+calls made with the same context for a short window, so that the calls made
+meanwhile by the other greenthreads of the service are sent along in a
+single object_batch() call.
+
+As the calls are only coalesced per context, this pays off for the
+greenthreads sharing one, like the ones a periodic task spawns for each
+instance, rather than for concurrent requests.
+"""
+
+import contextlib
+import sys
+
+import eventlet
+from eventlet import corolocal
+from eventlet import event
+from oslo_config import cfg
+import oslo_messaging as messaging
+from oslo_utils import importutils
+
+from nova.conductor import rpcapi
+from nova import exception
+from nova.objects import base as objects_base
+from nova import rpc
+
+batching_opts = [
+    cfg.FloatOpt('object_batch_window',
+                 default=0.0,
+                 help='Number of seconds the object calls forwarded to the '
+                      'conductor are held, so that the calls made meanwhile '
+                      'by other greenthreads with the same context are sent '
+                      'in a single RPC call. 0 only batches the calls made '
+                      'in the batched() blocks.'),
+    cfg.IntOpt('object_batch_size',
+               default=50,
+               help='Maximum number of object calls sent to the conductor in '
+                    'a single RPC call.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(batching_opts, 'conductor')
+
+
+def _error_from_primitive(error):
+    """Rebuild an exception reported by ConductorManager.object_batch()."""
+    if error['module'] in rpc.get_allowed_exmods():
+        try:
+            module = importutils.import_module(error['module'])
+        except ImportError:
+            module = None
+        cls = getattr(module, error['class'], None)
+        if isinstance(cls, type) and issubclass(cls,
+                                                exception.NovaException):
+            return cls(message=error['message'], **error['kwargs'])
+    return messaging.RemoteError(error['class'], error['message'])
+
+
+class _ObjectCall(object):
+    def __init__(self, method, kwargs):
+        self.method = method
+        self.kwargs = kwargs
+        self.event = event.Event()
+
+
+class BatchingConductorAPI(rpcapi.ConductorAPI):
+    """Conductor RPC API batching the object calls."""
+
+    def __init__(self):
+        super(BatchingConductorAPI, self).__init__()
+        # Calls waiting to be sent, keyed by the id of their context
+        self._pending = {}
+        # Number of batched() blocks entered by each greenthread
+        self._local = corolocal.local()
+
+    def _batching(self):
+        return ((CONF.conductor.object_batch_window > 0 or
+                 getattr(self._local, 'scopes', 0)) and
+                self.can_batch_objects())
+
+    @contextlib.contextmanager
+    def batched(self):
+        """Batch the object calls made by the current greenthread while in
+        the block, even if the object_batch_window option is 0.
+
+        The calls are held until the greenthreads ready to run have run, so
+        they are sent along with the calls made meanwhile by the other
+        greenthreads in a batched() block with the same context.
+        """
+        self._local.scopes = getattr(self._local, 'scopes', 0) + 1
+        try:
+            yield
+        finally:
+            self._local.scopes -= 1
+
+    def object_class_action(self, context, objname, objmethod, objver,
+                            args, kwargs):
+        if not self._batching():
+            return super(BatchingConductorAPI, self).object_class_action(
+                context, objname, objmethod, objver, args, kwargs)
+        return self._call(context, 'object_class_action',
+                          dict(objname=objname, objmethod=objmethod,
+                               objver=objver, args=args, kwargs=kwargs))
+
+    def object_action(self, context, objinst, objmethod, args, kwargs):
+        if not self._batching():
+            return super(BatchingConductorAPI, self).object_action(
+                context, objinst, objmethod, args, kwargs)
+        return self._call(context, 'object_action',
+                          dict(objinst=objinst, objmethod=objmethod,
+                               args=args, kwargs=kwargs))
+
+    def _call(self, context, method, kwargs):
+        call = _ObjectCall(method, kwargs)
+        calls = self._pending.get(id(context))
+        if calls is None:
+            calls = self._pending[id(context)] = []
+            eventlet.spawn_after(CONF.conductor.object_batch_window,
+                                 self._flush, context)
+        calls.append(call)
+        if len(calls) >= CONF.conductor.object_batch_size:
+            self._flush(context)
+        return call.event.wait()
+
+    def _flush(self, context):
+        # NOTE: The calls may have been sent already, when the batch got
+        # full before the end of the window.
+        calls = self._pending.pop(id(context), None)
+        if not calls:
+            return
+        if len(calls) == 1:
+            call = calls[0]
+            method = getattr(super(BatchingConductorAPI, self), call.method)
+            try:
+                call.event.send(method(context, **call.kwargs))
+            except Exception:
+                call.event.send_exception(*sys.exc_info())
+            return
+
+        try:
+            results = self.object_batch(
+                context, [{'method': batched.method, 'kwargs': batched.kwargs}
+                          for batched in calls])
+        except Exception:
+            exc_info = sys.exc_info()
+            for call in calls:
+                call.event.send_exception(*exc_info)
+            return
+        for call, result in zip(calls, results):
+            if 'error' in result:
+                call.event.send_exception(
+                    _error_from_primitive(result['error']))
+            else:
+                call.event.send(result['result'])
+
+
+@contextlib.contextmanager
+def batched():
+    """Batch the object calls made by the current greenthread in the block
+    with the ones made meanwhile by the other batching greenthreads, if the
+    objects are remoted through a BatchingConductorAPI.
+    """
+    api = objects_base.NovaObject.indirection_api
+    if not isinstance(api, BatchingConductorAPI):
+        yield
+        return
+    with api.batched():
+        yield
@@ -78,7 +78,7 @@ class ConductorManager(manager.Manager):
     namespace.  See the ComputeTaskManager class for details.
     """
 
-    target = messaging.Target(version='2.1')
+    target = messaging.Target(version='2.3')
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(service_name='conductor',
@@ -437,8 +437,15 @@ class ConductorManager(manager.Manager):
         except Exception:
             raise messaging.ExpectedException()
 
+    def _compact(self, context, result):
+        # NOTE: The client asked for the result in the compact encoding,
+        # which the RPC layer only decodes.
+        return nova_object.obj_to_compact_primitive(
+            nova_object.NovaObjectSerializer().serialize_entity(context,
+                                                                result))
+
     def object_class_action(self, context, objname, objmethod,
-                            objver, args, kwargs):
+                            objver, args, kwargs, compact=False):
         """Perform a classmethod action on an object."""
         objclass = nova_object.NovaObject.obj_class_from_name(objname,
                                                               objver)
@@ -447,10 +454,14 @@ class ConductorManager(manager.Manager):
         # NOTE(danms): The RPC layer will convert to primitives for us,
         # but in this case, we need to honor the version the client is
         # asking for, so we do it before returning here.
-        return (result.obj_to_primitive(target_version=objver)
-                if isinstance(result, nova_object.NovaObject) else result)
-
-    def object_action(self, context, objinst, objmethod, args, kwargs):
+        result = (result.obj_to_primitive(target_version=objver)
+                  if isinstance(result, nova_object.NovaObject) else result)
+        if compact:
+            result = self._compact(context, result)
+        return result
+
+    def object_action(self, context, objinst, objmethod, args, kwargs,
+                      compact=False):
         """Perform an action on an object."""
         oldobj = objinst.obj_clone()
         result = self._object_dispatch(objinst, objmethod, args, kwargs)
@@ -468,8 +479,45 @@ class ConductorManager(manager.Manager):
         # This is safe since a field named this would conflict with the
         # method anyway
         updates['obj_what_changed'] = objinst.obj_what_changed()
+        if compact:
+            return self._compact(context, (updates, result))
         return updates, result
 
+    def object_batch(self, context, calls, compact=False):
+        """Perform a list of object_action() and object_class_action()
+        calls, each one being a dict with the name of the method and its
+        kwargs.
+
+        A list with a dict holding either the result or the error of each
+        call is returned, the errors being reported as the module, class,
+        message and kwargs of the exception raised.
+        """
+        results = []
+        for call in calls:
+            method = call['method']
+            try:
+                if method not in ('object_action', 'object_class_action'):
+                    raise exception.ObjectActionError(
+                        action=method, reason='Cannot be batched')
+                result = getattr(self, method)(context, **call['kwargs'])
+            except messaging.ExpectedException as e:
+                results.append({'error': self._batch_error(e.exc_info[1])})
+            except Exception as e:
+                LOG.exception(_LE('Batched %s failed'), method)
+                results.append({'error': self._batch_error(e)})
+            else:
+                results.append({'result': result})
+        if compact:
+            return self._compact(context, results)
+        return results
+
+    @staticmethod
+    def _batch_error(error):
+        return {'module': error.__class__.__module__,
+                'class': error.__class__.__name__,
+                'message': six.text_type(error),
+                'kwargs': getattr(error, 'kwargs', {})}
+
     def object_backport(self, context, objinst, target_version):
         return objinst.obj_to_primitive(target_version=target_version)
 
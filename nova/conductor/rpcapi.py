@@ -178,6 +178,10 @@ class ConductorAPI(object):
     * Remove compute_node_delete()
     * Remove security_groups_trigger_handler()
 
+    * 2.2  - Added compact to object_class_action() and object_action(),
+             and accept objects in the compact encoding
+    * 2.3  - Added object_batch()
+
     """
 
     VERSION_ALIASES = {
@@ -193,10 +197,11 @@ class ConductorAPI(object):
         target = messaging.Target(topic=CONF.conductor.topic, version='2.0')
         version_cap = self.VERSION_ALIASES.get(CONF.upgrade_levels.conductor,
                                                CONF.upgrade_levels.conductor)
-        serializer = objects_base.NovaObjectSerializer()
+        self.serializer = objects_base.NovaObjectSerializer(
+            compact_check=lambda: self.client.can_send_version('2.2'))
         self.client = rpc.get_client(target,
                                      version_cap=version_cap,
-                                     serializer=serializer)
+                                     serializer=self.serializer)
 
     def instance_update(self, context, instance_uuid, updates,
                         service=None):
@@ -255,15 +260,34 @@ class ConductorAPI(object):
 
     def object_class_action(self, context, objname, objmethod, objver,
                             args, kwargs):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'object_class_action',
-                          objname=objname, objmethod=objmethod,
-                          objver=objver, args=args, kwargs=kwargs)
+        msg_args = dict(objname=objname, objmethod=objmethod, objver=objver,
+                        args=args, kwargs=kwargs)
+        version = '2.0'
+        if self.serializer.use_compact_encoding():
+            version = '2.2'
+            msg_args['compact'] = True
+        cctxt = self.client.prepare(version=version)
+        return cctxt.call(context, 'object_class_action', **msg_args)
 
     def object_action(self, context, objinst, objmethod, args, kwargs):
-        cctxt = self.client.prepare()
-        return cctxt.call(context, 'object_action', objinst=objinst,
-                          objmethod=objmethod, args=args, kwargs=kwargs)
+        msg_args = dict(objinst=objinst, objmethod=objmethod, args=args,
+                        kwargs=kwargs)
+        version = '2.0'
+        if self.serializer.use_compact_encoding():
+            version = '2.2'
+            msg_args['compact'] = True
+        cctxt = self.client.prepare(version=version)
+        return cctxt.call(context, 'object_action', **msg_args)
+
+    def can_batch_objects(self):
+        return self.client.can_send_version('2.3')
+
+    def object_batch(self, context, calls):
+        msg_args = dict(calls=calls)
+        if self.serializer.use_compact_encoding():
+            msg_args['compact'] = True
+        cctxt = self.client.prepare(version='2.3')
+        return cctxt.call(context, 'object_batch', **msg_args)
 
     def object_backport(self, context, objinst, target_version):
         cctxt = self.client.prepare()
@@ -125,6 +125,14 @@ def service_get_all_by_binary(context, binary):
     return IMPL.service_get_all_by_binary(context, binary)
 
 
+def service_get_all_by_binary_changed_since(context, binary, changed_since):
+    """Get all services for a given binary created, updated or deleted since
+    the given timestamp, including deleted and disabled ones.
+    """
+    return IMPL.service_get_all_by_binary_changed_since(context, binary,
+                                                        changed_since)
+
+
 def service_get_all_by_host(context, host):
     """Get all services for a given host."""
     return IMPL.service_get_all_by_host(context, host)
@@ -153,6 +161,16 @@ def service_update(context, service_id, values):
     return IMPL.service_update(context, service_id, values)
 
 
+def service_update_heartbeats(context, heartbeats):
+    """Record the heartbeats of several services in a single update.
+
+    :param heartbeats: dict of (number of heartbeats, time of the last
+                       heartbeat) tuples, keyed by service id
+    :returns: the number of services updated
+    """
+    return IMPL.service_update_heartbeats(context, heartbeats)
+
+
 ###################
 
 
@@ -209,6 +227,19 @@ def compute_node_get_all(context):
     return IMPL.compute_node_get_all(context)
 
 
+def compute_node_get_all_changed_since(context, changed_since):
+    """Get all computeNodes created, updated or deleted since a timestamp.
+
+    :param context: The security context
+    :param changed_since: datetime; rows whose created_at, updated_at or
+                          deleted_at are at or after it are returned,
+                          including deleted ones
+
+    :returns: List of dictionaries each containing compute node properties
+    """
+    return IMPL.compute_node_get_all_changed_since(context, changed_since)
+
+
 def compute_node_get_all_by_host(context, host, use_slave=False):
     """Get compute nodes by host name
 
@@ -1144,6 +1175,19 @@ def quota_reserve(context, resources, quotas, user_quotas, deltas, expire,
                               project_id=project_id, user_id=user_id)
 
 
+def quota_reserve_optimistic(context, resources, quotas, user_quotas, deltas,
+                             expire, until_refresh, max_age, project_id=None,
+                             user_id=None):
+    """Check quotas and create appropriate reservations, without locking
+    the quota usages.
+    """
+    return IMPL.quota_reserve_optimistic(context, resources, quotas,
+                                         user_quotas, deltas, expire,
+                                         until_refresh, max_age,
+                                         project_id=project_id,
+                                         user_id=user_id)
+
+
 def reservation_commit(context, reservations, project_id=None, user_id=None):
     """Commit quota reservations."""
     return IMPL.reservation_commit(context, reservations,
@@ -1811,9 +1855,11 @@ def instance_fault_create(context, values):
     return IMPL.instance_fault_create(context, values)
 
 
-def instance_fault_get_by_instance_uuids(context, instance_uuids):
+def instance_fault_get_by_instance_uuids(context, instance_uuids,
+                                         latest=False):
     """Get all instance faults for the provided instance_uuids."""
-    return IMPL.instance_fault_get_by_instance_uuids(context, instance_uuids)
+    return IMPL.instance_fault_get_by_instance_uuids(context, instance_uuids,
+                                                     latest=latest)
 
 
 ####################
@@ -1931,19 +1977,21 @@ def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
-    :returns: number of rows archived.
+    :returns: dict of the number of rows archived, keyed by table name.
     """
     return IMPL.archive_deleted_rows(context, max_rows=max_rows)
 
 
-def archive_deleted_rows_for_table(context, tablename, max_rows=None):
+def archive_deleted_rows_for_table(context, tablename, max_rows=None,
+                                   batch_size=None):
     """Move up to max_rows rows from tablename to corresponding shadow
-    table.
+    table, batch_size rows at a time.
 
     :returns: number of rows archived.
     """
     return IMPL.archive_deleted_rows_for_table(context, tablename,
-                                               max_rows=max_rows)
+                                               max_rows=max_rows,
+                                               batch_size=batch_size)
 
 
 def migrate_flavor_data(context, max_count, flavor_cache, force=False):
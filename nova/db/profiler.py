@@ -0,0 +1,197 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Accounting of the database statements run for each request.
+
+The API requests and the RPC calls handled by a service are profiled while
+they run. Each statement run by the database backend is attributed to the
+request whose id is the one of the current request context, and a summary
+is logged for the requests running too many statements, spending too much
+time in them, or running the same statement over and over, which usually
+means that rows are loaded one by one instead of in bulk (the "N+1"
+pattern).
+"""
+
+import contextlib
+import functools
+import re
+
+from oslo_config import cfg
+from oslo_context import context as common_context
+from oslo_log import log as logging
+
+from nova.i18n import _LW
+
+profiler_opts = [
+    cfg.BoolOpt('db_profiler_enabled',
+                default=False,
+                help='Count the database statements run by each API request '
+                     'and RPC call handled by the service, and log a '
+                     'summary of the requests above the thresholds below.'),
+    cfg.IntOpt('db_profiler_statement_threshold',
+               default=100,
+               help='Number of database statements of a request above '
+                    'which its summary is logged.'),
+    cfg.FloatOpt('db_profiler_time_threshold',
+                 default=1.0,
+                 help='Number of seconds spent in database statements by a '
+                      'request above which its summary is logged.'),
+    cfg.IntOpt('db_profiler_repeat_threshold',
+               default=20,
+               help='Number of times the same statement, with other '
+                    'parameters, can be run by a request before its summary '
+                    'is logged. Such statements are reported as repeated.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(profiler_opts)
+
+LOG = logging.getLogger(__name__)
+
+# Number of the most repeated statements listed by a summary
+_MAX_REPEATED = 5
+
+# Lists of placeholders, like those of an IN clause or of the rows of a
+# multi-row INSERT
+_PLACEHOLDERS = re.compile(r'\(\s*(?:\?|%s|%\(\w+\)s|:\w+)'
+                           r'(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\)'
+                           r'(?:\s*,\s*\(\s*(?:\?|%s|%\(\w+\)s|:\w+)'
+                           r'(?:\s*,\s*(?:\?|%s|%\(\w+\)s|:\w+))*\s*\))*')
+_SPACES = re.compile(r'\s+')
+
+# Profiles of the requests being handled, keyed by request id
+_PROFILES = {}
+
+
+def statement_shape(statement):
+    """Return the statement with its lists of placeholders collapsed, so
+    that it doesn't depend on the number of values it is run with.
+    """
+    return _PLACEHOLDERS.sub('(...)', _SPACES.sub(' ', statement.strip()))
+
+
+class RequestProfile(object):
+    """Statements run for a request."""
+
+    def __init__(self, request_id, name):
+        self.request_id = request_id
+        self.name = name
+        self.statements = 0
+        self.seconds = 0.0
+        # Count and time of the statements, keyed by their shape
+        self.shapes = {}
+        self.users = 0
+
+    def record(self, statement, seconds):
+        self.statements += 1
+        self.seconds += seconds
+        shape = statement_shape(statement)
+        count, shape_seconds = self.shapes.get(shape, (0, 0.0))
+        self.shapes[shape] = (count + 1, shape_seconds + seconds)
+
+    def repeated(self):
+        """Return the (shape, count, seconds) of the statements run at least
+        db_profiler_repeat_threshold times, the most repeated first.
+        """
+        threshold = CONF.db_profiler_repeat_threshold
+        repeated = [(shape, count, seconds)
+                    for shape, (count, seconds) in self.shapes.items()
+                    if count >= threshold]
+        return sorted(repeated, key=lambda item: item[1], reverse=True)
+
+    def log_summary(self):
+        """Log a summary of the statements of the request if it is above
+        the thresholds.
+        """
+        repeated = self.repeated()
+        if (not repeated and
+                self.statements < CONF.db_profiler_statement_threshold and
+                self.seconds < CONF.db_profiler_time_threshold):
+            return
+        LOG.warning(_LW("Request %(request_id)s (%(name)s) ran %(count)d "
+                        "database statements (%(shapes)d distinct) in "
+                        "%(seconds).3f seconds. Repeated statements: "
+                        "%(repeated)s"),
+                    {'request_id': self.request_id, 'name': self.name,
+                     'count': self.statements, 'shapes': len(self.shapes),
+                     'seconds': self.seconds,
+                     'repeated': '; '.join(
+                         '%d times in %.3f seconds: %s' % (count, seconds,
+                                                           shape)
+                         for shape, count, seconds in
+                         repeated[:_MAX_REPEATED]) or 'none'})
+
+
+def is_enabled():
+    return CONF.db_profiler_enabled
+
+
+@contextlib.contextmanager
+def profile(context, name):
+    """Attribute the database statements run while in the block to the
+    request of context, and log their summary at the end of the block.
+
+    The statements of the nested blocks of the same request, for example
+    of concurrent RPC calls made for the same API request, are all counted
+    in the summary logged at the end of the outer block.
+    """
+    request_id = getattr(context, 'request_id', None)
+    if not CONF.db_profiler_enabled or not request_id:
+        yield
+        return
+    request_profile = _PROFILES.get(request_id)
+    if request_profile is None:
+        request_profile = _PROFILES[request_id] = RequestProfile(request_id,
+                                                                 name)
+    request_profile.users += 1
+    try:
+        yield
+    finally:
+        request_profile.users -= 1
+        if not request_profile.users:
+            del _PROFILES[request_id]
+            request_profile.log_summary()
+
+
+def record(statement, seconds):
+    """Attribute a statement run by the database backend to the request of
+    the current context, if it is being profiled.
+    """
+    if not _PROFILES:
+        return
+    context = common_context.get_current()
+    request_profile = _PROFILES.get(getattr(context, 'request_id', None))
+    if request_profile is not None:
+        request_profile.record(statement, seconds)
+
+
+class ProfiledEndpoint(object):
+    """RPC endpoint profiling the calls of the endpoint it wraps."""
+
+    def __init__(self, endpoint, name):
+        self._endpoint = endpoint
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._endpoint, attr)
+        if attr.startswith('_') or not callable(value):
+            return value
+
+        @functools.wraps(value)
+        def wrapper(context, *args, **kwargs):
+            with profile(context, '%s.%s' % (self._name, attr)):
+                return value(context, *args, **kwargs)
+        return wrapper
@@ -21,8 +21,10 @@ import collections
 import copy
 import datetime
 import functools
+import inspect
 import sys
 import threading
+import time
 import uuid
 
 from oslo_config import cfg
@@ -39,6 +41,7 @@ import six
 from six.moves import range
 from sqlalchemy import and_
 from sqlalchemy import Boolean
+from sqlalchemy import event
 from sqlalchemy.exc import NoSuchTableError
 from sqlalchemy import Integer
 from sqlalchemy import MetaData
@@ -63,6 +66,7 @@ from nova import block_device
 from nova.compute import task_states
 from nova.compute import vm_states
 import nova.context
+from nova.db import profiler as db_profiler
 from nova.db.sqlalchemy import models
 from nova import exception
 from nova.i18n import _, _LI, _LE, _LW
@@ -74,6 +78,30 @@ db_opts = [
                help='When set, compute API will consider duplicate hostnames '
                     'invalid within the specified scope, regardless of case. '
                     'Should be empty, "project" or "global".'),
+    cfg.IntOpt('archive_batch_size',
+               default=1000,
+               help='Maximum number of deleted rows of a table moved to its '
+                    'shadow table in one transaction when archiving. '
+                    'Smaller batches hold their locks for less time.'),
+    cfg.StrOpt('db_replica_read_policy',
+               default='requested',
+               choices=('requested', 'eligible'),
+               help='Which reads go to the slave database when '
+                    'slave_connection is set: "requested" only sends the '
+                    'reads whose callers ask for it, "eligible" also sends '
+                    'the listing and reporting reads which tolerate data as '
+                    'old as the lag of the slave.'),
+    cfg.IntOpt('db_replica_max_lag',
+               default=0,
+               help='Maximum lag, in seconds, of the slave database above '
+                    'which reads go to the main database. The lag is '
+                    'estimated from the last service heartbeats seen by '
+                    'each database, which requires the db servicegroup '
+                    'driver. 0 disables the check.'),
+    cfg.IntOpt('db_replica_lag_check_interval',
+               default=10,
+               help='How often, in seconds, to estimate the lag of the slave '
+                    'database.'),
 ]
 
 api_db_opts = [
@@ -138,10 +166,26 @@ _API_FACADE = 'api'
 _LOCK = threading.Lock()
 
 
+def _profile_engine(engine):
+    """Report the statements run by engine to the database profiler."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context,
+                              executemany):
+        conn.info['profiler_start'] = time.time()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context,
+                             executemany):
+        start = conn.info.pop('profiler_start', None)
+        if start is not None:
+            db_profiler.record(statement, time.time() - start)
+
+
 def _create_facade(conf_group):
 
     # NOTE(dheeraj): This fragment is copied from oslo.db
-    return db_session.EngineFacade(
+    facade = db_session.EngineFacade(
         sql_connection=conf_group.connection,
         slave_connection=conf_group.slave_connection,
         sqlite_fk=False,
@@ -158,6 +202,12 @@ def _create_facade(conf_group):
         max_retries=conf_group.max_retries,
         retry_interval=conf_group.retry_interval)
 
+    if db_profiler.is_enabled():
+        _profile_engine(facade.get_engine())
+        if conf_group.slave_connection:
+            _profile_engine(facade.get_engine(use_slave=True))
+    return facade
+
 
 def _create_facade_lazily(facade, conf_group):
     global _LOCK, _ENGINE_FACADE
@@ -194,6 +244,9 @@ def get_api_session(**kwargs):
 
 _SHADOW_TABLE_PREFIX = 'shadow_'
 _DEFAULT_QUOTA_NAME = 'default'
+# Maximum number of values in the IN clause of a query fetching the rows
+# related to a list of instances.
+_MAX_IN_VALUES = 1000
 PER_PROJECT_QUOTAS = ['fixed_ips', 'floating_ips', 'networks']
 
 
@@ -234,6 +287,105 @@ def require_context(f):
     return wrapper
 
 
+class _ReplicaReadRouter(object):
+    """Decides whether the reads of the DB API go to the slave database, and
+    counts the reads sent to each database.
+    """
+
+    def __init__(self):
+        self.lag = None
+        self.lag_checked_at = None
+        self.counts = collections.defaultdict(
+            lambda: {'primary': 0, 'replica': 0})
+
+    @staticmethod
+    def _last_heartbeat(use_slave):
+        session = get_session(use_slave=use_slave)
+        return session.query(func.max(models.Service.updated_at)).scalar()
+
+    def _estimate_lag(self):
+        try:
+            primary = self._last_heartbeat(use_slave=False)
+            replica = self._last_heartbeat(use_slave=True)
+        except db_exc.DBError:
+            LOG.warning(_LW("Unable to estimate the lag of the slave "
+                            "database, reading from the main database."),
+                        exc_info=True)
+            return None
+        if primary is None:
+            return 0
+        if replica is None:
+            return None
+        return max(timeutils.delta_seconds(replica, primary), 0)
+
+    def replica_lag(self):
+        """Return the estimated lag of the slave database in seconds, or
+        None if it's unknown.
+        """
+        now = time.time()
+        if (self.lag_checked_at is None or
+                now - self.lag_checked_at >=
+                CONF.db_replica_lag_check_interval):
+            self.lag_checked_at = now
+            self.lag = self._estimate_lag()
+            LOG.debug("Estimated lag of the slave database: %s seconds",
+                      self.lag)
+        return self.lag
+
+    def use_slave(self, name, requested, eligible):
+        """Return whether a read of the name DB API function uses the slave
+        database.
+        """
+        use_slave = bool(requested or
+                         (eligible and
+                          CONF.db_replica_read_policy == 'eligible'))
+        if use_slave and not CONF.database.slave_connection:
+            use_slave = False
+        if use_slave and CONF.db_replica_max_lag:
+            lag = self.replica_lag()
+            if lag is None or lag > CONF.db_replica_max_lag:
+                use_slave = False
+        self.counts[name]['replica' if use_slave else 'primary'] += 1
+        return use_slave
+
+
+_REPLICA_READ_ROUTER = _ReplicaReadRouter()
+
+
+def _replica_read(eligible=False):
+    """Decorator routing the reads of a DB API function taking use_slave.
+
+    The read goes to the slave database if the caller asks for it, or if
+    the function is eligible and the policy sends eligible reads to the
+    slave, unless the slave lags too much behind. Only decorate read-only
+    functions.
+    """
+    def decorator(f):
+        name = f.__name__
+        position = inspect.getargspec(f).args.index('use_slave')
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if len(args) > position:
+                args = list(args)
+                args[position] = _REPLICA_READ_ROUTER.use_slave(
+                    name, args[position], eligible)
+            else:
+                kwargs['use_slave'] = _REPLICA_READ_ROUTER.use_slave(
+                    name, kwargs.get('use_slave'), eligible)
+            return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def get_replica_read_counts():
+    """Return the number of reads of the DB API functions routed by
+    _replica_read() to the main and to the slave databases.
+    """
+    return {name: dict(counts)
+            for name, counts in _REPLICA_READ_ROUTER.counts.items()}
+
+
 def require_instance_exists_using_uuid(f):
     """Decorator to require the specified instance to exist.
 
@@ -444,6 +596,7 @@ def _service_get(context, service_id, session=None,
     return result
 
 
+@_replica_read()
 def service_get(context, service_id, use_slave=False):
     return _service_get(context, service_id,
                         use_slave=use_slave)
@@ -480,6 +633,16 @@ def service_get_all_by_binary(context, binary):
                 all()
 
 
+def service_get_all_by_binary_changed_since(context, binary, changed_since):
+    model = models.Service
+    return model_query(context, model, read_deleted="yes").\
+                filter_by(binary=binary).\
+                filter(or_(model.created_at >= changed_since,
+                           model.updated_at >= changed_since,
+                           model.deleted_at >= changed_since)).\
+                all()
+
+
 def service_get_by_host_and_binary(context, host, binary):
     result = model_query(context, models.Service, read_deleted="no").\
                     filter_by(host=host).\
@@ -498,6 +661,7 @@ def service_get_all_by_host(context, host):
                 all()
 
 
+@_replica_read()
 def service_get_by_compute_host(context, host, use_slave=False):
     result = model_query(context, models.Service, read_deleted="no",
                          use_slave=use_slave).\
@@ -537,6 +701,27 @@ def service_update(context, service_id, values):
     return service_ref
 
 
+def service_update_heartbeats(context, heartbeats):
+    if not heartbeats:
+        return 0
+    model = models.Service
+    counts = {}
+    last_heartbeats = {}
+    for service_id, (count, last_heartbeat) in heartbeats.items():
+        counts[service_id] = count
+        last_heartbeats[service_id] = last_heartbeat
+    session = get_session()
+    with session.begin():
+        return model_query(context, model, session=session,
+                           read_deleted="no").\
+                    filter(model.id.in_(list(heartbeats))).\
+                    update({'report_count': model.report_count +
+                                sql.case(counts, value=model.id),
+                            'updated_at': sql.case(last_heartbeats,
+                                                   value=model.id)},
+                           synchronize_session=False)
+
+
 ###################
 
 def compute_node_get(context, compute_id):
@@ -576,6 +761,7 @@ def compute_node_get_by_host_and_nodename(context, host, nodename):
     return result
 
 
+@_replica_read()
 def compute_node_get_all_by_host(context, host, use_slave=False):
     result = model_query(context, models.ComputeNode, read_deleted='no',
                          use_slave=use_slave).\
@@ -592,6 +778,15 @@ def compute_node_get_all(context):
     return model_query(context, models.ComputeNode, read_deleted='no').all()
 
 
+def compute_node_get_all_changed_since(context, changed_since):
+    model = models.ComputeNode
+    return model_query(context, model, read_deleted='yes').\
+            filter(or_(model.created_at >= changed_since,
+                       model.updated_at >= changed_since,
+                       model.deleted_at >= changed_since)).\
+            all()
+
+
 def compute_node_search_by_hypervisor(context, hypervisor_match):
     field = models.ComputeNode.hypervisor_hostname
     return model_query(context, models.ComputeNode).\
@@ -1479,6 +1674,7 @@ def virtual_interface_get_by_uuid(context, vif_uuid):
 
 @require_context
 @require_instance_exists_using_uuid
+@_replica_read()
 def virtual_interface_get_by_instance(context, instance_uuid, use_slave=False):
     """Gets all virtual interfaces for instance.
 
@@ -1705,6 +1901,7 @@ def instance_destroy(context, instance_uuid, constraint=None):
 
 
 @require_context
+@_replica_read()
 def instance_get_by_uuid(context, uuid, columns_to_join=None, use_slave=False):
     return _instance_get_by_uuid(context, uuid,
             columns_to_join=columns_to_join, use_slave=use_slave)
@@ -1765,16 +1962,28 @@ def _build_instance_get(context, session=None,
     return query
 
 
+def _chunks(values, size=_MAX_IN_VALUES):
+    """Split values in lists of at most size values, to bound the length of
+    the IN clauses built from them.
+    """
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
 def _instances_fill_metadata(context, instances,
                              manual_joins=None, use_slave=False):
     """Selectively fill instances with manually-joined metadata. Note that
     instance will be converted to a dict.
 
+    Each manually joined table is read with one query per chunk of
+    _MAX_IN_VALUES instances, whatever the number of instances.
+
     :param context: security context
     :param instances: list of instances to fill
     :param manual_joins: list of tables to manually join (can be any
-                         combination of 'metadata' and 'system_metadata' or
-                         None to take the default of both)
+                         combination of 'metadata', 'system_metadata',
+                         'pci_devices' and 'tags' or None to take the default
+                         of both metadata)
     """
     uuids = [inst['uuid'] for inst in instances]
 
@@ -1783,20 +1992,34 @@ def _instances_fill_metadata(context, instances,
 
     meta = collections.defaultdict(list)
     if 'metadata' in manual_joins:
-        for row in _instance_metadata_get_multi(context, uuids,
-                                                use_slave=use_slave):
-            meta[row['instance_uuid']].append(row)
+        for chunk in _chunks(uuids):
+            for row in _instance_metadata_get_multi(context, chunk,
+                                                    use_slave=use_slave):
+                meta[row['instance_uuid']].append(row)
 
     sys_meta = collections.defaultdict(list)
     if 'system_metadata' in manual_joins:
-        for row in _instance_system_metadata_get_multi(context, uuids,
-                                                       use_slave=use_slave):
-            sys_meta[row['instance_uuid']].append(row)
+        for chunk in _chunks(uuids):
+            for row in _instance_system_metadata_get_multi(
+                    context, chunk, use_slave=use_slave):
+                sys_meta[row['instance_uuid']].append(row)
 
     pcidevs = collections.defaultdict(list)
     if 'pci_devices' in manual_joins:
-        for row in _instance_pcidevs_get_multi(context, uuids):
-            pcidevs[row['instance_uuid']].append(row)
+        for chunk in _chunks(uuids):
+            for row in _instance_pcidevs_get_multi(context, chunk):
+                pcidevs[row['instance_uuid']].append(row)
+
+    tags = collections.defaultdict(list)
+    if 'tags' in manual_joins:
+        # NOTE: Like the tags relationship, only load the tags of the
+        # instances which aren't deleted.
+        tagged_uuids = [inst['uuid'] for inst in instances
+                        if not inst['deleted']]
+        for chunk in _chunks(tagged_uuids):
+            for row in _instance_tags_get_multi(context, chunk,
+                                                use_slave=use_slave):
+                tags[row['resource_id']].append(row)
 
     filled_instances = []
     for inst in instances:
@@ -1805,6 +2028,8 @@ def _instances_fill_metadata(context, instances,
         inst['metadata'] = meta[inst['uuid']]
         if 'pci_devices' in manual_joins:
             inst['pci_devices'] = pcidevs[inst['uuid']]
+        if 'tags' in manual_joins:
+            inst['tags'] = tags[inst['uuid']]
         filled_instances.append(inst)
 
     return filled_instances
@@ -1813,8 +2038,8 @@ def _instances_fill_metadata(context, instances,
 def _manual_join_columns(columns_to_join):
     """Separate manually joined columns from columns_to_join
 
-    If columns_to_join contains 'metadata', 'system_metadata', or
-    'pci_devices' those columns are removed from columns_to_join and added
+    If columns_to_join contains 'metadata', 'system_metadata', 'pci_devices'
+    or 'tags' those columns are removed from columns_to_join and added
     to a manual_joins list to be used with the _instances_fill_metadata method.
 
     The columns_to_join formal parameter is copied and not modified, the return
@@ -1826,7 +2051,7 @@ def _manual_join_columns(columns_to_join):
     """
     manual_joins = []
     columns_to_join_new = copy.copy(columns_to_join)
-    for column in ('metadata', 'system_metadata', 'pci_devices'):
+    for column in ('metadata', 'system_metadata', 'pci_devices', 'tags'):
         if column in columns_to_join_new:
             columns_to_join_new.remove(column)
             manual_joins.append(column)
@@ -1873,6 +2098,7 @@ def instance_get_all_by_filters(context, filters, sort_key, sort_dir,
 
 
 @require_context
+@_replica_read(eligible=True)
 def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
                                      columns_to_join=None, use_slave=False,
                                      sort_keys=None, sort_dirs=None):
@@ -2044,16 +2270,15 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
 
     # paginate query
     if marker is not None:
-        try:
-            if deleted:
-                marker = _instance_get_by_uuid(
-                    context.elevated(read_deleted='yes'), marker,
-                    session=session)
-            else:
-                marker = _instance_get_by_uuid(context,
-                                               marker, session=session)
-        except exception.InstanceNotFound:
-            raise exception.MarkerNotFound(marker)
+        if deleted:
+            marker = _instance_get_pagination_marker(
+                context.elevated(read_deleted='yes'), marker, sort_keys,
+                session)
+        else:
+            marker = _instance_get_pagination_marker(context, marker,
+                                                     sort_keys, session)
+        query_prefix = _instance_keyset_bound(query_prefix, sort_keys,
+                                              sort_dirs, marker)
     try:
         query_prefix = sqlalchemyutils.paginate_query(query_prefix,
                                models.Instance, limit,
@@ -2066,6 +2291,60 @@ def instance_get_all_by_filters_sort(context, filters, limit=None, marker=None,
     return _instances_fill_metadata(context, query_prefix.all(), manual_joins)
 
 
+def _instance_get_pagination_marker(context, marker, sort_keys, session):
+    """Return the values of the sort keys of the marker instance.
+
+    Only the sort key columns of the marker are loaded, unless one of
+    the sort keys isn't a column of the instances table.
+    """
+    columns = models.Instance.__table__.columns
+    if not all(key in columns for key in sort_keys):
+        try:
+            return _instance_get_by_uuid(context, marker, session=session)
+        except exception.InstanceNotFound:
+            raise exception.MarkerNotFound(marker)
+
+    result = model_query(context, models.Instance,
+                         args=[getattr(models.Instance, key)
+                               for key in sort_keys],
+                         session=session, project_only=True).\
+                filter_by(uuid=marker).\
+                first()
+    if not result:
+        raise exception.MarkerNotFound(marker)
+    return result
+
+
+def _instance_keyset_bound(query, sort_keys, sort_dirs, marker):
+    """Bound the first sort key by its value in the marker.
+
+    paginate_query() selects the rows after the marker with an OR of
+    per-key criteria, which databases don't turn into an index range. All
+    these rows have the first sort key on the same side of the marker, so
+    saying it explicitly lets an index on it seek to the marker instead of
+    scanning the previous pages.
+
+    The NULLs sort first or last depending on the database, so the rows
+    with a NULL first sort key are kept when the column is nullable, and
+    nothing is bounded when the marker's value is NULL.
+    """
+    sort_key = sort_keys[0]
+    columns = models.Instance.__table__.columns
+    if sort_key not in columns:
+        return query
+    column = getattr(models.Instance, sort_key)
+    value = getattr(marker, sort_key)
+    if value is None:
+        return query
+    if sort_dirs[0] == 'desc':
+        bound = column <= value
+    else:
+        bound = column >= value
+    if columns[sort_key].nullable:
+        bound = or_(bound, column == null())
+    return query.filter(bound)
+
+
 def _tag_instance_filter(context, query, filters):
     """Applies tag filtering to an Instance query.
 
@@ -2287,6 +2566,7 @@ def process_sort_params(sort_keys, sort_dirs,
 
 
 @require_context
+@_replica_read(eligible=True)
 def instance_get_active_by_window_joined(context, begin, end=None,
                                          project_id=None, host=None,
                                          use_slave=False,
@@ -2337,6 +2617,7 @@ def _instance_get_all_query(context, project_only=False,
     return query
 
 
+@_replica_read()
 def instance_get_all_by_host(context, host,
                              columns_to_join=None,
                              use_slave=False):
@@ -2367,10 +2648,7 @@ def instance_get_all_by_host_and_node(context, host, node,
     if columns_to_join is None:
         manual_joins = []
     else:
-        candidates = ['system_metadata', 'metadata']
-        manual_joins = filter(lambda x: x in candidates,
-                              columns_to_join)
-        columns_to_join = list(set(columns_to_join) - set(candidates))
+        manual_joins, columns_to_join = _manual_join_columns(columns_to_join)
     return _instances_fill_metadata(context,
             _instance_get_all_query(
                 context,
@@ -3104,6 +3382,7 @@ def quota_create(context, project_id, resource, limit, user_id=None):
         quota_ref.save()
     except db_exc.DBDuplicateEntry:
         raise exception.QuotaExists(project_id=project_id, resource=resource)
+    quota.invalidate_limits_cache()
     return quota_ref
 
 
@@ -3124,6 +3403,7 @@ def quota_update(context, project_id, resource, limit, user_id=None):
                                                      user_id=user_id)
         else:
             raise exception.ProjectQuotaNotFound(project_id=project_id)
+    quota.invalidate_limits_cache()
 
 
 ###################
@@ -3176,6 +3456,7 @@ def quota_class_create(context, class_name, resource, limit):
     quota_class_ref.resource = resource
     quota_class_ref.hard_limit = limit
     quota_class_ref.save()
+    quota.invalidate_limits_cache()
     return quota_class_ref
 
 
@@ -3188,6 +3469,7 @@ def quota_class_update(context, class_name, resource, limit):
 
     if not result:
         raise exception.QuotaClassNotFound(class_name=class_name)
+    quota.invalidate_limits_cache()
 
 
 ###################
@@ -3306,13 +3588,14 @@ def _reservation_create(uuid, usage, project_id, user_id, resource,
 # on reservations.
 
 def _get_project_user_quota_usages(context, session, project_id,
-                                   user_id):
-    rows = model_query(context, models.QuotaUsage,
-                       read_deleted="no",
-                       session=session).\
-                   filter_by(project_id=project_id).\
-                   with_lockmode('update').\
-                   all()
+                                   user_id, lock=True):
+    query = model_query(context, models.QuotaUsage,
+                        read_deleted="no",
+                        session=session).\
+                   filter_by(project_id=project_id)
+    if lock:
+        query = query.with_lockmode('update')
+    rows = query.all()
     proj_result = dict()
     user_result = dict()
     # Get the total count of in_use,reserved
@@ -3449,6 +3732,36 @@ def _calculate_overquota(project_quotas, user_quotas, deltas,
     return overs
 
 
+def _raise_overquota(overs, project_quotas, user_quotas, deltas,
+                     project_usages, user_usages):
+    if project_quotas == user_quotas:
+        usages = project_usages
+    else:
+        # NOTE(mriedem): user_usages is a dict of resource keys to
+        # QuotaUsage sqlalchemy dict-like objects and doen't log well
+        # so convert the user_usages values to something useful for
+        # logging. Remove this if we ever change how
+        # _get_project_user_quota_usages returns the user_usages values.
+        user_usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'],
+                               total=v['total'])
+                  for k, v in user_usages.items()}
+        usages = user_usages
+    usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
+              for k, v in usages.items()}
+    LOG.debug('Raise OverQuota exception because: '
+              'project_quotas: %(project_quotas)s, '
+              'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
+              'overs: %(overs)s, project_usages: %(project_usages)s, '
+              'user_usages: %(user_usages)s',
+              {'project_quotas': project_quotas,
+               'user_quotas': user_quotas,
+               'overs': overs, 'deltas': deltas,
+               'project_usages': project_usages,
+               'user_usages': user_usages})
+    raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
+                              usages=usages)
+
+
 @require_context
 @oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
 def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
@@ -3569,32 +3882,186 @@ def quota_reserve(context, resources, project_quotas, user_quotas, deltas,
                         "resources: %s"), unders)
 
     if overs:
-        if project_quotas == user_quotas:
-            usages = project_usages
-        else:
-            # NOTE(mriedem): user_usages is a dict of resource keys to
-            # QuotaUsage sqlalchemy dict-like objects and doen't log well
-            # so convert the user_usages values to something useful for
-            # logging. Remove this if we ever change how
-            # _get_project_user_quota_usages returns the user_usages values.
-            user_usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'],
-                                   total=v['total'])
-                      for k, v in user_usages.items()}
-            usages = user_usages
-        usages = {k: dict(in_use=v['in_use'], reserved=v['reserved'])
-                  for k, v in usages.items()}
-        LOG.debug('Raise OverQuota exception because: '
-                  'project_quotas: %(project_quotas)s, '
-                  'user_quotas: %(user_quotas)s, deltas: %(deltas)s, '
-                  'overs: %(overs)s, project_usages: %(project_usages)s, '
-                  'user_usages: %(user_usages)s',
-                  {'project_quotas': project_quotas,
-                   'user_quotas': user_quotas,
-                   'overs': overs, 'deltas': deltas,
-                   'project_usages': project_usages,
-                   'user_usages': user_usages})
-        raise exception.OverQuota(overs=sorted(overs), quotas=user_quotas,
-                                  usages=usages)
+        _raise_overquota(overs, project_quotas, user_quotas, deltas,
+                         project_usages, user_usages)
+
+    return reservations
+
+
+class _QuotaUsageOverLimit(Exception):
+    """The conditional update of the usage of resource matched no row."""
+
+    def __init__(self, resource):
+        super(_QuotaUsageOverLimit, self).__init__(resource)
+        self.resource = resource
+
+
+def _is_quota_refresh_pending(quota_usage, max_age):
+    """Determines if a quota usage refresh is needed or counted down.
+
+    Unlike _is_quota_refresh_needed(), this doesn't count down until_refresh,
+    as that must be done with the usage locked.
+
+    :param quota_usage:   A QuotaUsage object for a given resource.
+    :param max_age:       Number of seconds between subsequent usage refreshes.
+    :return:              True if the usage must be reserved with it locked.
+    """
+    return (quota_usage.in_use < 0 or
+            quota_usage.until_refresh is not None or
+            bool(max_age and (timeutils.utcnow() -
+                              quota_usage.updated_at).seconds >= max_age))
+
+
+def _get_project_quota_usage_totals(context, project_id, resources):
+    """Returns the usages of a project summed over all its users.
+
+    :return: dict of resource keys to dicts of in_use, reserved and total.
+    """
+    rows = model_query(context, models.QuotaUsage,
+                       (models.QuotaUsage.resource,
+                        func.sum(models.QuotaUsage.in_use),
+                        func.sum(models.QuotaUsage.reserved)),
+                       read_deleted="no").\
+                   filter_by(project_id=project_id).\
+                   filter(models.QuotaUsage.resource.in_(resources)).\
+                   group_by(models.QuotaUsage.resource).\
+                   all()
+    return {resource: dict(in_use=int(in_use), reserved=int(reserved),
+                           total=int(in_use) + int(reserved))
+            for resource, in_use, reserved in rows}
+
+
+@oslo_db_api.wrap_db_retry(max_retries=5, retry_on_deadlock=True)
+def _quota_usages_reserve(context, user_usages, project_quotas, user_quotas,
+                          deltas, expire, project_id, user_id):
+    """Reserves deltas on the usages of a user and creates the reservations.
+
+    Each positive delta is added to the reserved count of the usage by an
+    UPDATE which only matches if the usage stays within the limit of the
+    user, so the usages are never read with a lock.
+
+    :return: list of the reservation UUIDs.
+    :raises: _QuotaUsageOverLimit if a delta is over the user quota.
+    """
+    session = get_session()
+    with session.begin():
+        # NOTE: The usages are always updated in the same order, so two
+        # concurrent reservations can't deadlock on them.
+        for res in sorted(deltas):
+            delta = deltas[res]
+            if delta <= 0:
+                continue
+            usage = user_usages[res]
+            query = model_query(context, models.QuotaUsage, read_deleted="no",
+                                session=session).\
+                        filter_by(id=usage.id)
+            if user_quotas[res] >= 0:
+                limit = user_quotas[res]
+                if usage.user_id is None:
+                    # NOTE: The per-project resources only have one usage
+                    # for the whole project, so the project limit is
+                    # checked here too.
+                    limit = min(limit, project_quotas[res])
+                query = query.filter(models.QuotaUsage.in_use +
+                                     models.QuotaUsage.reserved <=
+                                     limit - delta)
+            updated = query.update(
+                {'reserved': models.QuotaUsage.reserved + delta},
+                synchronize_session=False)
+            if not updated:
+                raise _QuotaUsageOverLimit(res)
+
+        reservations = []
+        for res, delta in deltas.items():
+            reservation = _reservation_create(str(uuid.uuid4()),
+                                              user_usages[res], project_id,
+                                              user_id, res, delta, expire,
+                                              session=session)
+            reservations.append(reservation.uuid)
+    return reservations
+
+
+@require_context
+def quota_reserve_optimistic(context, resources, project_quotas, user_quotas,
+                             deltas, expire, until_refresh, max_age,
+                             project_id=None, user_id=None):
+    """Check quotas and create reservations without locking the usages.
+
+    The usages of the user are checked and reserved by conditional updates,
+    see _quota_usages_reserve(). The usages of the project span the rows of
+    all its users, so they are only checked once the reservations are
+    committed, and these are rolled back if the project went over quota.
+    When two reservations race for the last of a project quota, both may
+    then be refused, but the quota can't be exceeded: the last one to commit
+    sees the other one.
+
+    The usages which must be created or refreshed are reserved by
+    quota_reserve() instead.
+    """
+    if project_id is None:
+        project_id = context.project_id
+    if user_id is None:
+        user_id = context.user_id
+
+    session = get_session()
+    project_usages, user_usages = _get_project_user_quota_usages(
+            context, session, project_id, user_id, lock=False)
+    if any(res not in user_usages or
+           _is_quota_refresh_pending(user_usages[res], max_age)
+           for res in deltas):
+        return quota_reserve(context, resources, project_quotas, user_quotas,
+                             deltas, expire, until_refresh, max_age,
+                             project_id=project_id, user_id=user_id)
+
+    # Check for deltas that would go negative
+    unders = [res for res, delta in deltas.items()
+              if delta < 0 and
+              delta + user_usages[res].in_use < 0]
+
+    reservations = []
+    overs = []
+    try:
+        reservations = _quota_usages_reserve(context, user_usages,
+                                             project_quotas, user_quotas,
+                                             deltas, expire, project_id,
+                                             user_id)
+    except _QuotaUsageOverLimit as e:
+        LOG.debug('Request is over user quota for resource "%(res)s". User '
+                  'limit: %(limit)s, delta: %(delta)s',
+                  {'res': e.resource, 'limit': user_quotas[e.resource],
+                   'delta': deltas[e.resource]})
+        overs.append(e.resource)
+
+    project_checked = [res for res, delta in deltas.items()
+                       if delta > 0 and user_quotas[res] >= 0 and
+                       user_usages[res].user_id is not None]
+    if reservations and project_checked:
+        # The totals include the deltas reserved above.
+        totals = _get_project_quota_usage_totals(context, project_id,
+                                                 project_checked)
+        for res in project_checked:
+            if project_quotas[res] < totals[res]['total']:
+                LOG.debug('Request is over project quota for resource '
+                          '"%(res)s". Project limit: %(limit)s, delta: '
+                          '%(delta)s, current total project usage: '
+                          '%(total)s',
+                          {'res': res, 'limit': project_quotas[res],
+                           'delta': deltas[res],
+                           'total': totals[res]['total'] - deltas[res]})
+                overs.append(res)
+        if overs:
+            reservation_rollback(context, reservations,
+                                 project_id=project_id, user_id=user_id)
+
+    if unders:
+        LOG.warning(_LW("Change will make usage less than 0 for the following "
+                        "resources: %s"), unders)
+
+    if overs:
+        project_usages, user_usages = _get_project_user_quota_usages(
+                context, get_session(), project_id, user_id, lock=False)
+        _raise_overquota(overs, project_quotas, user_quotas, deltas,
+                         project_usages, user_usages)
 
     return reservations
 
@@ -3664,6 +4131,7 @@ def quota_destroy_all_by_project_and_user(context, project_id, user_id):
                 filter_by(project_id=project_id).\
                 filter_by(user_id=user_id).\
                 soft_delete(synchronize_session=False)
+    quota.invalidate_limits_cache()
 
 
 @require_admin_context
@@ -3689,6 +4157,7 @@ def quota_destroy_all_by_project(context, project_id):
                     session=session, read_deleted="no").\
                 filter_by(project_id=project_id).\
                 soft_delete(synchronize_session=False)
+    quota.invalidate_limits_cache()
 
 
 @require_admin_context
@@ -3886,6 +4355,7 @@ def block_device_mapping_update_or_create(context, values, legacy=True):
 
 
 @require_context
+@_replica_read()
 def block_device_mapping_get_all_by_instance(context, instance_uuid,
                                              use_slave=False):
     return _block_device_mapping_get_query(context, use_slave=use_slave).\
@@ -4397,6 +4867,7 @@ def migration_get_by_instance_and_status(context, instance_uuid, status):
     return result
 
 
+@_replica_read(eligible=True)
 def migration_get_unconfirmed_by_dest_compute(context, confirm_window,
                                               dest_compute, use_slave=False):
     confirm_window = (timeutils.utcnow() -
@@ -5078,6 +5549,7 @@ def agent_build_update(context, agent_build_id, values):
 ####################
 
 @require_context
+@_replica_read()
 def bw_usage_get(context, uuid, start_period, mac, use_slave=False):
     values = {'start_period': start_period}
     values = convert_objects_related_datetimes(values, 'start_period')
@@ -5090,6 +5562,7 @@ def bw_usage_get(context, uuid, start_period, mac, use_slave=False):
 
 
 @require_context
+@_replica_read(eligible=True)
 def bw_usage_get_by_uuids(context, uuids, start_period, use_slave=False):
     values = {'start_period': start_period}
     values = convert_objects_related_datetimes(values, 'start_period')
@@ -5607,24 +6080,41 @@ def instance_fault_create(context, values):
     return dict(fault_ref.iteritems())
 
 
-def instance_fault_get_by_instance_uuids(context, instance_uuids):
-    """Get all instance faults for the provided instance_uuids."""
+def instance_fault_get_by_instance_uuids(context, instance_uuids,
+                                         latest=False):
+    """Get all instance faults for the provided instance_uuids.
+
+    :param instance_uuids: List of UUIDs of instances to grab faults for
+    :param latest: Optional boolean indicating we should only return the
+                   latest fault for the instance
+    """
     if not instance_uuids:
         return {}
 
-    rows = model_query(context, models.InstanceFault, read_deleted='no').\
-                       filter(models.InstanceFault.instance_uuid.in_(
-                           instance_uuids)).\
-                       order_by(desc("created_at"), desc("id")).\
-                       all()
-
     output = {}
     for instance_uuid in instance_uuids:
         output[instance_uuid] = []
 
-    for row in rows:
-        data = dict(row)
-        output[row['instance_uuid']].append(data)
+    for chunk in _chunks(instance_uuids):
+        query = model_query(context, models.InstanceFault,
+                            read_deleted='no').\
+                    filter(models.InstanceFault.instance_uuid.in_(chunk))
+        if latest:
+            latest_ids = model_query(context, models.InstanceFault,
+                                     [func.max(models.InstanceFault.id).
+                                      label('max_id')],
+                                     read_deleted='no').\
+                filter(models.InstanceFault.instance_uuid.in_(chunk)).\
+                group_by(models.InstanceFault.instance_uuid).\
+                subquery(name='latest_faults')
+            query = query.join(latest_ids,
+                               models.InstanceFault.id ==
+                               latest_ids.c.max_id)
+        rows = query.order_by(desc("created_at"), desc("id")).all()
+
+        for row in rows:
+            data = dict(row)
+            output[row['instance_uuid']].append(data)
 
     return output
 
@@ -5886,15 +6376,20 @@ def _get_default_deleted_value(table):
 
 
 @require_admin_context
-def archive_deleted_rows_for_table(context, tablename, max_rows):
+def archive_deleted_rows_for_table(context, tablename, max_rows,
+                                   batch_size=None):
     """Move up to max_rows rows from one tables to the corresponding
     shadow table. The context argument is only used for the decorator.
 
+    The rows are moved in batches of consecutive ids, each of them in its
+    own transaction, so that the locks are only held for one batch. A batch
+    which can't be deleted because of a foreign key is skipped, and will be
+    archived by a later run once its dependent rows have been.
+
     :returns: number of rows archived
     """
-    # NOTE(guochbo): There is a circular import, nova.db.sqlalchemy.utils
-    # imports nova.db.sqlalchemy.api.
-    from nova.db.sqlalchemy import utils as db_utils
+    if batch_size is None:
+        batch_size = CONF.archive_batch_size
 
     engine = get_engine()
     conn = engine.connect()
@@ -5920,59 +6415,90 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
         column = table.c.domain
     else:
         column = table.c.id
-    # NOTE(guochbo): Use DeleteFromSelect to avoid
-    # database's limit of maximum parameter in one SQL statement.
     deleted_column = table.c.deleted
+    deleted = deleted_column != deleted_column.default.arg
     columns = [c.name for c in table.c]
-    insert = shadow_table.insert(inline=True).\
-        from_select(columns,
-                    sql.select([table],
-                               deleted_column != deleted_column.default.arg).
-                    order_by(column).limit(max_rows))
-    query_delete = sql.select([column],
-                          deleted_column != deleted_column.default.arg).\
-                          order_by(column).limit(max_rows)
-
-    delete_statement = db_utils.DeleteFromSelect(table, query_delete, column)
-    try:
-        # Group the insert and delete in a transaction.
-        with conn.begin():
-            conn.execute(insert)
-            result_delete = conn.execute(delete_statement)
-    except db_exc.DBError:
-        # TODO(ekudryashova): replace by DBReferenceError when db layer
-        # raise it.
-        # A foreign key constraint keeps us from deleting some of
-        # these rows until we clean up a dependent table.  Just
-        # skip this table for now; we'll come back to it later.
-        msg = _("IntegrityError detected when archiving table %s") % tablename
-        LOG.warn(msg)
-        return rows_archived
 
-    rows_archived = result_delete.rowcount
+    last_id = None
+    while max_rows is None or rows_archived < max_rows:
+        limit = batch_size
+        if max_rows is not None:
+            limit = min(limit, max_rows - rows_archived)
+        query_ids = sql.select([column], deleted)
+        if last_id is not None:
+            query_ids = query_ids.where(column > last_id)
+        ids = [row[0] for row in
+               conn.execute(query_ids.order_by(column).limit(limit))]
+        if not ids:
+            break
+        # NOTE: Select the batch by its range of ids rather than by the
+        # list of ids, to avoid the database's limit of maximum parameters
+        # in one SQL statement.
+        batch = and_(deleted, column >= ids[0], column <= ids[-1])
+        last_id = ids[-1]
+
+        insert = shadow_table.insert(inline=True).\
+            from_select(columns, sql.select([table], batch))
+        delete_statement = table.delete().where(batch)
+        try:
+            # Group the insert and delete in a transaction.
+            with conn.begin():
+                conn.execute(insert)
+                result_delete = conn.execute(delete_statement)
+        except db_exc.DBError:
+            # TODO(ekudryashova): replace by DBReferenceError when db layer
+            # raise it.
+            # A foreign key constraint keeps us from deleting some of
+            # these rows until we clean up a dependent table.  Just
+            # skip this batch for now; we'll come back to it later.
+            LOG.warning(_LW("IntegrityError detected when archiving table "
+                            "%(table)s, skipping the rows %(first)s to "
+                            "%(last)s"),
+                        {'table': tablename, 'first': ids[0],
+                         'last': ids[-1]})
+            continue
+        rows_archived += result_delete.rowcount
 
     return rows_archived
 
 
+def _archive_table_names():
+    """Return the names of the tables to archive, the tables referencing
+    other tables first.
+    """
+    return [table.name
+            for table in reversed(models.BASE.metadata.sorted_tables)]
+
+
 @require_admin_context
 def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
-    :returns: Number of rows archived.
+    The tables are archived in the order of their foreign keys, so that the
+    rows of a table are archived before the rows they reference.
+
+    :returns: dict of the number of rows archived, keyed by table name
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in six.itervalues(models.__dict__):
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
+    table_to_rows_archived = {}
     rows_archived = 0
-    for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
+    for tablename in _archive_table_names():
+        if max_rows is not None and rows_archived >= max_rows:
             break
-    return rows_archived
+        start = time.time()
+        rows = archive_deleted_rows_for_table(context, tablename,
+            max_rows=None if max_rows is None else max_rows - rows_archived)
+        if rows:
+            elapsed = time.time() - start
+            LOG.info(_LI("Archived %(rows)d rows of table %(table)s in "
+                         "%(seconds).1f seconds (%(rate).0f rows/s)"),
+                     {'rows': rows, 'table': tablename,
+                      'seconds': elapsed,
+                      'rate': rows / max(elapsed, 0.001)})
+            table_to_rows_archived[tablename] = rows
+            rows_archived += rows
+    return table_to_rows_archived
 
 
 def _augment_flavor_to_migrate(flavor_to_migrate, db_flavor):
@@ -6398,6 +6924,13 @@ def _instance_pcidevs_get_multi(context, instance_uuids, session=None):
         filter(models.PciDevice.instance_uuid.in_(instance_uuids))
 
 
+def _instance_tags_get_multi(context, instance_uuids, use_slave=False):
+    if not instance_uuids:
+        return []
+    return get_session(use_slave=use_slave).query(models.Tag).\
+        filter(models.Tag.resource_id.in_(instance_uuids))
+
+
 def pci_device_destroy(context, node_id, address):
     result = model_query(context, models.PciDevice).\
                          filter_by(compute_node_id=node_id).\
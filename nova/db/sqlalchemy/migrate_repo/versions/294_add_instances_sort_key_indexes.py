@@ -0,0 +1,41 @@
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+from oslo_log import log as logging
+from sqlalchemy import Index, MetaData, Table
+
+from nova.i18n import _LI
+
+LOG = logging.getLogger(__name__)
+
+
+# Indexes serving the pages of instances sorted by these keys. Sorting by
+# host or uuid is already served by the existing indexes.
+INDEXES = {
+    'instances_deleted_created_at_idx': ['deleted', 'created_at'],
+    'instances_deleted_display_name_idx': ['deleted', 'display_name'],
+}
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+    table = Table('instances', meta, autoload=True)
+    existing = [idx.columns.keys() for idx in table.indexes]
+    for index_name, index_columns in sorted(INDEXES.items()):
+        if index_columns in existing:
+            LOG.info(_LI('Skipped adding %s because an equivalent index'
+                         ' already exists.'), index_name)
+            continue
+        columns = [getattr(table.c, col_name) for col_name in index_columns]
+        index = Index(index_name, *columns)
+        index.create(migrate_engine)
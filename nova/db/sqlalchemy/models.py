@@ -203,6 +203,10 @@ class Instance(BASE, NovaBase):
               'host', 'node', 'deleted'),
         Index('instances_host_deleted_cleaned_idx',
               'host', 'deleted', 'cleaned'),
+        Index('instances_deleted_created_at_idx',
+              'deleted', 'created_at'),
+        Index('instances_deleted_display_name_idx',
+              'deleted', 'display_name'),
         schema.UniqueConstraint('uuid', name='uniq_instances0uuid'),
     )
     injected_files = []
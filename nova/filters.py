@@ -17,6 +17,8 @@
 Filter support
 """
 
+import time
+
 from oslo_log import log as logging
 
 from nova.i18n import _LI
@@ -65,17 +67,30 @@ class BaseFilterHandler(loadables.BaseLoader):
     This class should be subclassed where one needs to use filters.
     """
 
+    # Object with a record(name, seconds, objs_in, objs_out) method, like
+    # nova.scheduler.timing.Timings, which is given the duration of each
+    # filter if set.
+    timings = None
+
+    def _record_filter(self, name, start, objs_in, objs_out):
+        if self.timings is not None:
+            self.timings.record('filter.%s' % name, time.time() - start,
+                                objs_in, objs_out)
+
     def get_filtered_objects(self, filters, objs, filter_properties, index=0):
         list_objs = list(objs)
         LOG.debug("Starting with %d host(s)", len(list_objs))
         for filter_ in filters:
             if filter_.run_filter_for_index(index):
                 cls_name = filter_.__class__.__name__
+                start = time.time()
                 objs = filter_.filter_all(list_objs, filter_properties)
                 if objs is None:
                     LOG.debug("Filter %s says to stop filtering", cls_name)
                     return
+                objs_in = len(list_objs)
                 list_objs = list(objs)
+                self._record_filter(cls_name, start, objs_in, len(list_objs))
                 if not list_objs:
                     LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
                     break
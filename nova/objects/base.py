@@ -22,6 +22,7 @@ import functools
 import traceback
 
 import netaddr
+from oslo_config import cfg
 from oslo_log import log as logging
 import oslo_messaging as messaging
 from oslo_utils import timeutils
@@ -37,6 +38,20 @@ from nova.openstack.common import versionutils
 from nova import utils
 
 
+object_opts = [
+    cfg.BoolOpt('compact_object_encoding',
+                default=False,
+                help='Send the objects passed over RPC in a compact encoding, '
+                     'where the field names of each object class are sent '
+                     'once per argument and the field values positionally. '
+                     'It is only used with the services whose RPC API '
+                     'version cap allows it, and for the replies of the '
+                     'conductor object calls.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(object_opts)
+
 LOG = logging.getLogger('object')
 
 
@@ -45,6 +60,24 @@ def get_attrname(name):
     return '_' + name
 
 
+# Types of the fields whose value is returned unchanged by their coerce()
+# when it is of one of the types listed, keyed by the exact type of field
+_TRUSTED_FIELD_TYPES = {
+    obj_fields.String: (six.text_type,),
+    obj_fields.UUID: (str,),
+    obj_fields.Integer: (int,),
+    obj_fields.Float: (float,),
+    obj_fields.Boolean: (bool,),
+}
+
+# Types of the fields which can't hold an object
+_NON_OBJECT_FIELD_TYPES = (obj_fields.String, obj_fields.UUID,
+                           obj_fields.Integer, obj_fields.Float,
+                           obj_fields.Boolean, obj_fields.DateTime,
+                           obj_fields.IPAddress, obj_fields.CompoundFieldType,
+                           obj_fields.NetworkModel)
+
+
 def make_class_properties(cls):
     # NOTE(danms/comstud): Inherit fields from super classes.
     # mro() returns the current class first and returns 'object' last, so
@@ -58,21 +91,38 @@ def make_class_properties(cls):
         for name, field in supercls.fields.items():
             if name not in cls.fields:
                 cls.fields[name] = field
+
+    # NOTE: The layout of the fields is computed once per class for the
+    # hot paths below. The values of the fields are stored in the __dict__
+    # of the objects, under their attrname, so they are looked up there
+    # rather than with hasattr() and getattr().
+    cls._obj_attrnames = {}
+    cls._obj_object_fields = []
+    cls._obj_trusted_types = {}
     for name, field in six.iteritems(cls.fields):
         if not isinstance(field, obj_fields.Field):
             raise exception.ObjectFieldInvalid(
                 field=name, objname=cls.obj_name())
-
-        def getter(self, name=name):
-            attrname = get_attrname(name)
-            if not hasattr(self, attrname):
+        attrname = get_attrname(name)
+        cls._obj_attrnames[name] = attrname
+        if not isinstance(field._type, _NON_OBJECT_FIELD_TYPES):
+            cls._obj_object_fields.append(name)
+        trusted_types = _TRUSTED_FIELD_TYPES.get(type(field._type))
+        if trusted_types and not field.read_only:
+            if field.nullable:
+                trusted_types += (type(None),)
+            cls._obj_trusted_types[name] = trusted_types
+
+        def getter(self, name=name, attrname=attrname):
+            try:
+                return self.__dict__[attrname]
+            except KeyError:
                 self.obj_load_attr(name)
-            return getattr(self, attrname)
+                return getattr(self, attrname)
 
-        def setter(self, value, name=name, field=field):
-            attrname = get_attrname(name)
+        def setter(self, value, name=name, attrname=attrname, field=field):
             field_value = field.coerce(self, name, value)
-            if field.read_only and hasattr(self, attrname):
+            if field.read_only and attrname in self.__dict__:
                 # Note(yjiang5): _from_db_object() may iterate
                 # every field and write, no exception in such situation.
                 if getattr(self, attrname) != field_value:
@@ -88,11 +138,10 @@ def make_class_properties(cls):
                 LOG.exception(_LE('Error setting %(attr)s'), {'attr': attr})
                 raise
 
-        def deleter(self, name=name):
-            attrname = get_attrname(name)
-            if not hasattr(self, attrname):
+        def deleter(self, name=name, attrname=attrname):
+            if attrname not in self.__dict__:
                 raise AttributeError('No such attribute `%s' % name)
-            delattr(self, get_attrname(name))
+            delattr(self, attrname)
 
         setattr(cls, name, property(getter, setter, deleter))
 
@@ -490,10 +539,12 @@ class NovaObject(object):
         This calls to_primitive() for each item in fields.
         """
         primitive = dict()
+        values = self.__dict__
         for name, field in self.fields.items():
-            if self.obj_attr_is_set(name):
+            attrname = self._obj_attrnames[name]
+            if attrname in values:
                 primitive[name] = field.to_primitive(self, name,
-                                                     getattr(self, name))
+                                                     values[attrname])
         if target_version:
             self.obj_make_compatible(primitive, target_version)
         obj = {'nova_object.name': self.obj_name(),
@@ -504,6 +555,25 @@ class NovaObject(object):
             obj['nova_object.changes'] = list(self.obj_what_changed())
         return obj
 
+    def _obj_set_db_fields(self, db_obj, names):
+        """Set the named fields from the columns of a database row.
+
+        This is the same as setting each field, but the values which the
+        field would not change, like the unicode values of the String
+        fields, are set without being coerced, and the changes are
+        tracked in bulk.
+        """
+        values = self.__dict__
+        trusted_types = self._obj_trusted_types
+        attrnames = self._obj_attrnames
+        for name in names:
+            value = db_obj[name]
+            if type(value) in trusted_types.get(name, ()):
+                values[attrnames[name]] = value
+            else:
+                setattr(self, name, value)
+        self._changed_fields.update(names)
+
     def obj_set_defaults(self, *attrs):
         if not attrs:
             attrs = [name for name, field in self.fields.items()
@@ -538,10 +608,11 @@ class NovaObject(object):
     def obj_what_changed(self):
         """Returns a set of fields that have been modified."""
         changes = set(self._changed_fields)
-        for field in self.fields:
-            if (self.obj_attr_is_set(field) and
-                    isinstance(getattr(self, field), NovaObject) and
-                    getattr(self, field).obj_what_changed()):
+        values = self.__dict__
+        for field in self._obj_object_fields:
+            value = values.get(self._obj_attrnames[field])
+            if (isinstance(value, NovaObject) and
+                    value.obj_what_changed()):
                 changes.add(field)
         return changes
 
@@ -602,7 +673,10 @@ class NovaObject(object):
         False if not. Raises AttributeError if attrname is not
         a valid attribute for this object.
         """
-        if attrname not in self.obj_fields:
+        field_attrname = self._obj_attrnames.get(attrname)
+        if field_attrname is not None:
+            return field_attrname in self.__dict__
+        if attrname not in self.obj_extra_fields:
             raise AttributeError(
                 _("%(objname)s object has no attribute '%(attrname)s'") %
                 {'objname': self.obj_name(), 'attrname': attrname})
@@ -699,6 +773,158 @@ class ObjectListBase(ovoo_base.ObjectListBase):
             return primitive.get(key, default)
 
 
+# Key of the compact encoding of an entity holding objects, and key of the
+# objects within it
+_COMPACT_KEY = 'nova_object.compact'
+_COMPACT_OBJECT_KEY = '~o'
+
+_PRIMITIVE_KEYS = frozenset(['nova_object.name', 'nova_object.namespace',
+                             'nova_object.version', 'nova_object.data',
+                             'nova_object.changes'])
+
+
+_CONTAINER_TYPES = (dict, list, tuple)
+
+
+class _NotCompactable(Exception):
+    pass
+
+
+class _CompactEncoder(object):
+    """Encoder of the object primitives held by an entity.
+
+    The name, version, namespace and field names of each object class are
+    put once in the classes table. An object is then encoded as a list of
+    the index of its class in the table, the bitmask of the positions of its
+    set fields in the field names of the class (as hex), the values of these
+    fields, and the bitmask of its changed fields if it has changes.
+    """
+
+    def __init__(self):
+        self.classes = []
+        self._layouts = {}
+
+    def _layout(self, primitive):
+        key = (primitive['nova_object.name'],
+               primitive['nova_object.version'],
+               primitive['nova_object.namespace'])
+        layout = self._layouts.get(key)
+        if layout is None:
+            layout = self._layouts[key] = (len(self.classes), [], {})
+            self.classes.append(list(key) + [layout[1]])
+        return layout
+
+    @staticmethod
+    def _mask(names, layout):
+        _index, field_names, positions = layout
+        mask = 0
+        for name in names:
+            position = positions.get(name)
+            if position is None:
+                position = positions[name] = len(field_names)
+                field_names.append(name)
+            mask |= 1 << position
+        return mask
+
+    def encode(self, value):
+        if isinstance(value, dict):
+            if 'nova_object.name' in value:
+                return {_COMPACT_OBJECT_KEY: self._encode_object(value)}
+            if _COMPACT_OBJECT_KEY in value or _COMPACT_KEY in value:
+                raise _NotCompactable()
+            return {k: self.encode(v) if isinstance(v, _CONTAINER_TYPES) else v
+                    for k, v in six.iteritems(value)}
+        elif isinstance(value, list):
+            return [self.encode(v) if isinstance(v, _CONTAINER_TYPES) else v
+                    for v in value]
+        elif isinstance(value, tuple):
+            return tuple([self.encode(v) if isinstance(v, _CONTAINER_TYPES)
+                          else v for v in value])
+        return value
+
+    def _encode_object(self, primitive):
+        if not _PRIMITIVE_KEYS.issuperset(primitive):
+            raise _NotCompactable()
+        layout = self._layout(primitive)
+        data = primitive['nova_object.data']
+        mask = self._mask(data, layout)
+        values = [data[name] for name in layout[1] if name in data]
+        values = [self.encode(v) if isinstance(v, _CONTAINER_TYPES) else v
+                  for v in values]
+        encoded = [layout[0], '%x' % mask, values]
+        if 'nova_object.changes' in primitive:
+            encoded.append('%x' % self._mask(primitive['nova_object.changes'],
+                                             layout))
+        return encoded
+
+
+class _CompactDecoder(object):
+    def __init__(self, classes):
+        self.classes = classes
+
+    def decode(self, value):
+        if isinstance(value, dict):
+            if _COMPACT_OBJECT_KEY in value:
+                return self._decode_object(value[_COMPACT_OBJECT_KEY])
+            return {k: self.decode(v) if isinstance(v, _CONTAINER_TYPES) else v
+                    for k, v in six.iteritems(value)}
+        elif isinstance(value, list):
+            return [self.decode(v) if isinstance(v, _CONTAINER_TYPES) else v
+                    for v in value]
+        elif isinstance(value, tuple):
+            return tuple([self.decode(v) if isinstance(v, _CONTAINER_TYPES)
+                          else v for v in value])
+        return value
+
+    @staticmethod
+    def _names(mask, field_names):
+        mask = int(mask, 16)
+        return [name for position, name in enumerate(field_names)
+                if mask >> position & 1]
+
+    def _decode_object(self, encoded):
+        objname, objver, namespace, field_names = self.classes[encoded[0]]
+        names = self._names(encoded[1], field_names)
+        primitive = {'nova_object.name': objname,
+                     'nova_object.namespace': namespace,
+                     'nova_object.version': objver,
+                     'nova_object.data': {
+                         name: (self.decode(value)
+                                if isinstance(value, _CONTAINER_TYPES)
+                                else value)
+                         for name, value in zip(names, encoded[2])}}
+        if len(encoded) > 3:
+            primitive['nova_object.changes'] = self._names(encoded[3],
+                                                           field_names)
+        return primitive
+
+
+def obj_to_compact_primitive(entity):
+    """Encode the object primitives held by a serialized entity compactly.
+
+    The entity is returned as is if it doesn't hold any object primitive.
+    obj_from_compact_primitive() turns the result back into the entity.
+    """
+    encoder = _CompactEncoder()
+    try:
+        encoded = encoder.encode(entity)
+    except _NotCompactable:
+        # NOTE: A plain dict using one of our keys can't be told apart
+        # from an encoded object, so such an entity is sent as is.
+        return entity
+    if not encoder.classes:
+        return entity
+    return {_COMPACT_KEY: [encoder.classes, encoded]}
+
+
+def obj_from_compact_primitive(compact):
+    """Turn the result of obj_to_compact_primitive() back into the entity
+    it was made from, ready for obj_from_primitive().
+    """
+    classes, encoded = compact[_COMPACT_KEY]
+    return _CompactDecoder(classes).decode(encoded)
+
+
 class NovaObjectSerializer(messaging.NoOpSerializer):
     """A NovaObject-aware Serializer.
 
@@ -706,8 +932,22 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
     ability to serialize and deserialize NovaObject entities. Any service
     that needs to accept or return NovaObjects as arguments or result values
     should pass this to its RPCClient and RPCServer objects.
+
+    When the compact_object_encoding option is set, the entities holding
+    objects are sent in the compact encoding of obj_to_compact_primitive()
+    if compact_check returns True, which must only be the case if all the
+    receivers of the client are able to decode it. The compact encoding is
+    always decoded.
     """
 
+    def __init__(self, compact_check=None):
+        super(NovaObjectSerializer, self).__init__()
+        self._compact_check = compact_check
+
+    def use_compact_encoding(self):
+        return (CONF.compact_object_encoding and
+                self._compact_check is not None and self._compact_check())
+
     @property
     def conductor(self):
         if not hasattr(self, '_conductor'):
@@ -752,16 +992,24 @@ class NovaObjectSerializer(messaging.NoOpSerializer):
                 iterable = list
             return iterable([action_fn(context, value) for value in values])
 
-    def serialize_entity(self, context, entity):
+    def _serialize_entity(self, context, entity):
         if isinstance(entity, (tuple, list, set, dict)):
-            entity = self._process_iterable(context, self.serialize_entity,
+            entity = self._process_iterable(context, self._serialize_entity,
                                             entity)
         elif (hasattr(entity, 'obj_to_primitive') and
               callable(entity.obj_to_primitive)):
             entity = entity.obj_to_primitive()
         return entity
 
+    def serialize_entity(self, context, entity):
+        entity = self._serialize_entity(context, entity)
+        if self.use_compact_encoding():
+            entity = obj_to_compact_primitive(entity)
+        return entity
+
     def deserialize_entity(self, context, entity):
+        if isinstance(entity, dict) and _COMPACT_KEY in entity:
+            entity = obj_from_compact_primitive(entity)
         if isinstance(entity, dict) and 'nova_object.name' in entity:
             entity = self._process_object(context, entity)
         elif isinstance(entity, (tuple, list, set, dict)):
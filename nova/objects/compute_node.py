@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 
 from nova import db
 from nova import exception
@@ -128,8 +129,7 @@ class ComputeNode(base.NovaPersistentObject, base.NovaObject,
             'pci_device_pools',
             ])
         fields = set(compute.fields) - special_cases
-        for key in fields:
-            compute[key] = db_compute[key]
+        compute._obj_set_db_fields(db_compute, fields)
 
         stats = db_compute['stats']
         if stats:
@@ -285,7 +285,8 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
     # Version 1.9 ComputeNode version 1.9
     # Version 1.10 ComputeNode version 1.10
     # Version 1.11 ComputeNode version 1.11
-    VERSION = '1.11'
+    # Version 1.12 Add get_all_changed_since()
+    VERSION = '1.12'
     fields = {
         'objects': fields.ListOfObjectsField('ComputeNode'),
         }
@@ -303,6 +304,7 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         '1.9': '1.9',
         '1.10': '1.10',
         '1.11': '1.11',
+        '1.12': '1.11',
         }
 
     @base.remotable_classmethod
@@ -311,6 +313,29 @@ class ComputeNodeList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.ComputeNode,
                                   db_computes)
 
+    @base.remotable_classmethod
+    def _get_all_changed_since(cls, context, changed_since):
+        # The timestamp string is converted back to a naive UTC datetime to
+        # match the DB columns.
+        changed_since = timeutils.normalize_time(
+            timeutils.parse_isotime(changed_since))
+        db_computes = db.compute_node_get_all_changed_since(context,
+                                                            changed_since)
+        return base.obj_make_list(context, cls(context), objects.ComputeNode,
+                                  db_computes)
+
+    @classmethod
+    def get_all_changed_since(cls, context, changed_since):
+        """Get the compute nodes created, updated or deleted since a time.
+
+        Deleted compute nodes are returned too, so that callers keeping a
+        local view of the nodes can evict them.
+        """
+        # We have to convert the datetime object to a string primitive for
+        # the remote call.
+        return cls._get_all_changed_since(context,
+                                          timeutils.isotime(changed_since))
+
     @base.remotable_classmethod
     def get_by_hypervisor(cls, context, hypervisor_match):
         db_computes = db.compute_node_search_by_hypervisor(context,
@@ -393,6 +393,14 @@ class FlexibleBoolean(Boolean):
         return strutils.bool_from_string(value)
 
 
+def _isotime(value):
+    # NOTE: This is the format of timeutils.isotime(), which is deprecated
+    # and wrapped in a warning check costing more than the formatting, for
+    # each datetime field serialized.
+    tz = value.tzinfo.tzname(None) if value.tzinfo else 'UTC'
+    return value.strftime('%Y-%m-%dT%H:%M:%S') + ('Z' if tz == 'UTC' else tz)
+
+
 class DateTime(FieldType):
     @staticmethod
     def coerce(obj, attr, value):
@@ -416,11 +424,11 @@ class DateTime(FieldType):
 
     @staticmethod
     def to_primitive(obj, attr, value):
-        return timeutils.isotime(value)
+        return _isotime(value)
 
     @staticmethod
     def stringify(value):
-        return timeutils.isotime(value)
+        return _isotime(value)
 
 
 class IPAddress(FieldType):
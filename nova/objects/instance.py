@@ -484,15 +484,12 @@ class Instance(base.NovaPersistentObject, base.NovaObject,
         if expected_attrs is None:
             expected_attrs = []
         # Most of the field names match right now, so be quick
-        for field in instance.fields:
-            if field in INSTANCE_OPTIONAL_ATTRS:
-                continue
-            elif field == 'deleted':
-                instance.deleted = db_inst['deleted'] == db_inst['id']
-            elif field == 'cleaned':
-                instance.cleaned = db_inst['cleaned'] == 1
-            else:
-                instance[field] = db_inst[field]
+        instance._obj_set_db_fields(db_inst, [
+            field for field in instance.fields
+            if (field not in INSTANCE_OPTIONAL_ATTRS and
+                field not in ('deleted', 'cleaned'))])
+        instance.deleted = db_inst['deleted'] == db_inst['id']
+        instance.cleaned = db_inst['cleaned'] == 1
 
         # NOTE(danms): We can be called with a dict instead of a
         # SQLAlchemy object, so we have to be careful here
@@ -1143,7 +1140,7 @@ def _make_instance_list(context, inst_list, db_inst_list, expected_attrs):
         # Build an instance_uuid:latest-fault mapping
         expected_attrs.remove('fault')
         instance_uuids = [inst['uuid'] for inst in db_inst_list]
-        faults = objects.InstanceFaultList.get_by_instance_uuids(
+        faults = objects.InstanceFaultList.get_latest_by_instance_uuids(
             context, instance_uuids)
         for fault in faults:
             if fault.instance_uuid not in inst_faults:
@@ -1326,7 +1323,7 @@ class InstanceList(base.ObjectListBase, base.NovaObject):
         :returns: A list of instance uuids for which faults were found.
         """
         uuids = [inst.uuid for inst in self]
-        faults = objects.InstanceFaultList.get_by_instance_uuids(
+        faults = objects.InstanceFaultList.get_latest_by_instance_uuids(
             self._context, uuids)
         faults_by_uuid = {}
         for fault in faults:
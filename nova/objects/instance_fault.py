@@ -58,7 +58,8 @@ class InstanceFault(base.NovaPersistentObject, base.NovaObject,
     @base.remotable_classmethod
     def get_latest_for_instance(cls, context, instance_uuid):
         db_faults = db.instance_fault_get_by_instance_uuids(context,
-                                                            [instance_uuid])
+                                                            [instance_uuid],
+                                                            latest=True)
         if instance_uuid in db_faults and db_faults[instance_uuid]:
             return cls._from_db_object(context, cls(),
                                        db_faults[instance_uuid][0])
@@ -94,7 +95,8 @@ class InstanceFaultList(base.ObjectListBase, base.NovaObject):
     # Version 1.0: Initial version
     #              InstanceFault <= version 1.1
     # Version 1.1: InstanceFault version 1.2
-    VERSION = '1.1'
+    # Version 1.2: Added get_latest_by_instance_uuids() method
+    VERSION = '1.2'
 
     fields = {
         'objects': fields.ListOfObjectsField('InstanceFault'),
@@ -103,8 +105,18 @@ class InstanceFaultList(base.ObjectListBase, base.NovaObject):
         '1.0': '1.1',
         # NOTE(danms): InstanceFault was at 1.1 before we added this
         '1.1': '1.2',
+        '1.2': '1.2',
         }
 
+    @base.remotable_classmethod
+    def get_latest_by_instance_uuids(cls, context, instance_uuids):
+        db_faultdict = db.instance_fault_get_by_instance_uuids(context,
+                                                               instance_uuids,
+                                                               latest=True)
+        db_faultlist = itertools.chain(*db_faultdict.values())
+        return base.obj_make_list(context, cls(context), objects.InstanceFault,
+                                  db_faultlist)
+
     @base.remotable_classmethod
     def get_by_instance_uuids(cls, context, instance_uuids):
         db_faultdict = db.instance_fault_get_by_instance_uuids(context,
@@ -44,8 +44,7 @@ class InstanceInfoCache(base.NovaPersistentObject, base.NovaObject,
 
     @staticmethod
     def _from_db_object(context, info_cache, db_obj):
-        for field in info_cache.fields:
-            info_cache[field] = db_obj[field]
+        info_cache._obj_set_db_fields(db_obj, info_cache.fields)
         info_cache.obj_reset_changes()
         info_cache._context = context
         return info_cache
@@ -150,12 +150,10 @@ class PciDevice(base.NovaPersistentObject, base.NovaObject,
 
     @staticmethod
     def _from_db_object(context, pci_device, db_dev):
-        for key in pci_device.fields:
-            if key != 'extra_info':
-                pci_device[key] = db_dev[key]
-            else:
-                extra_info = db_dev.get("extra_info")
-                pci_device.extra_info = jsonutils.loads(extra_info)
+        pci_device._obj_set_db_fields(
+            db_dev, [key for key in pci_device.fields if key != 'extra_info'])
+        extra_info = db_dev.get("extra_info")
+        pci_device.extra_info = jsonutils.loads(extra_info)
         pci_device._context = context
         pci_device.obj_reset_changes()
         return pci_device
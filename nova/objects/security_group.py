@@ -36,8 +36,7 @@ class SecurityGroup(base.NovaPersistentObject, base.NovaObject,
     @staticmethod
     def _from_db_object(context, secgroup, db_secgroup):
         # NOTE(danms): These are identical right now
-        for field in secgroup.fields:
-            secgroup[field] = db_secgroup[field]
+        secgroup._obj_set_db_fields(db_secgroup, secgroup.fields)
         secgroup._context = context
         secgroup.obj_reset_changes()
         return secgroup
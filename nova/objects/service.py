@@ -13,6 +13,7 @@
 #    under the License.
 
 from oslo_log import log as logging
+from oslo_utils import timeutils
 
 from nova import availability_zones
 from nova import db
@@ -20,6 +21,7 @@ from nova import exception
 from nova import objects
 from nova.objects import base
 from nova.objects import fields
+from nova.servicegroup.drivers import db as servicegroup_db
 from nova import utils
 
 
@@ -42,7 +44,8 @@ class Service(base.NovaPersistentObject, base.NovaObject,
     # Version 1.10: Changes behaviour of loading compute_node
     # Version 1.11: Added get_by_host_and_binary
     # Version 1.12: ComputeNode version 1.11
-    VERSION = '1.12'
+    # Version 1.13: Added heartbeat()
+    VERSION = '1.13'
 
     fields = {
         'id': fields.IntegerField(read_only=True),
@@ -174,6 +177,20 @@ class Service(base.NovaPersistentObject, base.NovaObject,
         db_service = db.service_update(self._context, self.id, updates)
         self._from_db_object(self._context, self, db_service)
 
+    @base.remotable
+    def heartbeat(self):
+        """Record a heartbeat of the service.
+
+        Unlike save(), the heartbeat is written to the database in bulk with
+        the heartbeats of the other services, see the
+        heartbeat_flush_interval option.
+        """
+        now = timeutils.utcnow()
+        self.report_count += 1
+        self.updated_at = now
+        servicegroup_db.record_heartbeat(self.id, now)
+        self.obj_reset_changes(['report_count', 'updated_at'])
+
     @base.remotable
     def destroy(self):
         db.service_destroy(self._context, self.id)
@@ -192,7 +209,9 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
     # Version 1.8: Service version 1.10
     # Version 1.9: Added get_by_binary() and Service version 1.11
     # Version 1.10: Service version 1.12
-    VERSION = '1.10'
+    # Version 1.11: Added get_by_binary_changed_since()
+    # Version 1.12: Service version 1.13
+    VERSION = '1.12'
 
     fields = {
         'objects': fields.ListOfObjectsField('Service'),
@@ -210,6 +229,8 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         '1.8': '1.10',
         '1.9': '1.11',
         '1.10': '1.12',
+        '1.11': '1.12',
+        '1.12': '1.13',
         }
 
     @base.remotable_classmethod
@@ -224,6 +245,25 @@ class ServiceList(base.ObjectListBase, base.NovaObject):
         return base.obj_make_list(context, cls(context), objects.Service,
                                   db_services)
 
+    @base.remotable_classmethod
+    def _get_by_binary_changed_since(cls, context, binary, changed_since):
+        changed_since = timeutils.normalize_time(
+            timeutils.parse_isotime(changed_since))
+        db_services = db.service_get_all_by_binary_changed_since(
+            context, binary, changed_since)
+        return base.obj_make_list(context, cls(context), objects.Service,
+                                  db_services)
+
+    @classmethod
+    def get_by_binary_changed_since(cls, context, binary, changed_since):
+        """Get the services for a binary changed since a given time.
+
+        Unlike get_by_binary(), disabled and deleted services are returned
+        too, so that callers keeping a local view can evict them.
+        """
+        return cls._get_by_binary_changed_since(
+            context, binary, timeutils.isotime(changed_since))
+
     @base.remotable_classmethod
     def get_by_host(cls, context, host):
         db_services = db.service_get_all_by_host(context, host)
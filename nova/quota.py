@@ -17,6 +17,7 @@
 """Quotas for instances, and floating ips."""
 
 import datetime
+import time
 
 from oslo_config import cfg
 from oslo_log import log as logging
@@ -24,6 +25,7 @@ from oslo_utils import importutils
 from oslo_utils import timeutils
 import six
 
+from nova import context as nova_context
 from nova import db
 from nova import exception
 from nova.i18n import _LE
@@ -95,13 +97,80 @@ quota_opts = [
                     'passed since the last reservation'),
     cfg.StrOpt('quota_driver',
                default='nova.quota.DbQuotaDriver',
-               help='Default driver to use for quota checks'),
+               help='Default driver to use for quota checks. '
+                    'nova.quota.OptimisticDbQuotaDriver reserves '
+                    'resources without locking the quota usages.'),
+    cfg.IntOpt('quota_limits_cache_ttl',
+               default=0,
+               help='Number of seconds the quota limits of the projects, '
+                    'users and quota classes read by the database quota '
+                    'drivers are cached. The cache of a process is '
+                    'invalidated when the process updates the quotas, the '
+                    'other processes see the updates once the cached limits '
+                    'expire. The usages are never cached. 0 disables the '
+                    'cache.'),
     ]
 
 CONF = cfg.CONF
 CONF.register_opts(quota_opts)
 
 
+# Maximum number of entries of the quota limits cache, the expired ones are
+# dropped when it is full.
+_LIMITS_CACHE_SIZE = 10000
+
+
+class _LimitsCache(object):
+    """Cache of the quota limits read from the database.
+
+    Entries expire after quota_limits_cache_ttl seconds, and all of them are
+    dropped when the quotas are updated. The version of the cache is bumped
+    at the same time, so that limits read before an update aren't cached
+    after it.
+    """
+
+    def __init__(self):
+        self._version = 0
+        self._entries = {}
+
+    def get(self, key, load):
+        """Return a copy of the cached dict of limits of key, calling load()
+        to read it if needed.
+        """
+        ttl = CONF.quota_limits_cache_ttl
+        if ttl <= 0:
+            return load()
+        now = time.time()
+        entry = self._entries.get(key)
+        if (entry is None or entry[0] != self._version or
+                entry[1] <= now):
+            version = self._version
+            entry = (version, now + ttl, load())
+            if version == self._version:
+                if len(self._entries) >= _LIMITS_CACHE_SIZE:
+                    self._purge(now)
+                self._entries[key] = entry
+        return dict(entry[2])
+
+    def _purge(self, now):
+        self._entries = {key: entry for key, entry in self._entries.items()
+                         if entry[0] == self._version and entry[1] > now}
+        if len(self._entries) >= _LIMITS_CACHE_SIZE:
+            self._entries = {}
+
+    def invalidate(self):
+        self._version += 1
+        self._entries = {}
+
+
+_LIMITS_CACHE = _LimitsCache()
+
+
+def invalidate_limits_cache():
+    """Drop the quota limits cached by this process, as they were updated."""
+    _LIMITS_CACHE.invalidate()
+
+
 class DbQuotaDriver(object):
     """Driver to perform necessary checks to enforce quotas and obtain
     quota information.  The default driver utilizes the local
@@ -124,6 +193,36 @@ class DbQuotaDriver(object):
 
         return db.quota_class_get(context, quota_class, resource)
 
+    # NOTE: The limits below are read through the limits cache. Reading them
+    # from the cache skips the checks of the DB API, so the access to the
+    # project or quota class is checked here.
+
+    def _get_default_class_quotas(self, context):
+        return _LIMITS_CACHE.get(('default',),
+                                 lambda: db.quota_class_get_default(context))
+
+    def _get_quota_class_quotas(self, context, quota_class):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_quota_class_context(context, quota_class)
+        return _LIMITS_CACHE.get(
+            ('class', quota_class),
+            lambda: db.quota_class_get_all_by_name(context, quota_class))
+
+    def _get_project_quotas(self, context, project_id):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_project_context(context, project_id)
+        return _LIMITS_CACHE.get(
+            ('project', project_id),
+            lambda: db.quota_get_all_by_project(context, project_id))
+
+    def _get_project_user_quotas(self, context, project_id, user_id):
+        if CONF.quota_limits_cache_ttl > 0:
+            nova_context.authorize_project_context(context, project_id)
+        return _LIMITS_CACHE.get(
+            ('user', project_id, user_id),
+            lambda: db.quota_get_all_by_project_and_user(context, project_id,
+                                                         user_id))
+
     def get_defaults(self, context, resources):
         """Given a list of resources, retrieve the default quotas.
         Use the class quotas named `_DEFAULT_QUOTA_NAME` as default quotas,
@@ -134,7 +233,7 @@ class DbQuotaDriver(object):
         """
 
         quotas = {}
-        default_quotas = db.quota_class_get_default(context)
+        default_quotas = self._get_default_class_quotas(context)
         for resource in resources.values():
             quotas[resource.name] = default_quotas.get(resource.name,
                                                        resource.default)
@@ -156,7 +255,7 @@ class DbQuotaDriver(object):
         """
 
         quotas = {}
-        class_quotas = db.quota_class_get_all_by_name(context, quota_class)
+        class_quotas = self._get_quota_class_quotas(context, quota_class)
         for resource in resources.values():
             if defaults or resource.name in class_quotas:
                 quotas[resource.name] = class_quotas.get(resource.name,
@@ -175,7 +274,7 @@ class DbQuotaDriver(object):
         if project_id == context.project_id:
             quota_class = context.quota_class
         if quota_class:
-            class_quotas = db.quota_class_get_all_by_name(context, quota_class)
+            class_quotas = self._get_quota_class_quotas(context, quota_class)
         else:
             class_quotas = {}
 
@@ -241,11 +340,10 @@ class DbQuotaDriver(object):
         if user_quotas:
             user_quotas = user_quotas.copy()
         else:
-            user_quotas = db.quota_get_all_by_project_and_user(context,
-                                                               project_id,
-                                                               user_id)
+            user_quotas = self._get_project_user_quotas(context, project_id,
+                                                        user_id)
         # Use the project quota for default user quota.
-        proj_quotas = project_quotas or db.quota_get_all_by_project(
+        proj_quotas = project_quotas or self._get_project_quotas(
             context, project_id)
         for key, value in six.iteritems(proj_quotas):
             if key not in user_quotas.keys():
@@ -283,7 +381,7 @@ class DbQuotaDriver(object):
                         will be returned.
         :param project_quotas: Quotas dictionary for the specified project.
         """
-        project_quotas = project_quotas or db.quota_get_all_by_project(
+        project_quotas = project_quotas or self._get_project_quotas(
             context, project_id)
         project_usages = None
         if usages:
@@ -331,14 +429,14 @@ class DbQuotaDriver(object):
         """
 
         settable_quotas = {}
-        db_proj_quotas = db.quota_get_all_by_project(context, project_id)
+        db_proj_quotas = self._get_project_quotas(context, project_id)
         project_quotas = self.get_project_quotas(context, resources,
                                                  project_id, remains=True,
                                                  project_quotas=db_proj_quotas)
         if user_id:
-            setted_quotas = db.quota_get_all_by_project_and_user(context,
-                                                     project_id,
-                                                     user_id)
+            setted_quotas = self._get_project_user_quotas(context,
+                                                          project_id,
+                                                          user_id)
             user_quotas = self.get_user_quotas(context, resources,
                                                project_id, user_id,
                                                project_quotas=db_proj_quotas,
@@ -459,7 +557,7 @@ class DbQuotaDriver(object):
             user_id = context.user_id
 
         # Get the applicable quotas
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_quotas(context, project_id)
         quotas = self._get_quotas(context, resources, values.keys(),
                                   has_sync=False, project_id=project_id,
                                   project_quotas=project_quotas)
@@ -553,7 +651,7 @@ class DbQuotaDriver(object):
         # NOTE(Vek): We're not worried about races at this point.
         #            Yes, the admin may be in the process of reducing
         #            quotas, but that's a pretty rare thing.
-        project_quotas = db.quota_get_all_by_project(context, project_id)
+        project_quotas = self._get_project_quotas(context, project_id)
         LOG.debug('Quota limits for project %(project_id)s: '
                   '%(project_quotas)s', {'project_id': project_id,
                                          'project_quotas': project_quotas})
@@ -577,6 +675,11 @@ class DbQuotaDriver(object):
         #            which means access to the session.  Since the
         #            session isn't available outside the DBAPI, we
         #            have to do the work there.
+        return self._reserve(context, resources, quotas, user_quotas,
+                             deltas, expire, project_id, user_id)
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
         return db.quota_reserve(context, resources, quotas, user_quotas,
                                 deltas, expire,
                                 CONF.until_refresh, CONF.max_age,
@@ -690,6 +793,28 @@ class DbQuotaDriver(object):
         db.reservation_expire(context)
 
 
+class OptimisticDbQuotaDriver(DbQuotaDriver):
+    """Database quota driver which reserves resources without locking the
+    quota usages.
+
+    The usages of the user are checked and reserved by conditional updates,
+    and those of the project once the reservations are committed, rolling
+    them back if the project went over quota. This avoids serializing the
+    concurrent reservations of a project on the locks of its usages, at the
+    cost of refusing both of two reservations racing for the last of a
+    project quota. The usages which need a refresh (see the until_refresh
+    and max_age options) are still reserved with the usages locked.
+    """
+
+    def _reserve(self, context, resources, quotas, user_quotas, deltas,
+                 expire, project_id, user_id):
+        return db.quota_reserve_optimistic(context, resources, quotas,
+                                           user_quotas, deltas, expire,
+                                           CONF.until_refresh, CONF.max_age,
+                                           project_id=project_id,
+                                           user_id=user_id)
+
+
 class NoopQuotaDriver(object):
     """Driver that turns quotas calls into no-ops and pretends that quotas
     for all resources are unlimited.  This can be used if you do not
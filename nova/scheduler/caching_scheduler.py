@@ -13,8 +13,27 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo_config import cfg
+from oslo_utils import timeutils
+
 from nova.scheduler import filter_scheduler
 
+caching_scheduler_opts = [
+    cfg.IntOpt('caching_scheduler_full_reload_interval',
+               default=600,
+               help='When scheduler_tracks_compute_node_changes is set, the '
+                    'CachingScheduler applies the updates sent by the '
+                    'compute nodes to its cached host states, and only '
+                    'reloads all of them from the database every this many '
+                    'seconds, to reconcile its view. The services are still '
+                    'refreshed by every periodic task.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(caching_scheduler_opts)
+CONF.import_opt('scheduler_tracks_compute_node_changes',
+                'nova.scheduler.host_manager')
+
 
 class CachingScheduler(filter_scheduler.FilterScheduler):
     """Scheduler to test aggressive caching of the host list.
@@ -48,20 +67,42 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
     In a similar way, if you have a high number of server deletes, the
     extra capacity from those deletes will not show up until the cache is
     refreshed.
+
+    Both of these issues go away when the compute nodes send their resource
+    usage to the schedulers (see scheduler_tracks_compute_node_changes): the
+    cached host states are then updated as soon as the resource trackers
+    update them, and the whole cache is only reloaded from time to time.
     """
 
     def __init__(self, *args, **kwargs):
         super(CachingScheduler, self).__init__(*args, **kwargs)
         self.all_host_states = None
+        self._last_full_reload = None
 
     def run_periodic_tasks(self, context):
         """Called from a periodic tasks in the manager."""
         elevated = context.elevated()
+        if self._can_skip_full_reload():
+            # NOTE: The compute nodes keep the cached host states up to
+            # date, only the liveness of their services needs a refresh.
+            removed = self.host_manager.refresh_services(elevated)
+            if removed:
+                self.all_host_states = [
+                    host_state for host_state in self.all_host_states
+                    if (host_state.host, host_state.nodename) not in removed]
+            return
         # NOTE(johngarbutt) Fetching the list of hosts before we get
         # a user request, so no user requests have to wait while we
         # fetch the list of hosts.
         self.all_host_states = self._get_up_hosts(elevated)
 
+    def _can_skip_full_reload(self):
+        if (not CONF.scheduler_tracks_compute_node_changes or
+                self.all_host_states is None):
+            return False
+        interval = CONF.caching_scheduler_full_reload_interval
+        return not timeutils.is_older_than(self._last_full_reload, interval)
+
     def _get_all_host_states(self, context):
         """Called from the filter scheduler, in a template pattern."""
         if self.all_host_states is None:
@@ -73,5 +114,6 @@ class CachingScheduler(filter_scheduler.FilterScheduler):
         return self.all_host_states
 
     def _get_up_hosts(self, context):
+        self._last_full_reload = timeutils.utcnow()
         all_hosts_iterator = self.host_manager.get_all_host_states(context)
         return list(all_hosts_iterator)
@@ -15,10 +15,15 @@
 
 import functools
 
+from oslo_config import cfg
 from oslo_utils import importutils
 
 from nova.scheduler import utils
 
+CONF = cfg.CONF
+CONF.import_opt('scheduler_tracks_compute_node_changes',
+                'nova.scheduler.host_manager')
+
 
 class LazyLoader(object):
 
@@ -58,7 +63,10 @@ class SchedulerClient(object):
         self.queryclient.delete_aggregate(context, aggregate)
 
     def update_resource_stats(self, context, name, stats):
-        self.reportclient.update_resource_stats(context, name, stats)
+        compute_node = self.reportclient.update_resource_stats(context, name,
+                                                               stats)
+        if CONF.scheduler_tracks_compute_node_changes:
+            self.queryclient.update_compute_node(context, compute_node)
 
     def update_instance_info(self, context, host_name, instance_info):
         self.queryclient.update_instance_info(context, host_name,
@@ -85,3 +85,12 @@ class SchedulerQueryClient(object):
         """
         self.scheduler_rpcapi.sync_instance_info(context, host_name,
                                                  instance_uuids)
+
+    def update_compute_node(self, context, compute_node):
+        """Updates the HostManager with the resource usage of a compute node
+        its resource tracker just saved.
+
+        :param context: local context
+        :param compute_node: a ComputeNode object.
+        """
+        self.scheduler_rpcapi.update_compute_node(context, compute_node)
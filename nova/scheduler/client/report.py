@@ -34,6 +34,7 @@ class SchedulerReportClient(object):
         :type name: immutable (str or tuple)
         :param stats: updated stats to send to scheduler
         :type stats: dict
+        :returns: the updated ComputeNode object
         """
 
         if 'id' in stats:
@@ -72,3 +73,4 @@ class SchedulerReportClient(object):
 
         LOG.info(_LI('Compute_service record updated for '
                  '%s') % str(name))
+        return compute_node
@@ -45,7 +45,18 @@ filter_scheduler_opts = [
                     'chosen from. A value of 1 chooses the '
                     'first host returned by the weighing functions. '
                     'This value must be at least 1. Any value less than 1 '
-                    'will be ignored, and 1 will be used instead')
+                    'will be ignored, and 1 will be used instead'),
+    cfg.BoolOpt('scheduler_incremental_multi_create',
+                default=False,
+                help='When scheduling several instances in a request, filter '
+                     'and weigh all the hosts only for the first one. For '
+                     'the next ones, only the host picked for the previous '
+                     'instance is filtered and weighed again, along with '
+                     'the filters which depend on the selected hosts, like '
+                     'the server group filters. The weighers must weigh '
+                     'each host independently of the others for the hosts '
+                     'to be picked the same way as when all of them are '
+                     'filtered and weighed again for each instance.'),
 ]
 
 CONF.register_opts(filter_scheduler_opts)
@@ -141,26 +152,45 @@ class FilterScheduler(driver.Scheduler):
 
         selected_hosts = []
         num_instances = request_spec.get('num_instances', 1)
+        incremental = (CONF.scheduler_incremental_multi_create and
+                       num_instances > 1)
+        ranking = None
         for num in range(num_instances):
             # Filter local hosts based on requirements ...
-            hosts = self.host_manager.get_filtered_hosts(hosts,
-                    filter_properties, index=num)
+            if incremental and selected_hosts:
+                hosts = self.host_manager.get_filtered_hosts_after_selection(
+                        hosts, selected_hosts[-1].obj, filter_properties,
+                        index=num)
+            else:
+                hosts = self.host_manager.get_filtered_hosts(hosts,
+                        filter_properties, index=num)
             if not hosts:
                 # Can't get any more locally.
                 break
 
             LOG.debug("Filtered %(hosts)s", {'hosts': hosts})
 
-            weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
-                    filter_properties)
+            scheduler_host_subset_size = CONF.scheduler_host_subset_size
+            if scheduler_host_subset_size < 1:
+                scheduler_host_subset_size = 1
+
+            # Only the best hosts we randomly pick from are needed, so there
+            # is no need to sort all the weighed hosts.
+            if not incremental:
+                weighed_hosts = self.host_manager.get_weighed_hosts(hosts,
+                        filter_properties, limit=scheduler_host_subset_size)
+            elif ranking is None:
+                ranking = self.host_manager.get_host_ranking(hosts,
+                                                             filter_properties)
+                weighed_hosts = ranking.get_best(scheduler_host_subset_size)
+            else:
+                ranking.update(hosts, selected_hosts[-1].obj)
+                weighed_hosts = ranking.get_best(scheduler_host_subset_size)
 
             LOG.debug("Weighed %(hosts)s", {'hosts': weighed_hosts})
 
-            scheduler_host_subset_size = CONF.scheduler_host_subset_size
             if scheduler_host_subset_size > len(weighed_hosts):
                 scheduler_host_subset_size = len(weighed_hosts)
-            if scheduler_host_subset_size < 1:
-                scheduler_host_subset_size = 1
 
             chosen_host = random.choice(
                 weighed_hosts[0:scheduler_host_subset_size])
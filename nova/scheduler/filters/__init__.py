@@ -17,7 +17,16 @@
 Scheduler host filters
 """
 
+import time
+
+from oslo_log import log as logging
+
 from nova import filters
+from nova.i18n import _LI
+from nova.scheduler.filters import columnar
+from nova.scheduler.filters import sharding
+
+LOG = logging.getLogger(__name__)
 
 
 class BaseHostFilter(filters.BaseFilter):
@@ -32,11 +41,104 @@ class BaseHostFilter(filters.BaseFilter):
         """
         raise NotImplementedError()
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        """Return a boolean numpy array telling which hosts of the
+        HostColumns pass the filter, or None if the filter has no vectorized
+        form.
+
+        Override this in a subclass along with host_passes(); both must
+        return the same results and have the same side effects on the hosts
+        which pass.
+        """
+        return None
+
+    # Set to True in a subclass if host_passes() only computes its result
+    # from the host state and the request, without any I/O like database or
+    # network accesses, so that it can run in the processes filtering shards
+    # of the hosts when scheduler_filter_processes is set.
+    process_safe = False
+
+    def depends_on_selected_hosts(self, filter_properties):
+        """Return True if the result of the filter for a host can change
+        when another host is selected for a previous instance of the same
+        request, e.g. because the filter looks at 'group_hosts'.
+
+        Such filters are run again over all the remaining hosts before each
+        instance when the hosts are not all filtered again for every
+        instance of a request.
+        """
+        return False
+
 
 class HostFilterHandler(filters.BaseFilterHandler):
     def __init__(self):
         super(HostFilterHandler, self).__init__(BaseHostFilter)
 
+    def get_filtered_objects(self, filters, objs, filter_properties, index=0):
+        if not columnar.is_enabled():
+            return self._get_filtered_objects(filters, list(objs),
+                                              filter_properties, index)
+
+        # Evaluate the filters having a vectorized form first over all the
+        # hosts at once, then the remaining ones over the surviving hosts.
+        host_columns = columnar.HostColumns(list(objs))
+        LOG.debug("Starting with %d host(s)", len(host_columns))
+        remaining_filters = []
+        for filter_ in filters:
+            if not filter_.run_filter_for_index(index):
+                continue
+            start = time.time()
+            mask = filter_.hosts_pass_vectorized(host_columns,
+                                                 filter_properties)
+            if mask is None:
+                remaining_filters.append(filter_)
+                continue
+            cls_name = filter_.__class__.__name__
+            objs_in = len(host_columns)
+            host_columns = host_columns.subset(mask)
+            self._record_filter(cls_name, start, objs_in, len(host_columns))
+            if not len(host_columns):
+                LOG.info(_LI("Filter %s returned 0 hosts"), cls_name)
+                return []
+            LOG.debug("Filter %(cls_name)s returned %(obj_len)d host(s)",
+                      {'cls_name': cls_name, 'obj_len': len(host_columns)})
+        return self._get_filtered_objects(remaining_filters,
+                                          host_columns.host_states,
+                                          filter_properties, index)
+
+    def _get_filtered_objects(self, filters, host_states, filter_properties,
+                              index):
+        if not sharding.is_enabled(len(host_states)):
+            return super(HostFilterHandler, self).get_filtered_objects(
+                filters, host_states, filter_properties, index)
+
+        # Run the filters which are not process-safe first, then the other
+        # ones in several processes if there are still enough hosts.
+        filters = [filter_ for filter_ in filters
+                   if filter_.run_filter_for_index(index)]
+        host_states = super(HostFilterHandler, self).get_filtered_objects(
+            [filter_ for filter_ in filters if not filter_.process_safe],
+            host_states, filter_properties, index)
+        safe_filters = [filter_ for filter_ in filters
+                        if filter_.process_safe]
+        if not host_states or not safe_filters:
+            return host_states
+        if not sharding.is_enabled(len(host_states)):
+            return super(HostFilterHandler, self).get_filtered_objects(
+                safe_filters, host_states, filter_properties, index)
+        start = time.time()
+        objs_in = len(host_states)
+        host_states = sharding.get_filtered_objects(
+            safe_filters, host_states, filter_properties, index)
+        # NOTE: The time of each filter is not known, only the one of all
+        # the filters run in shards.
+        self._record_filter('sharded', start, objs_in, len(host_states))
+        LOG.debug("Filters %(cls_names)s returned %(obj_len)d host(s)",
+                  {'cls_names': ', '.join(filter_.__class__.__name__
+                                          for filter_ in safe_filters),
+                   'obj_len': len(host_states)})
+        return host_states
+
 
 def all_filters():
     """Return a list of filter classes found in this directory.
@@ -103,6 +103,11 @@ class _GroupAntiAffinityFilter(filters.BaseHostFilter):
         # No groups configured
         return True
 
+    def depends_on_selected_hosts(self, filter_properties):
+        # NOTE: The selected hosts are added to 'group_hosts' as the
+        # instances of a request are scheduled.
+        return self.policy_name in filter_properties.get('group_policies', [])
+
 
 class ServerGroupAntiAffinityFilter(_GroupAntiAffinityFilter):
     def __init__(self):
@@ -129,6 +134,11 @@ class _GroupAffinityFilter(filters.BaseHostFilter):
         # No groups configured
         return True
 
+    def depends_on_selected_hosts(self, filter_properties):
+        # NOTE: The selected hosts are added to 'group_hosts' as the
+        # instances of a request are scheduled.
+        return self.policy_name in filter_properties.get('group_policies', [])
+
 
 class ServerGroupAffinityFilter(_GroupAffinityFilter):
     def __init__(self):
@@ -0,0 +1,88 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Columnar view of host states for vectorized filtering.
+
+Filters declaring a vectorized form evaluate one masked comparison over the
+numeric columns of all the hosts instead of calling host_passes() once per
+host. This requires numpy, which is an optional dependency.
+"""
+
+import operator
+
+from oslo_config import cfg
+from oslo_utils import importutils
+import six
+
+numpy = importutils.try_import('numpy')
+
+vectorized_filters_opt = cfg.BoolOpt('scheduler_use_vectorized_filters',
+        default=False,
+        help='Evaluate the filters which support it, like RamFilter, '
+             'CoreFilter, DiskFilter, NumInstancesFilter and IoOpsFilter, '
+             'over all the hosts at once using numpy arrays. Ignored if '
+             'numpy is not installed.')
+
+CONF = cfg.CONF
+CONF.register_opt(vectorized_filters_opt)
+
+
+def is_enabled():
+    """Return True if the vectorized filters are enabled and usable."""
+    return CONF.scheduler_use_vectorized_filters and numpy is not None
+
+
+class HostColumns(object):
+    """Numeric columns of a list of host states.
+
+    Columns are built lazily from the HostState attribute of the same name
+    the first time a filter asks for them, and are shared by all the filters
+    evaluated over the same hosts.
+    """
+
+    def __init__(self, host_states, columns=None):
+        self.host_states = host_states
+        self._columns = columns or {}
+
+    def __len__(self):
+        return len(self.host_states)
+
+    def __getitem__(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            column = numpy.fromiter(
+                six.moves.map(operator.attrgetter(name), self.host_states),
+                dtype=numpy.float64, count=len(self.host_states))
+            self._columns[name] = column
+        return column
+
+    def per_host(self, func):
+        """Return a column of func(host_state) for each host."""
+        return numpy.fromiter(
+            (func(host_state) for host_state in self.host_states),
+            dtype=numpy.float64, count=len(self.host_states))
+
+    def select(self, mask):
+        """Return the host states selected by mask."""
+        return [self.host_states[index] for index in numpy.flatnonzero(mask)]
+
+    def subset(self, mask):
+        """Return the HostColumns of the hosts selected by mask."""
+        indexes = numpy.flatnonzero(mask)
+        host_states = [self.host_states[index] for index in indexes]
+        columns = {name: column[indexes]
+                   for name, column in self._columns.items()}
+        return HostColumns(host_states, columns)
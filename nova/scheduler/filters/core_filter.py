@@ -20,6 +20,7 @@ from oslo_log import log as logging
 
 from nova.i18n import _LW
 from nova.scheduler import filters
+from nova.scheduler.filters import columnar
 from nova.scheduler.filters import utils
 
 LOG = logging.getLogger(__name__)
@@ -37,9 +38,16 @@ CONF.register_opt(cpu_allocation_ratio_opt)
 
 class BaseCoreFilter(filters.BaseHostFilter):
 
+    process_safe = True
+
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_cpu_allocation_ratios(self, host_columns, filter_properties):
+        return host_columns.per_host(
+            lambda host_state: self._get_cpu_allocation_ratio(
+                host_state, filter_properties))
+
     def host_passes(self, host_state, filter_properties):
         """Return True if host has sufficient CPU cores."""
         instance_type = filter_properties.get('instance_type')
@@ -73,6 +81,33 @@ class BaseCoreFilter(filters.BaseHostFilter):
 
         return True
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        """Return True for the hosts which have sufficient CPU cores."""
+        instance_type = filter_properties.get('instance_type')
+        if not instance_type:
+            return columnar.numpy.ones(len(host_columns), dtype=bool)
+
+        # Fail safe for the hosts not reporting their VCPUs
+        broken = host_columns['vcpus_total'] == 0
+        if broken.any():
+            LOG.warning(_LW("VCPUs not set; assuming CPU collection broken"))
+
+        instance_vcpus = instance_type['vcpus']
+        cpu_allocation_ratios = self._get_cpu_allocation_ratios(
+            host_columns, filter_properties)
+        vcpus_total = host_columns['vcpus_total'] * cpu_allocation_ratios
+
+        free_vcpus = vcpus_total - host_columns['vcpus_used']
+        passes = broken | (free_vcpus >= instance_vcpus)
+
+        # Only provide a VCPU limit to compute if the virt driver is reporting
+        # an accurate count of installed VCPUs. (XenServer driver does not)
+        with_limit = passes & (vcpus_total > 0)
+        for host_state, limit in zip(host_columns.select(with_limit),
+                                     vcpus_total[with_limit].tolist()):
+            host_state.limits['vcpu'] = limit
+        return passes
+
 
 class CoreFilter(BaseCoreFilter):
     """CoreFilter filters based on CPU core utilization."""
@@ -80,6 +115,9 @@ class CoreFilter(BaseCoreFilter):
     def _get_cpu_allocation_ratio(self, host_state, filter_properties):
         return CONF.cpu_allocation_ratio
 
+    def _get_cpu_allocation_ratios(self, host_columns, filter_properties):
+        return CONF.cpu_allocation_ratio
+
 
 class AggregateCoreFilter(BaseCoreFilter):
     """AggregateCoreFilter with per-aggregate CPU subscription flag.
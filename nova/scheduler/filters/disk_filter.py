@@ -32,9 +32,14 @@ CONF.register_opt(disk_allocation_ratio_opt)
 class DiskFilter(filters.BaseHostFilter):
     """Disk Filter with over subscription flag."""
 
+    process_safe = True
+
     def _get_disk_allocation_ratio(self, host_state, filter_properties):
         return CONF.disk_allocation_ratio
 
+    def _get_disk_allocation_ratios(self, host_columns, filter_properties):
+        return CONF.disk_allocation_ratio
+
     def host_passes(self, host_state, filter_properties):
         """Filter based on disk usage."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +69,29 @@ class DiskFilter(filters.BaseHostFilter):
         host_state.limits['disk_gb'] = disk_gb_limit
         return True
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        """Filter based on disk usage."""
+        instance_type = filter_properties.get('instance_type')
+        requested_disk = (1024 * (instance_type['root_gb'] +
+                                 instance_type['ephemeral_gb']) +
+                         instance_type['swap'])
+
+        total_usable_disk_mb = host_columns['total_usable_disk_gb'] * 1024
+
+        disk_allocation_ratios = self._get_disk_allocation_ratios(
+            host_columns, filter_properties)
+
+        disk_mb_limit = total_usable_disk_mb * disk_allocation_ratios
+        used_disk_mb = total_usable_disk_mb - host_columns['free_disk_mb']
+        usable_disk_mb = disk_mb_limit - used_disk_mb
+        passes = usable_disk_mb >= requested_disk
+
+        disk_gb_limit = disk_mb_limit[passes] / 1024
+        for host_state, limit in zip(host_columns.select(passes),
+                                     disk_gb_limit.tolist()):
+            host_state.limits['disk_gb'] = limit
+        return passes
+
 
 class AggregateDiskFilter(DiskFilter):
     """AggregateDiskFilter with per-aggregate disk allocation ratio flag.
@@ -84,3 +112,8 @@ class AggregateDiskFilter(DiskFilter):
             ratio = CONF.disk_allocation_ratio
 
         return ratio
+
+    def _get_disk_allocation_ratios(self, host_columns, filter_properties):
+        return host_columns.per_host(
+            lambda host_state: self._get_disk_allocation_ratio(
+                host_state, filter_properties))
@@ -36,9 +36,14 @@ CONF.register_opt(max_io_ops_per_host_opt)
 class IoOpsFilter(filters.BaseHostFilter):
     """Filter out hosts with too many concurrent I/O operations."""
 
+    process_safe = True
+
     def _get_max_io_ops_per_host(self, host_state, filter_properties):
         return CONF.max_io_ops_per_host
 
+    def _get_max_io_ops_per_hosts(self, host_columns, filter_properties):
+        return CONF.max_io_ops_per_host
+
     def host_passes(self, host_state, filter_properties):
         """Use information about current vm and task states collected from
         compute node statistics to decide whether to filter.
@@ -54,6 +59,11 @@ class IoOpsFilter(filters.BaseHostFilter):
                          'max_io_ops': max_io_ops})
         return passes
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        max_io_ops = self._get_max_io_ops_per_hosts(host_columns,
+                                                    filter_properties)
+        return host_columns['num_io_ops'] < max_io_ops
+
 
 class AggregateIoOpsFilter(IoOpsFilter):
     """AggregateIoOpsFilter with per-aggregate the max io operations.
@@ -73,3 +83,8 @@ class AggregateIoOpsFilter(IoOpsFilter):
             value = CONF.max_io_ops_per_host
 
         return value
+
+    def _get_max_io_ops_per_hosts(self, host_columns, filter_properties):
+        return host_columns.per_host(
+            lambda host_state: self._get_max_io_ops_per_host(
+                host_state, filter_properties))
@@ -35,6 +35,8 @@ class MetricsFilter(filters.BaseHostFilter):
     these hosts.
     """
 
+    process_safe = True
+
     def __init__(self):
         super(MetricsFilter, self).__init__()
         opts = utils.parse_options(CONF.metrics.weight_setting,
@@ -33,9 +33,14 @@ CONF.register_opt(max_instances_per_host_opt)
 class NumInstancesFilter(filters.BaseHostFilter):
     """Filter out hosts with too many instances."""
 
+    process_safe = True
+
     def _get_max_instances_per_host(self, host_state, filter_properties):
         return CONF.max_instances_per_host
 
+    def _get_max_instances_per_hosts(self, host_columns, filter_properties):
+        return CONF.max_instances_per_host
+
     def host_passes(self, host_state, filter_properties):
         num_instances = host_state.num_instances
         max_instances = self._get_max_instances_per_host(
@@ -48,6 +53,11 @@ class NumInstancesFilter(filters.BaseHostFilter):
                          'max_instances': max_instances})
         return passes
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        max_instances = self._get_max_instances_per_hosts(host_columns,
+                                                          filter_properties)
+        return host_columns['num_instances'] < max_instances
+
 
 class AggregateNumInstancesFilter(NumInstancesFilter):
     """AggregateNumInstancesFilter with per-aggregate the max num instances.
@@ -69,3 +79,8 @@ class AggregateNumInstancesFilter(NumInstancesFilter):
             value = CONF.max_instances_per_host
 
         return value
+
+    def _get_max_instances_per_hosts(self, host_columns, filter_properties):
+        return host_columns.per_host(
+            lambda host_state: self._get_max_instances_per_host(
+                host_state, filter_properties))
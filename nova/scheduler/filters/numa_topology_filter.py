@@ -24,6 +24,8 @@ CONF.import_opt('ram_allocation_ratio', 'nova.scheduler.filters.ram_filter')
 class NUMATopologyFilter(filters.BaseHostFilter):
     """Filter on requested NUMA topology."""
 
+    process_safe = True
+
     def host_passes(self, host_state, filter_properties):
         ram_ratio = CONF.ram_allocation_ratio
         cpu_ratio = CONF.cpu_allocation_ratio
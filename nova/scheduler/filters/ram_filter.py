@@ -36,9 +36,16 @@ CONF.register_opt(ram_allocation_ratio_opt)
 
 class BaseRamFilter(filters.BaseHostFilter):
 
+    process_safe = True
+
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         raise NotImplementedError
 
+    def _get_ram_allocation_ratios(self, host_columns, filter_properties):
+        return host_columns.per_host(
+            lambda host_state: self._get_ram_allocation_ratio(
+                host_state, filter_properties))
+
     def host_passes(self, host_state, filter_properties):
         """Only return hosts with sufficient available RAM."""
         instance_type = filter_properties.get('instance_type')
@@ -64,6 +71,25 @@ class BaseRamFilter(filters.BaseHostFilter):
         host_state.limits['memory_mb'] = memory_mb_limit
         return True
 
+    def hosts_pass_vectorized(self, host_columns, filter_properties):
+        """Only return hosts with sufficient available RAM."""
+        instance_type = filter_properties.get('instance_type')
+        requested_ram = instance_type['memory_mb']
+        total_usable_ram_mb = host_columns['total_usable_ram_mb']
+
+        ram_allocation_ratios = self._get_ram_allocation_ratios(
+            host_columns, filter_properties)
+
+        memory_mb_limit = total_usable_ram_mb * ram_allocation_ratios
+        used_ram_mb = total_usable_ram_mb - host_columns['free_ram_mb']
+        usable_ram = memory_mb_limit - used_ram_mb
+        passes = usable_ram >= requested_ram
+
+        for host_state, limit in zip(host_columns.select(passes),
+                                     memory_mb_limit[passes].tolist()):
+            host_state.limits['memory_mb'] = limit
+        return passes
+
 
 class RamFilter(BaseRamFilter):
     """Ram Filter with over subscription flag."""
@@ -71,6 +97,9 @@ class RamFilter(BaseRamFilter):
     def _get_ram_allocation_ratio(self, host_state, filter_properties):
         return CONF.ram_allocation_ratio
 
+    def _get_ram_allocation_ratios(self, host_columns, filter_properties):
+        return CONF.ram_allocation_ratio
+
 
 class AggregateRamFilter(BaseRamFilter):
     """AggregateRamFilter with per-aggregate ram subscription flag.
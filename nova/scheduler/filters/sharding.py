@@ -0,0 +1,207 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Filtering of large host sets across several processes.
+
+The worker processes are forked once the hosts to filter are known, so each
+of them gets a copy-on-write snapshot of the host states and of the request
+for free. A worker runs the filters over its shard of the hosts, and only
+sends back the positions and the limits of the hosts which passed. The
+scheduler process filters the first shard itself in the meantime.
+
+The workers inherit the eventlet hub of the scheduler process and its
+greenthreads, so they must never yield to it: they disable the logging,
+only run the process-safe filters and write their result with the
+original, blocking os functions, then exit. The scheduler process reads the
+results through green pipes, so the other requests keep being served
+meanwhile, and kills the workers which did not answer in time.
+"""
+
+import errno
+import logging as py_logging
+import os
+import signal
+import time
+
+import eventlet
+from eventlet import greenio
+from oslo_config import cfg
+from oslo_log import log as logging
+from six.moves import cPickle as pickle
+from six.moves import range
+
+from nova.i18n import _LW
+
+_original_os = eventlet.patcher.original('os')
+
+sharding_opts = [
+    cfg.IntOpt('scheduler_filter_processes',
+               default=0,
+               help='Number of processes running the process-safe filters, '
+                    'like NUMATopologyFilter or JsonFilter, over shards of '
+                    'the hosts when there are enough of them. The other '
+                    'filters are run first by the scheduler process. Values '
+                    'lower than 2 disable the sharding.'),
+    cfg.IntOpt('scheduler_filter_shard_min_hosts',
+               default=1000,
+               help='Minimum number of hosts in a shard filtered by a '
+                    'process, as forking the processes only pays off for '
+                    'large shards.'),
+    cfg.FloatOpt('scheduler_filter_process_timeout',
+                 default=10.0,
+                 help='Number of seconds the processes filtering shards of '
+                      'the hosts have to send their result. The shards of '
+                      'the processes which did not are filtered again by '
+                      'the scheduler process.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(sharding_opts)
+
+LOG = logging.getLogger(__name__)
+
+
+def is_enabled(num_hosts):
+    """Return True if num_hosts hosts should be filtered in shards."""
+    return (hasattr(os, 'fork') and _get_num_shards(num_hosts) > 1)
+
+
+def _get_num_shards(num_hosts):
+    min_hosts = max(CONF.scheduler_filter_shard_min_hosts, 1)
+    return min(CONF.scheduler_filter_processes, num_hosts // min_hosts)
+
+
+def _filter_shard(filters, host_states, start, stop, filter_properties,
+                  index):
+    """Return the positions and the limits of the hosts passing all the
+    filters among host_states[start:stop].
+    """
+    positions = list(range(start, stop))
+    for filter_ in filters:
+        if not filter_.run_filter_for_index(index):
+            continue
+        positions = [position for position in positions
+                     if filter_.host_passes(host_states[position],
+                                            filter_properties)]
+        if not positions:
+            break
+    return [(position, host_states[position].limits)
+            for position in positions]
+
+
+def _run_worker(write_fd, filters, host_states, start, stop,
+                filter_properties, index):
+    """Filter a shard in a forked process and send the result to the
+    scheduler process, or nothing if it failed.
+    """
+    try:
+        # NOTE: The filters log, and a logging handler would switch to the
+        # hub when taking a lock held by a scheduler greenthread at the time
+        # of the fork, or when writing to a green socket, like syslog.
+        py_logging.disable(py_logging.CRITICAL)
+        try:
+            data = pickle.dumps(_filter_shard(filters, host_states, start,
+                                              stop, filter_properties, index),
+                                pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            data = b''
+        # NOTE: The original os.write() blocks instead of switching to the
+        # hub, which would run the copies of the scheduler greenthreads.
+        while data:
+            data = data[_original_os.write(write_fd, data):]
+    finally:
+        _original_os._exit(0)
+
+
+def _read_result(read_fd, deadline):
+    """Return the data sent by a worker, or None if it didn't send it
+    before the deadline.
+    """
+    timeout = eventlet.Timeout(max(deadline - time.time(), 0))
+    try:
+        with greenio.GreenPipe(read_fd, 'rb') as pipe:
+            return pipe.read()
+    except eventlet.Timeout as e:
+        if e is not timeout:
+            raise
+        return None
+    finally:
+        timeout.cancel()
+
+
+def _reap_worker(pid, kill):
+    if kill:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError as e:
+            if e.errno != errno.ESRCH:
+                raise
+    # NOTE: Poll rather than blocking the hub until the worker exited.
+    while os.waitpid(pid, os.WNOHANG) == (0, 0):
+        eventlet.sleep(0.001)
+
+
+def get_filtered_objects(filters, host_states, filter_properties, index=0):
+    """Return the hosts passing all the filters, evaluated by several
+    processes over shards of host_states.
+
+    The filters must be process-safe and must not override filter_all(), as
+    they only see the hosts of a shard.
+    """
+    num_shards = _get_num_shards(len(host_states))
+    bounds = [(len(host_states) * i // num_shards,
+               len(host_states) * (i + 1) // num_shards)
+              for i in range(num_shards)]
+
+    workers = []
+    deadline = time.time() + CONF.scheduler_filter_process_timeout
+    for start, stop in bounds[1:]:
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            _run_worker(write_fd, filters, host_states, start, stop,
+                        filter_properties, index)
+        os.close(write_fd)
+        workers.append((pid, read_fd, start, stop))
+
+    start, stop = bounds[0]
+    results = [_filter_shard(filters, host_states, start, stop,
+                             filter_properties, index)]
+    for pid, read_fd, start, stop in workers:
+        data = _read_result(read_fd, deadline)
+        _reap_worker(pid, kill=data is None)
+        if not data:
+            # NOTE: Filter the shard again here, so that any error is
+            # raised by the scheduler process.
+            if data is None:
+                LOG.warning(_LW("Filtering hosts %(start)d to %(stop)d in a "
+                                "separate process timed out, filtering "
+                                "them again."), {'start': start, 'stop': stop})
+            else:
+                LOG.warning(_LW("Filtering hosts %(start)d to %(stop)d in a "
+                                "separate process failed, filtering them "
+                                "again."), {'start': start, 'stop': stop})
+            results.append(_filter_shard(filters, host_states, start, stop,
+                                         filter_properties, index))
+            continue
+        result = pickle.loads(data)
+        for position, limits in result:
+            host_states[position].limits.update(limits)
+        results.append(result)
+
+    return [host_states[position]
+            for shard in results for position, _limits in shard]
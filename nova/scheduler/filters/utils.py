@@ -24,28 +24,94 @@ from nova.i18n import _LI
 LOG = logging.getLogger(__name__)
 
 
-def aggregate_values_from_key(host_state, key_name):
-    """Returns a set of values based on a metadata key for a specific host."""
-    aggrlist = host_state.aggregates
-    aggregate_vals = set()
-    for aggr in aggrlist:
-        if key_name in aggr.metadata:
-            aggregate_vals.add(aggr.metadata[key_name])
-    return aggregate_vals
+class _MergedMetadata(dict):
+    """Values of the metadata of some aggregates, by key.
 
+    Missing keys give an empty set without being added, as the dict is
+    shared by all the filters.
+    """
 
-def aggregate_metadata_get_by_host(host_state, key=None):
-    """Returns a dict of all metadata for a specific host."""
-    aggrlist = host_state.aggregates
+    def __missing__(self, key):
+        return frozenset()
+
+
+def _merge_metadata(aggregates):
     metadata = collections.defaultdict(set)
-    for aggr in aggrlist:
-        if key is not None and key not in aggr.metadata:
-            continue
+    for aggr in aggregates:
         for k, v in six.iteritems(aggr.metadata):
             values = v.split(',')
             for value in values:
                 metadata[k].add(value.strip())
-    return metadata
+    return _MergedMetadata((k, frozenset(values))
+                           for k, values in six.iteritems(metadata))
+
+
+class AggregateMetadata(object):
+    """Metadata of the aggregates of a host, merged by key.
+
+    The HostManager keeps one for each host, which it replaces when the
+    aggregates of the host change, so that the filters don't merge the
+    metadata of the aggregates of each host for every request. It is
+    computed the first time a filter needs it.
+    """
+
+    def __init__(self, aggregates, aggregate_ids=None):
+        self.aggregates = aggregates
+        self.aggregate_ids = aggregate_ids
+        self._values = None
+        self._metadata = None
+        self._metadata_by_key = {}
+
+    def values_from_key(self, key_name):
+        """Returns the set of the values of a key."""
+        if self._values is None:
+            values = collections.defaultdict(set)
+            for aggr in self.aggregates:
+                for k, v in six.iteritems(aggr.metadata):
+                    values[k].add(v)
+            self._values = {k: frozenset(vals)
+                            for k, vals in six.iteritems(values)}
+        return self._values.get(key_name, frozenset())
+
+    def get_metadata(self, key=None):
+        """Returns a dict of the sets of the comma separated values of each
+        key, from the aggregates having key if set.
+        """
+        if key is None:
+            if self._metadata is None:
+                self._metadata = _merge_metadata(self.aggregates)
+            return self._metadata
+        metadata = self._metadata_by_key.get(key)
+        if metadata is None:
+            metadata = _merge_metadata([aggr for aggr in self.aggregates
+                                        if key in aggr.metadata])
+            self._metadata_by_key[key] = metadata
+        return metadata
+
+
+def _get_aggregate_metadata(host_state):
+    aggregate_metadata = getattr(host_state, 'aggregate_metadata', None)
+    if (aggregate_metadata is None or
+            aggregate_metadata.aggregates is not host_state.aggregates):
+        # NOTE: The aggregates were not set by the HostManager.
+        aggregate_metadata = AggregateMetadata(host_state.aggregates)
+    return aggregate_metadata
+
+
+def aggregate_values_from_key(host_state, key_name):
+    """Returns a set of values based on a metadata key for a specific host.
+
+    The returned set must not be modified.
+    """
+    return _get_aggregate_metadata(host_state).values_from_key(key_name)
+
+
+def aggregate_metadata_get_by_host(host_state, key=None):
+    """Returns a dict of all metadata for a specific host.
+
+    The returned dict must not be modified.
+    """
+    return _get_aggregate_metadata(host_state).get_metadata(key)
 
 
 def validate_num_values(vals, default=None, cast_to=int, based_on=min):
@@ -40,6 +40,8 @@ from nova.i18n import _, _LI, _LW
 from nova import objects
 from nova.pci import stats as pci_stats
 from nova.scheduler import filters
+from nova.scheduler.filters import utils as filters_utils
+from nova.scheduler import timing
 from nova.scheduler import weights
 from nova import utils
 from nova.virt import hardware
@@ -71,6 +73,26 @@ host_manager_opts = [
                default=True,
                help='Determines if the Scheduler tracks changes to instances '
                     'to help with its filtering decisions.'),
+    cfg.BoolOpt('scheduler_tracks_compute_node_changes',
+               default=False,
+               help='Determines if the compute nodes send their resource '
+                    'usage to the Schedulers each time they update it, so '
+                    'that the Schedulers caching the host states, like the '
+                    'CachingScheduler, can keep them up to date between two '
+                    'reloads.'),
+    cfg.BoolOpt('scheduler_incremental_host_state_refresh',
+               default=False,
+               help='Determines if the Scheduler only loads the compute '
+                    'nodes and services changed since its last refresh '
+                    'when updating its view of the hosts, instead of '
+                    'reloading all of them for every request.'),
+    cfg.IntOpt('scheduler_host_state_full_refresh_interval',
+               default=600,
+               help='Interval in seconds between full reloads of the host '
+                    'states when incremental refreshes are enabled. Full '
+                    'reloads reconcile changes the incremental refreshes may '
+                    'have missed, like clock skew between the writers. Set '
+                    'to 0 to only do a full reload at startup.'),
 ]
 
 CONF = cfg.CONF
@@ -106,6 +128,20 @@ class ReadOnlyDict(IterableUserDict):
         raise TypeError()
 
 
+def _get_last_change(objs, last_change=None):
+    """Returns the most recent creation, update or deletion time of objs,
+    or last_change if none of them is more recent.
+    """
+    for obj in objs:
+        for attr in ('created_at', 'updated_at', 'deleted_at'):
+            if not obj.obj_attr_is_set(attr):
+                continue
+            timestamp = getattr(obj, attr)
+            if timestamp and (last_change is None or timestamp > last_change):
+                last_change = timestamp
+    return last_change
+
+
 # Representation of a single metric value from a compute node.
 MetricItem = collections.namedtuple(
              'MetricItem', ['value', 'timestamp', 'source'])
@@ -153,6 +189,8 @@ class HostState(object):
 
         # List of aggregates the host belongs to
         self.aggregates = []
+        # Merged metadata of these aggregates, set by the HostManager
+        self.aggregate_metadata = None
 
         # Instances on this host
         self.instances = {}
@@ -315,6 +353,18 @@ class HostManager(object):
 
     def __init__(self):
         self.host_state_map = {}
+        # Dict of the set of keys of the host_state_map entries, keyed by
+        # their host
+        self.host_state_keys = collections.defaultdict(set)
+        # Dict of the nova-compute services keyed by their host
+        self.service_refs = {}
+        # Counters of the DB rows fetched to refresh the host states, and of
+        # the host states returned to the scheduler drivers
+        self.refresh_stats = collections.Counter()
+        self._last_full_refresh = None
+        self._services_changed_since = None
+        self._computes_changed_since = None
+        self._services_refreshed_since = None
         self.filter_handler = filters.HostFilterHandler()
         filter_classes = self.filter_handler.get_matching_classes(
                 CONF.scheduler_available_filters)
@@ -325,11 +375,19 @@ class HostManager(object):
         weigher_classes = self.weight_handler.get_matching_classes(
                 CONF.scheduler_weight_classes)
         self.weighers = [cls() for cls in weigher_classes]
+        # Rolling histograms of the time spent in the filters, the weighers
+        # and the refresh of the host states, or None if disabled
+        self.timings = timing.get_timings()
+        self.filter_handler.timings = self.timings
+        self.weight_handler.timings = self.timings
         # Dict of aggregates keyed by their ID
         self.aggs_by_id = {}
         # Dict of set of aggregate IDs keyed by the name of the host belonging
         # to those aggregates
         self.host_aggregates_map = collections.defaultdict(set)
+        # Dict of the merged metadata of the aggregates of a host, keyed by
+        # the name of the host, rebuilt when its aggregates change
+        self.host_aggregates_metadata = {}
         self._init_aggregates()
         self.tracks_instance_changes = CONF.scheduler_tracks_instance_changes
         # Dict of instances and status, keyed by host
@@ -360,12 +418,14 @@ class HostManager(object):
         self.aggs_by_id[aggregate.id] = aggregate
         for host in aggregate.hosts:
             self.host_aggregates_map[host].add(aggregate.id)
+            self.host_aggregates_metadata.pop(host, None)
         # Refreshing the mapping dict to remove all hosts that are no longer
         # part of the aggregate
         for host in self.host_aggregates_map:
             if (aggregate.id in self.host_aggregates_map[host]
                     and host not in aggregate.hosts):
                 self.host_aggregates_map[host].remove(aggregate.id)
+                self.host_aggregates_metadata.pop(host, None)
 
     def delete_aggregate(self, aggregate):
         """Deletes internal HostManager information about a specific aggregate.
@@ -375,6 +435,21 @@ class HostManager(object):
         for host in aggregate.hosts:
             if aggregate.id in self.host_aggregates_map[host]:
                 self.host_aggregates_map[host].remove(aggregate.id)
+            self.host_aggregates_metadata.pop(host, None)
+
+    def _get_aggregate_metadata(self, host):
+        """Returns the merged metadata of the aggregates of a host, which is
+        only rebuilt if its aggregates changed.
+        """
+        aggregate_ids = self.host_aggregates_map[host]
+        aggregate_metadata = self.host_aggregates_metadata.get(host)
+        if (aggregate_metadata is None or
+                aggregate_metadata.aggregate_ids != aggregate_ids):
+            aggregate_metadata = filters_utils.AggregateMetadata(
+                [self.aggs_by_id[agg_id] for agg_id in aggregate_ids],
+                frozenset(aggregate_ids))
+            self.host_aggregates_metadata[host] = aggregate_metadata
+        return aggregate_metadata
 
     def _init_instance_info(self):
         """Creates the initial view of instances for all hosts.
@@ -522,61 +597,261 @@ class HostManager(object):
         return self.filter_handler.get_filtered_objects(filters,
                 hosts, filter_properties, index)
 
-    def get_weighed_hosts(self, hosts, weight_properties):
-        """Weigh the hosts."""
+    def get_filtered_hosts_after_selection(self, hosts, selected_host,
+            filter_properties, filter_class_names=None, index=1):
+        """Filter again hosts which passed the filters for the previous
+        instance of a request, after selected_host was picked for it.
+
+        Only selected_host, which consumed the resources of the instance,
+        goes through all the filters again. The other hosts are only
+        checked by the filters depending on the selected hosts, since the
+        result of the other filters did not change for them. This returns
+        the same hosts as get_filtered_hosts() would.
+        """
+        if (filter_properties.get('force_hosts') or
+                filter_properties.get('force_nodes')):
+            # NOTE: Forced hosts are not filtered at all.
+            return list(hosts)
+
+        if filter_class_names is None:
+            filters = self.default_filters
+        else:
+            filters = self._choose_host_filters(filter_class_names)
+        filters = [filter_ for filter_ in filters
+                   if filter_.run_filter_for_index(index)]
+        dependent_filters = [filter_ for filter_ in filters
+                if filter_.depends_on_selected_hosts(filter_properties)]
+
+        passing = set()
+        selected_passes = self.filter_handler.get_filtered_objects(filters,
+                [selected_host], filter_properties, index)
+        if selected_passes is None:
+            return None
+        passing.update(selected_passes)
+        others = [host for host in hosts if host is not selected_host]
+        if dependent_filters:
+            others = self.filter_handler.get_filtered_objects(
+                dependent_filters, others, filter_properties, index)
+            if others is None:
+                return None
+        passing.update(others)
+        return [host for host in hosts if host in passing]
+
+    def get_host_ranking(self, hosts, weight_properties):
+        """Weigh the hosts and return them as a HostRanking, which can be
+        updated as the instances of a request consume their resources.
+        """
+        return weights.HostRanking(self.weight_handler, self.weighers,
+                                   hosts, weight_properties)
+
+    def get_weighed_hosts(self, hosts, weight_properties, limit=None):
+        """Weigh the hosts.
+
+        If limit is set, only the limit best weighed hosts are returned.
+        """
         return self.weight_handler.get_weighed_objects(self.weighers,
-                hosts, weight_properties)
+                hosts, weight_properties, limit=limit)
 
     def get_all_host_states(self, context):
         """Returns a list of HostStates that represents all the hosts
         the HostManager knows about. Also, each of the consumable resources
         in HostState are pre-populated and adjusted based on data in the db.
         """
+        start = time.time()
+        if self._should_refresh_incrementally():
+            self._refresh_changed_host_states(context)
+        else:
+            self._refresh_all_host_states(context)
+
+        instance_info_start = time.time()
+        for host_state in six.itervalues(self.host_state_map):
+            # We force to update the aggregates info each time a new request
+            # comes in, because some changes on the aggregates could have been
+            # happening after setting this field for the first time
+            aggregate_metadata = self._get_aggregate_metadata(host_state.host)
+            host_state.aggregates = aggregate_metadata.aggregates
+            host_state.aggregate_metadata = aggregate_metadata
+            self._add_instance_info(context, host_state)
+        self._record_timing('add_instance_info', instance_info_start)
+
+        self.refresh_stats['hosts_served'] += len(self.host_state_map)
+        self._record_timing('get_all_host_states', start)
+        return six.itervalues(self.host_state_map)
+
+    def _record_timing(self, name, start):
+        if self.timings is not None:
+            num_hosts = len(self.host_state_map)
+            self.timings.record('host_manager.%s' % name,
+                                time.time() - start, num_hosts, num_hosts)
 
-        service_refs = {service.host: service
-                        for service in objects.ServiceList.get_by_binary(
-                            context, 'nova-compute')}
+    def refresh_services(self, context):
+        """Updates the services of the known host states.
+
+        This keeps the liveness and the disabled status of host states which
+        are cached between requests up to date, without reloading the
+        compute nodes and the instances. The host states of the deleted
+        services are removed.
+
+        Returns the keys of the removed host states.
+        """
+        removed = set()
+        if self._services_refreshed_since is None:
+            # NOTE: No host states were loaded yet.
+            return removed
+        # NOTE: Unlike get_by_binary(), this returns the disabled and deleted
+        # services too.
+        services = objects.ServiceList.get_by_binary_changed_since(
+            context, 'nova-compute', self._services_refreshed_since)
+        for service in services:
+            host = service.host
+            if service.deleted:
+                # NOTE: The host may have a newer service than this one.
+                current = self.service_refs.get(host)
+                if current is not None and current.id == service.id:
+                    del self.service_refs[host]
+                    for state_key in list(self.host_state_keys.get(host,
+                                                                   ())):
+                        self._remove_host_state(state_key)
+                        removed.add(state_key)
+                continue
+            self.service_refs[host] = service
+            for state_key in self.host_state_keys.get(host, ()):
+                self.host_state_map[state_key].update_service(dict(service))
+        self._services_refreshed_since = _get_last_change(
+            services, self._services_refreshed_since)
+        self.refresh_stats['service_refreshes'] += 1
+        self.refresh_stats['rows_fetched'] += len(services)
+        return removed
+
+    def _should_refresh_incrementally(self):
+        if not CONF.scheduler_incremental_host_state_refresh:
+            return False
+        if (self._last_full_refresh is None or
+                self._services_changed_since is None or
+                self._computes_changed_since is None):
+            return False
+        interval = CONF.scheduler_host_state_full_refresh_interval
+        return not (interval and timeutils.is_older_than(
+            self._last_full_refresh, interval))
+
+    def _update_host_state(self, compute, service):
+        host = compute.host
+        node = compute.hypervisor_hostname
+        state_key = (host, node)
+        host_state = self.host_state_map.get(state_key)
+        if host_state:
+            host_state.update_from_compute_node(compute)
+        else:
+            host_state = self.host_state_cls(host, node, compute=compute)
+            self.host_state_map[state_key] = host_state
+            self.host_state_keys[host].add(state_key)
+        host_state.update_service(dict(service))
+
+    def _remove_host_state(self, state_key):
+        host, node = state_key
+        LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
+                     "from scheduler"), {'host': host, 'node': node})
+        del self.host_state_map[state_key]
+        host_keys = self.host_state_keys.get(host)
+        if host_keys is not None:
+            host_keys.discard(state_key)
+            if not host_keys:
+                del self.host_state_keys[host]
+
+    def _refresh_all_host_states(self, context):
+        """Rebuilds the host states from all the compute nodes and services."""
+        self._last_full_refresh = timeutils.utcnow()
+        services = objects.ServiceList.get_by_binary(context, 'nova-compute')
+        self.service_refs = {service.host: service for service in services}
         # Get resource usage across the available compute nodes:
         compute_nodes = objects.ComputeNodeList.get_all(context)
         seen_nodes = set()
         for compute in compute_nodes:
-            service = service_refs.get(compute.host)
+            service = self.service_refs.get(compute.host)
 
             if not service:
                 LOG.warning(_LW(
                     "No compute service record found for host %(host)s"),
                     {'host': compute.host})
                 continue
-            host = compute.host
-            node = compute.hypervisor_hostname
-            state_key = (host, node)
-            host_state = self.host_state_map.get(state_key)
-            if host_state:
-                host_state.update_from_compute_node(compute)
-            else:
-                host_state = self.host_state_cls(host, node, compute=compute)
-                self.host_state_map[state_key] = host_state
-            # We force to update the aggregates info each time a new request
-            # comes in, because some changes on the aggregates could have been
-            # happening after setting this field for the first time
-            host_state.aggregates = [self.aggs_by_id[agg_id] for agg_id in
-                                     self.host_aggregates_map[
-                                         host_state.host]]
-            host_state.update_service(dict(service))
-            self._add_instance_info(context, compute, host_state)
-            seen_nodes.add(state_key)
+            self._update_host_state(compute, service)
+            seen_nodes.add((compute.host, compute.hypervisor_hostname))
 
         # remove compute nodes from host_state_map if they are not active
         dead_nodes = set(self.host_state_map.keys()) - seen_nodes
         for state_key in dead_nodes:
-            host, node = state_key
-            LOG.info(_LI("Removing dead compute node %(host)s:%(node)s "
-                         "from scheduler"), {'host': host, 'node': node})
-            del self.host_state_map[state_key]
-
-        return six.itervalues(self.host_state_map)
+            self._remove_host_state(state_key)
+
+        self._services_refreshed_since = _get_last_change(services)
+        if CONF.scheduler_incremental_host_state_refresh:
+            self._services_changed_since = _get_last_change(services)
+            self._computes_changed_since = _get_last_change(compute_nodes)
+        self.refresh_stats['full_refreshes'] += 1
+        self.refresh_stats['rows_fetched'] += (len(services) +
+                                               len(compute_nodes))
+
+    def _refresh_changed_host_states(self, context):
+        """Applies the compute nodes and services changed since the last
+        refresh to the existing host states.
+
+        Deleted and disabled services, as well as deleted compute nodes, are
+        returned by the queries too, so that their host states can be
+        evicted.
+        """
+        services = objects.ServiceList.get_by_binary_changed_since(
+            context, 'nova-compute', self._services_changed_since)
+        compute_nodes = list(objects.ComputeNodeList.get_all_changed_since(
+            context, self._computes_changed_since))
+
+        new_hosts = set()
+        for service in services:
+            host = service.host
+            if service.deleted or service.disabled:
+                self.service_refs.pop(host, None)
+                for state_key in list(self.host_state_keys.get(host, ())):
+                    self._remove_host_state(state_key)
+                continue
+            if host not in self.service_refs:
+                new_hosts.add(host)
+            self.service_refs[host] = service
+            for state_key in self.host_state_keys.get(host, ()):
+                self.host_state_map[state_key].update_service(dict(service))
 
-    def _add_instance_info(self, context, compute, host_state):
+        for compute in compute_nodes:
+            state_key = (compute.host, compute.hypervisor_hostname)
+            service = self.service_refs.get(compute.host)
+            if compute.deleted or not service:
+                if state_key in self.host_state_map:
+                    self._remove_host_state(state_key)
+                continue
+            self._update_host_state(compute, service)
+            new_hosts.discard(compute.host)
+
+        # Services which were re-enabled, or just created, may have compute
+        # nodes which didn't change since the last refresh.
+        for host in new_hosts:
+            try:
+                host_computes = objects.ComputeNodeList.get_all_by_host(
+                    context, host)
+            except exception.ComputeHostNotFound:
+                continue
+            for compute in host_computes:
+                self._update_host_state(compute, self.service_refs[host])
+            compute_nodes.extend(host_computes)
+
+        self._services_changed_since = _get_last_change(
+            services, self._services_changed_since)
+        self._computes_changed_since = _get_last_change(
+            compute_nodes, self._computes_changed_since)
+        self.refresh_stats['incremental_refreshes'] += 1
+        self.refresh_stats['rows_fetched'] += (len(services) +
+                                               len(compute_nodes))
+        LOG.debug("Refreshed %(rows)d changed compute nodes and services "
+                  "for %(hosts)d hosts",
+                  {'rows': len(services) + len(compute_nodes),
+                   'hosts': len(self.host_state_map)})
+
+    def _add_instance_info(self, context, host_state):
         """Adds the host instance info to the host_state object.
 
         Some older compute nodes may not be sending instance change updates to
@@ -586,7 +861,7 @@ class HostManager(object):
         In those cases, we need to grab the current InstanceList instead of
         relying on the version in _instance_info.
         """
-        host_name = compute.host
+        host_name = host_state.host
         host_info = self._instance_info.get(host_name)
         if host_info and host_info.get("updated"):
             inst_dict = host_info["instances"]
@@ -606,6 +881,35 @@ class HostManager(object):
         host_info = self._instance_info[host_name] = {}
         host_info["instances"] = inst_dict
         host_info["updated"] = False
+        self._set_host_state_instances(host_name, inst_dict)
+
+    def _set_host_state_instances(self, host_name, inst_dict):
+        """Make the known host states of a host use a new instance dict.
+
+        The host states share the instance dict of their host with
+        _instance_info, so this keeps host states which are cached between
+        requests, like by the CachingScheduler, up to date.
+        """
+        for state_key in self.host_state_keys.get(host_name, ()):
+            self.host_state_map[state_key].instances = inst_dict
+
+    def update_compute_node(self, context, compute_node):
+        """Receives a ComputeNode object from a compute node, each time its
+        resource tracker updates it.
+
+        The known host state of the compute node is updated with it, unless
+        the host state consumed an instance since the update was made.
+        """
+        state_key = (compute_node.host, compute_node.hypervisor_hostname)
+        host_state = self.host_state_map.get(state_key)
+        if host_state is None:
+            # NOTE: The host state will be created the next time all the
+            # host states are loaded.
+            LOG.debug("Received an update from an unknown compute node "
+                      "%(host)s (%(node)s).",
+                      {'host': state_key[0], 'node': state_key[1]})
+            return
+        host_state.update_from_compute_node(compute_node)
 
     @utils.synchronized(HOST_INSTANCE_SEMAPHORE)
     def update_instance_info(self, context, host_name, instance_info):
@@ -630,6 +934,8 @@ class HostManager(object):
                 host_info["instances"] = {instance.uuid: instance
                                           for instance in instances}
                 host_info["updated"] = True
+                self._set_host_state_instances(host_name,
+                                               host_info["instances"])
             else:
                 self._recreate_instance_info(context, host_name)
                 LOG.info(_LI("Received an update from an unknown host '%s'. "
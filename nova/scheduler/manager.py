@@ -26,6 +26,7 @@ from oslo_serialization import jsonutils
 from oslo_utils import importutils
 
 from nova import exception
+from nova.i18n import _LI
 from nova import manager
 from nova import objects
 from nova.openstack.common import periodic_task
@@ -48,6 +49,7 @@ scheduler_driver_opts = [
 ]
 CONF = cfg.CONF
 CONF.register_opts(scheduler_driver_opts)
+CONF.import_opt('scheduler_timing_log_interval', 'nova.scheduler.timing')
 
 QUOTAS = quota.QUOTAS
 
@@ -55,7 +57,7 @@ QUOTAS = quota.QUOTAS
 class SchedulerManager(manager.Manager):
     """Chooses a host to run instances on."""
 
-    target = messaging.Target(version='4.2')
+    target = messaging.Target(version='4.4')
 
     def __init__(self, scheduler_driver=None, *args, **kwargs):
         if not scheduler_driver:
@@ -74,6 +76,22 @@ class SchedulerManager(manager.Manager):
     def _run_periodic_tasks(self, context):
         self.driver.run_periodic_tasks(context)
 
+    @periodic_task.periodic_task(spacing=CONF.scheduler_timing_log_interval)
+    def _log_timings(self, context):
+        if CONF.scheduler_timing_log_interval <= 0:
+            return
+        timings = self.driver.host_manager.timings
+        if timings is None:
+            return
+        summary = timings.summary()
+        for name in sorted(summary):
+            LOG.info(_LI("Timing of %(name)s over the last %(window)d "
+                         "seconds: %(count)d calls, mean %(mean_ms).1fms, "
+                         "p50 %(p50_ms).1fms, p99 %(p99_ms).1fms, max "
+                         "%(max_ms).1fms, %(mean_hosts_in).1f hosts in, "
+                         "%(mean_hosts_out).1f hosts out"),
+                     dict(summary[name], name=name, window=timings.window))
+
     @messaging.expected_exceptions(exception.NoValidHost)
     def select_destinations(self, context, request_spec, filter_properties):
         """Returns destinations(s) best suited for this request_spec and
@@ -86,6 +104,19 @@ class SchedulerManager(manager.Manager):
             filter_properties)
         return jsonutils.to_primitive(dests)
 
+    def get_timings(self, context):
+        """Returns the summaries of the time spent in the filters, the
+        weighers and the refresh of the host states during the last
+        scheduler_timing_window seconds, keyed by their name.
+
+        The summaries are dicts with the 'count', 'mean_ms', 'p50_ms',
+        'p99_ms', 'max_ms', 'mean_hosts_in' and 'mean_hosts_out' keys.
+        """
+        timings = self.driver.host_manager.timings
+        if timings is None:
+            return {}
+        return timings.summary()
+
     def update_aggregates(self, ctxt, aggregates):
         """Updates HostManager internal aggregates information.
 
@@ -126,6 +157,13 @@ class SchedulerManager(manager.Manager):
         self.driver.host_manager.sync_instance_info(context, host_name,
                                                     instance_uuids)
 
+    def update_compute_node(self, context, compute_node):
+        """Receives the resource usage of a compute node each time its
+        resource tracker updates it, and passes it on to the driver's
+        HostManager.
+        """
+        self.driver.host_manager.update_compute_node(context, compute_node)
+
 
 class _SchedulerManagerV3Proxy(object):
 
@@ -95,6 +95,9 @@ class SchedulerAPI(object):
         methods in 4.x after that point should be done such that they can
         handle the version_cap being set to 4.2.
 
+        * 4.3 - Added update_compute_node()
+        * 4.4 - Added get_timings()
+
     '''
 
     VERSION_ALIASES = {
@@ -143,3 +146,18 @@ class SchedulerAPI(object):
         cctxt = self.client.prepare(version='4.2', fanout=True)
         return cctxt.cast(ctxt, 'sync_instance_info', host_name=host_name,
                           instance_uuids=instance_uuids)
+
+    def update_compute_node(self, ctxt, compute_node):
+        if not self.client.can_send_version('4.3'):
+            # NOTE: Older schedulers reload the compute nodes from the
+            # database anyway.
+            return
+        cctxt = self.client.prepare(version='4.3', fanout=True)
+        return cctxt.cast(ctxt, 'update_compute_node',
+                          compute_node=compute_node)
+
+    def get_timings(self, ctxt, host=None):
+        """Get the timings of a scheduler, of the one given by host if set.
+        """
+        cctxt = self.client.prepare(version='4.4', server=host)
+        return cctxt.call(ctxt, 'get_timings')
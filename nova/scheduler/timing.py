@@ -0,0 +1,176 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Rolling histograms of the time spent in the steps of the scheduler.
+
+The filters, the weighers and the host state refresh report the wall time of
+each of their calls, along with the number of hosts they got and returned.
+Calls are only counted in fixed buckets, so recording one is cheap enough to
+leave the timings enabled. The scheduler manager logs a summary of them
+periodically, and returns it through the get_timings() RPC method, which
+`nova-manage scheduler timings` calls.
+"""
+
+import bisect
+import collections
+import time
+
+from oslo_config import cfg
+
+timing_opts = [
+    cfg.BoolOpt('scheduler_timing_enabled',
+                default=True,
+                help='Record the time spent in each filter and weigher and '
+                     'in the refresh of the host states. The summary is '
+                     'shown by `nova-manage scheduler timings`.'),
+    cfg.IntOpt('scheduler_timing_window',
+               default=600,
+               help='Number of seconds of scheduler activity summarized by '
+                    'the timings.'),
+    cfg.IntOpt('scheduler_timing_log_interval',
+               default=300,
+               help='How often (in seconds) to log a summary of the '
+                    'scheduler timings. 0 disables the summary.'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(timing_opts)
+
+# Upper bounds, in seconds, of the buckets of the histograms
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# Number of slots the window of a histogram is split into; the oldest one is
+# dropped as a whole when the window moves.
+SLOTS = 10
+
+
+class _Slot(object):
+    __slots__ = ('index', 'count', 'seconds', 'max_seconds', 'objs_in',
+                 'objs_out', 'buckets')
+
+    def __init__(self, index):
+        self.index = index
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.objs_in = 0
+        self.objs_out = 0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class RollingHistogram(object):
+    """Histogram of the durations of the calls made during the last window
+    seconds.
+    """
+
+    def __init__(self, window):
+        self.slot_length = max(float(window) / SLOTS, 1.0)
+        self._slots = collections.deque()
+
+    def _current_slot(self, now):
+        index = int(now // self.slot_length)
+        if not self._slots or self._slots[-1].index != index:
+            self._slots.append(_Slot(index))
+            self._expire(index)
+        return self._slots[-1]
+
+    def _expire(self, index):
+        while self._slots and self._slots[0].index <= index - SLOTS:
+            self._slots.popleft()
+
+    def record(self, seconds, objs_in=0, objs_out=0, now=None):
+        slot = self._current_slot(time.time() if now is None else now)
+        slot.count += 1
+        slot.seconds += seconds
+        slot.objs_in += objs_in
+        slot.objs_out += objs_out
+        if seconds > slot.max_seconds:
+            slot.max_seconds = seconds
+        slot.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+
+    def summary(self, now=None):
+        """Return a dict summarizing the calls in the window, or None if
+        there was none.
+        """
+        self._expire(int((time.time() if now is None else now) //
+                         self.slot_length))
+        count = sum(slot.count for slot in self._slots)
+        if not count:
+            return None
+        max_seconds = max(slot.max_seconds for slot in self._slots)
+        buckets = [sum(counts) for counts in
+                   zip(*[slot.buckets for slot in self._slots])]
+
+        def _percentile(percent):
+            # The upper bound of the bucket holding the percentile, which
+            # can't be more than the longest call.
+            rank = count * percent / 100.0
+            seen = 0
+            for bound, bucket_count in zip(BUCKETS, buckets):
+                seen += bucket_count
+                if seen >= rank:
+                    return min(bound, max_seconds)
+            return max_seconds
+
+        return {
+            'count': count,
+            'mean_ms': sum(slot.seconds for slot in self._slots) * 1000.0 /
+                       count,
+            'p50_ms': _percentile(50) * 1000.0,
+            'p99_ms': _percentile(99) * 1000.0,
+            'max_ms': max_seconds * 1000.0,
+            'mean_hosts_in': float(sum(slot.objs_in for slot in self._slots)) /
+                             count,
+            'mean_hosts_out': float(sum(slot.objs_out
+                                        for slot in self._slots)) / count,
+        }
+
+
+class Timings(object):
+    """Rolling histograms of the scheduler steps, keyed by their name, like
+    'filter.RamFilter' or 'weigher.RAMWeigher'.
+    """
+
+    def __init__(self, window=None):
+        if window is None:
+            window = CONF.scheduler_timing_window
+        self.window = window
+        self._histograms = {}
+
+    def record(self, name, seconds, objs_in=0, objs_out=0):
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = RollingHistogram(self.window)
+        histogram.record(seconds, objs_in, objs_out)
+
+    def summary(self):
+        """Return the summaries of the steps called during the window, keyed
+        by their name.
+        """
+        summaries = {}
+        for name, histogram in self._histograms.items():
+            summary = histogram.summary()
+            if summary:
+                summaries[name] = summary
+        return summaries
+
+
+def get_timings():
+    """Return a new Timings, or None if the timings are disabled."""
+    if CONF.scheduler_timing_enabled:
+        return Timings()
+    return None
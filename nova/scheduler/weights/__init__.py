@@ -17,8 +17,24 @@
 Scheduler host weights
 """
 
+import heapq
+import time
+
+from oslo_config import cfg
+
+from nova.scheduler.filters import columnar
 from nova import weights
 
+vectorized_weighers_opt = cfg.BoolOpt('scheduler_use_vectorized_weighers',
+        default=False,
+        help='Compute the weights of all the hosts at once using numpy '
+             'arrays, and normalize them in a single pass, instead of '
+             'weighing the hosts one by one. Ignored if numpy is not '
+             'installed.')
+
+CONF = cfg.CONF
+CONF.register_opt(vectorized_weighers_opt)
+
 
 class WeighedHost(weights.WeighedObject):
     def to_dict(self):
@@ -33,7 +49,15 @@ class WeighedHost(weights.WeighedObject):
 
 class BaseHostWeigher(weights.BaseWeigher):
     """Base class for host weights."""
-    pass
+
+    def weigh_objects_vectorized(self, host_columns, weight_properties):
+        """Return a numpy array of the weights of the hosts of the
+        HostColumns, or None if the weigher has no vectorized form.
+
+        Override this in a subclass along with _weigh_object(); both must
+        return the same weights.
+        """
+        return None
 
 
 class HostWeightHandler(weights.BaseWeightHandler):
@@ -42,6 +66,197 @@ class HostWeightHandler(weights.BaseWeightHandler):
     def __init__(self):
         super(HostWeightHandler, self).__init__(BaseHostWeigher)
 
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None):
+        if not _use_vectorized_weighers():
+            return super(HostWeightHandler, self).get_weighed_objects(
+                weighers, obj_list, weighing_properties, limit=limit)
+
+        numpy = columnar.numpy
+        host_states = list(obj_list)
+        if len(host_states) <= 1:
+            return [self.object_class(obj, 0.0) for obj in host_states]
+
+        all_weights = numpy.array(self._weigh_vectorized(
+            weighers, host_states, weighing_properties), dtype=numpy.float64)
+        minvals = numpy.array([weigher.minval for weigher in weighers],
+                              dtype=numpy.float64)
+        maxvals = numpy.array([weigher.maxval for weigher in weighers],
+                              dtype=numpy.float64)
+
+        # Normalize the weights of all the weighers at once; the weighers
+        # having the same minimum and maximum get null weights.
+        ranges = maxvals - minvals
+        flat = ranges == 0
+        ranges[flat] = 1.0
+        all_weights -= minvals[:, numpy.newaxis]
+        all_weights /= ranges[:, numpy.newaxis]
+        all_weights[flat] = 0.0
+
+        totals = numpy.zeros(len(host_states))
+        for i, weigher in enumerate(weighers):
+            totals += weigher.weight_multiplier() * all_weights[i]
+
+        weighed_objs = [self.object_class(obj, weight)
+                        for obj, weight in zip(host_states, totals.tolist())]
+        return weights.best_weighed(weighed_objs, lambda x: x.weight, limit)
+
+    def get_weights(self, weighers, host_states, weighing_properties):
+        """Return the weights of the hosts, before normalization, as one
+        list per weigher.
+
+        The minval and maxval of the weighers are updated as a side effect,
+        like when the hosts are weighed by get_weighed_objects().
+        """
+        if _use_vectorized_weighers():
+            numpy = columnar.numpy
+            return [numpy.asarray(weights_, dtype=numpy.float64).tolist()
+                    for weights_ in self._weigh_vectorized(
+                        weighers, host_states, weighing_properties)]
+        weighed_objs = [self.object_class(obj, 0.0) for obj in host_states]
+        all_weights = []
+        for weigher in weighers:
+            start = time.time()
+            all_weights.append(list(weigher.weigh_objects(
+                weighed_objs, weighing_properties)))
+            self._record_weigher(weigher, start, len(weighed_objs))
+        return all_weights
+
+    def _weigh_vectorized(self, weighers, host_states, weighing_properties):
+        host_columns = columnar.HostColumns(host_states)
+        weighed_objs = None
+        all_weights = []
+        for weigher in weighers:
+            start = time.time()
+            weights_ = weigher.weigh_objects_vectorized(host_columns,
+                                                        weighing_properties)
+            if weights_ is None:
+                if weighed_objs is None:
+                    weighed_objs = [self.object_class(obj, 0.0)
+                                    for obj in host_states]
+                weights_ = weigher.weigh_objects(weighed_objs,
+                                                 weighing_properties)
+            else:
+                # Keep track of the extreme weights like weigh_objects()
+                # does, as they are reused for the next requests.
+                lowest = weights_.min()
+                highest = weights_.max()
+                if weigher.minval is None or lowest < weigher.minval:
+                    weigher.minval = lowest.item()
+                if weigher.maxval is None or highest > weigher.maxval:
+                    weigher.maxval = highest.item()
+            all_weights.append(weights_)
+            self._record_weigher(weigher, start, len(host_states))
+        return all_weights
+
+
+class HostRanking(object):
+    """Hosts of a multi-instance request, ordered by their weights.
+
+    The hosts are weighed once, then only the host consuming the resources
+    of an instance is weighed again before the next instance is scheduled.
+    The best hosts are kept at the top of a heap, with the same order and
+    the same weights as the ones given by get_weighed_objects(), provided
+    the weighers weigh each host independently of the others.
+    """
+
+    def __init__(self, weight_handler, weighers, hosts, weight_properties):
+        self.weight_handler = weight_handler
+        self.weighers = weighers
+        self.weight_properties = weight_properties
+        self.hosts = list(hosts)
+        self._positions = {host: i for i, host in enumerate(self.hosts)}
+        self._alive = set(self._positions.values())
+        self._heap = []
+        self._generations = [0] * len(self.hosts)
+        self._weights = [0.0] * len(self.hosts)
+        self._raw_weights = None
+        if len(self.hosts) > 1:
+            self._raw_weights = list(zip(*self.weight_handler.get_weights(
+                self.weighers, self.hosts, self.weight_properties)))
+            self._rebuild()
+
+    def _get_scales(self):
+        scales = []
+        for weigher in self.weighers:
+            minval = float(weigher.minval)
+            maxval = float(weigher.maxval)
+            scales.append((weigher.weight_multiplier(), minval,
+                           maxval - minval if minval != maxval else None))
+        return scales
+
+    def _get_weight(self, raw_weights):
+        # NOTE: This must do exactly the same float operations as
+        # nova.weights.normalize() and get_weighed_objects().
+        weight = 0.0
+        for (multiplier, minval, range_), raw_weight in zip(self._scales,
+                                                            raw_weights):
+            if range_ is None:
+                weight += multiplier * 0
+            else:
+                weight += multiplier * ((raw_weight - minval) / range_)
+        return weight
+
+    def _rebuild(self):
+        self._scales = self._get_scales()
+        self._heap = []
+        for i in self._alive:
+            self._weights[i] = self._get_weight(self._raw_weights[i])
+            self._generations[i] += 1
+            self._heap.append((-self._weights[i], i, self._generations[i]))
+        heapq.heapify(self._heap)
+
+    def update(self, hosts, consumed_host):
+        """Update the ranking after consumed_host was picked.
+
+        :param hosts: the hosts passing the filters for the next instance,
+                      which are a subset of the previous ones.
+        """
+        if len(hosts) != len(self._alive):
+            positions = set(self._positions[host] for host in hosts)
+            self._alive &= positions
+        if len(self._alive) <= 1 or self._raw_weights is None:
+            return
+        i = self._positions[consumed_host]
+        if i not in self._alive:
+            return
+
+        weighed_obj = [self.weight_handler.object_class(consumed_host, 0.0)]
+        self._raw_weights[i] = tuple(
+            weigher.weigh_objects(weighed_obj, self.weight_properties)[0]
+            for weigher in self.weighers)
+        if self._get_scales() != self._scales:
+            # The extreme weights changed, so do all the normalized weights.
+            self._rebuild()
+            return
+        self._weights[i] = self._get_weight(self._raw_weights[i])
+        self._generations[i] += 1
+        heapq.heappush(self._heap,
+                       (-self._weights[i], i, self._generations[i]))
+
+    def get_best(self, limit):
+        """Return the limit best WeighedHosts, sorted by descending weight."""
+        if len(self._alive) <= 1:
+            return [self.weight_handler.object_class(self.hosts[i], 0.0)
+                    for i in self._alive]
+        best = []
+        while self._heap and len(best) < limit:
+            entry = heapq.heappop(self._heap)
+            position, generation = entry[1:]
+            if (position in self._alive and
+                    generation == self._generations[position]):
+                best.append(entry)
+        for entry in best:
+            heapq.heappush(self._heap, entry)
+        return [self.weight_handler.object_class(self.hosts[entry[1]],
+                                                 self._weights[entry[1]])
+                for entry in best]
+
+
+def _use_vectorized_weighers():
+    return (CONF.scheduler_use_vectorized_weighers and
+            columnar.numpy is not None)
+
 
 def all_weighers():
     """Return a list of weight plugin classes found in this directory."""
@@ -102,3 +102,8 @@ class MetricsWeigher(weights.BaseHostWeigher):
                         return CONF.metrics.weight_of_unavailable
 
         return value
+
+    def weigh_objects_vectorized(self, host_columns, weight_properties):
+        return host_columns.per_host(
+            lambda host_state: self._weigh_object(host_state,
+                                                  weight_properties))
@@ -30,6 +30,7 @@ from oslo_utils import importutils
 from nova import baserpc
 from nova import conductor
 from nova import context
+from nova.db import profiler as db_profiler
 from nova import debugger
 from nova import exception
 from nova.i18n import _, _LE, _LI, _LW
@@ -184,6 +185,9 @@ class Service(service.Service):
             baserpc.BaseRPCAPI(self.manager.service_name, self.backdoor_port)
         ]
         endpoints.extend(self.manager.additional_endpoints)
+        if db_profiler.is_enabled():
+            endpoints = [db_profiler.ProfiledEndpoint(endpoint, self.topic)
+                         for endpoint in endpoints]
 
         serializer = objects_base.NovaObjectSerializer()
 
@@ -13,26 +13,109 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import eventlet
 from oslo_config import cfg
 from oslo_log import log as logging
 from oslo_utils import timeutils
 import six
+from six.moves import range
 
+from nova import context as nova_context
+from nova import db
 from nova.i18n import _, _LE
+from nova import objects
 from nova.servicegroup import api
 from nova.servicegroup.drivers import base
 
 
+db_driver_opts = [
+    cfg.FloatOpt('heartbeat_flush_interval',
+                 default=0.0,
+                 help='Number of seconds the heartbeats of the services are '
+                      'held before being written to the database, in bulk '
+                      'with the heartbeats received meanwhile. The '
+                      'heartbeats of the services without database access '
+                      'are held by the conductor, which needs to be '
+                      'upgraded first. The liveness checks allow for the '
+                      'delay, so use the same value on all the nodes. 0 '
+                      'writes each heartbeat by saving the service record.'),
+    cfg.IntOpt('service_liveness_cache_time',
+               default=10,
+               help='Number of seconds the heartbeats of the services of a '
+                    'group, read from the database to list the members of '
+                    'the group which are up, are cached.'),
+]
+
 CONF = cfg.CONF
+CONF.register_opts(db_driver_opts)
 CONF.import_opt('service_down_time', 'nova.service')
 
 LOG = logging.getLogger(__name__)
 
+# Maximum number of services whose heartbeats are written in one statement
+HEARTBEAT_BATCH_SIZE = 500
+
+
+class _HeartbeatBuffer(object):
+    """Heartbeats of the services waiting to be written to the database."""
+
+    def __init__(self):
+        # Number of heartbeats and time of the last one, keyed by service id
+        self._pending = {}
+        self._flush_scheduled = False
+
+    def _add(self, service_id, count, last_heartbeat):
+        pending = self._pending.get(service_id)
+        if pending is not None:
+            count += pending[0]
+            last_heartbeat = max(last_heartbeat, pending[1])
+        self._pending[service_id] = (count, last_heartbeat)
+
+    def record(self, service_id, heartbeat):
+        self._add(service_id, 1, heartbeat)
+        if CONF.heartbeat_flush_interval <= 0:
+            self.flush()
+        elif not self._flush_scheduled:
+            self._flush_scheduled = True
+            eventlet.spawn_after(CONF.heartbeat_flush_interval, self.flush)
+
+    def flush(self):
+        self._flush_scheduled = False
+        heartbeats, self._pending = self._pending, {}
+        context = nova_context.get_admin_context()
+        service_ids = sorted(heartbeats)
+        for start in range(0, len(service_ids), HEARTBEAT_BATCH_SIZE):
+            batch = {service_id: heartbeats[service_id]
+                     for service_id in
+                     service_ids[start:start + HEARTBEAT_BATCH_SIZE]}
+            try:
+                db.service_update_heartbeats(context, batch)
+            except Exception:
+                # NOTE: The heartbeats are written with the next ones.
+                LOG.exception(_LE('Writing the heartbeats of %d services '
+                                  'failed'), len(batch))
+                for service_id, (count, last_heartbeat) in batch.items():
+                    self._add(service_id, count, last_heartbeat)
+
+
+_HEARTBEATS = _HeartbeatBuffer()
+
+
+def record_heartbeat(service_id, heartbeat):
+    """Record a heartbeat of a service, written to the database after
+    heartbeat_flush_interval seconds with the other heartbeats recorded by
+    this process.
+    """
+    _HEARTBEATS.record(service_id, heartbeat)
+
 
 class DbDriver(base.Driver):
 
     def __init__(self, *args, **kwargs):
         self.service_down_time = CONF.service_down_time
+        # Time of the read and last heartbeats of the services of a group,
+        # keyed by group
+        self._liveness = {}
 
     def join(self, member, group, service=None):
         """Add a new member to a service group.
@@ -53,10 +136,8 @@ class DbDriver(base.Driver):
             service.tg.add_timer(report_interval, self._report_state,
                                  api.INITIAL_REPORTING_DELAY, service)
 
-    def is_up(self, service_ref):
-        """Moved from nova.utils
-        Check whether a service is up based on last heartbeat.
-        """
+    @staticmethod
+    def _last_heartbeat(service_ref):
         last_heartbeat = service_ref['updated_at'] or service_ref['created_at']
         if isinstance(last_heartbeat, six.string_types):
             # NOTE(russellb) If this service_ref came in over rpc via
@@ -67,20 +148,63 @@ class DbDriver(base.Driver):
             # Objects have proper UTC timezones, but the timeutils comparison
             # below does not (and will fail)
             last_heartbeat = last_heartbeat.replace(tzinfo=None)
+        return last_heartbeat
+
+    def _elapsed_is_up(self, elapsed):
+        # NOTE: The heartbeats may be held for heartbeat_flush_interval
+        # seconds before being written.
+        return (abs(elapsed) <=
+                self.service_down_time + CONF.heartbeat_flush_interval)
+
+    def is_up(self, service_ref):
+        """Moved from nova.utils
+        Check whether a service is up based on last heartbeat.
+        """
+        last_heartbeat = self._last_heartbeat(service_ref)
+        if self._liveness:
+            # NOTE: The heartbeats read by get_all() may be more recent than
+            # the service record given, but they aren't read again here.
+            liveness = self._liveness.get(service_ref['topic'])
+            cached_heartbeat = liveness and liveness[1].get(
+                service_ref['host'])
+            if cached_heartbeat and cached_heartbeat > last_heartbeat:
+                last_heartbeat = cached_heartbeat
         # Timestamps in DB are UTC.
         elapsed = timeutils.delta_seconds(last_heartbeat, timeutils.utcnow())
-        is_up = abs(elapsed) <= self.service_down_time
+        is_up = self._elapsed_is_up(elapsed)
         if not is_up:
             LOG.debug('Seems service is down. Last heartbeat was %(lhb)s. '
                       'Elapsed time is %(el)s',
                       {'lhb': str(last_heartbeat), 'el': str(elapsed)})
         return is_up
 
+    def get_all(self, group_id):
+        """Return the hosts of the enabled services of a group which are up.
+
+        The heartbeats of the services of the group are read from the
+        database at most every service_liveness_cache_time seconds.
+        """
+        now = timeutils.utcnow()
+        liveness = self._liveness.get(group_id)
+        if (liveness is None or timeutils.delta_seconds(liveness[0], now) >=
+                CONF.service_liveness_cache_time):
+            services = objects.ServiceList.get_by_topic(
+                nova_context.get_admin_context(), group_id)
+            liveness = (now, {service.host: self._last_heartbeat(service)
+                              for service in services})
+            self._liveness[group_id] = liveness
+        return [host for host, last_heartbeat in liveness[1].items()
+                if self._elapsed_is_up(
+                    timeutils.delta_seconds(last_heartbeat, now))]
+
     def _report_state(self, service):
         """Update the state of this service in the datastore."""
         try:
-            service.service_ref.report_count += 1
-            service.service_ref.save()
+            if CONF.heartbeat_flush_interval > 0:
+                service.service_ref.heartbeat()
+            else:
+                service.service_ref.report_count += 1
+                service.service_ref.save()
 
             # TODO(termie): make this pattern be more elegant.
             if getattr(service, 'model_disconnected', False):
@@ -158,7 +158,7 @@ class SimpleTenantUsageTestV21(test.TestCase):
         req.environ['nova.context'] = self.admin_context
 
         # Make sure that get_active_by_window_joined is only called with
-        # expected_attrs=['system_metadata'].
+        # expected_attrs=['flavor', 'system_metadata'].
         orig_get_active_by_window_joined = (
             objects.InstanceList.get_active_by_window_joined)
 
@@ -166,7 +166,7 @@ class SimpleTenantUsageTestV21(test.TestCase):
                                     project_id=None, host=None,
                                     expected_attrs=None,
                                     use_slave=False):
-            self.assertEqual(['system_metadata'], expected_attrs)
+            self.assertEqual(['flavor', 'system_metadata'], expected_attrs)
             return orig_get_active_by_window_joined(context, begin, end,
                                                     project_id, host,
                                                     expected_attrs, use_slave)
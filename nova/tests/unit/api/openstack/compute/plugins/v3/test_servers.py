@@ -682,7 +682,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             db_list = [fakes.stub_instance(100, uuid=server_uuid)]
             return instance_obj._make_instance_list(
                 context, objects.InstanceList(), db_list, FIELDS)
@@ -700,7 +701,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('image', search_opts)
             self.assertEqual(search_opts['image'], '12345')
@@ -719,7 +721,8 @@ class ServersControllerTest(ControllerTest):
     def test_tenant_id_filter_converts_to_project_id_for_admin(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(filters)
             self.assertEqual(filters['project_id'], 'newfake')
             self.assertFalse(filters.get('tenant_id'))
@@ -737,7 +740,8 @@ class ServersControllerTest(ControllerTest):
     def test_tenant_id_filter_no_admin_context(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotEqual(filters, None)
             self.assertEqual(filters['project_id'], 'fake')
             return [fakes.stub_instance(100)]
@@ -752,7 +756,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_normal(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
 
@@ -767,7 +772,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_one(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
 
@@ -782,7 +788,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_zero(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -797,7 +804,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_false(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -812,7 +820,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_param_invalid(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertNotIn('all_tenants', filters)
             return [fakes.stub_instance(100)]
 
@@ -827,7 +836,8 @@ class ServersControllerTest(ControllerTest):
     def test_admin_restricted_tenant(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(filters)
             self.assertEqual(filters['project_id'], 'fake')
             return [fakes.stub_instance(100)]
@@ -843,7 +853,8 @@ class ServersControllerTest(ControllerTest):
     def test_all_tenants_pass_policy(self):
         def fake_get_all(context, filters=None, limit=None, marker=None,
                          columns_to_join=None, use_slave=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(filters)
             self.assertNotIn('project_id', filters)
             return [fakes.stub_instance(100)]
@@ -889,7 +900,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('flavor', search_opts)
             # flavor is an integer ID
@@ -923,7 +935,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], [vm_states.ACTIVE])
@@ -945,7 +958,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('task_state', search_opts)
             self.assertEqual([task_states.REBOOT_PENDING,
@@ -971,7 +985,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'],
                              [vm_states.ACTIVE, vm_states.STOPPED])
@@ -1006,7 +1021,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], ['deleted'])
 
@@ -1077,7 +1093,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('name', search_opts)
             self.assertEqual(search_opts['name'], 'whee.*')
@@ -1107,7 +1124,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-since', search_opts)
             changes_since = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -1141,7 +1159,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1172,7 +1191,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1202,7 +1222,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip', search_opts)
             self.assertEqual(search_opts['ip'], '10\..*')
@@ -1226,7 +1247,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip6', search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
@@ -1307,15 +1329,31 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         expected_attrs=None, sort_keys=None, sort_dirs=None):
+                         expected_attrs=None, sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.expected_attrs = expected_attrs
-            return []
+            return objects.InstanceList(objects=[])
+
+        self.stubs.Set(compute_api.API, 'get_all', fake_get_all)
+
+        req = fakes.HTTPRequestV3.blank('/servers/detail',
+                                        use_admin_context=True)
+        self.assertIn('servers', self.controller.detail(req))
+        self.assertIn('pci_devices', self.expected_attrs)
+
+    def test_get_servers_index_skips_default_attrs(self):
+        self.get_all_kwargs = None
+
+        def fake_get_all(compute_self, context, **kwargs):
+            self.get_all_kwargs = kwargs
+            return objects.InstanceList(objects=[])
 
         self.stubs.Set(compute_api.API, 'get_all', fake_get_all)
 
         req = fakes.HTTPRequestV3.blank('/servers', use_admin_context=True)
         self.assertIn('servers', self.controller.index(req))
-        self.assertIn('pci_devices', self.expected_attrs)
+        self.assertFalse(self.get_all_kwargs['load_default_attrs'])
+        self.assertIsNone(self.get_all_kwargs.get('expected_attrs'))
 
 
 class ServersControllerDeleteTest(ControllerTest):
@@ -674,7 +674,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             db_list = [fakes.stub_instance(100, uuid=server_uuid)]
             return instance_obj._make_instance_list(
                 context, objects.InstanceList(), db_list, FIELDS)
@@ -692,7 +693,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('image', search_opts)
             self.assertEqual(search_opts['image'], '12345')
@@ -868,7 +870,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('flavor', search_opts)
             # flavor is an integer ID
@@ -902,7 +905,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], [vm_states.ACTIVE])
@@ -940,7 +944,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        load_default_attrs=False)
 
     @mock.patch.object(compute_api.API, 'get_all')
     def test_get_servers_system_metadata_filter(self, get_all_mock):
@@ -966,7 +971,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        load_default_attrs=False)
 
     @mock.patch.object(compute_api.API, 'get_all')
     def test_get_servers_flavor_not_found(self, get_all_mock):
@@ -998,7 +1004,8 @@ class ServersControllerTest(ControllerTest):
         get_all_mock.assert_called_once_with(mock.ANY,
                         search_opts=expected_search_opts, limit=mock.ANY,
                         marker=mock.ANY, want_objects=mock.ANY,
-                        sort_keys=mock.ANY, sort_dirs=mock.ANY)
+                        sort_keys=mock.ANY, sort_dirs=mock.ANY,
+                        load_default_attrs=False)
 
     def test_get_servers_allows_task_status(self):
         server_uuid = str(uuid.uuid4())
@@ -1006,7 +1013,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('task_state', search_opts)
             self.assertEqual([task_states.REBOOT_PENDING,
@@ -1032,7 +1040,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'],
                              [vm_states.ACTIVE, vm_states.STOPPED])
@@ -1067,7 +1076,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIn('vm_state', search_opts)
             self.assertEqual(search_opts['vm_state'], ['deleted'])
 
@@ -1136,7 +1146,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('name', search_opts)
             self.assertEqual(search_opts['name'], 'whee.*')
@@ -1157,7 +1168,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('changes-since', search_opts)
             changes_since = datetime.datetime(2011, 1, 24, 17, 8, 1,
@@ -1191,7 +1203,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1222,7 +1235,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             # Allowed by user
             self.assertIn('name', search_opts)
@@ -1251,7 +1265,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip', search_opts)
             self.assertEqual(search_opts['ip'], '10\..*')
@@ -1275,7 +1290,8 @@ class ServersControllerTest(ControllerTest):
 
         def fake_get_all(compute_self, context, search_opts=None,
                          limit=None, marker=None, want_objects=False,
-                         sort_keys=None, sort_dirs=None):
+                         sort_keys=None, sort_dirs=None,
+                         load_default_attrs=True):
             self.assertIsNotNone(search_opts)
             self.assertIn('ip6', search_opts)
             self.assertEqual(search_opts['ip6'], 'ffff.*')
@@ -2779,6 +2779,29 @@ class _ComputeAPIUnitTestMixIn(object):
         api = compute_api.API(skip_policy_check=True)
         api.create(self.context, None, None)
 
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_all_default_attrs(self, mock_get):
+        self.compute_api.get_all(self.context, expected_attrs=['flavor'])
+        self.assertEqual(['metadata', 'system_metadata', 'info_cache',
+                          'security_groups', 'flavor'],
+                         mock_get.call_args[1]['expected_attrs'])
+
+        mock_get.reset_mock()
+        self.compute_api.get_all(self.context, expected_attrs=['flavor'],
+                                 load_default_attrs=False)
+        self.assertEqual(['flavor'], mock_get.call_args[1]['expected_attrs'])
+
+    @mock.patch.object(compute_api.API, '_ip_filter')
+    @mock.patch.object(objects.InstanceList, 'get_by_filters')
+    def test_get_all_no_default_attrs_ip_filter(self, mock_get,
+                                                mock_ip_filter):
+        self.compute_api.get_all(self.context,
+                                 search_opts={'ip': '10.0.0.1'},
+                                 want_objects=True,
+                                 load_default_attrs=False)
+        self.assertEqual(['info_cache'],
+                         mock_get.call_args[1]['expected_attrs'])
+
 
 class ComputeAPIUnitTestCase(_ComputeAPIUnitTestMixIn, test.NoDBTestCase):
     def setUp(self):
@@ -35,6 +35,7 @@ from nova.compute import task_states
 from nova.compute import utils as compute_utils
 from nova.compute import vm_states
 from nova.conductor import api as conductor_api
+from nova.conductor import batching as conductor_batching
 from nova.conductor import rpcapi as conductor_rpcapi
 from nova import context
 from nova import db
@@ -1193,6 +1194,22 @@ class ComputeManagerUnitTestCase(test.NoDBTestCase):
                                         use_slave=True)
             mock_spawn.assert_called_once_with(mock.ANY, instance)
 
+    @mock.patch.object(conductor_batching, 'batched')
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_sync_power_states_batched(self, mock_get, mock_batched):
+        instance = objects.Instance(uuid='fake-uuid')
+        mock_get.return_value = [instance]
+        with contextlib.nested(
+            mock.patch.object(self.compute._sync_power_pool, 'spawn_n',
+                              side_effect=lambda fn, *args: fn(*args)),
+            mock.patch.object(self.compute,
+                              '_query_driver_power_state_and_sync')
+        ) as (mock_spawn, mock_sync):
+            self.compute._sync_power_states(self.context)
+            mock_sync.assert_called_once_with(self.context, instance)
+        mock_batched.assert_called_once_with()
+        self.assertEqual({}, self.compute._syncs_in_progress)
+
     def _get_sync_instance(self, power_state, vm_state, task_state=None,
                            shutdown_terminate=False):
         instance = objects.Instance()
@@ -15,7 +15,6 @@
 
 """Tests for compute resource tracking."""
 
-import copy
 import uuid
 
 import mock
@@ -806,12 +805,57 @@ class SchedulerClientTrackerTestCase(BaseTrackerTestCase):
     def test_update_resource(self):
         # change a compute node value to simulate a change
         self.tracker.compute_node['local_gb_used'] += 1
-        expected = copy.deepcopy(self.tracker.compute_node)
+        compute_node = self.tracker.compute_node
+        expected = {'id': compute_node['id'],
+                    'local_gb_used': compute_node['local_gb_used']}
         self.tracker._update(self.context)
         self.tracker.scheduler_client.update_resource_stats.\
             assert_called_once_with(self.context,
                                     ("fakehost", "fakenode"),
                                     expected)
+        self.assertEqual(len(self.tracker.compute_node) - 1,
+                         self.tracker.update_savings['fields'])
+        self.assertTrue(self.tracker.update_savings['bytes'] > 0)
+
+    def test_update_resource_after_failure(self):
+        update = self.tracker.scheduler_client.update_resource_stats
+        update.side_effect = test.TestingException
+        self.tracker.compute_node['local_gb_used'] += 1
+        self.assertRaises(test.TestingException,
+                          self.tracker._update, self.context)
+        update.side_effect = None
+        self.tracker._update(self.context)
+        self.assertEqual(2, update.call_count)
+
+    def test_update_volatile_resource(self):
+        self.flags(compute_node_volatile_update_interval=2)
+        update = self.tracker.scheduler_client.update_resource_stats
+        for i in range(2):
+            self.tracker.compute_node['metrics'] = jsonutils.dumps([i])
+            self.tracker._update(self.context)
+            self.assertFalse(update.called)
+        self.assertEqual(2, self.tracker.update_savings['rows'])
+
+        self.tracker.compute_node['metrics'] = jsonutils.dumps([2])
+        self.tracker._update(self.context)
+        update.assert_called_once_with(
+            self.context, ("fakehost", "fakenode"),
+            {'id': self.tracker.compute_node['id'], 'metrics': '[2]'})
+        self.assertEqual(0, self.tracker.volatile_updates_held)
+
+    def test_update_volatile_resource_with_other_change(self):
+        self.flags(compute_node_volatile_update_interval=2)
+        update = self.tracker.scheduler_client.update_resource_stats
+        self.tracker.compute_node['metrics'] = '[1]'
+        self.tracker._update(self.context)
+        self.assertFalse(update.called)
+
+        self.tracker.compute_node['local_gb_used'] += 1
+        self.tracker._update(self.context)
+        update.assert_called_once_with(
+            self.context, ("fakehost", "fakenode"),
+            {'id': self.tracker.compute_node['id'], 'metrics': '[1]',
+             'local_gb_used': self.tracker.compute_node['local_gb_used']})
 
     def test_no_update_resource(self):
         self.tracker._update(self.context)
@@ -984,6 +1028,99 @@ class InstanceClaimTestCase(BaseTrackerTestCase):
         self.assertEqual(0, self.compute["local_gb_used"])
         self.assertEqual(FAKE_VIRT_LOCAL_GB, self.compute["free_disk_gb"])
 
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node',
+                return_value=[])
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance_uuid',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    def test_claim_during_audit(self, mock_get, mock_get_instances):
+        claim_mem_total = 3 + FAKE_VIRT_MEMORY_OVERHEAD
+        instance = self._fake_instance_obj(memory_mb=3, root_gb=2,
+                                           ephemeral_gb=0)
+        get_audit_data = self.tracker._get_audit_data
+
+        def _claim_while_gathering(context):
+            # The audit doesn't see the instance claimed meanwhile, and
+            # must not hold the lock the claim takes.
+            audit = get_audit_data(context)
+            with mock.patch.object(instance, 'save'):
+                self.tracker.instance_claim(self.context, instance,
+                                            self.limits)
+            return audit
+
+        with mock.patch.object(self.tracker, '_get_audit_data',
+                               side_effect=_claim_while_gathering):
+            self.tracker.update_available_resource(self.context)
+
+        self.assertEqual(claim_mem_total, self.compute['memory_mb_used'])
+        self.assertEqual(2, self.compute['local_gb_used'])
+        self.assertIn(instance.uuid, self.tracker.tracked_instances)
+        self.assertIn(instance.uuid, self.tracker.pending_claims)
+
+        # A later audit gathers its data after the claim, so the ledger
+        # forgets about it.
+        self.tracker.update_available_resource(self.context)
+        self.assertEqual({}, self.tracker.pending_claims)
+
+    @mock.patch('nova.objects.InstanceList.get_by_host_and_node',
+                return_value=[])
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance_uuid',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    def test_claim_aborted_during_audit(self, mock_get, mock_get_instances):
+        instance = self._fake_instance_obj(memory_mb=3, root_gb=2,
+                                           ephemeral_gb=0)
+        get_audit_data = self.tracker._get_audit_data
+
+        def _claim_and_abort_while_gathering(context):
+            audit = get_audit_data(context)
+            with mock.patch.object(instance, 'save'):
+                self.tracker.instance_claim(self.context, instance,
+                                            self.limits)
+            self.tracker.abort_instance_claim(self.context, instance)
+            return audit
+
+        with mock.patch.object(self.tracker, '_get_audit_data',
+                               side_effect=_claim_and_abort_while_gathering):
+            self.tracker.update_available_resource(self.context)
+
+        self.assertEqual(0, self.compute['local_gb_used'])
+        self.assertNotIn(instance.uuid, self.tracker.tracked_instances)
+        self.assertEqual({}, self.tracker.pending_claims)
+
+    @mock.patch('nova.objects.InstancePCIRequests.get_by_instance_uuid',
+                return_value=objects.InstancePCIRequests(requests=[]))
+    def test_release_during_audit(self, mock_get):
+        instance = self._fake_instance_obj(memory_mb=3, root_gb=2,
+                                           ephemeral_gb=0)
+        with mock.patch.object(instance, 'save'):
+            self.tracker.instance_claim(self.context, instance, self.limits)
+        get_audit_data = self.tracker._get_audit_data
+
+        def _release_while_gathering(context):
+            # The audit still sees the instance deleted meanwhile.
+            audit = get_audit_data(context)
+            deleted = instance.obj_clone()
+            deleted.vm_state = vm_states.DELETED
+            self.tracker.update_usage(self.context, deleted)
+            return audit
+
+        with mock.patch('nova.objects.InstanceList.get_by_host_and_node',
+                        return_value=[instance]):
+            with mock.patch.object(self.tracker, '_get_audit_data',
+                                   side_effect=_release_while_gathering):
+                self.tracker.update_available_resource(self.context)
+
+        self.assertEqual(0, self.compute['memory_mb_used'])
+        self.assertEqual(0, self.compute['local_gb_used'])
+        self.assertNotIn(instance.uuid, self.tracker.tracked_instances)
+        self.assertIn(instance.uuid, self.tracker.pending_releases)
+
+        # A later audit gathers its data after the release, so the ledger
+        # forgets about it.
+        with mock.patch('nova.objects.InstanceList.get_by_host_and_node',
+                        return_value=[]):
+            self.tracker.update_available_resource(self.context)
+        self.assertEqual({}, self.tracker.pending_releases)
+
     @mock.patch('nova.objects.InstancePCIRequests.get_by_instance_uuid',
                 return_value=objects.InstancePCIRequests(requests=[]))
     def test_instance_claim_with_oversubscription(self, mock_get):
@@ -1192,7 +1329,8 @@ class InstanceClaimTestCase(BaseTrackerTestCase):
                              inst.obj_what_changed())
 
         mock_save.side_effect = fake_save
-        inst = objects.Instance(host=None, node=None, memory_mb=1024)
+        inst = objects.Instance(host=None, node=None, memory_mb=1024,
+                                uuid='fake-uuid')
         inst.obj_reset_changes()
         numa = objects.InstanceNUMATopology()
         claim = mock.MagicMock()
@@ -1462,13 +1600,17 @@ class TrackerPeriodicTestCase(BaseTrackerTestCase):
         @mock.patch.object(self.tracker, 'driver')
         @mock.patch.object(self.tracker,
                            '_update_available_resource')
+        @mock.patch.object(self.tracker, '_get_audit_data')
         @mock.patch.object(self.tracker, '_verify_resources')
         @mock.patch.object(self.tracker, '_report_hypervisor_resource_view')
-        def _test(mock_rhrv, mock_vr, mock_uar, mock_driver):
+        def _test(mock_rhrv, mock_vr, mock_gad, mock_uar, mock_driver):
             resources = {'there is someone in my head': 'but it\'s not me'}
             mock_driver.get_available_resource.return_value = resources
+            self.tracker.claim_generation = 3
             self.tracker.update_available_resource(self.context)
-            mock_uar.assert_called_once_with(self.context, resources)
+            mock_gad.assert_called_once_with(self.context)
+            mock_uar.assert_called_once_with(self.context, resources,
+                                             mock_gad.return_value, 3)
 
         _test()
 
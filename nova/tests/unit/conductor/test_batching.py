@@ -0,0 +1,163 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import eventlet
+import mock
+import oslo_messaging as messaging
+
+from nova.conductor import batching
+from nova.conductor import rpcapi as conductor_rpcapi
+from nova import context
+from nova import exception
+from nova.objects import base as objects_base
+from nova import test
+
+
+class BatchingConductorAPITestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(BatchingConductorAPITestCase, self).setUp()
+        self.flags(object_batch_window=0.01, group='conductor')
+        self.context = context.RequestContext('fake-user', 'fake-project')
+        self.api = batching.BatchingConductorAPI()
+
+    def _spawn_calls(self, contexts, objmethods=None):
+        if objmethods is None:
+            objmethods = ['get'] * len(contexts)
+
+        def _call(ctxt, objmethod):
+            try:
+                return self.api.object_class_action(ctxt, 'Instance',
+                                                    objmethod, '1.0', [], {})
+            except Exception as e:
+                return e
+
+        threads = [eventlet.spawn(_call, ctxt, objmethod)
+                   for ctxt, objmethod in zip(contexts, objmethods)]
+        return [thread.wait() for thread in threads]
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_class_action')
+    def test_not_batching(self, mock_class_action, mock_batch):
+        self.flags(object_batch_window=0, group='conductor')
+        mock_class_action.return_value = 'result'
+        self.assertEqual(['result', 'result'],
+                         self._spawn_calls([self.context] * 2))
+        self.assertEqual(2, mock_class_action.call_count)
+        self.assertFalse(mock_batch.called)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'can_batch_objects',
+                       return_value=False)
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_class_action')
+    def test_not_batching_version_cap(self, mock_class_action, mock_batch,
+                                      mock_can_batch):
+        mock_class_action.return_value = 'result'
+        self.assertEqual(['result', 'result'],
+                         self._spawn_calls([self.context] * 2))
+        self.assertEqual(2, mock_class_action.call_count)
+        self.assertFalse(mock_batch.called)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    def test_batch(self, mock_batch):
+        mock_batch.return_value = [
+            {'result': 'result'},
+            {'error': {'module': 'nova.exception',
+                       'class': 'InstanceNotFound',
+                       'message': 'Instance fake-uuid could not be found.',
+                       'kwargs': {'instance_id': 'fake-uuid', 'code': 404}}},
+            {'error': {'module': 'nova.objects.base', 'class': 'Boom',
+                       'message': 'boom', 'kwargs': {}}}]
+        results = self._spawn_calls([self.context] * 3,
+                                    ['get', 'get_missing', 'boom'])
+        mock_batch.assert_called_once_with(self.context, [
+            {'method': 'object_class_action',
+             'kwargs': {'objname': 'Instance', 'objmethod': objmethod,
+                        'objver': '1.0', 'args': [], 'kwargs': {}}}
+            for objmethod in ('get', 'get_missing', 'boom')])
+        self.assertEqual('result', results[0])
+        self.assertIsInstance(results[1], exception.InstanceNotFound)
+        self.assertEqual('Instance fake-uuid could not be found.',
+                         results[1].format_message())
+        self.assertIsInstance(results[2], messaging.RemoteError)
+        self.assertEqual({}, self.api._pending)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch',
+                       side_effect=messaging.MessagingTimeout)
+    def test_batch_failed(self, mock_batch):
+        results = self._spawn_calls([self.context] * 2)
+        self.assertEqual(1, mock_batch.call_count)
+        for result in results:
+            self.assertIsInstance(result, messaging.MessagingTimeout)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_action')
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_class_action')
+    def test_batch_per_context(self, mock_class_action, mock_action,
+                               mock_batch):
+        other_context = context.RequestContext('fake-user', 'fake-project')
+        mock_class_action.return_value = 'single'
+        mock_batch.return_value = [{'result': 'batched'}] * 2
+        self.assertEqual(['batched', 'single', 'batched'],
+                         self._spawn_calls([self.context, other_context,
+                                            self.context]))
+        mock_class_action.assert_called_once_with(
+            other_context, objname='Instance', objmethod='get',
+            objver='1.0', args=[], kwargs={})
+        self.assertEqual(1, mock_batch.call_count)
+        self.assertEqual(self.context, mock_batch.call_args[0][0])
+        self.assertFalse(mock_action.called)
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    def test_batch_size(self, mock_batch):
+        self.flags(object_batch_window=10, object_batch_size=2,
+                   group='conductor')
+        mock_batch.return_value = [{'result': 'batched'}] * 2
+        self.assertEqual(['batched'] * 4,
+                         self._spawn_calls([self.context] * 4))
+        self.assertEqual(2, mock_batch.call_count)
+
+    def _spawn_batched_calls(self, count):
+        def _call():
+            with batching.batched():
+                return self.api.object_class_action(self.context, 'Instance',
+                                                    'get', '1.0', [], {})
+
+        threads = [eventlet.spawn(_call) for i in range(count)]
+        return [thread.wait() for thread in threads]
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    def test_batched(self, mock_batch):
+        self.flags(object_batch_window=0, group='conductor')
+        self.stubs.Set(objects_base.NovaObject, 'indirection_api', self.api)
+        mock_batch.return_value = [{'result': 'batched'}] * 3
+        self.assertEqual(['batched'] * 3, self._spawn_batched_calls(3))
+        self.assertEqual(1, mock_batch.call_count)
+        self.assertFalse(self.api._batching())
+
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_batch')
+    @mock.patch.object(conductor_rpcapi.ConductorAPI, 'object_class_action')
+    def test_batched_current_greenthread(self, mock_class_action,
+                                         mock_batch):
+        # The greenthreads spawned in the block don't batch their calls.
+        self.flags(object_batch_window=0, group='conductor')
+        self.stubs.Set(objects_base.NovaObject, 'indirection_api', self.api)
+        mock_class_action.return_value = 'single'
+        with batching.batched():
+            self.assertTrue(self.api._batching())
+            self.assertEqual(['single'] * 2,
+                             self._spawn_calls([self.context] * 2))
+        self.assertEqual(2, mock_class_action.call_count)
+        self.assertFalse(mock_batch.called)
+
+    def test_batched_other_api(self):
+        with batching.batched():
+            pass
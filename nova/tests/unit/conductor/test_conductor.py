@@ -467,6 +467,49 @@ class ConductorTestCase(_BaseTestCase, test.TestCase):
         self.assertIn('dict', updates)
         self.assertEqual({'foo': 'bar'}, updates['dict'])
 
+    def test_object_batch(self):
+        class TestObject(obj_base.NovaObject):
+            fields = {'dict': fields.DictOfStringsField()}
+
+            def touch_dict(self):
+                self.dict['foo'] = 'bar'
+
+            @classmethod
+            def get(cls, context, missing=False):
+                if missing:
+                    raise exc.InstanceNotFound(instance_id='fake-uuid')
+                return cls(dict={})
+
+        obj = TestObject(dict={})
+        obj.obj_reset_changes()
+        results = self.conductor.object_batch(self.context, [
+            {'method': 'object_action',
+             'kwargs': {'objinst': obj, 'objmethod': 'touch_dict',
+                        'args': [], 'kwargs': {}}},
+            {'method': 'object_class_action',
+             'kwargs': {'objname': TestObject.obj_name(), 'objmethod': 'get',
+                        'objver': '1.0', 'args': [], 'kwargs': {}}},
+            {'method': 'object_class_action',
+             'kwargs': {'objname': TestObject.obj_name(), 'objmethod': 'get',
+                        'objver': '1.0', 'args': [],
+                        'kwargs': {'missing': True}}},
+            {'method': 'object_backport',
+             'kwargs': {'objinst': obj, 'target_version': '1.0'}},
+        ])
+        self.assertEqual(4, len(results))
+        updates, result = results[0]['result']
+        self.assertEqual({'foo': 'bar'}, updates['dict'])
+        self.assertIsNone(result)
+        self.assertEqual('TestObject',
+                         results[1]['result']['nova_object.name'])
+        self.assertEqual({'module': 'nova.exception',
+                          'class': 'InstanceNotFound',
+                          'message': 'Instance fake-uuid could not be found.',
+                          'kwargs': {'instance_id': 'fake-uuid',
+                                     'code': 404}},
+                         results[2]['error'])
+        self.assertEqual('ObjectActionError', results[3]['error']['class'])
+
     def _test_expected_exceptions(self, db_method, conductor_method, errors,
                                   *args, **kwargs):
         # Tests that expected exceptions are handled properly.
@@ -777,6 +820,69 @@ class ConductorRPCAPITestCase(_BaseTestCase, test.TestCase):
         self.conductor_manager = self.conductor_service.manager
         self.conductor = conductor_rpcapi.ConductorAPI()
 
+    def _test_object_action_compact(self, is_classmethod):
+        class TestObject(obj_base.NovaObject):
+            fields = {'dict': fields.DictOfStringsField()}
+
+            def touch_dict(self):
+                self.dict['foo'] = 'bar'
+                return self
+
+            @classmethod
+            def get(cls, context):
+                return cls(dict={'foo': 'bar'})
+
+        self.flags(compact_object_encoding=True)
+        with mock.patch.object(obj_base, 'obj_from_compact_primitive',
+                               wraps=obj_base.obj_from_compact_primitive
+                               ) as mock_decode:
+            if is_classmethod:
+                result = self.conductor.object_class_action(
+                    self.context, TestObject.obj_name(), 'get', '1.0', [], {})
+            else:
+                obj = TestObject(dict={})
+                obj.obj_reset_changes()
+                updates, result = self.conductor.object_action(
+                    self.context, obj, 'touch_dict', [], {})
+                self.assertEqual({'foo': 'bar'}, updates['dict'])
+            # The request, if it holds an object, and the reply
+            self.assertEqual(1 if is_classmethod else 2,
+                             mock_decode.call_count)
+        self.assertIsInstance(result, TestObject)
+        self.assertEqual({'foo': 'bar'}, result.dict)
+
+    def test_object_action_compact(self):
+        self._test_object_action_compact(False)
+
+    def test_object_class_action_compact(self):
+        self._test_object_action_compact(True)
+
+    def test_object_batch(self):
+        class TestObject(obj_base.NovaObject):
+            fields = {'dict': fields.DictOfStringsField()}
+
+            @classmethod
+            def get(cls, context):
+                return cls(dict={'foo': 'bar'})
+
+        results = self.conductor.object_batch(self.context, [
+            {'method': 'object_class_action',
+             'kwargs': {'objname': TestObject.obj_name(), 'objmethod': 'get',
+                        'objver': '1.0', 'args': [], 'kwargs': {}}}] * 2)
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertIsInstance(result['result'], TestObject)
+            self.assertEqual({'foo': 'bar'}, result['result'].dict)
+
+    def test_object_action_compact_version_cap(self):
+        self.flags(compact_object_encoding=True)
+        self.flags(conductor='2.1', group='upgrade_levels')
+        self.conductor = conductor_rpcapi.ConductorAPI()
+        self.assertFalse(self.conductor.serializer.use_compact_encoding())
+        self.flags(conductor='2.2', group='upgrade_levels')
+        self.conductor = conductor_rpcapi.ConductorAPI()
+        self.assertTrue(self.conductor.serializer.use_compact_encoding())
+
 
 class ConductorAPITestCase(_BaseTestCase, test.TestCase):
     """Conductor API Tests."""
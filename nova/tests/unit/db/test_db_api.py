@@ -463,6 +463,179 @@ class UnsupportedDbRegexpTestCase(DbTestCase):
                     marker = insts[-1]['uuid']
                     self.assertEqual(correct[-1]['uuid'], marker)
 
+    def test_instance_get_all_by_filters_sort_paginate_desc(self,
+            mock_get_regexp):
+        test1 = self.create_instance_with_args(display_name='test1')
+        test2 = self.create_instance_with_args(display_name='test2')
+        test2_2 = self.create_instance_with_args(display_name='test2')
+        self.create_instance_with_args(display_name='test3')
+        filters = {'display_name': '%test%'}
+        sort_keys = ['display_name', 'id']
+        sort_dirs = ['desc', 'desc']
+
+        self._assert_equals_inst_order([test2, test1], filters,
+                                       sort_keys=sort_keys,
+                                       sort_dirs=sort_dirs,
+                                       marker=test2_2['uuid'])
+        self._assert_equals_inst_order([test2_2, test2], filters,
+                                       sort_keys=sort_keys,
+                                       sort_dirs=['asc', 'desc'],
+                                       limit=2, marker=test1['uuid'])
+
+    @mock.patch.object(sqlalchemy_api, '_instance_get_by_uuid')
+    def test_instance_get_all_by_filters_sort_marker_columns(self,
+            mock_get_by_uuid, mock_get_regexp):
+        # The marker only needs its sort keys when they are all columns
+        test1 = self.create_instance_with_args(display_name='test1')
+        test2 = self.create_instance_with_args(display_name='test2')
+
+        self._assert_equals_inst_order([test2], {},
+                                       sort_keys=['display_name'],
+                                       sort_dirs=['asc'],
+                                       marker=test1['uuid'])
+        self.assertFalse(mock_get_by_uuid.called)
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, {},
+                          marker=str(stdlib_uuid.uuid4()))
+
+    def _assert_paginate_by_nullable_key(self, sort_dir):
+        insts = [self.create_instance_with_args(display_name=display_name)
+                 for display_name in (None, 'test1', None, 'test2', 'test1',
+                                      None)]
+        sort_keys = ['display_name', 'id']
+        sort_dirs = [sort_dir, sort_dir]
+
+        def get_page(marker):
+            return [inst['uuid'] for inst in
+                    db.instance_get_all_by_filters_sort(
+                        self.context, {}, marker=marker,
+                        sort_keys=sort_keys, sort_dirs=sort_dirs)]
+
+        # The bound on the first sort key never changes the page
+        for inst in insts:
+            if inst['display_name'] is None:
+                continue
+            page = get_page(inst['uuid'])
+            with mock.patch.object(sqlalchemy_api, '_instance_keyset_bound',
+                                   side_effect=lambda query, *args: query):
+                self.assertEqual(get_page(inst['uuid']), page)
+
+        # The rows with a NULL first sort key are kept
+        query = sqlalchemy_api.model_query(self.context, models.Instance)
+        marker = sqlalchemy_api._instance_get_pagination_marker(
+            self.context, insts[1]['uuid'], sort_keys, query.session)
+        bounded = sqlalchemy_api._instance_keyset_bound(
+            query, sort_keys, sort_dirs, marker)
+        names = [inst['display_name'] for inst in bounded]
+        self.assertEqual(3, names.count(None))
+
+        # Nothing is bounded by a NULL value
+        marker = sqlalchemy_api._instance_get_pagination_marker(
+            self.context, insts[0]['uuid'], sort_keys, query.session)
+        self.assertIs(query, sqlalchemy_api._instance_keyset_bound(
+            query, sort_keys, sort_dirs, marker))
+
+    def test_instance_get_all_by_filters_sort_paginate_nullable_asc(self,
+            mock_get_regexp):
+        self._assert_paginate_by_nullable_key('asc')
+
+    def test_instance_get_all_by_filters_sort_paginate_nullable_desc(self,
+            mock_get_regexp):
+        self._assert_paginate_by_nullable_key('desc')
+
+    def test_instance_get_all_by_filters_sort_marker_other_project(self,
+            mock_get_regexp):
+        # The marker must be an instance the context can see
+        other_context = context.RequestContext('other', 'other')
+        other = self.create_instance_with_args(context=other_context,
+                                               display_name='test1')
+        test2 = self.create_instance_with_args(display_name='test2')
+
+        self.assertRaises(exception.MarkerNotFound,
+                          db.instance_get_all_by_filters_sort,
+                          self.context, {}, sort_keys=['display_name'],
+                          sort_dirs=['asc'], marker=other['uuid'])
+        result = db.instance_get_all_by_filters_sort(
+            self.context.elevated(), {}, sort_keys=['display_name'],
+            sort_dirs=['asc'], marker=other['uuid'])
+        self.assertEqual([test2['uuid']], [inst['uuid'] for inst in result])
+
+
+class ReplicaReadRouterTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ReplicaReadRouterTestCase, self).setUp()
+        self.router = sqlalchemy_api._ReplicaReadRouter()
+        self.flags(slave_connection='sqlite://', group='database')
+
+    def test_use_slave_requested(self):
+        self.assertTrue(self.router.use_slave('foo', True, False))
+        self.assertFalse(self.router.use_slave('foo', False, True))
+        self.assertFalse(self.router.use_slave('foo', None, False))
+        self.assertEqual({'primary': 2, 'replica': 1},
+                         self.router.counts['foo'])
+
+    def test_use_slave_eligible(self):
+        self.flags(db_replica_read_policy='eligible')
+        self.assertTrue(self.router.use_slave('foo', False, True))
+        self.assertFalse(self.router.use_slave('foo', False, False))
+
+    def test_use_slave_no_slave_connection(self):
+        self.flags(slave_connection=None, group='database')
+        self.assertFalse(self.router.use_slave('foo', True, False))
+        self.assertEqual({'primary': 1, 'replica': 0},
+                         self.router.counts['foo'])
+
+    @mock.patch.object(sqlalchemy_api._ReplicaReadRouter, 'replica_lag')
+    def test_use_slave_lag(self, mock_lag):
+        self.assertTrue(self.router.use_slave('foo', True, False))
+        self.assertFalse(mock_lag.called)
+
+        self.flags(db_replica_max_lag=30)
+        mock_lag.return_value = 30
+        self.assertTrue(self.router.use_slave('foo', True, False))
+        mock_lag.return_value = 31
+        self.assertFalse(self.router.use_slave('foo', True, False))
+        mock_lag.return_value = None
+        self.assertFalse(self.router.use_slave('foo', True, False))
+
+    @mock.patch.object(sqlalchemy_api._ReplicaReadRouter, '_last_heartbeat')
+    @mock.patch('time.time')
+    def test_replica_lag(self, mock_time, mock_heartbeat):
+        now = datetime.datetime(2015, 1, 1, 12, 0, 0)
+        heartbeats = {False: now,
+                      True: now - datetime.timedelta(seconds=5)}
+        mock_heartbeat.side_effect = lambda use_slave: heartbeats[use_slave]
+        mock_time.return_value = 1000
+        self.assertEqual(5, self.router.replica_lag())
+
+        # The lag is only estimated again after the check interval
+        heartbeats[True] = now
+        mock_time.return_value = 1009
+        self.assertEqual(5, self.router.replica_lag())
+        mock_time.return_value = 1010
+        self.assertEqual(0, self.router.replica_lag())
+
+    @mock.patch.object(sqlalchemy_api._ReplicaReadRouter, '_last_heartbeat',
+                       side_effect=db_exc.DBError)
+    def test_replica_lag_error(self, mock_heartbeat):
+        self.assertIsNone(self.router.replica_lag())
+
+    @mock.patch.object(sqlalchemy_api, '_REPLICA_READ_ROUTER')
+    def test_replica_read(self, mock_router):
+        @sqlalchemy_api._replica_read(eligible=True)
+        def fake_read(context, uuid, use_slave=False):
+            return use_slave
+
+        mock_router.use_slave.return_value = 'routed'
+        self.assertEqual('routed', fake_read('ctxt', 'uuid'))
+        mock_router.use_slave.assert_called_once_with('fake_read', None,
+                                                      True)
+        mock_router.use_slave.reset_mock()
+        self.assertEqual('routed', fake_read('ctxt', 'uuid', True))
+        mock_router.use_slave.assert_called_once_with('fake_read', True,
+                                                      True)
+
 
 class ModelQueryTestCase(DbTestCase):
     def test_model_query_invalid_arguments(self):
@@ -2381,6 +2554,27 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertEqual('bar', result[0]['system_metadata'][0]['value'])
         self.assertEqual(instance['uuid'], result[0]['extra']['instance_uuid'])
 
+    @mock.patch.object(sqlalchemy_api, '_MAX_IN_VALUES', 1)
+    def test_instance_get_all_by_filters_manual_joins_chunks(self):
+        instances = [self.create_instance_with_args(metadata={'foo': 'bar'})
+                     for i in range(3)]
+        for instance in instances:
+            db.instance_tag_set(self.ctxt, instance['uuid'],
+                                [instance['uuid']])
+        db.instance_destroy(self.ctxt, instances[2]['uuid'])
+        result = db.instance_get_all_by_filters(
+            self.ctxt, {}, columns_to_join=['metadata', 'tags'])
+        self.assertEqual(3, len(result))
+        for inst in result:
+            if inst['uuid'] == instances[2]['uuid']:
+                # Like the tags relationship, deleted instances have no tags
+                self.assertEqual([], inst['tags'])
+                continue
+            self.assertEqual({'foo': 'bar'},
+                             utils.metadata_to_dict(inst['metadata']))
+            self.assertEqual([inst['uuid']],
+                             [tag['tag'] for tag in inst['tags']])
+
     @mock.patch('nova.db.sqlalchemy.api._instances_fill_metadata')
     @mock.patch('nova.db.sqlalchemy.api._instance_get_all_query')
     def test_instance_get_all_by_host_and_node_fills_manually(self,
@@ -2388,10 +2582,11 @@ class InstanceTestCase(test.TestCase, ModelsObjectComparatorMixin):
                                                               mock_fill):
         db.instance_get_all_by_host_and_node(
             self.ctxt, 'h1', 'n1',
-            columns_to_join=['metadata', 'system_metadata', 'extra', 'foo'])
+            columns_to_join=['metadata', 'system_metadata', 'extra', 'foo',
+                             'tags'])
         self.assertEqual(sorted(['extra', 'foo']),
                          sorted(mock_getall.call_args[1]['joins']))
-        self.assertEqual(sorted(['metadata', 'system_metadata']),
+        self.assertEqual(sorted(['metadata', 'system_metadata', 'tags']),
                          sorted(mock_fill.call_args[1]['manual_joins']))
 
     def test_instance_get_all_hung_in_rebooting(self):
@@ -2815,6 +3010,26 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for key, value in new_values.iteritems():
             self.assertEqual(value, updated_service[key])
 
+    def test_service_update_heartbeats(self):
+        service1 = self._create_service({})
+        service2 = self._create_service({'host': 'fake_host2'})
+        service3 = self._create_service({'host': 'fake_host3'})
+        heartbeat1 = datetime.datetime(2015, 6, 1, 12, 0, 0)
+        heartbeat2 = datetime.datetime(2015, 6, 1, 12, 0, 5)
+        self.assertEqual(0, db.service_update_heartbeats(self.ctxt, {}))
+        self.assertEqual(2, db.service_update_heartbeats(
+            self.ctxt, {service1['id']: (1, heartbeat1),
+                        service2['id']: (2, heartbeat2)}))
+        service1 = db.service_get(self.ctxt, service1['id'])
+        self.assertEqual(4, service1['report_count'])
+        self.assertEqual(heartbeat1, service1['updated_at'])
+        service2 = db.service_get(self.ctxt, service2['id'])
+        self.assertEqual(5, service2['report_count'])
+        self.assertEqual(heartbeat2, service2['updated_at'])
+        service3 = db.service_get(self.ctxt, service3['id'])
+        self.assertEqual(3, service3['report_count'])
+        self.assertIsNone(service3['updated_at'])
+
     def test_service_update_not_found_exception(self):
         self.assertRaises(exception.ServiceNotFound,
                           db.service_update, self.ctxt, 100500, {})
@@ -2895,6 +3110,28 @@ class ServiceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         real = db.service_get_all_by_binary(self.ctxt, 'b1')
         self._assertEqualListsOfObjects(expected, real)
 
+    def test_service_get_all_by_binary_changed_since(self):
+        self.useFixture(test.TimeOverride())
+        then = datetime.datetime(2015, 6, 1, 10, 0, 0)
+        timeutils.set_time_override(then)
+        self._create_service({'host': 'host0', 'binary': 'b1'})
+        now = then + datetime.timedelta(seconds=60)
+        timeutils.set_time_override(now)
+        values = [
+            {'host': 'host1', 'binary': 'b1'},
+            {'host': 'host2', 'binary': 'b1', 'disabled': True},
+            {'host': 'host3', 'binary': 'b1'},
+            {'host': 'host4', 'binary': 'b2'}
+        ]
+        services = [self._create_service(vals) for vals in values]
+        db.service_destroy(self.ctxt, services[2]['id'])
+        real = db.service_get_all_by_binary_changed_since(self.ctxt, 'b1',
+                                                          now)
+        self.assertEqual(set(['host1', 'host2', 'host3']),
+                         set(service['host'] for service in real))
+        deleted = [service for service in real if service['deleted']]
+        self.assertEqual(['host3'], [service['host'] for service in deleted])
+
     def test_service_get_all_by_host(self):
         values = [
             {'host': 'host1', 'topic': 't11', 'binary': 'b11'},
@@ -3347,6 +3584,30 @@ class InstanceFaultTestCase(test.TestCase, ModelsObjectComparatorMixin):
         for uuid in uuids:
             self._assertEqualListsOfObjects(expected[uuid], faults[uuid])
 
+    @mock.patch.object(sqlalchemy_api, '_MAX_IN_VALUES', 1)
+    def test_instance_fault_get_latest_by_instance(self):
+        """Ensure we can retrieve only latest faults for instance."""
+        uuids = [str(stdlib_uuid.uuid4()), str(stdlib_uuid.uuid4())]
+        fault_codes = [404, 500]
+        expected = {}
+
+        # Create faults
+        for uuid in uuids:
+            db.instance_create(self.ctxt, {'uuid': uuid})
+
+            expected[uuid] = []
+            for code in fault_codes:
+                fault_values = self._create_fault_values(uuid, code)
+                fault = db.instance_fault_create(self.ctxt, fault_values)
+            expected[uuid].append(fault)
+
+        # Ensure only the latest fault of each instance is returned
+        faults = db.instance_fault_get_by_instance_uuids(self.ctxt, uuids,
+                                                         latest=True)
+        self.assertEqual(len(expected), len(faults))
+        for uuid in uuids:
+            self._assertEqualListsOfObjects(expected[uuid], faults[uuid])
+
     def test_instance_faults_get_by_instance_uuids_no_faults(self):
         uuid = str(stdlib_uuid.uuid4())
         # None should be returned when no faults exist.
@@ -6174,6 +6435,17 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self.assertRaises(exception.ProjectQuotaNotFound,
             db.quota_update, self.ctxt, 'project1', 'resource1', 42)
 
+    @mock.patch.object(quota, 'invalidate_limits_cache')
+    def test_quota_writes_invalidate_limits_cache(self, mock_invalidate):
+        db.quota_create(self.ctxt, 'project1', 'resource1', 41)
+        db.quota_update(self.ctxt, 'project1', 'resource1', 42)
+        db.quota_class_create(self.ctxt, 'class1', 'resource1', 41)
+        db.quota_class_update(self.ctxt, 'class1', 'resource1', 42)
+        db.quota_destroy_all_by_project_and_user(self.ctxt, 'project1',
+                                                 'user1')
+        db.quota_destroy_all_by_project(self.ctxt, 'project1')
+        self.assertEqual(6, mock_invalidate.call_count)
+
     def test_quota_get_nonexistent(self):
         self.assertRaises(exception.ProjectQuotaNotFound,
             db.quota_get, self.ctxt, 'project1', 'resource1')
@@ -6317,6 +6589,145 @@ class QuotaTestCase(test.TestCase, ModelsObjectComparatorMixin):
                           'project1', 'resource1', 42)
 
 
+class QuotaReserveOptimisticTestCase(test.TestCase):
+    """Tests for db.api.quota_reserve_optimistic()."""
+
+    def setUp(self):
+        super(QuotaReserveOptimisticTestCase, self).setUp()
+        self.ctxt = context.get_admin_context()
+        self.expire = timeutils.utcnow() + datetime.timedelta(days=1)
+        self.quotas = {'instances': 4, 'cores': 8, 'fixed_ips': 2}
+        self.resources = {}
+        sync_functions = {}
+        for resource in self.quotas:
+            sync_name = '_sync_%s' % resource
+            self.resources[resource] = quota.ReservableResource(
+                resource, sync_name, 'quota_%s' % resource)
+            sync_functions[sync_name] = self._get_sync(resource)
+        patcher = mock.patch.dict(sqlalchemy_api.QUOTA_SYNC_FUNCTIONS,
+                                  sync_functions)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _get_sync(resource):
+        def sync(elevated, project_id, user_id, session):
+            return {resource: 0}
+        return sync
+
+    def _reserve(self, deltas, user_id='user1', user_quotas=None):
+        return db.quota_reserve_optimistic(self.ctxt, self.resources,
+                                           self.quotas,
+                                           user_quotas or self.quotas,
+                                           deltas, self.expire, 0, 0,
+                                           'project1', user_id)
+
+    def _create_usages(self, user_id='user1'):
+        self._reserve(dict.fromkeys(self.quotas, 0), user_id=user_id)
+
+    def _get_usages(self, user_id='user1'):
+        return db.quota_usage_get_all_by_project_and_user(self.ctxt,
+                                                          'project1', user_id)
+
+    def _count_reservations(self):
+        return sqlalchemy_api.model_query(self.ctxt, models.Reservation,
+                                          read_deleted="no").count()
+
+    def test_reserve_creates_usages_locked(self):
+        with mock.patch.object(sqlalchemy_api, 'quota_reserve',
+                               wraps=sqlalchemy_api.quota_reserve) as reserve:
+            reservations = self._reserve({'instances': 1, 'cores': 2})
+        self.assertTrue(reserve.called)
+        self.assertEqual(2, len(reservations))
+        usages = self._get_usages()
+        self.assertEqual({'in_use': 0, 'reserved': 1}, usages['instances'])
+        self.assertEqual({'in_use': 0, 'reserved': 2}, usages['cores'])
+
+    def test_reserve(self):
+        self._create_usages()
+        with mock.patch.object(sqlalchemy_api, 'quota_reserve') as reserve:
+            reservations = self._reserve({'instances': 2, 'cores': 4,
+                                          'fixed_ips': -1})
+        self.assertFalse(reserve.called)
+        usages = self._get_usages()
+        self.assertEqual({'in_use': 0, 'reserved': 2}, usages['instances'])
+        self.assertEqual({'in_use': 0, 'reserved': 4}, usages['cores'])
+        self.assertEqual({'in_use': 0, 'reserved': 0}, usages['fixed_ips'])
+        self.assertEqual(3, len(reservations))
+        for reservation_uuid in reservations:
+            reservation = _reservation_get(self.ctxt, reservation_uuid)
+            self.assertEqual('user1', reservation.user_id)
+            self.assertEqual(self.expire, reservation.expire)
+            self.assertEqual({'instances': 2, 'cores': 4, 'fixed_ips': -1}[
+                             reservation.resource], reservation.delta)
+
+    def test_reserve_commit(self):
+        self._create_usages()
+        reservations = self._reserve({'instances': 2, 'cores': 4})
+        db.reservation_commit(self.ctxt, reservations, 'project1', 'user1')
+        usages = self._get_usages()
+        self.assertEqual({'in_use': 2, 'reserved': 0}, usages['instances'])
+        self.assertEqual({'in_use': 4, 'reserved': 0}, usages['cores'])
+
+    def test_reserve_over_user_quota(self):
+        self._create_usages()
+        self._reserve({'instances': 1})
+        user_quotas = dict(self.quotas, instances=2)
+        count = self._count_reservations()
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                {'instances': 2, 'cores': 1},
+                                user_quotas=user_quotas)
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        usages = self._get_usages()
+        self.assertEqual({'in_use': 0, 'reserved': 1}, usages['instances'])
+        self.assertEqual({'in_use': 0, 'reserved': 0}, usages['cores'])
+        self.assertEqual(count, self._count_reservations())
+
+    def test_reserve_over_project_quota(self):
+        self._create_usages('user2')
+        self._reserve({'instances': 3}, user_id='user2')
+        self._create_usages()
+        count = self._count_reservations()
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                {'instances': 2, 'cores': 1})
+        self.assertEqual(['instances'], exc.kwargs['overs'])
+        usages = self._get_usages()
+        self.assertEqual({'in_use': 0, 'reserved': 0}, usages['instances'])
+        self.assertEqual({'in_use': 0, 'reserved': 0}, usages['cores'])
+        self.assertEqual(count, self._count_reservations())
+
+    def test_reserve_over_project_quota_per_project_resource(self):
+        self._create_usages('user2')
+        self._reserve({'fixed_ips': 2}, user_id='user2')
+        self._create_usages()
+        user_quotas = dict(self.quotas, fixed_ips=10)
+        exc = self.assertRaises(exception.OverQuota, self._reserve,
+                                {'fixed_ips': 1}, user_quotas=user_quotas)
+        self.assertEqual(['fixed_ips'], exc.kwargs['overs'])
+        self.assertEqual({'in_use': 0, 'reserved': 2},
+                         self._get_usages()['fixed_ips'])
+
+    def test_reserve_unlimited(self):
+        self._create_usages()
+        user_quotas = dict(self.quotas, instances=-1)
+        self._reserve({'instances': 10}, user_quotas=user_quotas)
+        self.assertEqual({'in_use': 0, 'reserved': 10},
+                         self._get_usages()['instances'])
+
+    def test_reserve_refresh_pending(self):
+        self._create_usages()
+        db.quota_usage_update(self.ctxt, 'project1', 'user1', 'instances',
+                              until_refresh=5)
+        with mock.patch.object(sqlalchemy_api, 'quota_reserve',
+                               wraps=sqlalchemy_api.quota_reserve) as reserve:
+            self._reserve({'instances': 1})
+        self.assertTrue(reserve.called)
+        usage = db.quota_usage_get(self.ctxt, 'project1', 'instances',
+                                   'user1')
+        self.assertEqual(4, usage.until_refresh)
+        self.assertEqual(1, usage.reserved)
+
+
 class QuotaReserveNoDbTestCase(test.NoDBTestCase):
     """Tests quota reserve/refresh operations using mock."""
 
@@ -6593,6 +7004,27 @@ class ComputeNodeTestCase(test.TestCase, ModelsObjectComparatorMixin):
         new_stats = jsonutils.loads(node['stats'])
         self.assertEqual(self.stats, new_stats)
 
+    def test_compute_node_get_all_changed_since(self):
+        self.useFixture(test.TimeOverride())
+        now = timeutils.utcnow() + datetime.timedelta(seconds=60)
+        timeutils.set_time_override(now)
+        self.assertEqual([], db.compute_node_get_all_changed_since(self.ctxt,
+                                                                   now))
+
+        compute_node_data = self.compute_node_dict.copy()
+        compute_node_data['hypervisor_hostname'] = 'node2'
+        node2 = db.compute_node_create(self.ctxt, compute_node_data)
+        compute_node_data['hypervisor_hostname'] = 'node3'
+        node3 = db.compute_node_create(self.ctxt, compute_node_data)
+        db.compute_node_delete(self.ctxt, node3['id'])
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, now)
+        self.assertEqual(set([node2['id'], node3['id']]),
+                         set(node['id'] for node in nodes))
+
+        db.compute_node_update(self.ctxt, self.item['id'], {'vcpus_used': 1})
+        nodes = db.compute_node_get_all_changed_since(self.ctxt, now)
+        self.assertEqual(3, len(nodes))
+
     def test_compute_node_get_all_deleted_compute_node(self):
         # Create a service and compute node and ensure we can find its stats;
         # delete the service and compute node when done and loop again
@@ -7971,6 +8403,67 @@ class ArchiveTestCase(test.TestCase):
             'shadow_consoles'
         )
 
+    def _enable_sqlite_foreign_keys(self):
+        dialect = self.engine.url.get_dialect()
+        if dialect == sqlite.dialect:
+            import sqlite3
+            tup = sqlite3.sqlite_version_info
+            if tup[0] < 3 or (tup[0] == 3 and tup[1] < 7):
+                self.skipTest(
+                    'sqlite version too old for reliable SQLA foreign_keys')
+            self.conn.execute("PRAGMA foreign_keys = ON")
+
+    def test_archive_deleted_rows_fk_order(self):
+        self._enable_sqlite_foreign_keys()
+        ins_stmt = self.console_pools.insert().values(deleted=1)
+        result = self.conn.execute(ins_stmt)
+        pool_id = result.inserted_primary_key[0]
+        ins_stmt = self.consoles.insert().values(deleted=1, pool_id=pool_id)
+        self.conn.execute(ins_stmt)
+        # The consoles are archived before the pools they reference.
+        self.assertEqual({'consoles': 1, 'console_pools': 1},
+                         db.archive_deleted_rows(self.context))
+        self._assert_shadow_tables_empty_except(
+            'shadow_console_pools',
+            'shadow_consoles'
+        )
+
+    def test_archive_deleted_rows_for_table_skips_fk_batch(self):
+        self._enable_sqlite_foreign_keys()
+        pool_ids = []
+        for _ in range(2):
+            ins_stmt = self.console_pools.insert().values(deleted=1)
+            result = self.conn.execute(ins_stmt)
+            pool_ids.append(result.inserted_primary_key[0])
+        ins_stmt = self.consoles.insert().values(pool_id=pool_ids[0])
+        self.conn.execute(ins_stmt)
+        # Only the batch of the pool still used by a console fails.
+        num = db.archive_deleted_rows_for_table(self.context,
+                                                "console_pools",
+                                                batch_size=1)
+        self.assertEqual(1, num)
+        rows = self.conn.execute(
+            sql.select([self.shadow_console_pools.c.id])).fetchall()
+        self.assertEqual([(pool_ids[1],)], rows)
+
+    def test_archive_deleted_rows_for_table_batches(self):
+        for uuidstr in self.uuidstrs:
+            ins_stmt = self.instance_id_mappings.insert().values(
+                uuid=uuidstr, deleted=1)
+            self.conn.execute(ins_stmt)
+        with mock.patch.object(sqlalchemy_api.LOG, 'warning') as mock_warn:
+            num = db.archive_deleted_rows_for_table(
+                self.context, "instance_id_mappings", max_rows=5,
+                batch_size=2)
+            self.assertEqual(5, num)
+            num = db.archive_deleted_rows_for_table(
+                self.context, "instance_id_mappings", batch_size=2)
+            self.assertEqual(1, num)
+        self.assertFalse(mock_warn.called)
+        rows = self.conn.execute(
+            sql.select([self.shadow_instance_id_mappings])).fetchall()
+        self.assertEqual(6, len(rows))
+
     def test_archive_deleted_rows_2_tables(self):
         # Add 6 rows to each table
         for uuidstr in self.uuidstrs:
@@ -693,6 +693,14 @@ class NovaMigrationsCheckers(test_migrations.ModelsMigrationsSync,
         self.assertIsNone(fake_migration.migration_type)
         self.assertFalse(fake_migration.hidden)
 
+    def _check_294(self, engine, data):
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_deleted_created_at_idx',
+                                ['deleted', 'created_at'])
+        self.assertIndexMembers(engine, 'instances',
+                                'instances_deleted_display_name_idx',
+                                ['deleted', 'display_name'])
+
 
 class TestNovaMigrationsSQLite(NovaMigrationsCheckers,
                                test_base.DbTestCase,
@@ -0,0 +1,129 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import sqlalchemy
+
+from nova import context
+from nova.db import profiler
+from nova.db.sqlalchemy import api as sqlalchemy_api
+from nova import test
+
+
+class ProfilerTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(ProfilerTestCase, self).setUp()
+        self.flags(db_profiler_enabled=True,
+                   db_profiler_statement_threshold=10,
+                   db_profiler_time_threshold=1.0,
+                   db_profiler_repeat_threshold=3)
+        self.context = context.RequestContext('fake-user', 'fake-project',
+                                              request_id='req-1')
+
+    def test_statement_shape(self):
+        self.assertEqual(
+            'SELECT a FROM t WHERE t.id IN (...) AND t.b = ?',
+            profiler.statement_shape('SELECT a\n  FROM t WHERE t.id IN '
+                                     '(?, ?, ?) AND t.b = ?'))
+        self.assertEqual(
+            'INSERT INTO t (a, b) VALUES (...)',
+            profiler.statement_shape('INSERT INTO t (a, b) VALUES '
+                                     '(%s, %s), (%s, %s)'))
+        self.assertEqual(
+            'SELECT a FROM t WHERE t.id IN (...)',
+            profiler.statement_shape('SELECT a FROM t WHERE t.id IN '
+                                     '(%(id_1)s, %(id_2)s)'))
+
+    def test_record_not_profiled(self):
+        profiler.record('SELECT 1', 0.1)
+        self.assertEqual({}, profiler._PROFILES)
+
+    @mock.patch.object(profiler.LOG, 'warning')
+    def test_profile(self, mock_warning):
+        with profiler.profile(self.context, 'GET Controller.index'):
+            request_profile = profiler._PROFILES['req-1']
+            profiler.record('SELECT a FROM t WHERE t.id = ?', 0.1)
+            profiler.record('SELECT b FROM u', 0.2)
+            # Statements of other requests aren't counted
+            context.RequestContext('fake-user', 'fake-project',
+                                   request_id='req-2')
+            profiler.record('SELECT c FROM v', 0.1)
+            self.context.update_store()
+        self.assertEqual({}, profiler._PROFILES)
+        self.assertEqual(2, request_profile.statements)
+        self.assertAlmostEqual(0.3, request_profile.seconds)
+        self.assertEqual([], request_profile.repeated())
+        self.assertFalse(mock_warning.called)
+
+    @mock.patch.object(profiler.LOG, 'warning')
+    def test_profile_repeated(self, mock_warning):
+        with profiler.profile(self.context, 'GET Controller.index'):
+            request_profile = profiler._PROFILES['req-1']
+            profiler.record('SELECT b FROM u', 0.1)
+            for i in range(4):
+                profiler.record('SELECT a FROM t WHERE t.id = ?', 0.01)
+        self.assertEqual([('SELECT a FROM t WHERE t.id = ?', 4, 0.04)],
+                         request_profile.repeated())
+        self.assertEqual(1, mock_warning.call_count)
+        self.assertIn('4 times in 0.040 seconds: SELECT a FROM t WHERE '
+                      't.id = ?', mock_warning.call_args[0][1]['repeated'])
+
+    @mock.patch.object(profiler.LOG, 'warning')
+    def test_profile_thresholds(self, mock_warning):
+        with profiler.profile(self.context, 'GET Controller.index'):
+            profiler.record('SELECT a FROM t', 1.5)
+        with profiler.profile(self.context, 'GET Controller.index'):
+            for i in range(10):
+                profiler.record('SELECT a FROM t%d' % i, 0.01)
+        self.assertEqual(2, mock_warning.call_count)
+
+    @mock.patch.object(profiler.LOG, 'warning')
+    def test_profile_nested(self, mock_warning):
+        with profiler.profile(self.context, 'conductor.object_action'):
+            request_profile = profiler._PROFILES['req-1']
+            with profiler.profile(self.context, 'conductor.object_action'):
+                for i in range(3):
+                    profiler.record('SELECT a FROM t WHERE t.id = ?', 0.01)
+            self.assertFalse(mock_warning.called)
+            profiler.record('SELECT a FROM t WHERE t.id = ?', 0.01)
+        self.assertEqual(4, request_profile.statements)
+        self.assertEqual(1, mock_warning.call_count)
+
+    def test_profile_disabled(self):
+        self.flags(db_profiler_enabled=False)
+        with profiler.profile(self.context, 'GET Controller.index'):
+            self.assertEqual({}, profiler._PROFILES)
+
+    def test_profiled_endpoint(self):
+        class Endpoint(object):
+            target = 'target'
+
+            def method(self, context, arg):
+                profiler.record('SELECT a FROM t', 0.1)
+                return profiler._PROFILES['req-1'].name, arg
+
+        endpoint = profiler.ProfiledEndpoint(Endpoint(), 'conductor')
+        self.assertEqual('target', endpoint.target)
+        self.assertEqual(('conductor.method', 'arg'),
+                         endpoint.method(self.context, arg='arg'))
+        self.assertEqual({}, profiler._PROFILES)
+
+    def test_profile_engine(self):
+        engine = sqlalchemy.create_engine('sqlite://')
+        sqlalchemy_api._profile_engine(engine)
+        with profiler.profile(self.context, 'GET Controller.index'):
+            request_profile = profiler._PROFILES['req-1']
+            engine.execute('SELECT 1')
+            engine.execute('SELECT 2')
+        self.assertEqual(2, request_profile.statements)
+        self.assertEqual(['SELECT 1', 'SELECT 2'],
+                         sorted(request_profile.shapes))
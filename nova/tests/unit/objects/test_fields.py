@@ -349,7 +349,10 @@ class TestDateTime(TestField):
         self.coerce_good_values = [(self.dt, self.dt),
                                    (timeutils.isotime(self.dt), self.dt)]
         self.coerce_bad_values = [1, 'foo']
-        self.to_primitive_values = [(self.dt, timeutils.isotime(self.dt))]
+        dt_offset = datetime.datetime(
+            1955, 11, 5, tzinfo=iso8601.iso8601.FixedOffset(1, 0, '+01:00'))
+        self.to_primitive_values = [(self.dt, timeutils.isotime(self.dt)),
+                                    (dt_offset, timeutils.isotime(dt_offset))]
         self.from_primitive_values = [(timeutils.isotime(self.dt), self.dt)]
 
     def test_stringify(self):
@@ -158,7 +158,7 @@ class _TestInstanceObject(object):
             ).AndReturn(fake_instance)
         fake_faults = test_instance_fault.fake_faults
         db.instance_fault_get_by_instance_uuids(
-                self.context, [fake_instance['uuid']]
+                self.context, [fake_instance['uuid']], latest=True
                 ).AndReturn(fake_faults)
 
         self.mox.ReplayAll()
@@ -388,6 +388,19 @@ class _TestInstanceObject(object):
     def test_save_exp_task_state_api_cell_admin_reset(self):
         self._save_test_helper('api', {'admin_state_reset': True})
 
+    def test_obj_clone_snapshot(self):
+        inst = instance.Instance._from_db_object(
+            self.context, instance.Instance(), self.fake_instance,
+            expected_attrs=['system_metadata', 'info_cache'])
+        sys_meta = inst.system_metadata
+        info_cache = inst.info_cache
+        snapshot = inst.obj_clone()
+        sys_meta['a'] = '2'
+        info_cache.instance_uuid = 'x'
+        self.assertNotIn('a', snapshot.system_metadata)
+        self.assertEqual(self.fake_instance['uuid'],
+                         snapshot.info_cache.instance_uuid)
+
     def test_save_rename_sends_notification(self):
         # Tests that simply changing the 'display_name' on the instance
         # will send a notification.
@@ -770,7 +783,8 @@ class _TestInstanceObject(object):
                                 use_slave=False
                                 ).AndReturn(self.fake_instance)
         db.instance_fault_get_by_instance_uuids(
-            self.context, [fake_uuid]).AndReturn({fake_uuid: fake_faults})
+            self.context, [fake_uuid], latest=True
+            ).AndReturn({fake_uuid: fake_faults})
         self.mox.ReplayAll()
         inst = instance.Instance.get_by_uuid(self.context, fake_uuid,
                                              expected_attrs=['fault'])
@@ -1124,7 +1138,8 @@ class _TestInstanceObject(object):
         mock_get.return_value = {'fake': [fake_fault]}
         inst = instance.Instance(context=self.context, uuid='fake')
         fault = inst.fault
-        mock_get.assert_called_once_with(self.context, ['fake'])
+        mock_get.assert_called_once_with(self.context, ['fake'],
+                                         latest=True)
         self.assertEqual(fake_fault['id'], fault.id)
         self.assertNotIn('metadata', inst.obj_what_changed())
 
@@ -1573,7 +1588,7 @@ class _TestInstanceListObject(object):
                                     use_slave=False
                                     ).AndReturn(fake_insts)
         db.instance_fault_get_by_instance_uuids(
-            self.context, [x['uuid'] for x in fake_insts]
+            self.context, [x['uuid'] for x in fake_insts], latest=True
             ).AndReturn(fake_faults)
         self.mox.ReplayAll()
         instances = instance.InstanceList.get_by_host(self.context, 'host',
@@ -1608,6 +1623,7 @@ class _TestInstanceListObject(object):
 
         db.instance_fault_get_by_instance_uuids(self.context,
                                                 [x.uuid for x in insts],
+                                                latest=True
                                                 ).AndReturn(db_faults)
         self.mox.ReplayAll()
         inst_list = instance.InstanceList()
@@ -35,7 +35,8 @@ fake_faults = {
 class _TestInstanceFault(object):
     def test_get_latest_for_instance(self):
         self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
-        db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid']
+        db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid'],
+                                                latest=True
                                                 ).AndReturn(fake_faults)
         self.mox.ReplayAll()
         fault = instance_fault.InstanceFault.get_latest_for_instance(
@@ -45,7 +46,8 @@ class _TestInstanceFault(object):
 
     def test_get_latest_for_instance_with_none(self):
         self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
-        db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid']
+        db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid'],
+                                                latest=True
                                                 ).AndReturn({})
         self.mox.ReplayAll()
         fault = instance_fault.InstanceFault.get_latest_for_instance(
@@ -64,6 +66,19 @@ class _TestInstanceFault(object):
                 self.assertEqual(fake_faults['fake-uuid'][index][key],
                                  faults[index][key])
 
+    def test_get_latest_by_instance_uuids(self):
+        self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
+        db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid'],
+                                                latest=True
+                                                ).AndReturn(
+            {'fake-uuid': fake_faults['fake-uuid'][:1]})
+        self.mox.ReplayAll()
+        faults = instance_fault.InstanceFaultList.get_latest_by_instance_uuids(
+            self.context, ['fake-uuid'])
+        self.assertEqual(1, len(faults))
+        for key in fake_faults['fake-uuid'][0]:
+            self.assertEqual(fake_faults['fake-uuid'][0][key], faults[0][key])
+
     def test_get_by_instance_with_none(self):
         self.mox.StubOutWithMock(db, 'instance_fault_get_by_instance_uuids')
         db.instance_fault_get_by_instance_uuids(self.context, ['fake-uuid']
@@ -23,6 +23,7 @@ import pprint
 
 import mock
 from oslo_log import log
+from oslo_serialization import jsonutils
 from oslo_utils import timeutils
 import six
 from testtools import matchers
@@ -613,6 +614,17 @@ class _TestObject(object):
         bar.foo = 1
         self.assertEqual(set(['bar']), obj.obj_what_changed())
 
+    def test_changed_with_sub_object_in_untyped_field(self):
+        class ParentObject(base.NovaObject):
+            fields = {'foo': fields.IntegerField(),
+                      'bar': fields.Field(fields.FieldType()),
+                      }
+        obj = ParentObject(foo=1, bar=MyObj())
+        obj.obj_reset_changes()
+        self.assertEqual(set(), obj.obj_what_changed())
+        obj.bar.foo = 1
+        self.assertEqual(set(['bar']), obj.obj_what_changed())
+
     def test_static_result(self):
         obj = MyObj.query(self.context)
         self.assertEqual(obj.bar, 'bar')
@@ -659,6 +671,46 @@ class _TestObject(object):
         self.assertFalse(obj.obj_attr_is_set('bar'))
         self.assertRaises(AttributeError, obj.obj_attr_is_set, 'bang')
 
+    def test_obj_set_db_fields(self):
+        obj = MyObj()
+        bar = u'bar'
+        db_obj = {'foo': '2', 'bar': bar, 'missing': 'missing',
+                  'readonly': 3, 'deleted': None}
+        obj._obj_set_db_fields(db_obj, ['foo', 'bar', 'missing', 'readonly',
+                                        'deleted'])
+        self.assertEqual(2, obj.foo)
+        self.assertIs(bar, obj.bar)
+        self.assertIsInstance(obj.missing, six.text_type)
+        self.assertEqual(3, obj.readonly)
+        self.assertFalse(obj.deleted)
+        self.assertEqual(set(['foo', 'bar', 'missing', 'readonly',
+                              'deleted']), obj.obj_what_changed())
+        self.assertRaises(exception.ReadOnlyFieldError,
+                          obj._obj_set_db_fields, {'readonly': 4},
+                          ['readonly'])
+
+    def test_obj_clone(self):
+        obj = MyObj(foo=1, bar='bar', rel_object=MyOwnedObject(baz=1),
+                    rel_objects=[MyOwnedObject(baz=2)])
+        obj.obj_reset_changes(['foo'])
+        rel_object = obj.rel_object
+        rel_objects = obj.rel_objects
+        clone = obj.obj_clone()
+        self.assertEqual(obj.obj_to_primitive()['nova_object.data'],
+                         clone.obj_to_primitive()['nova_object.data'])
+        self.assertEqual(obj.obj_what_changed(), clone.obj_what_changed())
+        # The sub-objects referenced before the copy are not shared
+        rel_object.baz = 3
+        rel_objects[0].baz = 4
+        self.assertEqual(1, clone.rel_object.baz)
+        self.assertEqual(2, clone.rel_objects[0].baz)
+
+    def test_obj_clone_memo(self):
+        obj = MyObj(rel_object=MyOwnedObject(baz=1))
+        obj_copy, rel_object_copy = copy.deepcopy([obj, obj.rel_object])
+        self.assertIs(rel_object_copy, obj_copy.rel_object)
+        self.assertIsNot(obj.rel_object, obj_copy.rel_object)
+
     def test_obj_reset_changes_recursive(self):
         obj = MyObj(rel_object=MyOwnedObject(baz=123),
                     rel_objects=[MyOwnedObject(baz=456)])
@@ -1074,6 +1126,68 @@ class TestObjectSerializer(_BaseTestCase):
         thing2 = ser.deserialize_entity(self.context, thing)
         self.assertIsInstance(thing2['foo'], base.NovaObject)
 
+    def _get_compact_obj(self):
+        obj = MyObj(foo=1, bar='bar', rel_object=MyOwnedObject(baz=1),
+                    rel_objects=[MyOwnedObject(baz=2), MyOwnedObject(baz=3)])
+        obj.obj_reset_changes(['foo', 'rel_objects'])
+        return obj
+
+    def test_object_serialization_compact(self):
+        self.flags(compact_object_encoding=True)
+        ser = base.NovaObjectSerializer(compact_check=lambda: True)
+        obj = self._get_compact_obj()
+        primitive = ser.serialize_entity(self.context,
+                                         [obj, {'key': obj}, 'foo'])
+        self.assertEqual(['nova_object.compact'], list(primitive))
+        classes = primitive['nova_object.compact'][0]
+        self.assertEqual([['MyObj', '1.6', 'nova'],
+                          ['MyOwnedObject', '1.0', 'nova']],
+                         [cls[:3] for cls in classes])
+        thing = ser.deserialize_entity(self.context, primitive)
+        self.assertEqual('foo', thing[2])
+        for obj2 in (thing[0], thing[1]['key']):
+            self.assertIsInstance(obj2, MyObj)
+            self.assertEqual(self.context, obj2._context)
+            self.assertEqual(1, obj2.foo)
+            self.assertEqual('bar', obj2.bar)
+            self.assertFalse(obj2.obj_attr_is_set('missing'))
+            self.assertEqual(1, obj2.rel_object.baz)
+            self.assertEqual([2, 3], [o.baz for o in obj2.rel_objects])
+            self.assertEqual(set(['bar', 'rel_object']),
+                             obj2.obj_what_changed())
+
+    def test_object_serialization_compact_round_trip(self):
+        obj = self._get_compact_obj()
+        primitive = obj.obj_to_primitive()
+        compact = base.obj_to_compact_primitive(primitive)
+        primitive2 = base.obj_from_compact_primitive(
+            jsonutils.loads(jsonutils.dumps(compact)))
+        self.assertEqual(sorted(primitive.pop('nova_object.changes')),
+                         sorted(primitive2.pop('nova_object.changes')))
+        self.assertEqual(primitive, primitive2)
+        self.assertLess(len(jsonutils.dumps(compact)),
+                        len(jsonutils.dumps(primitive)))
+
+    def test_object_serialization_compact_not_negotiated(self):
+        obj = self._get_compact_obj()
+        compact_check = mock.Mock(return_value=False)
+        ser = base.NovaObjectSerializer(compact_check=compact_check)
+        self.assertIn('nova_object.name', ser.serialize_entity(self.context,
+                                                               obj))
+        self.assertFalse(compact_check.called)
+        self.flags(compact_object_encoding=True)
+        self.assertIn('nova_object.name', ser.serialize_entity(self.context,
+                                                               obj))
+        self.assertTrue(compact_check.called)
+        ser = base.NovaObjectSerializer()
+        self.assertIn('nova_object.name', ser.serialize_entity(self.context,
+                                                               obj))
+
+    def test_obj_to_compact_primitive_not_compactable(self):
+        for thing in (1, 'foo', [1, {'foo': 'bar'}],
+                      {'~o': 1, 'obj': MyObj(foo=1).obj_to_primitive()}):
+            self.assertEqual(thing, base.obj_to_compact_primitive(thing))
+
 
 class TestArgsSerializer(test.NoDBTestCase):
     def setUp(self):
@@ -1111,7 +1225,7 @@ object_data = {
     'BlockDeviceMappingList': '1.10-44b9818d5e90a7396eb807540cbe42c0',
     'CellMapping': '1.0-4b1616970814c3c819e10c7ef6b9c3d5',
     'ComputeNode': '1.11-5f8cd6948ad98fcc0c39b79d49acc4b6',
-    'ComputeNodeList': '1.11-f09b7f64339350b4296ac85c07e3a573',
+    'ComputeNodeList': '1.12-8b116aa37794771f1e7629ed4edd4403',
     'DNSDomain': '1.0-5bdc288d7c3b723ce86ede998fd5c9ba',
     'DNSDomainList': '1.0-bc58364180c693203ebcf5e5d5775736',
     'EC2Ids': '1.0-8e193896fa01cec598b875aea94da608',
@@ -1132,7 +1246,7 @@ object_data = {
     'InstanceActionList': '1.0-7f3f14a6c16fa16113c112a3b2ffffdd',
     'InstanceExternalEvent': '1.0-2c5d816a6447594d9ba91cc44834f685',
     'InstanceFault': '1.2-090c74b3833c715845ec2cf24a686aaf',
-    'InstanceFaultList': '1.1-94f71c64972f25ba5675704bf2087fdb',
+    'InstanceFaultList': '1.2-03cf4a245dc49b43dfcb80cd7cdc80eb',
     'InstanceGroup': '1.9-a77a59735d62790dcaa413a21acfaa73',
     'InstanceGroupList': '1.6-4642a730448b2336dfbf0f410f9c0cab',
     'InstanceInfoCache': '1.5-ef7394dae46cff2dd560324555cb85cf',
@@ -1168,8 +1282,8 @@ object_data = {
     'SecurityGroupList': '1.0-29b93ebda887d1941ec10c8e34644356',
     'SecurityGroupRule': '1.1-38290b6f9a35e416c2bcab5f18708967',
     'SecurityGroupRuleList': '1.1-c98e038da57c3a9e47e62a588e5b3c23',
-    'Service': '1.12-1a34a387914f90aacc33c8c43d45d0b3',
-    'ServiceList': '1.10-653f472b965b6ed17235ebd683751be7',
+    'Service': '1.13-84746abde58217873829c98ded31ef1b',
+    'ServiceList': '1.12-e35f9b0f644c8d3ce353f7cf8d63fcb2',
     'Tag': '1.0-521693d0515aa031dff2b8ae3f86c8e0',
     'TagList': '1.0-698b4e8bd7d818db10b71a6d3c596760',
     'TestSubclassedObject': '1.6-d0f7f126f87433003c4d2ced202d6c86',
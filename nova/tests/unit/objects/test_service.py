@@ -20,6 +20,7 @@ from nova import exception
 from nova import objects
 from nova.objects import aggregate
 from nova.objects import service
+from nova.servicegroup.drivers import db as servicegroup_db
 from nova.tests.unit.objects import test_compute_node
 from nova.tests.unit.objects import test_objects
 
@@ -132,6 +133,19 @@ class _TestServiceObject(object):
         service_obj.host = 'fake-host'
         service_obj.save()
 
+    @mock.patch.object(servicegroup_db, 'record_heartbeat')
+    def test_heartbeat(self, mock_record):
+        timeutils.set_time_override(NOW)
+        self.addCleanup(timeutils.clear_time_override)
+        service_obj = service.Service(context=self.context, id=123,
+                                      report_count=1)
+        service_obj.obj_reset_changes()
+        service_obj.heartbeat()
+        mock_record.assert_called_once_with(123, NOW)
+        self.assertEqual(2, service_obj.report_count)
+        self.assertEqual(NOW, service_obj.updated_at.replace(tzinfo=None))
+        self.assertEqual(set(), service_obj.obj_what_changed())
+
     @mock.patch.object(db, 'service_create',
                        return_value=fake_service)
     def test_set_id_failure(self, db_mock):
@@ -174,6 +188,18 @@ class _TestServiceObject(object):
         self.assertEqual(1, len(services))
         mock_get.assert_called_once_with(self.context, 'fake-binary')
 
+    @mock.patch('nova.db.service_get_all_by_binary_changed_since')
+    def test_get_by_binary_changed_since(self, mock_get):
+        mock_get.return_value = [fake_service]
+        changed_since = timeutils.parse_isotime('2015-06-01T10:00:00Z')
+        services = service.ServiceList.get_by_binary_changed_since(
+            self.context, 'fake-binary', changed_since)
+        self.assertEqual(1, len(services))
+        self.compare_obj(services[0], fake_service, allow_missing=OPTIONAL)
+        mock_get.assert_called_once_with(
+            self.context, 'fake-binary',
+            timeutils.normalize_time(changed_since))
+
     def test_get_by_host(self):
         self.mox.StubOutWithMock(db, 'service_get_all_by_host')
         db.service_get_all_by_host(self.context, 'fake-host').AndReturn(
@@ -19,6 +19,7 @@ Fakes For Scheduler tests.
 import six
 
 from nova import objects
+from nova.scheduler.filters import columnar
 from nova.scheduler import host_manager
 
 NUMA_TOPOLOGY = objects.NUMATopology(
@@ -92,3 +93,10 @@ class FakeHostState(host_manager.HostState):
             self.instances = {}
         for (key, val) in six.iteritems(attribute_dict):
             setattr(self, key, val)
+
+
+def hosts_pass_vectorized(filt, host_states, filter_properties):
+    """Return the per-host results of the vectorized form of a filter."""
+    host_columns = columnar.HostColumns(host_states)
+    return [bool(passes) for passes in
+            filt.hosts_pass_vectorized(host_columns, filter_properties)]
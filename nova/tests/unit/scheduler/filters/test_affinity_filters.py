@@ -203,3 +203,12 @@ class TestGroupAffinityFilter(test.NoDBTestCase):
     def test_group_affinity_filter_fails(self):
         self._test_group_affinity_filter_fails(
                 affinity_filter.ServerGroupAffinityFilter(), 'affinity')
+
+    def test_group_filters_depend_on_selected_hosts(self):
+        for filt_cls, policy in (
+                (affinity_filter.ServerGroupAffinityFilter(), 'affinity'),
+                (affinity_filter.ServerGroupAntiAffinityFilter(),
+                 'anti-affinity')):
+            self.assertTrue(filt_cls.depends_on_selected_hosts(
+                {'group_policies': [policy]}))
+            self.assertFalse(filt_cls.depends_on_selected_hosts({}))
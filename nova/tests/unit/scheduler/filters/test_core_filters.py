@@ -19,6 +19,34 @@ from nova.tests.unit.scheduler import fakes
 
 class TestCoreFilter(test.NoDBTestCase):
 
+    def test_core_filter_vectorized(self):
+        self.filt_cls = core_filter.CoreFilter()
+        filter_properties = {'instance_type': {'vcpus': 2}}
+        self.flags(cpu_allocation_ratio=2)
+
+        def _hosts():
+            return [fakes.FakeHostState('host%d' % i, 'node1',
+                        {'vcpus_total': vcpus_total, 'vcpus_used': 7})
+                    for i, vcpus_total in enumerate([0, 4, 5])]
+
+        hosts = _hosts()
+        expected = [self.filt_cls.host_passes(host, filter_properties)
+                    for host in hosts]
+        vectorized_hosts = _hosts()
+        self.assertEqual([True, False, True], expected)
+        self.assertEqual(expected, fakes.hosts_pass_vectorized(
+            self.filt_cls, vectorized_hosts, filter_properties))
+        self.assertEqual(hosts[2].limits, vectorized_hosts[2].limits)
+        self.assertEqual({}, vectorized_hosts[0].limits)
+
+    def test_core_filter_vectorized_no_instance_type(self):
+        self.filt_cls = core_filter.CoreFilter()
+        host = fakes.FakeHostState('host1', 'node1',
+                {'vcpus_total': 4, 'vcpus_used': 70})
+        self.assertEqual([True],
+                         fakes.hosts_pass_vectorized(self.filt_cls, [host],
+                                                     {}))
+
     def test_core_filter_passes(self):
         self.filt_cls = core_filter.CoreFilter()
         filter_properties = {'instance_type': {'vcpus': 1}}
@@ -31,6 +31,28 @@ class TestDiskFilter(test.NoDBTestCase):
                 {'free_disk_mb': 11 * 1024, 'total_usable_disk_gb': 13})
         self.assertTrue(filt_cls.host_passes(host, filter_properties))
 
+    def test_disk_filter_vectorized(self):
+        self.flags(disk_allocation_ratio=1.5)
+        filt_cls = disk_filter.DiskFilter()
+        filter_properties = {'instance_type': {'root_gb': 3,
+            'ephemeral_gb': 3, 'swap': 1024}}
+
+        def _hosts():
+            return [fakes.FakeHostState('host%d' % i, 'node1',
+                        {'free_disk_mb': free_disk_mb,
+                         'total_usable_disk_gb': 12})
+                    for i, free_disk_mb in enumerate([0, 1024, 2048])]
+
+        hosts = _hosts()
+        expected = [filt_cls.host_passes(host, filter_properties)
+                    for host in hosts]
+        vectorized_hosts = _hosts()
+        self.assertEqual([False, True, True], expected)
+        self.assertEqual(expected, fakes.hosts_pass_vectorized(
+            filt_cls, vectorized_hosts, filter_properties))
+        self.assertEqual([host.limits for host in hosts[1:]],
+                         [host.limits for host in vectorized_hosts[1:]])
+
     def test_disk_filter_fails(self):
         self.flags(disk_allocation_ratio=1.0)
         filt_cls = disk_filter.DiskFilter()
@@ -36,6 +36,16 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_iops_vectorized(self):
+        self.flags(max_io_ops_per_host=8)
+        self.filt_cls = io_ops_filter.IoOpsFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node1',
+                                     {'num_io_ops': num_io_ops})
+                 for i, num_io_ops in enumerate([0, 7, 8, 9])]
+        self.assertEqual([True, True, False, False],
+                         fakes.hosts_pass_vectorized(self.filt_cls, hosts,
+                                                     {}))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_aggregate_filter_num_iops_value(self, agg_mock):
         self.flags(max_io_ops_per_host=7)
@@ -35,6 +35,28 @@ class TestNumInstancesFilter(test.NoDBTestCase):
         filter_properties = {}
         self.assertFalse(self.filt_cls.host_passes(host, filter_properties))
 
+    def test_filter_num_instances_vectorized(self):
+        self.flags(max_instances_per_host=5)
+        self.filt_cls = num_instances_filter.NumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node1',
+                                     {'num_instances': num_instances})
+                 for i, num_instances in enumerate([0, 4, 5, 6])]
+        self.assertEqual([True, True, False, False],
+                         fakes.hosts_pass_vectorized(self.filt_cls, hosts,
+                                                     {}))
+
+    @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
+    def test_filter_aggregate_num_instances_vectorized(self, agg_mock):
+        self.flags(max_instances_per_host=4)
+        self.filt_cls = num_instances_filter.AggregateNumInstancesFilter()
+        hosts = [fakes.FakeHostState('host%d' % i, 'node1',
+                                     {'num_instances': 5})
+                 for i in range(3)]
+        agg_mock.side_effect = [set(), set(['6']), set(['XXX'])]
+        self.assertEqual([False, True, False],
+                         fakes.hosts_pass_vectorized(self.filt_cls, hosts,
+                                                     {}))
+
     @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
     def test_filter_aggregate_num_instances_value(self, agg_mock):
         self.flags(max_instances_per_host=4)
@@ -45,6 +45,26 @@ class TestRamFilter(test.NoDBTestCase):
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(2048 * 2.0, host.limits['memory_mb'])
 
+    def test_ram_filter_vectorized(self):
+        self.flags(ram_allocation_ratio=1.5)
+        filter_properties = {'instance_type': {'memory_mb': 1024}}
+
+        def _hosts():
+            return [fakes.FakeHostState('host%d' % i, 'node1',
+                        {'free_ram_mb': free_ram_mb,
+                         'total_usable_ram_mb': 2048})
+                    for i, free_ram_mb in enumerate([-1024, 0, 1, 1024])]
+
+        hosts = _hosts()
+        expected = [self.filt_cls.host_passes(host, filter_properties)
+                    for host in hosts]
+        vectorized_hosts = _hosts()
+        self.assertEqual([False, True, True, True], expected)
+        self.assertEqual(expected, fakes.hosts_pass_vectorized(
+            self.filt_cls, vectorized_hosts, filter_properties))
+        self.assertEqual([host.limits for host in hosts],
+                         [host.limits for host in vectorized_hosts])
+
 
 @mock.patch('nova.scheduler.filters.utils.aggregate_values_from_key')
 class TestAggregateRamFilter(test.NoDBTestCase):
@@ -87,3 +107,15 @@ class TestAggregateRamFilter(test.NoDBTestCase):
         # use the minimum ratio from aggregates
         self.assertTrue(self.filt_cls.host_passes(host, filter_properties))
         self.assertEqual(1024 * 1.5, host.limits['memory_mb'])
+
+    def test_aggregate_ram_filter_vectorized(self, agg_mock):
+        self.flags(ram_allocation_ratio=1.0)
+        filter_properties = {'context': mock.sentinel.ctx,
+                             'instance_type': {'memory_mb': 1024}}
+        hosts = [fakes.FakeHostState('host%d' % i, 'node1',
+                    {'free_ram_mb': 1023, 'total_usable_ram_mb': 1024})
+                 for i in range(3)]
+        agg_mock.side_effect = [set(), set(['2.0']), set(['XXX'])]
+        self.assertEqual([False, True, False], fakes.hosts_pass_vectorized(
+            self.filt_cls, hosts, filter_properties))
+        self.assertEqual(1024 * 2.0, hosts[1].limits['memory_mb'])
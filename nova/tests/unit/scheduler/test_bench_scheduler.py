@@ -0,0 +1,72 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For the scheduler benchmark tool.
+"""
+
+import copy
+import imp
+import os
+
+import nova
+from nova import test
+
+BENCH_PATH = os.path.join(os.path.dirname(os.path.dirname(nova.__file__)),
+                          'tools', 'scheduler', 'bench_scheduler.py')
+
+
+class BenchSchedulerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(BenchSchedulerTestCase, self).setUp()
+        self.bench = imp.load_source('bench_scheduler', BENCH_PATH)
+        self.profile = copy.deepcopy(self.bench.DEFAULT_PROFILE)
+        self.profile.update(hosts=4, requests=5, aggregates=2,
+                            instances_per_host=2)
+
+    def _test_run(self, scheduler_name):
+        result = self.bench.run(self.profile, scheduler_name)
+
+        self.assertEqual(scheduler_name, result['scheduler'])
+        self.assertEqual(5, result['requests'])
+        self.assertLessEqual(result['latency_ms']['p50'],
+                             result['latency_ms']['max'])
+        self.assertIn('RamFilter', result['filters'])
+        self.assertIn('RAMWeigher', result['weighers'])
+        for summary in result['filters'].values():
+            self.assertIn('ms_per_request', summary)
+            self.assertLessEqual(summary['mean_hosts_in'], 4)
+        self.assertGreaterEqual(result['get_all_host_states']['count'], 1)
+        return result
+
+    def test_run_filter_scheduler(self):
+        result = self._test_run('filter')
+        self.assertEqual(4, result['get_all_host_states']['mean_hosts_out'])
+
+    def test_run_caching_scheduler(self):
+        self._test_run('caching')
+
+    def test_run_timings_disabled_in_profile(self):
+        # The timings of the tool are recorded anyway
+        self.profile['options'] = {'scheduler_timing_enabled': False}
+        self._test_run('filter')
+
+    def test_compare(self):
+        result = self.bench.run(self.profile, 'filter')
+        self.assertTrue(self.bench.compare(result, result, 0))
+        slower = copy.deepcopy(result)
+        slower['latency_ms']['p99'] = result['latency_ms']['p99'] * 2 + 1
+        self.assertFalse(self.bench.compare(result, slower, 10))
+        self.assertTrue(self.bench.compare(result, slower, None))
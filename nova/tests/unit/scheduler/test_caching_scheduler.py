@@ -13,6 +13,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 import mock
 from oslo_utils import timeutils
 from six.moves import range
@@ -42,6 +44,49 @@ class CachingSchedulerTestCase(test_scheduler.SchedulerTestCase):
         self.assertEqual([], self.driver.all_host_states)
         context.elevated.assert_called_with()
 
+    @mock.patch.object(host_manager.HostManager, "refresh_services")
+    @mock.patch.object(caching_scheduler.CachingScheduler,
+                       "_get_up_hosts")
+    def test_run_periodic_tasks_tracks_compute_node_changes(
+            self, mock_up_hosts, mock_refresh_services):
+        self.flags(scheduler_tracks_compute_node_changes=True,
+                   caching_scheduler_full_reload_interval=600)
+        mock_up_hosts.return_value = []
+        mock_refresh_services.return_value = set()
+        context = mock.Mock()
+        self.driver.all_host_states = ["asdf"]
+        self.driver._last_full_reload = timeutils.utcnow()
+
+        self.driver.run_periodic_tasks(context)
+
+        self.assertFalse(mock_up_hosts.called)
+        mock_refresh_services.assert_called_once_with(
+            context.elevated.return_value)
+        self.assertEqual(["asdf"], self.driver.all_host_states)
+
+        # The cache is reloaded once the interval elapsed.
+        self.driver._last_full_reload -= datetime.timedelta(seconds=601)
+        self.driver.run_periodic_tasks(context)
+
+        self.assertTrue(mock_up_hosts.called)
+        self.assertEqual([], self.driver.all_host_states)
+
+    @mock.patch.object(host_manager.HostManager, "refresh_services")
+    def test_run_periodic_tasks_removes_deleted_hosts(
+            self, mock_refresh_services):
+        self.flags(scheduler_tracks_compute_node_changes=True,
+                   caching_scheduler_full_reload_interval=600)
+        host_states = [host_manager.HostState('host%d' % i, 'node%d' % i)
+                       for i in range(3)]
+        mock_refresh_services.return_value = set([('host1', 'node1')])
+        self.driver.all_host_states = list(host_states)
+        self.driver._last_full_reload = timeutils.utcnow()
+
+        self.driver.run_periodic_tasks(mock.Mock())
+
+        self.assertEqual([host_states[0], host_states[2]],
+                         self.driver.all_host_states)
+
     @mock.patch.object(caching_scheduler.CachingScheduler,
                        "_get_up_hosts")
     def test_get_all_host_states_returns_cached_value(self, mock_up_hosts):
@@ -44,9 +44,9 @@ class SchedulerReportClientTestCase(test.NoDBTestCase):
                                        "product_id": "foo",
                                        "count": 1,
                                        "a": "b"}]}
-        self.client.update_resource_stats(self.context,
-                                          ('fakehost', 'fakenode'),
-                                          stats)
+        result = self.client.update_resource_stats(self.context,
+                                                   ('fakehost', 'fakenode'),
+                                                   stats)
         mock_cn.assert_called_once_with(objects.ComputeNode,
                                         context=self.context,
                                         id=1)
@@ -55,6 +55,7 @@ class SchedulerReportClientTestCase(test.NoDBTestCase):
         self.assertEqual("b", cn.pci_device_pools[0].tags["a"])
         cn.save.assert_called_once_with()
         self.assertEqual('bar', cn.foo)
+        self.assertEqual(cn, result)
 
     def test_update_compute_node_raises(self):
         stats = {"foo": "bar"}
@@ -183,3 +184,17 @@ class SchedulerClientTestCase(test.NoDBTestCase):
         self.assertIsNotNone(self.client.reportclient.instance)
         mock_update_resource_stats.assert_called_once_with(
             'ctxt', 'fake_name', 'fake_stats')
+        self.assertIsNone(self.client.queryclient.instance)
+
+    @mock.patch.object(scheduler_query_client.SchedulerQueryClient,
+                       'update_compute_node')
+    @mock.patch.object(scheduler_report_client.SchedulerReportClient,
+                       'update_resource_stats')
+    def test_update_resource_stats_tracks_compute_node_changes(
+            self, mock_update_resource_stats, mock_update_compute_node):
+        self.flags(scheduler_tracks_compute_node_changes=True)
+
+        self.client.update_resource_stats('ctxt', 'fake_name', 'fake_stats')
+
+        mock_update_compute_node.assert_called_once_with(
+            'ctxt', mock_update_resource_stats.return_value)
@@ -16,16 +16,24 @@
 Tests For Filter Scheduler.
 """
 
+import contextlib
+
 import mock
+from oslo_config import cfg
 
+from nova import context
 from nova import exception
 from nova.scheduler import filter_scheduler
 from nova.scheduler import host_manager
 from nova.scheduler import utils as scheduler_utils
 from nova.scheduler import weights
+from nova import test
 from nova.tests.unit.scheduler import fakes
 from nova.tests.unit.scheduler import test_scheduler
 
+CONF = cfg.CONF
+CONF.import_opt('io_ops_weight_multiplier', 'nova.scheduler.weights.io_ops')
+
 
 def fake_get_filtered_hosts(hosts, filter_properties, index):
     return list(hosts)
@@ -52,7 +60,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 1.0
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             return [weights.WeighedHost(host_state, self.next_weight)]
@@ -205,7 +214,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
 
         self.next_weight = 50
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             this_weight = self.next_weight
             self.next_weight = 0
             host_state = hosts[0]
@@ -256,7 +266,8 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
         selected_hosts = []
         selected_nodes = []
 
-        def _fake_weigh_objects(_self, functions, hosts, options):
+        def _fake_weigh_objects(_self, functions, hosts, options,
+                                limit=None):
             self.next_weight += 2.0
             host_state = hosts[0]
             selected_hosts.append(host_state.host)
@@ -328,3 +339,97 @@ class FilterSchedulerTestCase(test_scheduler.SchedulerTestCase):
                 # Make sure that the consumed hosts have chance to be reverted.
                 for host in consumed_hosts:
                     self.assertIsNone(host.obj.updated)
+
+
+class IncrementalMultiCreateTestCase(test.NoDBTestCase):
+    """Test case for the incremental scheduling of multiple instances."""
+
+    def setUp(self):
+        super(IncrementalMultiCreateTestCase, self).setUp()
+        self.context = context.RequestContext('fake_user', 'fake_project')
+        self.flags(scheduler_default_filters=['RamFilter', 'IoOpsFilter',
+                                              'ServerGroupAffinityFilter',
+                                              'ServerGroupAntiAffinityFilter'],
+                   scheduler_host_subset_size=3,
+                   io_ops_weight_multiplier=-2.0)
+
+    def _get_all_host_states(self):
+        return [fakes.FakeHostState('host%d' % (i // 2), 'node%d' % i,
+                                    {'free_ram_mb': 512 * (i % 5) + 1024,
+                                     'total_usable_ram_mb': 4096,
+                                     'num_io_ops': i % 3})
+                for i in range(20)]
+
+    def _schedule(self, incremental, num_instances, filter_properties):
+        self.flags(scheduler_incremental_multi_create=incremental)
+        with contextlib.nested(
+            mock.patch.object(host_manager.HostManager, '_init_aggregates'),
+            mock.patch.object(host_manager.HostManager,
+                              '_init_instance_info'),
+        ):
+            driver = filter_scheduler.FilterScheduler()
+        instance_properties = {'project_id': 1,
+                               'root_gb': 1,
+                               'memory_mb': 512,
+                               'ephemeral_gb': 0,
+                               'vcpus': 1,
+                               'os_type': 'Linux',
+                               'uuid': 'fake-uuid',
+                               'numa_topology': None,
+                               'pci_requests': None}
+        request_spec = dict(instance_properties=instance_properties,
+                            instance_type={'memory_mb': 512},
+                            num_instances=num_instances)
+        with contextlib.nested(
+            mock.patch.object(driver, '_get_all_host_states',
+                              return_value=self._get_all_host_states()),
+            mock.patch('random.choice', side_effect=lambda seq: seq[-1]),
+        ):
+            hosts = driver._schedule(self.context, request_spec,
+                                     filter_properties=filter_properties)
+        return [(host.obj.nodename, host.weight) for host in hosts]
+
+    def _assert_same_hosts(self, num_instances, filter_properties=None):
+        expected = self._schedule(False, num_instances,
+                                  dict(filter_properties or {}))
+        hosts = self._schedule(True, num_instances,
+                               dict(filter_properties or {}))
+        self.assertEqual(expected, hosts)
+        return hosts
+
+    def test_same_hosts(self):
+        hosts = self._assert_same_hosts(40)
+        self.assertEqual(40, len(hosts))
+
+    def test_same_hosts_not_enough_resources(self):
+        hosts = self._assert_same_hosts(200)
+        self.assertTrue(40 < len(hosts) < 200)
+
+    def test_same_hosts_vectorized(self):
+        self.flags(scheduler_use_vectorized_filters=True,
+                   scheduler_use_vectorized_weighers=True)
+        hosts = self._assert_same_hosts(200)
+        self.assertTrue(40 < len(hosts) < 200)
+
+    def test_same_hosts_anti_affinity(self):
+        hosts = self._assert_same_hosts(
+            20, {'group_updated': True, 'group_hosts': [],
+                 'group_policies': ['anti-affinity']})
+        # One node per host.
+        self.assertEqual(10, len(hosts))
+
+    def test_same_hosts_affinity(self):
+        hosts = self._assert_same_hosts(
+            20, {'group_updated': True, 'group_hosts': [],
+                 'group_policies': ['affinity']})
+        self.assertEqual(
+            1, len(set(nodename[:-1] for nodename, _weight in hosts)))
+
+    @mock.patch.object(host_manager.HostManager, 'get_weighed_hosts')
+    @mock.patch.object(host_manager.HostManager, 'get_filtered_hosts',
+                       side_effect=fake_get_filtered_hosts)
+    def test_filter_and_weigh_once(self, mock_filter, mock_weigh):
+        self.flags(scheduler_default_filters=['RamFilter'])
+        self._schedule(True, 5, {})
+        self.assertEqual(1, mock_filter.call_count)
+        self.assertFalse(mock_weigh.called)
@@ -18,6 +18,7 @@ Tests For Scheduler Host Filters.
 import inspect
 import sys
 
+import mock
 from six.moves import range
 
 from nova import filters
@@ -128,6 +129,23 @@ class FiltersTestCase(test.NoDBTestCase):
                                                      filter_properties)
         self.assertEqual(filter_objs_last, result)
 
+    def test_get_filtered_objects_records_timings(self):
+        class OddFilter(filters.BaseFilter):
+            def _filter_one(self, obj, filter_properties):
+                return obj % 2
+
+        self.stubs.Set(loadables.BaseLoader, '__init__',
+                       lambda *args, **kwargs: None)
+        filter_handler = filters.BaseFilterHandler(filters.BaseFilter)
+        filter_handler.timings = mock.Mock()
+        result = filter_handler.get_filtered_objects([Filter1(), OddFilter()],
+                                                     range(4), {})
+        self.assertEqual([1, 3], result)
+        self.assertEqual(
+            [('filter.Filter1', 4, 4), ('filter.OddFilter', 4, 2)],
+            [(call[0][0], call[0][2], call[0][3]) for call in
+             filter_handler.timings.record.call_args_list])
+
     def test_get_filtered_objects_for_index(self):
         """Test that we don't call a filter when its
         run_filter_for_index() method returns false
@@ -12,6 +12,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import mock
+
 from nova import objects
 from nova.scheduler.filters import utils
 from nova import test
@@ -94,3 +96,42 @@ class UtilsTestCase(test.NoDBTestCase):
         metadata = utils.aggregate_metadata_get_by_host(host_state, 'k3')
 
         self.assertEqual({}, metadata)
+
+    def test_aggregate_metadata_get_by_host_missing_key(self):
+        host_state = fakes.FakeHostState(
+            'fake', 'node', {'aggregates': _AGGREGATE_FIXTURES})
+
+        metadata = utils.aggregate_metadata_get_by_host(host_state)
+
+        self.assertEqual(set(), metadata['k3'])
+        self.assertNotIn('k3', metadata)
+
+    def test_aggregate_metadata_computed_once(self):
+        aggregate_metadata = utils.AggregateMetadata(_AGGREGATE_FIXTURES)
+        host_state = fakes.FakeHostState(
+            'fake', 'node', {'aggregates': _AGGREGATE_FIXTURES,
+                             'aggregate_metadata': aggregate_metadata})
+
+        with mock.patch.object(utils, '_merge_metadata',
+                               wraps=utils._merge_metadata) as mock_merge:
+            for i in range(2):
+                metadata = utils.aggregate_metadata_get_by_host(host_state)
+                self.assertEqual(set(['1', '3', '7', '6']), metadata['k1'])
+                metadata = utils.aggregate_metadata_get_by_host(host_state,
+                                                                'k1')
+                self.assertEqual(set(['9', '8', '2', '4']), metadata['k2'])
+                self.assertEqual(
+                    set(['1', '3', '6,7']),
+                    utils.aggregate_values_from_key(host_state, 'k1'))
+            self.assertEqual(2, mock_merge.call_count)
+
+    def test_aggregate_metadata_of_other_aggregates(self):
+        # The aggregates were changed since the metadata were merged.
+        aggregate_metadata = utils.AggregateMetadata(_AGGREGATE_FIXTURES)
+        host_state = fakes.FakeHostState(
+            'fake', 'node', {'aggregates': _AGGREGATE_FIXTURES[:1],
+                             'aggregate_metadata': aggregate_metadata})
+
+        metadata = utils.aggregate_metadata_get_by_host(host_state)
+
+        self.assertEqual(set(['1']), metadata['k1'])
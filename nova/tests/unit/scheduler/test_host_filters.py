@@ -15,9 +15,21 @@
 Tests For Scheduler Host Filters.
 """
 
+import functools
+import logging
+import os
+import time
+
+import eventlet
+import mock
+
 from nova.scheduler import filters
 from nova.scheduler.filters import all_hosts_filter
+from nova.scheduler.filters import columnar
 from nova.scheduler.filters import compute_filter
+from nova.scheduler.filters import io_ops_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler.filters import sharding
 from nova import test
 from nova.tests.unit.scheduler import fakes
 
@@ -36,3 +48,176 @@ class HostFiltersTestCase(test.NoDBTestCase):
         filt_cls = all_hosts_filter.AllHostsFilter()
         host = fakes.FakeHostState('host1', 'node1', {})
         self.assertTrue(filt_cls.host_passes(host, {}))
+
+
+class VectorizedHostFilterHandlerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(VectorizedHostFilterHandlerTestCase, self).setUp()
+        self.flags(scheduler_use_vectorized_filters=True,
+                   ram_allocation_ratio=1.0, max_io_ops_per_host=8)
+        self.filter_handler = filters.HostFilterHandler()
+        self.filters = [all_hosts_filter.AllHostsFilter(),
+                        ram_filter.RamFilter(),
+                        io_ops_filter.IoOpsFilter()]
+        self.filter_properties = {'instance_type': {'memory_mb': 1024}}
+        self.hosts = [
+            fakes.FakeHostState('host1', 'node1',
+                                {'free_ram_mb': 1024, 'num_io_ops': 0,
+                                 'total_usable_ram_mb': 2048}),
+            fakes.FakeHostState('host2', 'node2',
+                                {'free_ram_mb': 512, 'num_io_ops': 0,
+                                 'total_usable_ram_mb': 2048}),
+            fakes.FakeHostState('host3', 'node3',
+                                {'free_ram_mb': 2048, 'num_io_ops': 8,
+                                 'total_usable_ram_mb': 2048}),
+            fakes.FakeHostState('host4', 'node4',
+                                {'free_ram_mb': 2048, 'num_io_ops': 1,
+                                 'total_usable_ram_mb': 2048}),
+        ]
+
+    def _get_filtered_hosts(self):
+        return self.filter_handler.get_filtered_objects(
+            self.filters, iter(self.hosts), self.filter_properties)
+
+    def test_get_filtered_objects(self):
+        with mock.patch.object(ram_filter.RamFilter,
+                               'host_passes') as mock_passes:
+            result = self._get_filtered_hosts()
+            self.assertFalse(mock_passes.called)
+        self.assertEqual([self.hosts[0], self.hosts[3]], result)
+        self.assertEqual(2048.0, self.hosts[0].limits['memory_mb'])
+
+    def test_get_filtered_objects_matches_per_host(self):
+        result = self._get_filtered_hosts()
+        self.flags(scheduler_use_vectorized_filters=False)
+        self.assertEqual(self._get_filtered_hosts(), result)
+
+    def test_get_filtered_objects_no_hosts_left(self):
+        self.filter_properties = {'instance_type': {'memory_mb': 4096}}
+        with mock.patch.object(all_hosts_filter.AllHostsFilter,
+                               'host_passes') as mock_passes:
+            self.assertEqual([], self._get_filtered_hosts())
+            self.assertFalse(mock_passes.called)
+
+    def test_get_filtered_objects_without_numpy(self):
+        self.stubs.Set(columnar, 'numpy', None)
+        with mock.patch.object(ram_filter.RamFilter,
+                               'hosts_pass_vectorized') as mock_vectorized:
+            result = self._get_filtered_hosts()
+            self.assertFalse(mock_vectorized.called)
+        self.assertEqual([self.hosts[0], self.hosts[3]], result)
+
+
+class ShardedHostFilterHandlerTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(ShardedHostFilterHandlerTestCase, self).setUp()
+        self.flags(scheduler_filter_processes=3,
+                   scheduler_filter_shard_min_hosts=2,
+                   ram_allocation_ratio=1.5, max_io_ops_per_host=8)
+        self.filter_handler = filters.HostFilterHandler()
+        self.filters = [all_hosts_filter.AllHostsFilter(),
+                        ram_filter.RamFilter(),
+                        io_ops_filter.IoOpsFilter()]
+        self.filter_properties = {'instance_type': {'memory_mb': 1024}}
+        self.hosts = [
+            fakes.FakeHostState('host%d' % i, 'node%d' % i,
+                                {'free_ram_mb': 512 * (i % 4),
+                                 'num_io_ops': i % 10,
+                                 'total_usable_ram_mb': 2048})
+            for i in range(20)]
+
+    def _get_filtered_hosts(self):
+        return self.filter_handler.get_filtered_objects(
+            self.filters, iter(self.hosts), self.filter_properties)
+
+    def _get_expected_hosts(self):
+        return [host for host in self.hosts
+                if host.free_ram_mb + 1024 >= 1024 and host.num_io_ops < 8]
+
+    def test_is_enabled(self):
+        self.assertTrue(sharding.is_enabled(4))
+        self.assertFalse(sharding.is_enabled(3))
+        self.flags(scheduler_filter_processes=1)
+        self.assertFalse(sharding.is_enabled(20))
+
+    def test_get_filtered_objects(self):
+        result = self._get_filtered_hosts()
+        self.assertEqual(self._get_expected_hosts(), result)
+        for host in result:
+            self.assertEqual(3072.0, host.limits['memory_mb'])
+
+    def test_get_filtered_objects_matches_serial(self):
+        result = self._get_filtered_hosts()
+        self.flags(scheduler_filter_processes=0)
+        self.assertEqual(self._get_filtered_hosts(), result)
+
+    def test_get_filtered_objects_not_process_safe_first(self):
+        with mock.patch.object(all_hosts_filter.AllHostsFilter,
+                               'host_passes',
+                               side_effect=lambda host, props:
+                                   host is not self.hosts[1]) as mock_passes:
+            result = self._get_filtered_hosts()
+            # NOTE: calls made by the forked processes would not be seen
+            # here, so all the hosts went through the filter in this one.
+            self.assertEqual(len(self.hosts), mock_passes.call_count)
+        self.assertNotIn(self.hosts[1], result)
+
+    def test_get_filtered_objects_too_few_hosts_left(self):
+        self.flags(scheduler_filter_shard_min_hosts=15)
+        with mock.patch.object(sharding, 'get_filtered_objects') as mock_get:
+            result = self._get_filtered_hosts()
+            self.assertFalse(mock_get.called)
+        self.assertEqual(self._get_expected_hosts(), result)
+
+    @mock.patch.object(sharding.LOG, 'warning')
+    def test_get_filtered_objects_worker_failure(self, mock_warning):
+        with mock.patch.object(sharding.pickle, 'dumps',
+                               side_effect=Exception):
+            result = self._get_filtered_hosts()
+        self.assertEqual(self._get_expected_hosts(), result)
+        self.assertEqual(2, mock_warning.call_count)
+
+    @mock.patch.object(sharding.LOG, 'warning')
+    def test_get_filtered_objects_worker_logging_disabled(self,
+                                                          mock_warning):
+        parent_pid = os.getpid()
+        parent_disable = logging.root.manager.disable
+        io_ops_host_passes = functools.partial(
+            io_ops_filter.IoOpsFilter.host_passes, self.filters[2])
+
+        def host_passes(host_state, filter_properties):
+            # The workers only pass the hosts when they can't log
+            if (os.getpid() != parent_pid and
+                    logging.root.manager.disable < logging.CRITICAL):
+                return False
+            return io_ops_host_passes(host_state, filter_properties)
+
+        with mock.patch.object(io_ops_filter.IoOpsFilter, 'host_passes',
+                               side_effect=host_passes):
+            result = self._get_filtered_hosts()
+        self.assertEqual(self._get_expected_hosts(), result)
+        self.assertFalse(mock_warning.called)
+        self.assertEqual(parent_disable, logging.root.manager.disable)
+
+    @mock.patch.object(sharding.LOG, 'warning')
+    def test_get_filtered_objects_worker_timeout(self, mock_warning):
+        self.flags(scheduler_filter_process_timeout=0.5)
+        filter_shard = sharding._filter_shard
+        parent_pid = os.getpid()
+        sleep = eventlet.patcher.original('time').sleep
+
+        def _filter_shard(*args):
+            if os.getpid() != parent_pid:
+                sleep(60)
+            return filter_shard(*args)
+
+        start = time.time()
+        with mock.patch.object(sharding, '_filter_shard',
+                               side_effect=_filter_shard):
+            result = self._get_filtered_hosts()
+        self.assertLess(time.time() - start, 30)
+        self.assertEqual(self._get_expected_hosts(), result)
+        self.assertEqual(2, mock_warning.call_count)
+        self.assertIn('timed out', mock_warning.call_args[0][0])
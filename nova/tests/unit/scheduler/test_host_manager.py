@@ -17,15 +17,20 @@ Tests For HostManager
 """
 
 import collections
+import datetime
 
+import iso8601
 import mock
 from oslo_config import cfg
 from oslo_serialization import jsonutils
+from oslo_utils import timeutils
 import six
 
 import nova
 from nova.compute import task_states
 from nova.compute import vm_states
+from nova import context as nova_context
+from nova import db
 from nova import exception
 from nova import objects
 from nova.objects import base as obj_base
@@ -361,6 +366,78 @@ class HostManagerTestCase(test.NoDBTestCase):
                 fake_properties)
         self._verify_result(info, result, False)
 
+    @mock.patch.object(FakeFilterClass2, 'depends_on_selected_hosts',
+                       return_value=False)
+    @mock.patch.object(FakeFilterClass2, 'host_passes', return_value=True)
+    @mock.patch.object(FakeFilterClass1, 'host_passes', return_value=True)
+    def test_get_filtered_hosts_after_selection(self, mock_passes1,
+                                                mock_passes2, mock_depends):
+        specified_filters = ['FakeFilterClass1', 'FakeFilterClass2']
+        result = self.host_manager.get_filtered_hosts_after_selection(
+            self.fake_hosts, self.fake_hosts[2], {},
+            filter_class_names=specified_filters)
+        self.assertEqual(self.fake_hosts, result)
+        # Only the selected host is filtered again.
+        mock_passes1.assert_called_once_with(self.fake_hosts[2], {})
+        mock_passes2.assert_called_once_with(self.fake_hosts[2], {})
+
+    @mock.patch.object(FakeFilterClass2, 'depends_on_selected_hosts',
+                       return_value=True)
+    @mock.patch.object(FakeFilterClass2, 'host_passes')
+    @mock.patch.object(FakeFilterClass1, 'host_passes', return_value=False)
+    def test_get_filtered_hosts_after_selection_dependent_filter(
+            self, mock_passes1, mock_passes2, mock_depends):
+        mock_passes2.side_effect = (
+            lambda host_state, props: host_state.host != 'fake_multihost')
+        specified_filters = ['FakeFilterClass1', 'FakeFilterClass2']
+        result = self.host_manager.get_filtered_hosts_after_selection(
+            self.fake_hosts, self.fake_hosts[2], {},
+            filter_class_names=specified_filters)
+        # The selected host fails the first filter and the other hosts go
+        # through the second filter only.
+        self.assertEqual([self.fake_hosts[0], self.fake_hosts[1],
+                          self.fake_hosts[3]], result)
+        mock_passes1.assert_called_once_with(self.fake_hosts[2], {})
+        self.assertEqual(len(self.fake_hosts) - 1, mock_passes2.call_count)
+
+    def test_get_filtered_hosts_after_selection_forced_hosts(self):
+        fake_properties = {'force_hosts': ['fake_host1', 'fake_host3']}
+        hosts = [self.fake_hosts[0], self.fake_hosts[2]]
+        self.stubs.Set(FakeFilterClass1, '_filter_one', None)
+        result = self.host_manager.get_filtered_hosts_after_selection(
+            hosts, hosts[0], fake_properties)
+        self.assertEqual(hosts, result)
+
+    @mock.patch.object(nova.objects.InstanceList, 'get_by_host',
+                       return_value=objects.InstanceList())
+    @mock.patch.object(objects.ComputeNodeList, 'get_all',
+                       return_value=fakes.COMPUTE_NODES)
+    @mock.patch.object(objects.ServiceList, 'get_by_binary',
+                       return_value=fakes.SERVICES)
+    def test_get_all_host_states_records_timings(self, mock_get_by_binary,
+                                                 mock_get_all,
+                                                 mock_get_by_host):
+        self.assertIs(self.host_manager.timings,
+                      self.host_manager.filter_handler.timings)
+        self.assertIs(self.host_manager.timings,
+                      self.host_manager.weight_handler.timings)
+        self.host_manager.get_all_host_states('fake_context')
+        summary = self.host_manager.timings.summary()
+        self.assertEqual(['host_manager.add_instance_info',
+                          'host_manager.get_all_host_states'],
+                         sorted(summary))
+        self.assertEqual(4.0, summary['host_manager.get_all_host_states'][
+            'mean_hosts_out'])
+
+    def test_timings_disabled(self):
+        self.flags(scheduler_timing_enabled=False)
+        with mock.patch.object(host_manager.HostManager,
+                               '_init_aggregates'):
+            self.host_manager = host_manager.HostManager()
+        self.assertIsNone(self.host_manager.timings)
+        self.assertIsNone(self.host_manager.filter_handler.timings)
+        self.assertIsNone(self.host_manager.weight_handler.timings)
+
     @mock.patch.object(nova.objects.InstanceList, 'get_by_host')
     def test_get_all_host_states(self, mock_get_by_host):
         mock_get_by_host.return_value = objects.InstanceList()
@@ -483,6 +560,45 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = self.host_manager.host_state_map[('fake', 'fake')]
         self.assertEqual([], host_state.aggregates)
 
+    @mock.patch.object(nova.objects.InstanceList, 'get_by_host',
+                       return_value=objects.InstanceList())
+    @mock.patch.object(host_manager.HostState, 'update_from_compute_node')
+    @mock.patch.object(objects.ComputeNodeList, 'get_all')
+    @mock.patch.object(objects.ServiceList, 'get_by_binary')
+    def test_get_all_host_states_aggregate_metadata(self, svc_get_by_binary,
+                                                    cn_get_all,
+                                                    update_from_cn,
+                                                    mock_get_by_host):
+        svc_get_by_binary.return_value = [objects.Service(host='fake')]
+        cn_get_all.return_value = [
+            objects.ComputeNode(host='fake', hypervisor_hostname='fake')]
+        fake_agg = objects.Aggregate(id=1, hosts=['fake'],
+                                     metadata={'foo': 'bar'})
+        self.host_manager.update_aggregates([fake_agg])
+
+        self.host_manager.get_all_host_states('fake-context')
+        host_state = self.host_manager.host_state_map[('fake', 'fake')]
+        aggregate_metadata = host_state.aggregate_metadata
+        self.assertIs(host_state.aggregates, aggregate_metadata.aggregates)
+        self.assertEqual({'foo': set(['bar'])},
+                         aggregate_metadata.get_metadata())
+
+        # The metadata are not merged again if the aggregates didn't change
+        self.host_manager.get_all_host_states('fake-context')
+        self.assertIs(aggregate_metadata, host_state.aggregate_metadata)
+
+        fake_agg = objects.Aggregate(id=1, hosts=['fake'],
+                                     metadata={'foo': 'baz'})
+        self.host_manager.update_aggregates([fake_agg])
+        self.host_manager.get_all_host_states('fake-context')
+        self.assertEqual({'foo': set(['baz'])},
+                         host_state.aggregate_metadata.get_metadata())
+
+        self.host_manager.delete_aggregate(fake_agg)
+        self.host_manager.get_all_host_states('fake-context')
+        self.assertEqual([], host_state.aggregates)
+        self.assertEqual({}, host_state.aggregate_metadata.get_metadata())
+
     @mock.patch('nova.objects.ServiceList.get_by_binary')
     @mock.patch('nova.objects.ComputeNodeList.get_all')
     @mock.patch('nova.objects.InstanceList.get_by_host')
@@ -500,7 +616,7 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = None
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         self.assertFalse(mock_get_by_host.called)
         self.assertTrue(host_state.instances)
         self.assertEqual(host_state.instances['uuid1'], inst1)
@@ -522,7 +638,7 @@ class HostManagerTestCase(test.NoDBTestCase):
         host_state = host_manager.HostState('host1', cn1)
         self.assertFalse(host_state.instances)
         mock_get_by_host.return_value = objects.InstanceList(objects=[inst1])
-        hm._add_instance_info(context, cn1, host_state)
+        hm._add_instance_info(context, host_state)
         mock_get_by_host.assert_called_once_with(context, cn1.host)
         self.assertTrue(host_state.instances)
         self.assertEqual(host_state.instances['uuid1'], inst1)
@@ -673,6 +789,72 @@ class HostManagerTestCase(test.NoDBTestCase):
                 'fake_context', host_name)
         self.assertFalse(new_info['updated'])
 
+    @mock.patch.object(objects.InstanceList, 'get_by_host')
+    def test_recreate_instance_info_updates_host_states(self, mock_get):
+        inst = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                               host='fake_multihost')
+        mock_get.return_value = objects.InstanceList(objects=[inst])
+        self._add_host_states()
+        self.host_manager._recreate_instance_info('fake_context',
+                                                  'fake_multihost')
+        for host_state in self.fake_hosts:
+            if host_state.host == 'fake_multihost':
+                self.assertIs(self.host_manager._instance_info[
+                    'fake_multihost']['instances'], host_state.instances)
+            else:
+                self.assertEqual({}, host_state.instances)
+
+    def _add_host_states(self):
+        for host_state in self.fake_hosts:
+            state_key = (host_state.host, host_state.nodename)
+            self.host_manager.host_state_map[state_key] = host_state
+            self.host_manager.host_state_keys[host_state.host].add(state_key)
+
+    def test_update_instance_info_updates_only_host_states_of_host(self):
+        self._add_host_states()
+        instances = [host_state.instances for host_state in self.fake_hosts]
+
+        class _HostStateMap(dict):
+            def __iter__(self):
+                raise AssertionError('The host states were scanned')
+            iteritems = itervalues = keys = items = values = __iter__
+
+        self.host_manager.host_state_map = _HostStateMap(
+            self.host_manager.host_state_map)
+        inst1 = fake_instance.fake_instance_obj('fake_context', uuid='aaa',
+                                                host='fake_multihost')
+        inst2 = fake_instance.fake_instance_obj('fake_context', uuid='bbb',
+                                                host='fake_multihost')
+        self.host_manager.update_instance_info(
+            'fake_context', 'fake_multihost',
+            objects.InstanceList(objects=[inst1, inst2]))
+
+        inst_dict = self.host_manager._instance_info['fake_multihost'][
+            'instances']
+        self.assertEqual(set(['aaa', 'bbb']), set(inst_dict))
+        for host_state, host_instances in zip(self.fake_hosts, instances):
+            if host_state.host == 'fake_multihost':
+                self.assertIs(inst_dict, host_state.instances)
+            else:
+                self.assertIs(host_instances, host_state.instances)
+
+    def test_update_compute_node(self):
+        host_state = self.fake_hosts[0]
+        self.host_manager.host_state_map[
+            (host_state.host, host_state.nodename)] = host_state
+        compute = objects.ComputeNode(
+            host=host_state.host, hypervisor_hostname=host_state.nodename)
+        with mock.patch.object(host_state,
+                               'update_from_compute_node') as mock_update:
+            self.host_manager.update_compute_node('fake_context', compute)
+            mock_update.assert_called_once_with(compute)
+
+    def test_update_compute_node_unknown(self):
+        compute = objects.ComputeNode(host='unknown',
+                                      hypervisor_hostname='unknown')
+        self.host_manager.update_compute_node('fake_context', compute)
+        self.assertEqual({}, self.host_manager.host_state_map)
+
 
 class HostManagerChangedNodesTestCase(test.NoDBTestCase):
     """Test case for HostManager class."""
@@ -752,6 +934,233 @@ class HostManagerChangedNodesTestCase(test.NoDBTestCase):
         self.assertEqual(len(host_states_map), 0)
 
 
+class HostManagerIncrementalRefreshTestCase(test.NoDBTestCase):
+    """Test case for the incremental refresh of the HostManager states."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostManagerIncrementalRefreshTestCase, self).setUp()
+        self.flags(scheduler_incremental_host_state_refresh=True)
+        self.host_manager = host_manager.HostManager()
+        self.useFixture(test.TimeOverride())
+        self.then = timeutils.utcnow().replace(tzinfo=iso8601.iso8601.Utc())
+        self.services = [self._make_service(host, updated_at=self.then)
+                         for host in ('host1', 'host2', 'host3')]
+        self.computes = [self._make_compute(host, updated_at=self.then)
+                         for host in ('host1', 'host2', 'host3')]
+        self.context = 'fake_context'
+
+        patcher = mock.patch('nova.objects.InstanceList.get_by_host',
+                             return_value=objects.InstanceList())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @staticmethod
+    def _make_service(host, **updates):
+        service = objects.Service(host=host, disabled=False, deleted=False,
+                                  created_at=None, deleted_at=None)
+        service.update(updates)
+        return service
+
+    @staticmethod
+    def _make_compute(host, **updates):
+        compute = objects.ComputeNode(
+            local_gb=1024, memory_mb=1024, vcpus=1, disk_available_least=None,
+            free_ram_mb=512, vcpus_used=1, free_disk_gb=512, local_gb_used=0,
+            host=host, hypervisor_hostname=host.replace('host', 'node'),
+            host_ip='127.0.0.1', hypervisor_version=0, numa_topology=None,
+            hypervisor_type='foo', supported_hv_specs=[],
+            pci_device_pools=None, cpu_info=None, stats=None, metrics=None,
+            deleted=False, created_at=None, deleted_at=None)
+        compute.update(updates)
+        return compute
+
+    @mock.patch('nova.objects.ComputeNodeList.get_all_changed_since')
+    @mock.patch('nova.objects.ServiceList.get_by_binary_changed_since')
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def _refresh_twice(self, changed_services, changed_computes,
+                       mock_get_svc, mock_get_all, mock_svc_changed,
+                       mock_cn_changed):
+        mock_get_svc.return_value = self.services
+        mock_get_all.return_value = self.computes
+        mock_svc_changed.return_value = changed_services
+        mock_cn_changed.return_value = changed_computes
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(60)
+        self.host_manager.get_all_host_states(self.context)
+
+        self.assertEqual(1, mock_get_svc.call_count)
+        self.assertEqual(1, mock_get_all.call_count)
+        mock_svc_changed.assert_called_once_with(self.context, 'nova-compute',
+                                                 self.then)
+        mock_cn_changed.assert_called_once_with(self.context, self.then)
+
+    def test_get_all_host_states_unchanged(self):
+        with mock.patch.object(host_manager.HostState,
+                               'update_from_compute_node') as mock_update:
+            self._refresh_twice([], [])
+            self.assertEqual(3, mock_update.call_count)
+        self.assertEqual(3, len(self.host_manager.host_state_map))
+        self.assertEqual({'full_refreshes': 1,
+                          'incremental_refreshes': 1,
+                          'rows_fetched': 6,
+                          'hosts_served': 6},
+                         self.host_manager.refresh_stats)
+
+    def test_get_all_host_states_changed_compute(self):
+        now = self.then + datetime.timedelta(seconds=30)
+        compute = self._make_compute('host2', updated_at=now,
+                                     free_ram_mb=256)
+        self._refresh_twice([], [compute])
+        host_state = self.host_manager.host_state_map[('host2', 'node2')]
+        self.assertEqual(256, host_state.free_ram_mb)
+        self.assertEqual(now, self.host_manager._computes_changed_since)
+        self.assertEqual(7, self.host_manager.refresh_stats['rows_fetched'])
+
+    def test_get_all_host_states_deleted_compute(self):
+        compute = self._make_compute('host2', deleted=True,
+                                     deleted_at=self.then)
+        self._refresh_twice([], [compute])
+        self.assertEqual(set([('host1', 'node1'), ('host3', 'node3')]),
+                         set(self.host_manager.host_state_map))
+
+    def test_get_all_host_states_disabled_service(self):
+        service = self._make_service('host3', disabled=True,
+                                     updated_at=self.then)
+        self._refresh_twice([service], [])
+        self.assertEqual(set([('host1', 'node1'), ('host2', 'node2')]),
+                         set(self.host_manager.host_state_map))
+        self.assertNotIn('host3', self.host_manager.service_refs)
+        self.assertEqual({'host1': set([('host1', 'node1')]),
+                          'host2': set([('host2', 'node2')])},
+                         self.host_manager.host_state_keys)
+
+    def test_get_all_host_states_changed_service(self):
+        service = self._make_service('host2', updated_at=self.then,
+                                     report_count=42)
+        with mock.patch.object(host_manager.HostState,
+                               'update_service') as mock_update:
+            self._refresh_twice([service], [])
+        # 3 host states created by the full refresh and the one updated
+        self.assertEqual(4, mock_update.call_count)
+        self.assertEqual(42, mock_update.call_args[0][0]['report_count'])
+        self.assertEqual(set([('host2', 'node2')]),
+                         self.host_manager.host_state_keys['host2'])
+
+    @mock.patch('nova.objects.ComputeNodeList.get_all_by_host')
+    def test_get_all_host_states_enabled_service(self, mock_get_by_host):
+        compute = self._make_compute('host4', updated_at=self.then)
+        mock_get_by_host.return_value = [compute]
+        service = self._make_service('host4', updated_at=self.then)
+        self._refresh_twice([service], [])
+        mock_get_by_host.assert_called_once_with(self.context, 'host4')
+        host_state = self.host_manager.host_state_map[('host4', 'node4')]
+        self.assertEqual('host4', host_state.service['host'])
+
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_full_refresh_interval(self, mock_get_svc,
+                                                       mock_get_all):
+        self.flags(scheduler_host_state_full_refresh_interval=30)
+        mock_get_svc.return_value = self.services
+        mock_get_all.return_value = self.computes
+        self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(60)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertEqual(2, self.host_manager.refresh_stats['full_refreshes'])
+
+    @mock.patch('nova.objects.ComputeNodeList.get_all')
+    @mock.patch('nova.objects.ServiceList.get_by_binary')
+    def test_get_all_host_states_disabled(self, mock_get_svc, mock_get_all):
+        self.flags(scheduler_incremental_host_state_refresh=False)
+        mock_get_svc.return_value = self.services
+        mock_get_all.return_value = self.computes
+        self.host_manager.get_all_host_states(self.context)
+        self.host_manager.get_all_host_states(self.context)
+        self.assertEqual(2, mock_get_all.call_count)
+        self.assertIsNone(self.host_manager._computes_changed_since)
+
+
+class HostManagerRefreshServicesTestCase(test.TestCase):
+    """Test case for the refresh of the services of the host states."""
+
+    @mock.patch.object(host_manager.HostManager, '_init_instance_info')
+    @mock.patch.object(host_manager.HostManager, '_init_aggregates')
+    def setUp(self, mock_init_agg, mock_init_inst):
+        super(HostManagerRefreshServicesTestCase, self).setUp()
+        self.context = nova_context.get_admin_context()
+        self.host_manager = host_manager.HostManager()
+        self.useFixture(test.TimeOverride())
+        self.services = {}
+        for host in ('host1', 'host2', 'host3'):
+            service = objects.Service(self.context, host=host,
+                                      binary='nova-compute', topic='compute',
+                                      report_count=0)
+            service.create()
+            self.services[host] = service
+            db.compute_node_create(self.context, {
+                'vcpus': 2, 'memory_mb': 1024, 'local_gb': 2048,
+                'vcpus_used': 0, 'memory_mb_used': 0, 'local_gb_used': 0,
+                'free_ram_mb': 1024, 'free_disk_gb': 2048,
+                'hypervisor_type': 'fake', 'hypervisor_version': 1,
+                'cpu_info': '', 'running_vms': 0, 'current_workload': 0,
+                'service_id': service.id, 'host': host,
+                'disk_available_least': 100,
+                'hypervisor_hostname': host.replace('host', 'node'),
+                'host_ip': '127.0.0.1', 'supported_instances': '[]',
+                'pci_stats': None, 'metrics': '[]', 'extra_resources': '',
+                'stats': '{}', 'numa_topology': ''})
+        with mock.patch.object(objects.InstanceList, 'get_by_host',
+                               return_value=objects.InstanceList()):
+            self.host_manager.get_all_host_states(self.context)
+        timeutils.advance_time_seconds(60)
+
+    def _host_state(self, host):
+        return self.host_manager.host_state_map[
+            (host, host.replace('host', 'node'))]
+
+    def test_refresh_services(self):
+        self.services['host1'].disabled = True
+        self.services['host1'].save()
+        self.services['host2'].report_count = 1
+        self.services['host2'].save()
+        self.services['host3'].destroy()
+
+        removed = self.host_manager.refresh_services(self.context)
+
+        self.assertEqual(set([('host3', 'node3')]), removed)
+        self.assertEqual(set([('host1', 'node1'), ('host2', 'node2')]),
+                         set(self.host_manager.host_state_map))
+        self.assertNotIn('host3', self.host_manager.service_refs)
+        self.assertTrue(self._host_state('host1').service['disabled'])
+        self.assertEqual(1, self._host_state('host2').service['report_count'])
+        self.assertEqual(9, self.host_manager.refresh_stats['rows_fetched'])
+
+        # Enabling the service again is seen by the next refresh.
+        timeutils.advance_time_seconds(60)
+        self.services['host1'].disabled = False
+        self.services['host1'].save()
+        self.assertEqual(set(),
+                         self.host_manager.refresh_services(self.context))
+        self.assertFalse(self._host_state('host1').service['disabled'])
+
+    def test_refresh_services_unchanged(self):
+        self.assertEqual(set(),
+                         self.host_manager.refresh_services(self.context))
+        self.assertEqual(3, len(self.host_manager.host_state_map))
+
+    def test_refresh_services_not_loaded(self):
+        self.host_manager._services_refreshed_since = None
+        with mock.patch.object(objects.ServiceList,
+                               'get_by_binary_changed_since') as mock_get:
+            self.assertEqual(set(),
+                             self.host_manager.refresh_services(self.context))
+        self.assertFalse(mock_get.called)
+
+
 class HostStateTestCase(test.NoDBTestCase):
     """Test case for HostState class."""
 
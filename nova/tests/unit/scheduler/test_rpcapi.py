@@ -101,3 +101,31 @@ class SchedulerRpcAPITestCase(test.NoDBTestCase):
                 instance_uuids=['fake1', 'fake2'],
                 fanout=True,
                 version='4.2')
+
+    def test_update_compute_node(self):
+        self._test_scheduler_api('update_compute_node', rpc_method='cast',
+                compute_node='fake_compute_node',
+                fanout=True,
+                version='4.3')
+
+    def test_update_compute_node_old_scheduler(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.mox.StubOutWithMock(rpcapi, 'client')
+        rpcapi.client.can_send_version('4.3').AndReturn(False)
+        # NOTE: Nothing is sent to schedulers not knowing the method, so
+        # prepare() must not be called.
+        self.mox.ReplayAll()
+        self.assertIsNone(rpcapi.update_compute_node(ctxt,
+                                                     'fake_compute_node'))
+
+    def test_get_timings(self):
+        ctxt = context.RequestContext('fake_user', 'fake_project')
+        rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.mox.StubOutWithMock(rpcapi, 'client')
+        rpcapi.client.prepare(version='4.4',
+                              server='fake_host').AndReturn(rpcapi.client)
+        rpcapi.client.call(ctxt, 'get_timings').AndReturn('fake_timings')
+        self.mox.ReplayAll()
+        self.assertEqual('fake_timings',
+                         rpcapi.get_timings(ctxt, host='fake_host'))
@@ -104,6 +104,43 @@ class SchedulerManagerTestCase(test.NoDBTestCase):
                                               mock.sentinel.host_name,
                                               mock.sentinel.instance_uuids)
 
+    def test_update_compute_node(self):
+        with mock.patch.object(self.manager.driver.host_manager,
+                               'update_compute_node') as mock_update:
+            self.manager.update_compute_node(mock.sentinel.context,
+                                             mock.sentinel.compute_node)
+            mock_update.assert_called_once_with(mock.sentinel.context,
+                                                mock.sentinel.compute_node)
+
+    def test_get_timings(self):
+        timings = self.manager.driver.host_manager.timings
+        timings.record('filter.RamFilter', 0.002, 10, 5)
+        summary = self.manager.get_timings(self.context)
+        self.assertEqual(['filter.RamFilter'], list(summary))
+        self.assertEqual(1, summary['filter.RamFilter']['count'])
+
+    def test_get_timings_disabled(self):
+        self.manager.driver.host_manager.timings = None
+        self.assertEqual({}, self.manager.get_timings(self.context))
+
+    @mock.patch.object(manager.LOG, 'info')
+    def test_log_timings(self, mock_info):
+        timings = self.manager.driver.host_manager.timings
+        timings.record('filter.RamFilter', 0.002, 10, 5)
+        timings.record('weigher.RAMWeigher', 0.001, 5, 5)
+        self.manager._log_timings(self.context)
+        self.assertEqual(2, mock_info.call_count)
+        self.assertEqual('filter.RamFilter',
+                         mock_info.call_args_list[0][0][1]['name'])
+
+    @mock.patch.object(manager.LOG, 'info')
+    def test_log_timings_disabled(self, mock_info):
+        self.flags(scheduler_timing_log_interval=0)
+        self.manager.driver.host_manager.timings.record('filter.RamFilter',
+                                                        0.002, 10, 5)
+        self.manager._log_timings(self.context)
+        self.assertFalse(mock_info.called)
+
 
 class SchedulerV3PassthroughTestCase(test.TestCase):
 
@@ -0,0 +1,85 @@
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Tests For Scheduler timings.
+"""
+
+import mock
+
+from nova.scheduler import timing
+from nova import test
+
+
+class RollingHistogramTestCase(test.NoDBTestCase):
+
+    def setUp(self):
+        super(RollingHistogramTestCase, self).setUp()
+        self.histogram = timing.RollingHistogram(100)
+
+    def test_summary(self):
+        for i in range(98):
+            self.histogram.record(0.0007, 10, 4, now=1000)
+        self.histogram.record(0.02, 10, 2, now=1001)
+        self.histogram.record(0.3, 10, 0, now=1002)
+        summary = self.histogram.summary(now=1003)
+        self.assertEqual(100, summary['count'])
+        self.assertEqual(1.0, summary['p50_ms'])
+        self.assertEqual(25.0, summary['p99_ms'])
+        self.assertEqual(300.0, summary['max_ms'])
+        self.assertAlmostEqual((98 * 0.7 + 20 + 300) / 100,
+                               summary['mean_ms'])
+        self.assertEqual(10.0, summary['mean_hosts_in'])
+        self.assertEqual(3.94, summary['mean_hosts_out'])
+
+    def test_summary_percentile_capped_by_max(self):
+        self.histogram.record(0.3, now=1000)
+        summary = self.histogram.summary(now=1000)
+        self.assertEqual(300.0, summary['p50_ms'])
+        self.assertEqual(300.0, summary['p99_ms'])
+
+    def test_summary_rolls(self):
+        self.histogram.record(0.3, now=1000)
+        self.histogram.record(0.001, now=1095)
+        self.assertEqual(2, self.histogram.summary(now=1099)['count'])
+        summary = self.histogram.summary(now=1101)
+        self.assertEqual(1, summary['count'])
+        self.assertEqual(1.0, summary['max_ms'])
+        self.assertIsNone(self.histogram.summary(now=1200))
+
+
+class TimingsTestCase(test.NoDBTestCase):
+
+    def test_summary(self):
+        timings = timing.Timings()
+        timings.record('filter.RamFilter', 0.001, 10, 5)
+        timings.record('filter.RamFilter', 0.003, 10, 5)
+        timings.record('weigher.RAMWeigher', 0.002, 5, 5)
+        summary = timings.summary()
+        self.assertEqual(['filter.RamFilter', 'weigher.RAMWeigher'],
+                         sorted(summary))
+        self.assertEqual(2, summary['filter.RamFilter']['count'])
+        self.assertEqual(600, timings.window)
+
+    @mock.patch('time.time', return_value=1000)
+    def test_summary_expired(self, mock_time):
+        timings = timing.Timings(window=60)
+        timings.record('filter.RamFilter', 0.001, 10, 5)
+        mock_time.return_value = 1061
+        self.assertEqual({}, timings.summary())
+
+    def test_get_timings(self):
+        self.assertIsInstance(timing.get_timings(), timing.Timings)
+        self.flags(scheduler_timing_enabled=False)
+        self.assertIsNone(timing.get_timings())
@@ -16,6 +16,9 @@
 Tests For Scheduler weights.
 """
 
+import mock
+
+from nova.scheduler.filters import columnar
 from nova.scheduler import weights
 from nova.scheduler.weights import io_ops
 from nova.scheduler.weights import metrics
@@ -38,3 +41,122 @@ class TestWeighedHost(test.NoDBTestCase):
         self.assertIn(ram.RAMWeigher, classes)
         self.assertIn(metrics.MetricsWeigher, classes)
         self.assertIn(io_ops.IoOpsWeigher, classes)
+
+
+class VectorizedHostWeightHandlerTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(VectorizedHostWeightHandlerTestCase, self).setUp()
+        if columnar.numpy is None:
+            self.skipTest('numpy is not installed')
+        self.weight_handler = weights.HostWeightHandler()
+        self.flags(io_ops_weight_multiplier=2.0)
+
+    def _get_all_hosts(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512, 'num_io_ops': 3}),
+            ('host2', 'node2', {'free_ram_mb': 1024, 'num_io_ops': 0}),
+            ('host3', 'node3', {'free_ram_mb': 3072, 'num_io_ops': 7}),
+            ('host4', 'node4', {'free_ram_mb': 8192, 'num_io_ops': 1}),
+            ('host5', 'node5', {'free_ram_mb': 1024, 'num_io_ops': 0}),
+        ]
+        return [fakes.FakeHostState(host, node, values)
+                for host, node, values in host_values]
+
+    def _get_weighed_hosts(self, vectorized, limit=None):
+        self.flags(scheduler_use_vectorized_weighers=vectorized)
+        weighers = [ram.RAMWeigher(), io_ops.IoOpsWeigher()]
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+            weighers, self._get_all_hosts(), {}, limit=limit)
+        return ([(weighed.obj.host, weighed.weight)
+                 for weighed in weighed_hosts],
+                [(weigher.minval, weigher.maxval) for weigher in weighers])
+
+    def test_same_weights_as_weigh_objects(self):
+        self.assertEqual(self._get_weighed_hosts(False),
+                         self._get_weighed_hosts(True))
+
+    def test_records_timings(self):
+        self.weight_handler.timings = mock.Mock()
+        self._get_weighed_hosts(True)
+        self.assertEqual(
+            [('weigher.RAMWeigher', 5, 5), ('weigher.IoOpsWeigher', 5, 5)],
+            [(call[0][0], call[0][2], call[0][3]) for call in
+             self.weight_handler.timings.record.call_args_list])
+
+    def test_same_weights_as_weigh_objects_with_limit(self):
+        weighed_hosts, _ = self._get_weighed_hosts(True, limit=2)
+        self.assertEqual(self._get_weighed_hosts(False)[0][:2],
+                         weighed_hosts)
+
+    def test_weigher_without_vectorized_form(self):
+        class FakeWeigher(weights.BaseHostWeigher):
+            def _weigh_object(self, host_state, weight_properties):
+                return len(host_state.host) + host_state.free_ram_mb % 3
+
+        results = []
+        for vectorized in (False, True):
+            self.flags(scheduler_use_vectorized_weighers=vectorized)
+            weighers = [ram.RAMWeigher(), FakeWeigher()]
+            weighed_hosts = self.weight_handler.get_weighed_objects(
+                weighers, self._get_all_hosts(), {})
+            results.append([(weighed.obj.host, weighed.weight)
+                            for weighed in weighed_hosts])
+        self.assertEqual(results[0], results[1])
+
+    def test_flat_weights(self):
+        self.flags(scheduler_use_vectorized_weighers=True)
+        hosts = [fakes.FakeHostState('host%d' % i, 'node', {'num_io_ops': 0})
+                 for i in range(3)]
+        weighed_hosts = self.weight_handler.get_weighed_objects(
+            [io_ops.IoOpsWeigher()], hosts, {})
+        self.assertEqual([0.0] * 3,
+                         [weighed.weight for weighed in weighed_hosts])
+        self.assertEqual(['host0', 'host1', 'host2'],
+                         [weighed.obj.host for weighed in weighed_hosts])
+
+
+class HostRankingTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(HostRankingTestCase, self).setUp()
+        self.weight_handler = weights.HostWeightHandler()
+        self.weighers = [ram.RAMWeigher(), io_ops.IoOpsWeigher()]
+        self.hosts = [fakes.FakeHostState('host%d' % i, 'node',
+                                          {'free_ram_mb': 1024 * i,
+                                           'num_io_ops': i % 3})
+                      for i in range(6)]
+
+    def _get_weighed_hosts(self, hosts, limit=None):
+        # NOTE: The weighers remember the extreme weights, so this gives
+        # the weights the scheduler would get for the next instance.
+        return [(weighed.obj.host, weighed.weight) for weighed in
+                self.weight_handler.get_weighed_objects(self.weighers, hosts,
+                                                        {}, limit=limit)]
+
+    def test_get_best(self):
+        ranking = weights.HostRanking(self.weight_handler, self.weighers,
+                                      self.hosts, {})
+        self.assertEqual(self._get_weighed_hosts(self.hosts, limit=3),
+                         [(weighed.obj.host, weighed.weight)
+                          for weighed in ranking.get_best(3)])
+
+    def test_update(self):
+        ranking = weights.HostRanking(self.weight_handler, self.weighers,
+                                      self.hosts, {})
+        # The best host loses its RAM, a new maximum of io ops is reached
+        # and another host is filtered out.
+        self.hosts[5].free_ram_mb = 0
+        self.hosts[5].num_io_ops = 5
+        hosts = self.hosts[:2] + self.hosts[3:]
+        ranking.update(hosts, self.hosts[5])
+        self.assertEqual(5, self.weighers[1].maxval)
+        self.assertEqual(self._get_weighed_hosts(hosts),
+                         [(weighed.obj.host, weighed.weight)
+                          for weighed in ranking.get_best(10)])
+
+    def test_update_one_host_left(self):
+        ranking = weights.HostRanking(self.weight_handler, self.weighers,
+                                      self.hosts, {})
+        ranking.update(self.hosts[2:3], self.hosts[5])
+        self.assertEqual([('host2', 0.0)],
+                         [(weighed.obj.host, weighed.weight)
+                          for weighed in ranking.get_best(3)])
@@ -13,10 +13,14 @@
 #    under the License.
 
 import datetime
+
+import eventlet
 import mock
 
+from nova import db
 from nova import objects
 from nova import servicegroup
+from nova.servicegroup.drivers import db as db_driver
 from nova import test
 
 
@@ -75,3 +79,108 @@ class DBServiceGroupTestCase(test.NoDBTestCase):
         fn(service)
         upd_mock.assert_called_once_with()
         self.assertEqual(11, service_ref.report_count)
+
+    @mock.patch.object(objects.Service, 'heartbeat')
+    @mock.patch.object(objects.Service, 'save')
+    def test_report_state_heartbeat(self, mock_save, mock_heartbeat):
+        self.flags(heartbeat_flush_interval=1)
+        service_ref = objects.Service(host='fake-host', topic='compute',
+                                      report_count=10)
+        service = mock.MagicMock(model_disconnected=False,
+                                 service_ref=service_ref)
+        self.servicegroup_api._driver._report_state(service)
+        mock_heartbeat.assert_called_once_with()
+        self.assertFalse(mock_save.called)
+
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    def test_is_up_heartbeat_flush_interval(self, now_mock):
+        self.flags(heartbeat_flush_interval=5)
+        fts_func = datetime.datetime.fromtimestamp
+        now_mock.return_value = fts_func(1000)
+        service_ref = {'host': 'fake-host', 'topic': 'compute',
+                       'created_at': fts_func(900)}
+
+        service_ref['updated_at'] = fts_func(1000 - self.down_time - 5)
+        self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
+        service_ref['updated_at'] = fts_func(1000 - self.down_time - 6)
+        self.assertFalse(self.servicegroup_api.service_is_up(service_ref))
+
+    @mock.patch.object(objects.ServiceList, 'get_by_topic')
+    @mock.patch('oslo_utils.timeutils.utcnow')
+    def test_get_all(self, now_mock, mock_get):
+        self.flags(service_liveness_cache_time=10)
+        fts_func = datetime.datetime.fromtimestamp
+        now_mock.return_value = fts_func(1000)
+        mock_get.return_value = [
+            objects.Service(host='host-up', updated_at=fts_func(995),
+                            created_at=fts_func(900)),
+            objects.Service(host='host-down', updated_at=None,
+                            created_at=fts_func(900))]
+        self.assertEqual(['host-up'], self.servicegroup_api.get_all('compute'))
+
+        # The heartbeats read are cached
+        now_mock.return_value = fts_func(1005)
+        self.assertEqual(['host-up'], self.servicegroup_api.get_all('compute'))
+        self.assertEqual(1, mock_get.call_count)
+        # and more recent than the service record given here
+        service_ref = {'host': 'host-up', 'topic': 'compute',
+                       'updated_at': fts_func(900),
+                       'created_at': fts_func(900)}
+        self.assertTrue(self.servicegroup_api.service_is_up(service_ref))
+
+        now_mock.return_value = fts_func(1011)
+        self.assertEqual([], self.servicegroup_api.get_all('compute'))
+        self.assertEqual(2, mock_get.call_count)
+
+
+class HeartbeatBufferTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(HeartbeatBufferTestCase, self).setUp()
+        self.buffer = db_driver._HeartbeatBuffer()
+        self.heartbeat1 = datetime.datetime(2015, 6, 1, 12, 0, 0)
+        self.heartbeat2 = datetime.datetime(2015, 6, 1, 12, 0, 5)
+
+    @mock.patch.object(db, 'service_update_heartbeats')
+    def test_record(self, mock_update):
+        self.buffer.record(1, self.heartbeat1)
+        mock_update.assert_called_once_with(mock.ANY,
+                                            {1: (1, self.heartbeat1)})
+
+    @mock.patch.object(eventlet, 'spawn_after')
+    @mock.patch.object(db, 'service_update_heartbeats')
+    def test_record_held(self, mock_update, mock_spawn_after):
+        self.flags(heartbeat_flush_interval=2)
+        self.buffer.record(1, self.heartbeat1)
+        self.buffer.record(2, self.heartbeat1)
+        self.buffer.record(1, self.heartbeat2)
+        mock_spawn_after.assert_called_once_with(2, self.buffer.flush)
+        self.assertFalse(mock_update.called)
+
+        self.buffer.flush()
+        mock_update.assert_called_once_with(
+            mock.ANY, {1: (2, self.heartbeat2), 2: (1, self.heartbeat1)})
+        self.buffer.record(1, self.heartbeat2)
+        self.assertEqual(2, mock_spawn_after.call_count)
+
+    @mock.patch.object(db_driver, 'HEARTBEAT_BATCH_SIZE', 2)
+    @mock.patch.object(eventlet, 'spawn_after')
+    @mock.patch.object(db, 'service_update_heartbeats')
+    def test_flush_batches(self, mock_update, mock_spawn_after):
+        self.flags(heartbeat_flush_interval=2)
+        for service_id in range(3):
+            self.buffer.record(service_id, self.heartbeat1)
+        self.buffer.flush()
+        self.assertEqual(
+            [mock.call(mock.ANY, {0: (1, self.heartbeat1),
+                                  1: (1, self.heartbeat1)}),
+             mock.call(mock.ANY, {2: (1, self.heartbeat1)})],
+            mock_update.call_args_list)
+
+    @mock.patch.object(db, 'service_update_heartbeats',
+                       side_effect=[test.TestingException, 1])
+    def test_flush_failed(self, mock_update):
+        self.buffer.record(1, self.heartbeat1)
+        self.buffer.record(1, self.heartbeat2)
+        self.assertEqual(2, mock_update.call_count)
+        self.assertEqual({1: (2, self.heartbeat2)},
+                         mock_update.call_args[0][1])
@@ -26,6 +26,7 @@ from nova.db import migration
 from nova.db.sqlalchemy import migration as sqla_migration
 from nova import exception
 from nova import objects
+from nova.scheduler import rpcapi as scheduler_rpcapi
 from nova import test
 from nova.tests.unit.db import fakes as db_fakes
 from nova.tests.unit import fake_instance
@@ -383,6 +384,18 @@ class DBCommandsTestCase(test.TestCase):
     def test_archive_deleted_rows_negative(self):
         self.assertEqual(1, self.commands.archive_deleted_rows(-1))
 
+    @mock.patch.object(db, 'archive_deleted_rows',
+                       return_value={'instances': 10, 'consoles': 5})
+    def test_archive_deleted_rows_verbose(self, mock_archive):
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout',
+                                             StringIO.StringIO()))
+        self.commands.archive_deleted_rows(20, verbose=True)
+        mock_archive.assert_called_once_with(mock.ANY, 20)
+        output = sys.stdout.getvalue()
+        self.assertIn('consoles', output)
+        self.assertIn('instances', output)
+        self.assertIn('Archived 15 rows', output)
+
     @mock.patch.object(migration, 'db_null_instance_uuid_scan',
                        return_value={'foo': 0})
     def test_null_instance_uuid_scan_no_records_found(self, mock_scan):
@@ -455,6 +468,38 @@ class ServiceCommandsTestCase(test.TestCase):
         self.assertEqual(2, self.commands.disable('nohost', 'noservice'))
 
 
+class SchedulerCommandsTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(SchedulerCommandsTestCase, self).setUp()
+        self.commands = manage.SchedulerCommands()
+        self.output = StringIO.StringIO()
+        self.useFixture(fixtures.MonkeyPatch('sys.stdout', self.output))
+
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'get_timings')
+    def test_timings(self, mock_get_timings):
+        mock_get_timings.return_value = {
+            'filter.RamFilter': {'count': 3, 'mean_ms': 0.5, 'p50_ms': 0.5,
+                                 'p99_ms': 1.0, 'max_ms': 1.0,
+                                 'mean_hosts_in': 10.0,
+                                 'mean_hosts_out': 5.0}}
+        self.commands.timings(host='fake-host')
+
+        mock_get_timings.assert_called_once_with(mock.ANY, host='fake-host')
+        self.assertTrue(mock_get_timings.call_args[0][0].is_admin)
+        lines = self.output.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual(['filter.RamFilter', '3', '0.500', '0.500', '1.000',
+                          '1.000', '10.0', '5.0'], lines[1].split())
+
+    @mock.patch.object(scheduler_rpcapi.SchedulerAPI, 'get_timings',
+                       return_value={})
+    def test_timings_none(self, mock_get_timings):
+        self.commands.timings()
+
+        mock_get_timings.assert_called_once_with(mock.ANY, host=None)
+        self.assertIn('No scheduler timings', self.output.getvalue())
+
+
 class CellCommandsTestCase(test.TestCase):
     def setUp(self):
         super(CellCommandsTestCase, self).setUp()
@@ -16,6 +16,7 @@
 
 import datetime
 
+import mock
 from oslo_config import cfg
 from oslo_utils import timeutils
 from six.moves import range
@@ -475,6 +476,62 @@ class BaseResourceTestCase(test.TestCase):
                           resources, 'check')
 
 
+class LimitsCacheTestCase(test.NoDBTestCase):
+    def setUp(self):
+        super(LimitsCacheTestCase, self).setUp()
+        self.flags(quota_limits_cache_ttl=60)
+        self.cache = quota._LimitsCache()
+        self.loads = 0
+
+    def _load(self):
+        self.loads += 1
+        return {'instances': self.loads}
+
+    def test_get(self):
+        self.assertEqual({'instances': 1}, self.cache.get('key', self._load))
+        self.assertEqual({'instances': 1}, self.cache.get('key', self._load))
+        self.assertEqual({'instances': 2},
+                         self.cache.get('other', self._load))
+        self.assertEqual(2, self.loads)
+
+    def test_get_copy(self):
+        self.cache.get('key', self._load)['instances'] = 10
+        self.assertEqual({'instances': 1}, self.cache.get('key', self._load))
+
+    def test_get_disabled(self):
+        self.flags(quota_limits_cache_ttl=0)
+        self.cache.get('key', self._load)
+        self.assertEqual({'instances': 2}, self.cache.get('key', self._load))
+
+    @mock.patch('time.time')
+    def test_get_expired(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.get('key', self._load)
+        mock_time.return_value = 1059
+        self.assertEqual({'instances': 1}, self.cache.get('key', self._load))
+        mock_time.return_value = 1060
+        self.assertEqual({'instances': 2}, self.cache.get('key', self._load))
+
+    def test_invalidate(self):
+        self.cache.get('key', self._load)
+        self.cache.invalidate()
+        self.assertEqual({'instances': 2}, self.cache.get('key', self._load))
+
+    def test_invalidate_while_loading(self):
+        def load():
+            self.cache.invalidate()
+            return self._load()
+
+        self.assertEqual({'instances': 1}, self.cache.get('key', load))
+        self.assertEqual({'instances': 2}, self.cache.get('key', self._load))
+
+    @mock.patch.object(quota, '_LIMITS_CACHE_SIZE', 2)
+    def test_get_full(self):
+        for key in range(3):
+            self.cache.get(key, self._load)
+        self.assertEqual(1, len(self.cache._entries))
+
+
 class QuotaEngineTestCase(test.TestCase):
     def test_init(self):
         quota_obj = quota.QuotaEngine()
@@ -953,6 +1010,41 @@ class DbQuotaDriverTestCase(test.TestCase):
 
         self._stub_quota_class_get_all_by_name()
 
+    def test_get_project_quotas_cached_limits(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self.stubs.Set(quota, '_LIMITS_CACHE', quota._LimitsCache())
+        self._stub_get_by_project()
+        context = FakeContext('test_project', 'test_class')
+        result = self.driver.get_project_quotas(
+            context, quota.QUOTAS._resources, 'test_project')
+        self.calls = []
+        self.assertEqual(result, self.driver.get_project_quotas(
+            context, quota.QUOTAS._resources, 'test_project'))
+        self.assertEqual(self.calls, ['quota_usage_get_all_by_project'])
+
+        self.calls = []
+        quota.invalidate_limits_cache()
+        self.driver.get_project_quotas(context, quota.QUOTAS._resources,
+                                       'test_project', usages=False)
+        self.assertEqual(self.calls, [
+                'quota_get_all_by_project',
+                'quota_class_get_all_by_name',
+                'quota_class_get_default',
+                ])
+
+    def test_get_project_quotas_cached_limits_other_project(self):
+        self.flags(quota_limits_cache_ttl=60)
+        self.stubs.Set(quota, '_LIMITS_CACHE', quota._LimitsCache())
+        self._stub_get_by_project()
+        self.driver.get_project_quotas(
+            FakeContext('test_project', 'test_class'),
+            quota.QUOTAS._resources, 'test_project', usages=False)
+        self.assertRaises(exception.Forbidden,
+                          self.driver.get_project_quotas,
+                          FakeContext('other_project', 'test_class'),
+                          quota.QUOTAS._resources, 'test_project',
+                          usages=False)
+
     def test_get_user_quotas(self):
         self.maxDiff = None
         self._stub_get_by_project_and_user()
@@ -2310,6 +2402,32 @@ class DbQuotaDriverTestCase(test.TestCase):
                 ])
         self.assertEqual(result, ['resv-1', 'resv-2', 'resv-3'])
 
+    def test_reserve_optimistic(self):
+        self.driver = quota.OptimisticDbQuotaDriver()
+        self._stub_get_project_quotas()
+        self._stub_quota_reserve()
+
+        def fake_quota_reserve_optimistic(context, resources, quotas,
+                                          user_quotas, deltas, expire,
+                                          until_refresh, max_age,
+                                          project_id=None, user_id=None):
+            self.calls.append(('quota_reserve_optimistic', expire,
+                               until_refresh, max_age, project_id, user_id))
+            return ['resv-1']
+        self.stubs.Set(db, 'quota_reserve_optimistic',
+                       fake_quota_reserve_optimistic)
+        expire = timeutils.utcnow() + datetime.timedelta(seconds=120)
+        result = self.driver.reserve(FakeContext('test_project', 'test_class'),
+                                     quota.QUOTAS._resources,
+                                     dict(instances=2), expire=expire)
+
+        self.assertEqual(self.calls, [
+                'get_project_quotas',
+                ('quota_reserve_optimistic', expire, 0, 0, 'test_project',
+                 'fake_user'),
+                ])
+        self.assertEqual(result, ['resv-1'])
+
     def test_usage_reset(self):
         calls = []
 
@@ -26,6 +26,7 @@ from oslo_concurrency import processutils
 from oslo_config import cfg
 import testtools
 
+from nova.db import profiler as db_profiler
 from nova import exception
 from nova import manager
 from nova import objects
@@ -258,6 +259,22 @@ class ServiceTestCase(test.NoDBTestCase):
         serv.rpcserver.stop.assert_called_once_with()
         serv.rpcserver.wait.assert_called_once_with()
 
+    @mock.patch('nova.servicegroup.API')
+    @mock.patch('nova.objects.service.Service.get_by_host_and_binary')
+    @mock.patch.object(rpc, 'get_server')
+    def test_service_start_db_profiler(
+            self, mock_rpc, mock_svc_get_by_host_and_binary, mock_API):
+        self.flags(db_profiler_enabled=True)
+        serv = service.Service(self.host,
+                               self.binary,
+                               self.topic,
+                               'nova.tests.unit.test_service.FakeManager')
+        serv.start()
+        endpoints = mock_rpc.call_args[0][1]
+        self.assertTrue(all(isinstance(endpoint, db_profiler.ProfiledEndpoint)
+                            for endpoint in endpoints))
+        self.assertEqual(serv.manager, endpoints[0]._endpoint)
+
 
 class TestWSGIService(test.TestCase):
 
@@ -19,6 +19,7 @@ Tests For weights.
 import mock
 
 from nova.scheduler import weights as scheduler_weights
+from nova.scheduler.weights import ram
 from nova import test
 from nova.tests.unit.scheduler import fakes
 from nova import weights
@@ -71,3 +72,46 @@ class TestWeigher(test.NoDBTestCase):
         self.assertEqual(1, len(weighed_host))
         self.assertEqual('host1', weighed_host[0].obj.host)
         self.assertFalse(mock_weigh.called)
+
+    def test_get_weighed_objects_limit(self):
+        host_values = [
+            ('host1', 'node1', {'free_ram_mb': 512}),
+            ('host2', 'node2', {'free_ram_mb': 8192}),
+            ('host3', 'node3', {'free_ram_mb': 1024}),
+            ('host4', 'node4', {'free_ram_mb': 8192}),
+        ]
+        hostinfo = [fakes.FakeHostState(host, node, values)
+                    for host, node, values in host_values]
+
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weighers = [ram.RAMWeigher()]
+        weighed_hosts = weight_handler.get_weighed_objects(weighers,
+                                                           hostinfo, {})
+        best_hosts = weight_handler.get_weighed_objects(weighers,
+                                                        hostinfo, {},
+                                                        limit=2)
+        self.assertEqual(['host2', 'host4'],
+                         [weighed.obj.host for weighed in best_hosts])
+        self.assertEqual([(weighed.obj, weighed.weight)
+                          for weighed in weighed_hosts[:2]],
+                         [(weighed.obj, weighed.weight)
+                          for weighed in best_hosts])
+
+    def test_get_weighed_objects_records_timings(self):
+        hostinfo = [fakes.FakeHostState('host1', 'node1',
+                                        {'free_ram_mb': 512}),
+                    fakes.FakeHostState('host2', 'node2',
+                                        {'free_ram_mb': 1024})]
+        weight_handler = scheduler_weights.HostWeightHandler()
+        weight_handler.timings = mock.Mock()
+        weight_handler.get_weighed_objects([ram.RAMWeigher()], hostinfo, {})
+        weight_handler.timings.record.assert_called_once_with(
+            'weigher.RAMWeigher', mock.ANY, 2, 2)
+
+    def test_best_weighed(self):
+        items = [3, 1, 4, 1, 5, 9, 2, 6]
+        self.assertEqual([9, 6, 5], weights.best_weighed(items, abs, 3))
+        self.assertEqual(sorted(items, reverse=True),
+                         weights.best_weighed(items, abs))
+        self.assertEqual(sorted(items, reverse=True),
+                         weights.best_weighed(items, abs, 42))
@@ -8745,6 +8745,96 @@ class LibvirtConnTestCase(test.NoDBTestCase):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
         self.assertEqual(0, drvr._get_disk_over_committed_size_total())
 
+    def _test_disk_over_committed_size_total_cached(self, mock_list,
+                                                    mock_stat, mock_info):
+        dom = mock.MagicMock()
+        dom.name.return_value = 'instance0000001'
+        dom.UUIDString.return_value = '19479fee-07a5-49bb-9138-d3738280d63c'
+        dom.XMLDesc.return_value = '<domain/>'
+        mock_list.return_value = [dom]
+        mock_stat.return_value = mock.Mock(st_mtime=1000, st_size=83886080)
+        mock_info.return_value = jsonutils.dumps(
+            [{'type': 'qcow2', 'path': '/somepath/disk1',
+              'virt_disk_size': '10737418240',
+              'backing_file': '/somepath/disk1',
+              'disk_size': '83886080',
+              'over_committed_disk_size': '10653532160'}])
+
+        drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), False)
+        self.assertEqual(10653532160,
+                         drvr._get_disk_over_committed_size_total())
+        self.assertEqual(10653532160,
+                         drvr._get_disk_over_committed_size_total())
+        mock_stat.assert_called_with('/somepath/disk1')
+        return drvr, dom
+
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info")
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_disk_over_committed_size_total_cached(self, mock_list,
+                                                   mock_stat, mock_info):
+        self._test_disk_over_committed_size_total_cached(
+            mock_list, mock_stat, mock_info)
+        mock_info.assert_called_once_with('instance0000001', '<domain/>')
+
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info")
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_disk_over_committed_size_total_disk_changed(self, mock_list,
+                                                         mock_stat,
+                                                         mock_info):
+        drvr, dom = self._test_disk_over_committed_size_total_cached(
+            mock_list, mock_stat, mock_info)
+        mock_stat.return_value = mock.Mock(st_mtime=2000, st_size=83886080)
+        drvr._get_disk_over_committed_size_total()
+        self.assertEqual(2, mock_info.call_count)
+
+        dom.XMLDesc.return_value = '<domain><devices/></domain>'
+        drvr._get_disk_over_committed_size_total()
+        self.assertEqual(3, mock_info.call_count)
+
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info")
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_disk_over_committed_size_total_disk_grew(self, mock_list,
+                                                      mock_stat, mock_info):
+        drvr, dom = self._test_disk_over_committed_size_total_cached(
+            mock_list, mock_stat, mock_info)
+        # The size reported by qemu-img no longer matches the file, so the
+        # disks are inspected again until it does.
+        mock_stat.return_value = mock.Mock(st_mtime=1000, st_size=93886080)
+        drvr._get_disk_over_committed_size_total()
+        drvr._get_disk_over_committed_size_total()
+        self.assertEqual(3, mock_info.call_count)
+        self.assertNotIn(dom.UUIDString(), drvr._disk_info_cache)
+
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info")
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_disk_over_committed_size_total_invalidated(self, mock_list,
+                                                        mock_stat,
+                                                        mock_info):
+        drvr, dom = self._test_disk_over_committed_size_total_cached(
+            mock_list, mock_stat, mock_info)
+        instance = objects.Instance(uuid=dom.UUIDString())
+        with mock.patch.object(drvr, '_destroy'):
+            with mock.patch.object(drvr, 'cleanup'):
+                drvr.destroy(self.context, instance, [])
+        drvr._get_disk_over_committed_size_total()
+        self.assertEqual(2, mock_info.call_count)
+
+    @mock.patch.object(libvirt_driver.LibvirtDriver, "_get_instance_disk_info")
+    @mock.patch.object(os, 'stat')
+    @mock.patch.object(host.Host, "list_instance_domains")
+    def test_disk_over_committed_size_total_domain_gone(self, mock_list,
+                                                        mock_stat,
+                                                        mock_info):
+        drvr, dom = self._test_disk_over_committed_size_total_cached(
+            mock_list, mock_stat, mock_info)
+        mock_list.return_value = []
+        self.assertEqual(0, drvr._get_disk_over_committed_size_total())
+        self.assertEqual({}, drvr._disk_info_cache)
+
     def test_cpu_info(self):
         drvr = libvirt_driver.LibvirtDriver(fake.FakeVirtAPI(), True)
 
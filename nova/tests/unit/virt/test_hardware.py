@@ -1465,6 +1465,91 @@ class VirtNUMAHostTopologyTestCase(test.NoDBTestCase):
                                                         pci_stats=pci_stats)
             self.assertIsNone(fitted_instance1)
 
+    def test_get_fitting_pci_no_stats(self):
+        pci_request = objects.InstancePCIRequest(count=1,
+            spec=[{'vendor_id': '8086'}])
+        fitted_instance1 = hw.numa_fit_instance_to_host(
+            self.host, self.instance1, pci_requests=[pci_request])
+        self.assertIsNone(fitted_instance1)
+
+    def test_get_fitting_does_not_modify_instance(self):
+        fitted_instance = hw.numa_fit_instance_to_host(
+                self.host, self.instance3, self.limits)
+        self.assertEqual(1, fitted_instance.cells[0].id)
+        self.assertEqual(0, self.instance3.cells[0].id)
+
+    def _get_host_topology(self, num_cells, memory_usage=0):
+        return objects.NUMATopology(cells=[
+            objects.NUMACell(id=i, cpuset=set([2 * i, 2 * i + 1]),
+                             memory=2048, cpu_usage=0,
+                             memory_usage=memory_usage * i,
+                             mempages=[], siblings=[],
+                             pinned_cpus=set([]))
+            for i in range(num_cells)])
+
+    def _get_instance_topology(self, num_cells, memory=512):
+        return objects.InstanceNUMATopology(cells=[
+            objects.InstanceNUMACell(id=i, cpuset=set([2 * i, 2 * i + 1]),
+                                     memory=memory)
+            for i in range(num_cells)])
+
+    def test_get_fitting_follows_permutations_order(self):
+        host = self._get_host_topology(4)
+        host.cells[0].memory_usage = 4096
+        fitted_instance = hw.numa_fit_instance_to_host(
+            host, self._get_instance_topology(2), self.limits)
+        self.assertEqual([1, 2], [cell.id for cell in fitted_instance.cells])
+
+    def test_get_fitting_pack(self):
+        host = self._get_host_topology(4, memory_usage=256)
+        fitted_instance = hw.numa_fit_instance_to_host(
+            host, self._get_instance_topology(2), self.limits,
+            strategy='pack')
+        self.assertEqual([3, 2], [cell.id for cell in fitted_instance.cells])
+
+    def test_get_fitting_spread(self):
+        host = self._get_host_topology(4, memory_usage=256)
+        host.cells[0].memory_usage = 1024
+        fitted_instance = hw.numa_fit_instance_to_host(
+            host, self._get_instance_topology(2), self.limits,
+            strategy='spread')
+        self.assertEqual([1, 2], [cell.id for cell in fitted_instance.cells])
+
+    def test_get_fitting_strategy_option(self):
+        self.flags(numa_fit_strategy='pack')
+        host = self._get_host_topology(4, memory_usage=256)
+        fitted_instance = hw.numa_fit_instance_to_host(
+            host, self._get_instance_topology(1), self.limits)
+        self.assertEqual(3, fitted_instance.cells[0].id)
+
+    @mock.patch.object(hw, '_numa_fit_instance_cell')
+    def test_get_fitting_prunes_full_cells(self, mock_fit):
+        host = self._get_host_topology(8)
+        for cell in host.cells[:7]:
+            cell.memory_usage = 4096
+        fitted_instance = hw.numa_fit_instance_to_host(
+            host, self._get_instance_topology(2), self.limits)
+        self.assertIsNone(fitted_instance)
+        self.assertFalse(mock_fit.called)
+
+    def test_get_fitting_fits_each_cell_once(self):
+        host = self._get_host_topology(6)
+        pci_request = objects.InstancePCIRequest(count=1,
+            spec=[{'vendor_id': '8086'}])
+        pci_stats = stats.PciDeviceStats()
+        with mock.patch.object(hw, '_numa_fit_instance_cell',
+                               wraps=hw._numa_fit_instance_cell) as mock_fit:
+            with mock.patch.object(stats.PciDeviceStats, 'support_requests',
+                                   return_value=False) as mock_support:
+                fitted_instance = hw.numa_fit_instance_to_host(
+                    host, self._get_instance_topology(3), self.limits,
+                    pci_requests=[pci_request], pci_stats=pci_stats)
+        self.assertIsNone(fitted_instance)
+        # All the 6 * 5 * 4 permutations were tried, fitting each of the 3
+        # instance cells onto each of the 6 host cells once.
+        self.assertEqual(120, mock_support.call_count)
+        self.assertEqual(18, mock_fit.call_count)
+
 
 class NumberOfSerialPortsTest(test.NoDBTestCase):
     def test_flavor(self):
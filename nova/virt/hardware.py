@@ -30,6 +30,14 @@ virt_cpu_opts = [
     cfg.StrOpt('vcpu_pin_set',
                 help='Defines which pcpus that instance vcpus can use. '
                'For example, "4-12,^8,15"'),
+    cfg.StrOpt('numa_fit_strategy',
+               default='first',
+               choices=('first', 'pack', 'spread'),
+               help='Which host NUMA cells are tried first when fitting an '
+                    'instance NUMA topology onto a host: "first" follows '
+                    'the order of the host cells, "pack" prefers the cells '
+                    'with the least free memory and CPUs left, and "spread" '
+                    'the cells with the most.'),
 ]
 
 CONF = cfg.CONF
@@ -993,9 +1001,57 @@ def numa_get_constraints(flavor, image_meta):
     return _add_cpu_pinning_constraint(flavor, image_meta, numa_topology)
 
 
+def _numa_cell_has_capacity(host_cell, instance_cell, limit_cell=None):
+    """Cheaply check if the free capacity of a host cell can hold an
+    instance cell
+
+    :param host_cell: host cell to fit the instance cell onto
+    :param instance_cell: instance cell we want to fit
+    :param limit_cell: an objects.NUMATopologyLimit or None
+
+    This only looks at the CPU and memory counters of the host cell, so
+    a cell passing it may still be refused by _numa_fit_instance_cell,
+    but a cell failing it would be refused as well.
+
+    :returns: True if the instance cell may fit onto the host cell
+    """
+    if (instance_cell.memory > host_cell.memory or
+            len(instance_cell.cpuset) > len(host_cell.cpuset)):
+        return False
+
+    if instance_cell.cpu_pinning_requested:
+        return (host_cell.avail_cpus >= len(instance_cell.cpuset) and
+                host_cell.avail_memory >= instance_cell.memory)
+    elif limit_cell:
+        return (host_cell.memory_usage + instance_cell.memory <=
+                    host_cell.memory * limit_cell.ram_allocation_ratio and
+                host_cell.cpu_usage + len(instance_cell.cpuset) <=
+                    len(host_cell.cpuset) * limit_cell.cpu_allocation_ratio)
+    return True
+
+
+def _numa_sort_host_cells(host_cells, strategy):
+    """Return the host cells in the order they should be tried in
+
+    :param host_cells: list of objects.NUMACell
+    :param strategy: one of 'first', 'pack' or 'spread'
+
+    :returns: a list of objects.NUMACell
+    """
+    if strategy not in ('pack', 'spread'):
+        return list(host_cells)
+
+    def _free_capacity(cell):
+        return (cell.avail_memory,
+                min(cell.avail_cpus, len(cell.cpuset) - cell.cpu_usage))
+
+    return sorted(host_cells, key=_free_capacity,
+                  reverse=(strategy == 'spread'))
+
+
 def numa_fit_instance_to_host(
         host_topology, instance_topology, limits=None,
-        pci_requests=None, pci_stats=None):
+        pci_requests=None, pci_stats=None, strategy=None):
     """Fit the instance topology onto the host topology given the limits
 
     :param host_topology: objects.NUMATopology object to fit an instance on
@@ -1003,36 +1059,78 @@ def numa_fit_instance_to_host(
     :param limits: objects.NUMATopologyLimits that defines limits
     :param pci_requests: instance pci_requests
     :param pci_stats: pci_stats for the host
+    :param strategy: order in which the host cells are tried, one of
+                     'first', 'pack' or 'spread'. Defaults to the
+                     numa_fit_strategy option.
 
     Given a host and instance topology and optionally limits - this method
-    will attempt to fit instance cells onto all permutations of host cells
+    will attempt to fit instance cells onto the permutations of host cells
     by calling the _numa_fit_instance_cell method, and return a new
     InstanceNUMATopology with it's cell ids set to host cell id's of
     the first successful permutation, or None.
+
+    Host cells without the free capacity for an instance cell are left out
+    before permuting, and each instance cell is fitted at most once onto
+    each host cell, so the cost no longer grows with the number of
+    permutations. The cells of instance_topology are not modified.
     """
     if (not (host_topology and instance_topology) or
         len(host_topology) < len(instance_topology)):
         return
-    else:
-        # TODO(ndipanov): We may want to sort permutations differently
-        # depending on whether we want packing/spreading over NUMA nodes
-        for host_cell_perm in itertools.permutations(
-                host_topology.cells, len(instance_topology)):
-            cells = []
-            for host_cell, instance_cell in zip(
-                    host_cell_perm, instance_topology.cells):
-                got_cell = _numa_fit_instance_cell(
-                    host_cell, instance_cell, limits)
-                if got_cell is None:
-                    break
-                cells.append(got_cell)
-            if len(cells) == len(host_cell_perm):
-                if not pci_requests:
-                    return objects.InstanceNUMATopology(cells=cells)
-                elif ((pci_stats is not None) and
-                    pci_stats.support_requests(pci_requests,
-                                                     cells)):
-                    return objects.InstanceNUMATopology(cells=cells)
+
+    host_cells = _numa_sort_host_cells(host_topology.cells,
+                                       strategy or CONF.numa_fit_strategy)
+    instance_cells = instance_topology.cells
+
+    candidates = []
+    for instance_cell in instance_cells:
+        cell_candidates = [
+            host_index for host_index, host_cell in enumerate(host_cells)
+            if _numa_cell_has_capacity(host_cell, instance_cell, limits)]
+        if not cell_candidates:
+            return
+        candidates.append(cell_candidates)
+    if len(set(itertools.chain(*candidates))) < len(instance_cells):
+        return
+
+    # NOTE: _numa_fit_instance_cell() sets the id, the page size and the
+    # pinning of the instance cell it gets, so each host cell is given its
+    # own copy and the result is kept for the other permutations.
+    fitted_cells = {}
+
+    def _fit_cell(host_index, instance_index):
+        key = (host_index, instance_index)
+        if key not in fitted_cells:
+            instance_cell = instance_cells[instance_index].obj_clone()
+            fitted_cells[key] = _numa_fit_instance_cell(
+                host_cells[host_index], instance_cell, limits)
+        return fitted_cells[key]
+
+    def _permutations(instance_index, used):
+        # Yields the lists of fitted cells in the order of
+        # itertools.permutations(), skipping those with a cell not fitting.
+        if instance_index == len(instance_cells):
+            yield []
+            return
+        for host_index in candidates[instance_index]:
+            if host_index in used:
+                continue
+            got_cell = _fit_cell(host_index, instance_index)
+            if got_cell is None:
+                continue
+            used.add(host_index)
+            for cells in _permutations(instance_index + 1, used):
+                yield [got_cell] + cells
+            used.discard(host_index)
+
+    for cells in _permutations(0, set()):
+        if not pci_requests:
+            return objects.InstanceNUMATopology(cells=cells)
+        elif ((pci_stats is not None) and
+            pci_stats.support_requests(pci_requests, cells)):
+            return objects.InstanceNUMATopology(cells=cells)
+        elif pci_stats is None:
+            return
 
 
 def _numa_pagesize_usage_from_cell(hostcell, instancecell, sign):
@@ -416,6 +416,9 @@ class LibvirtDriver(driver.ComputeDriver):
             self._get_volume_drivers(), self)
 
         self._disk_cachemode = None
+        # Over committed disk size of each domain, keyed by its uuid, along
+        # with what it was computed from. See _get_disk_over_committed_size.
+        self._disk_info_cache = {}
         self.image_cache_manager = imagecache.ImageCacheManager()
         self.image_backend = imagebackend.Backend(CONF.use_cow_images)
 
@@ -731,6 +734,7 @@ class LibvirtDriver(driver.ComputeDriver):
         self._destroy(instance)
         self.cleanup(context, instance, network_info, block_device_info,
                      destroy_disks, migrate_data)
+        self._invalidate_disk_info_cache(instance)
 
     def _undefine_domain(self, instance):
         try:
@@ -1301,6 +1305,7 @@ class LibvirtDriver(driver.ComputeDriver):
             virt_dom = self._host.get_domain(instance)
         except exception.InstanceNotFound:
             raise exception.InstanceNotRunning(instance_id=instance.uuid)
+        self._invalidate_disk_info_cache(instance)
 
         base_image_ref = instance.image_ref
 
@@ -2366,6 +2371,7 @@ class LibvirtDriver(driver.ComputeDriver):
     # for xenapi(tr3buchet)
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
+        self._invalidate_disk_info_cache(instance)
         disk_info = blockinfo.get_disk_info(CONF.libvirt.virt_type,
                                             instance,
                                             image_meta,
@@ -6120,14 +6126,15 @@ class LibvirtDriver(driver.ComputeDriver):
         """Return total over committed disk size for all instances."""
         # Disk size that all instance uses : virtual_size - disk_size
         disk_over_committed_size = 0
+        domain_uuids = set()
         for dom in self._host.list_instance_domains():
             try:
                 xml = dom.XMLDesc(0)
-                disk_infos = jsonutils.loads(
-                        self._get_instance_disk_info(dom.name(), xml))
-                for info in disk_infos:
-                    disk_over_committed_size += int(
-                        info['over_committed_disk_size'])
+                dom_uuid = dom.UUIDString()
+                domain_uuids.add(dom_uuid)
+                disk_over_committed_size += (
+                    self._get_disk_over_committed_size(dom.name(), dom_uuid,
+                                                       xml))
             except libvirt.libvirtError as ex:
                 error_code = ex.get_error_code()
                 LOG.warn(_LW(
@@ -6162,8 +6169,62 @@ class LibvirtDriver(driver.ComputeDriver):
                           'error': e})
             # NOTE(gtt116): give other tasks a chance.
             greenthread.sleep(0)
+        for dom_uuid in set(self._disk_info_cache) - domain_uuids:
+            del self._disk_info_cache[dom_uuid]
         return disk_over_committed_size
 
+    @staticmethod
+    def _get_disk_stats(disk_infos):
+        """Return the mtime and the size of each disk, or None if one of
+        them can't be checked for changes.
+        """
+        stats = []
+        for info in disk_infos:
+            try:
+                stat = os.stat(info['path'])
+            except OSError:
+                return None
+            # NOTE: The size of a block device isn't that of its file, and
+            # a file which grew since it was inspected can't be trusted.
+            if stat.st_size != int(info['disk_size']):
+                return None
+            stats.append((info['path'], stat.st_mtime, stat.st_size))
+        return stats
+
+    def _get_disk_over_committed_size(self, instance_name, instance_uuid,
+                                      xml):
+        """Return the over committed disk size of a domain.
+
+        Running qemu-img over every disk of every domain is what makes the
+        resource audit slow, so the result is kept as long as the domain
+        XML and the mtime and size of each of its disks are unchanged.
+        """
+        cached = self._disk_info_cache.get(instance_uuid)
+        if cached is not None:
+            cached_xml, stats, over_committed_size = cached
+            if xml == cached_xml and stats == self._get_disk_stats(
+                    [{'path': path, 'disk_size': size}
+                     for path, _mtime, size in stats]):
+                return over_committed_size
+
+        disk_infos = jsonutils.loads(
+                self._get_instance_disk_info(instance_name, xml))
+        over_committed_size = sum(int(info['over_committed_disk_size'])
+                                  for info in disk_infos)
+        stats = self._get_disk_stats(disk_infos)
+        if stats is None:
+            self._disk_info_cache.pop(instance_uuid, None)
+        else:
+            self._disk_info_cache[instance_uuid] = (xml, stats,
+                                                    over_committed_size)
+        return over_committed_size
+
+    def _invalidate_disk_info_cache(self, instance):
+        """Forget the disk accounting of an instance whose disks are being
+        created, changed or removed.
+        """
+        self._disk_info_cache.pop(instance.get('uuid'), None)
+
     def unfilter_instance(self, instance, network_info):
         """See comments of same method in firewall_driver."""
         self.firewall_driver.unfilter_instance(instance,
@@ -6224,6 +6285,7 @@ class LibvirtDriver(driver.ComputeDriver):
                                    timeout=0, retry_interval=0):
         LOG.debug("Starting migrate_disk_and_power_off",
                    instance=instance)
+        self._invalidate_disk_info_cache(instance)
 
         ephemerals = driver.block_device_info_get_ephemerals(block_device_info)
 
@@ -6405,6 +6467,7 @@ class LibvirtDriver(driver.ComputeDriver):
                          network_info, image_meta, resize_instance,
                          block_device_info=None, power_on=True):
         LOG.debug("Starting finish_migration", instance=instance)
+        self._invalidate_disk_info_cache(instance)
 
         # resize disks. only "disk" and "disk.local" are necessary.
         disk_info = jsonutils.loads(disk_info)
@@ -6458,6 +6521,7 @@ class LibvirtDriver(driver.ComputeDriver):
                                 block_device_info=None, power_on=True):
         LOG.debug("Starting finish_revert_migration",
                   instance=instance)
+        self._invalidate_disk_info_cache(instance)
 
         inst_base = libvirt_utils.get_instance_path(instance)
         inst_base_resize = inst_base + "_resize"
@@ -18,6 +18,8 @@ Pluggable Weighing support
 """
 
 import abc
+import heapq
+import time
 
 import six
 
@@ -121,14 +123,30 @@ class BaseWeigher(object):
 class BaseWeightHandler(loadables.BaseLoader):
     object_class = WeighedObject
 
-    def get_weighed_objects(self, weighers, obj_list, weighing_properties):
-        """Return a sorted (descending), normalized list of WeighedObjects."""
+    # Object with a record(name, seconds, objs_in, objs_out) method, like
+    # nova.scheduler.timing.Timings, which is given the duration of each
+    # weigher if set.
+    timings = None
+
+    def _record_weigher(self, weigher, start, num_objs):
+        if self.timings is not None:
+            self.timings.record('weigher.%s' % weigher.__class__.__name__,
+                                time.time() - start, num_objs, num_objs)
+
+    def get_weighed_objects(self, weighers, obj_list, weighing_properties,
+                            limit=None):
+        """Return a sorted (descending), normalized list of WeighedObjects.
+
+        If limit is set, only the limit best WeighedObjects are returned,
+        which avoids sorting the whole list.
+        """
         weighed_objs = [self.object_class(obj, 0.0) for obj in obj_list]
 
         if len(weighed_objs) <= 1:
             return weighed_objs
 
         for weigher in weighers:
+            start = time.time()
             weights = weigher.weigh_objects(weighed_objs, weighing_properties)
 
             # Normalize the weights
@@ -139,5 +157,16 @@ class BaseWeightHandler(loadables.BaseLoader):
             for i, weight in enumerate(weights):
                 obj = weighed_objs[i]
                 obj.weight += weigher.weight_multiplier() * weight
+            self._record_weigher(weigher, start, len(weighed_objs))
 
-        return sorted(weighed_objs, key=lambda x: x.weight, reverse=True)
+        return best_weighed(weighed_objs, lambda x: x.weight, limit)
+
+
+def best_weighed(items, key, limit=None):
+    """Return items sorted by descending key, or only the limit first ones.
+
+    Items with equal keys keep their relative order, in both cases.
+    """
+    if limit is not None and limit < len(items):
+        return heapq.nlargest(limit, items, key=key)
+    return sorted(items, key=key, reverse=True)
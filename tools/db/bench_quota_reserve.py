@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the quota drivers with concurrent reservations.
+
+Runs --reservers threads, each reserving instances, cores and ram for one of
+the --users users of a single project --reservations times, then committing
+or rolling back the reservation, alternately. This is run for the
+DbQuotaDriver, which locks the quota usages of the project, and for the
+OptimisticDbQuotaDriver, which doesn't.
+
+The database must be a real MySQL or PostgreSQL one, as SQLite serializes
+the transactions anyway. Its schema is created with --sync, and the quotas
+and usages of the benchmark project are deleted before each run.
+
+The result is printed as JSON: the throughput and latency percentiles of
+reserve() for each driver, the number of OverQuota errors and of other
+errors, and the usages of the project at the end of the run, which must not
+be over the limits.
+
+Usage:
+
+    python tools/db/bench_quota_reserve.py --connection mysql://...
+        [--sync] [--driver db|optimistic|all] [--reservers N]
+        [--reservations N] [--users N] [--instances-limit N]
+        [--output result.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import sys
+import threading
+import time
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+
+from nova import context as nova_context
+from nova import db
+from nova.db import migration
+from nova import exception
+from nova import quota
+
+CONF = cfg.CONF
+
+PROJECT_ID = 'bench-quota-project'
+
+DRIVERS = {
+    'db': quota.DbQuotaDriver,
+    'optimistic': quota.OptimisticDbQuotaDriver,
+}
+
+DELTAS = {'instances': 1, 'cores': 2, 'ram': 2048}
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    index = int(round((len(sorted_values) - 1) * percent / 100.0))
+    return sorted_values[index]
+
+
+def _reset_project(instances_limit):
+    admin_context = nova_context.get_admin_context()
+    db.quota_destroy_all_by_project(admin_context, PROJECT_ID)
+    for resource, delta in DELTAS.items():
+        db.quota_create(admin_context, PROJECT_ID, resource,
+                        instances_limit * delta)
+
+
+def _reserver(driver, user_id, reservations, stats, lock):
+    context = nova_context.RequestContext(user_id, PROJECT_ID,
+                                          is_admin=False)
+    latencies = []
+    over_quota = errors = 0
+    for i in range(reservations):
+        try:
+            start = time.time()
+            try:
+                reserved = driver.reserve(context, quota.QUOTAS._resources,
+                                          DELTAS)
+            finally:
+                latencies.append(time.time() - start)
+            if i % 2:
+                driver.rollback(context, reserved)
+            else:
+                driver.commit(context, reserved)
+        except exception.OverQuota:
+            over_quota += 1
+        except Exception as e:
+            print('Reservation failed: %s' % e, file=sys.stderr)
+            errors += 1
+    with lock:
+        stats['latencies'].extend(latencies)
+        stats['over_quota'] += over_quota
+        stats['errors'] += errors
+
+
+def run(driver_name, reservers, reservations, users, instances_limit):
+    _reset_project(instances_limit)
+    driver = DRIVERS[driver_name]()
+    stats = {'latencies': [], 'over_quota': 0, 'errors': 0}
+    lock = threading.Lock()
+    threads = [threading.Thread(target=_reserver,
+                                args=(driver, 'bench-user-%d' % (i % users),
+                                      reservations, stats, lock))
+               for i in range(reservers)]
+
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.time() - start
+
+    latencies = sorted(stats['latencies'])
+    usages = db.quota_usage_get_all_by_project(
+        nova_context.get_admin_context(), PROJECT_ID)
+    usages.pop('project_id')
+    return {
+        'calls': len(latencies),
+        'over_quota': stats['over_quota'],
+        'errors': stats['errors'],
+        'seconds': round(seconds, 3),
+        'per_second': round(len(latencies) / seconds, 1) if seconds else 0,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50) * 1000, 3),
+            'p99': round(_percentile(latencies, 99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3) if latencies else 0,
+        },
+        'usages': usages,
+        'limits': {resource: instances_limit * delta
+                   for resource, delta in DELTAS.items()},
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--connection', required=True,
+                        help='SQLAlchemy URL of the database to use')
+    parser.add_argument('--sync', action='store_true',
+                        help='Create or upgrade the schema of the database')
+    parser.add_argument('--driver', choices=sorted(DRIVERS) + ['all'],
+                        default='all')
+    parser.add_argument('--reservers', type=int, default=100,
+                        help='Number of concurrent reservers')
+    parser.add_argument('--reservations', type=int, default=20,
+                        help='Number of reservations made by each reserver')
+    parser.add_argument('--users', type=int, default=10,
+                        help='Number of users the reservers are spread over')
+    parser.add_argument('--instances-limit', type=int, default=100000,
+                        help='Instances quota of the project, lower it to '
+                             'benchmark reservations near the limit')
+    parser.add_argument('--output', help='File to write the JSON result to, '
+                                         'instead of the standard output')
+    args = parser.parse_args(argv)
+    CONF([], project='nova')
+    CONF.set_override('connection', args.connection, group='database')
+    if args.sync:
+        migration.db_sync()
+
+    if args.driver == 'all':
+        driver_names = sorted(DRIVERS)
+    else:
+        driver_names = [args.driver]
+    result = {name: run(name, args.reservers, args.reservations, args.users,
+                        args.instances_limit)
+              for name in driver_names}
+
+    output = jsonutils.dumps(result, indent=2, sort_keys=True,
+                        separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
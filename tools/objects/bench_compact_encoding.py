@@ -0,0 +1,270 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the size and cost of the standard and compact object encodings.
+
+The payloads are the arguments of the RPC calls made with the most objects:
+
+- object_class_action: the reply of the conductor to
+  InstanceList.get_by_host() for --instances instances, with their flavor,
+  info_cache, numa_topology, pci_devices, security_groups and metadata
+- object_action: an Instance.save() request and its reply
+- build_and_run_instance and terminate_instance: the compute RPC casts with
+  the instance, block device mappings and requested networks
+
+Each payload is serialized by the NovaObjectSerializer and dumped to JSON
+like the RPC drivers do, then loaded and deserialized back into objects,
+--repeat times.
+
+The result is printed as JSON: for each payload and encoding, the size of
+the message in bytes and the mean time to encode and to decode it.
+
+Usage:
+
+    python tools/objects/bench_compact_encoding.py [--instances N]
+        [--repeat N] [--output result.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import sys
+import time
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from oslo_utils import timeutils
+
+from nova.compute import vm_states
+from nova import context as nova_context
+from nova.network import model as network_model
+from nova import objects
+from nova.objects import base as objects_base
+
+CONF = cfg.CONF
+
+CREATED_AT = datetime.datetime(2015, 6, 1, 12, 0, 0)
+
+
+def _flavor():
+    return objects.Flavor(id=1, flavorid='42', name='m1.large',
+                          memory_mb=8192, vcpus=4, root_gb=80,
+                          ephemeral_gb=0, swap=0, rxtx_factor=1.0,
+                          vcpu_weight=0, disabled=False, is_public=True,
+                          extra_specs={'hw:cpu_policy': 'dedicated'},
+                          created_at=CREATED_AT, updated_at=None,
+                          deleted_at=None, deleted=False)
+
+
+def _network_info(index):
+    subnet = network_model.Subnet(
+        cidr='10.0.0.0/24', gateway=network_model.IP('10.0.0.1'),
+        ips=[network_model.FixedIP(address='10.0.%d.%d' % (index // 250,
+                                                           index % 250 + 2))],
+        dns=[network_model.IP('8.8.8.8')])
+    network = network_model.Network(id='net-uuid', bridge='br100',
+                                    label='private', subnets=[subnet])
+    return network_model.NetworkInfo([network_model.VIF(
+        id='vif-%d' % index, address='fa:16:3e:00:%02x:%02x' % (
+            index // 256 % 256, index % 256),
+        network=network, type='ovs', devname='tap%d' % index,
+        details={'port_filter': True, 'ovs_hybrid_plug': True},
+        active=True)])
+
+
+def _instance(context, index):
+    uuid = '%08d-0000-4000-8000-000000000000' % index
+    instance = objects.Instance(
+        context=context, id=index, uuid=uuid, user_id='bench-user',
+        project_id='bench-project', host='bench-host', node='bench-node',
+        hostname='server-%d' % index, display_name='server-%d' % index,
+        display_description='server-%d' % index, image_ref='image-uuid',
+        kernel_id='', ramdisk_id='', launch_index=0, key_name='key',
+        key_data=None, power_state=1, vm_state=vm_states.ACTIVE,
+        task_state=None, memory_mb=8192, vcpus=4, root_gb=80,
+        ephemeral_gb=0, instance_type_id=1, reservation_id='r-%d' % index,
+        launched_at=CREATED_AT, terminated_at=None,
+        availability_zone='nova', locked=False, locked_by=None,
+        os_type='linux', architecture='x86_64', vm_mode='hvm',
+        root_device_name='/dev/vda', default_ephemeral_device=None,
+        default_swap_device=None, config_drive='', access_ip_v4=None,
+        access_ip_v6=None, auto_disk_config=False, progress=0,
+        shutdown_terminate=False, disable_terminate=False, cell_name=None,
+        cleaned=False, ephemeral_key_uuid=None, created_at=CREATED_AT,
+        updated_at=CREATED_AT, deleted_at=None, deleted=False,
+        metadata={'role': 'web'},
+        system_metadata={'image_base_image_ref': 'image-uuid',
+                         'image_min_disk': '80', 'image_min_ram': '0',
+                         'image_disk_format': 'qcow2',
+                         'image_container_format': 'bare'},
+        security_groups=objects.SecurityGroupList(objects=[
+            objects.SecurityGroup(id=1, name='default',
+                                  description='default',
+                                  user_id='bench-user',
+                                  project_id='bench-project',
+                                  created_at=CREATED_AT, updated_at=None,
+                                  deleted_at=None, deleted=False)]),
+        info_cache=objects.InstanceInfoCache(
+            instance_uuid=uuid, network_info=_network_info(index),
+            created_at=CREATED_AT, updated_at=None, deleted_at=None,
+            deleted=False),
+        numa_topology=objects.InstanceNUMATopology(
+            id=index, instance_uuid=uuid, cells=[
+                objects.InstanceNUMACell(id=cell, cpuset=set([cell * 2,
+                                                              cell * 2 + 1]),
+                                         memory=4096, pagesize=None,
+                                         cpu_pinning_raw=None)
+                for cell in range(2)]),
+        pci_devices=objects.PciDeviceList(objects=[
+            objects.PciDevice(id=index * 2 + device, compute_node_id=1,
+                              address='0000:0%d:00.0' % device,
+                              vendor_id='8086', product_id='1520',
+                              dev_type='type-VF', status='allocated',
+                              dev_id='pci_0000_0%d_00_0' % device,
+                              label='label_8086_1520', instance_uuid=uuid,
+                              request_id=None, extra_info={},
+                              numa_node=0, created_at=CREATED_AT,
+                              updated_at=None, deleted_at=None,
+                              deleted=False)
+            for device in range(2)]),
+        flavor=_flavor(), old_flavor=None, new_flavor=None)
+    instance.obj_reset_changes()
+    return instance
+
+
+def _bdms(instance):
+    return objects.BlockDeviceMappingList(objects=[
+        objects.BlockDeviceMapping(
+            id=instance.id, instance_uuid=instance.uuid,
+            source_type='image', destination_type='local',
+            device_type='disk', disk_bus='virtio', boot_index=0,
+            device_name='/dev/vda', delete_on_termination=True,
+            snapshot_id=None, volume_id=None, volume_size=None,
+            image_id='image-uuid', no_device=False, connection_info=None,
+            guest_format=None, created_at=CREATED_AT, updated_at=None,
+            deleted_at=None, deleted=False)])
+
+
+def payloads(context, instances):
+    """Return the RPC payloads to encode, keyed by name."""
+    instance_list = objects.InstanceList(objects=[
+        _instance(context, index) for index in range(instances)])
+    instance_list.obj_reset_changes()
+    instance = _instance(context, 0)
+    saved = instance.obj_clone()
+    saved.task_state = 'spawning'
+    saved.progress = 10
+    limits = objects.NUMATopologyLimits(cpu_allocation_ratio=16.0,
+                                        ram_allocation_ratio=1.5)
+    return {
+        'object_class_action': {
+            'result': instance_list.obj_to_primitive(),
+        },
+        'object_action': {
+            'objinst': saved, 'objmethod': 'save', 'args': [], 'kwargs': {},
+            'result': ({'task_state': 'spawning', 'progress': 10,
+                        'updated_at': timeutils.strtime(CREATED_AT),
+                        'info_cache': instance.info_cache.obj_to_primitive(),
+                        'obj_what_changed': set()}, None),
+        },
+        'build_and_run_instance': {
+            'instance': instance, 'image': {'id': 'image-uuid',
+                                            'min_disk': 80},
+            'request_spec': {'instance_properties': instance,
+                             'instance_type': instance.flavor},
+            'filter_properties': {'retry': {'num_attempts': 1, 'hosts': []},
+                                  'limits': {'numa_topology': limits}},
+            'admin_password': None, 'injected_files': [],
+            'requested_networks': objects.NetworkRequestList(objects=[
+                objects.NetworkRequest(network_id='net-uuid')]),
+            'security_groups': ['default'],
+            'block_device_mapping': _bdms(instance),
+            'node': 'bench-node', 'limits': {'memory_mb': 12288}},
+        'terminate_instance': {
+            'instance': instance, 'bdms': _bdms(instance),
+            'reservations': ['reservation-uuid'] * 3},
+    }
+
+
+def _encode(serializer, context, payload):
+    return jsonutils.dumps({name: serializer.serialize_entity(context, value)
+                            for name, value in payload.items()})
+
+
+def _decode(serializer, context, message):
+    return {name: serializer.deserialize_entity(context, value)
+            for name, value in jsonutils.loads(message).items()}
+
+
+def run(context, payload, compact, repeat):
+    CONF.set_override('compact_object_encoding', compact)
+    serializer = objects_base.NovaObjectSerializer(
+        compact_check=lambda: True)
+    start = time.time()
+    for i in range(repeat):
+        message = _encode(serializer, context, payload)
+    encode_seconds = (time.time() - start) / repeat
+    start = time.time()
+    for i in range(repeat):
+        _decode(serializer, context, message)
+    decode_seconds = (time.time() - start) / repeat
+    return {
+        'bytes': len(message),
+        'encode_ms': round(encode_seconds * 1000, 3),
+        'decode_ms': round(decode_seconds * 1000, 3),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--instances', type=int, default=100,
+                        help='Number of instances of the InstanceList '
+                             'returned by object_class_action')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Number of times each payload is encoded and '
+                             'decoded')
+    parser.add_argument('--output', help='File to write the JSON result to, '
+                                         'instead of the standard output')
+    args = parser.parse_args(argv)
+    CONF([], project='nova')
+    objects.register_all()
+    context = nova_context.RequestContext('bench-user', 'bench-project',
+                                          is_admin=False)
+
+    result = {}
+    for name, payload in payloads(context, args.instances).items():
+        standard = run(context, payload, False, args.repeat)
+        compact = run(context, payload, True, args.repeat)
+        result[name] = {
+            'standard': standard,
+            'compact': compact,
+            'size_ratio': round(float(compact['bytes']) / standard['bytes'],
+                                3),
+        }
+
+    output = jsonutils.dumps(result, indent=2, sort_keys=True,
+                             separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Microbenchmarks of the Instance and ComputeNode objects and their lists.
+
+For each class, --objects database rows are generated like the database API
+returns them, with unicode strings and naive datetimes. The following
+operations are then timed, --repeat times:
+
+- from_db: building the list of objects from the rows, the way
+  InstanceList.get_by_host() and ComputeNodeList.get_all() do
+- getattr: reading every set field of every object
+- setattr: setting a few fields of every object
+- what_changed: obj_what_changed() of every object
+- to_primitive: obj_to_primitive() of the list
+- from_primitive: obj_from_primitive() of the list
+- clone: obj_clone() of the list
+
+The result is printed as JSON: the best time of each operation in
+milliseconds, for each class.
+
+Usage:
+
+    python tools/objects/bench_objects.py [--objects N] [--repeat N]
+        [--output result.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import datetime
+import sys
+import time
+
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+import six
+
+from nova import context as nova_context
+from nova import objects
+from nova.objects import base as objects_base
+from nova.objects import fields
+from nova.objects import instance as instance_obj
+
+CONF = cfg.CONF
+
+CREATED_AT = datetime.datetime(2015, 6, 1, 12, 0, 0)
+
+INSTANCE_ATTRS = ['metadata', 'system_metadata', 'info_cache',
+                  'security_groups', 'pci_devices']
+
+
+def _db_value(field, name, index):
+    """Return a value for a column, as the database API would."""
+    field_type = field._type
+    if isinstance(field_type, fields.Enum):
+        return six.text_type(field_type._valid_values[0])
+    if isinstance(field_type, fields.Boolean):
+        return False
+    if isinstance(field_type, fields.Integer):
+        return index
+    if isinstance(field_type, fields.Float):
+        return 1.0
+    if isinstance(field_type, fields.DateTime):
+        return CREATED_AT
+    if isinstance(field_type, fields.UUID):
+        return six.text_type('%08d-0000-4000-8000-000000000000' % index)
+    if isinstance(field_type, fields.String):
+        return six.text_type('%s-%d' % (name, index))
+    return None
+
+
+def _db_row(cls, index, skip=()):
+    return {name: _db_value(field, name, index)
+            for name, field in cls.fields.items() if name not in skip}
+
+
+def _instance_rows(count):
+    rows = []
+    for index in range(count):
+        row = _db_row(objects.Instance, index,
+                      skip=instance_obj.INSTANCE_OPTIONAL_ATTRS)
+        uuid = row['uuid']
+        row.update({
+            'deleted': 0, 'cleaned': 0, 'task_state': None,
+            'access_ip_v4': None, 'access_ip_v6': None, 'extra': None,
+            'metadata': [{'key': u'role', 'value': u'web'}],
+            'system_metadata': [
+                {'key': u'image_%s' % key, 'value': u'value'}
+                for key in ('base_image_ref', 'min_disk', 'min_ram',
+                            'disk_format', 'container_format')],
+            'info_cache': {'instance_uuid': uuid, 'network_info': u'[]',
+                           'created_at': CREATED_AT, 'updated_at': None,
+                           'deleted_at': None, 'deleted': False},
+            'security_groups': [
+                dict(_db_row(objects.SecurityGroup, index, skip=('rules',)),
+                     deleted=False)],
+            'pci_devices': [
+                dict(_db_row(objects.PciDevice, index * 2 + device),
+                     extra_info='{}', deleted=False)
+                for device in range(2)],
+        })
+        rows.append(row)
+    return rows
+
+
+def _compute_node_rows(count):
+    rows = []
+    for index in range(count):
+        row = _db_row(objects.ComputeNode, index,
+                      skip=('supported_hv_specs', 'pci_device_pools'))
+        row.update({
+            'deleted': 0,
+            'stats': jsonutils.dumps({'num_instances': '10',
+                                      'num_vm_active': '10'}),
+            'supported_instances': jsonutils.dumps(
+                [['x86_64', 'kvm', 'hvm']]),
+            'pci_stats': None,
+            'numa_topology': None,
+            'host': u'host-%d' % index,
+        })
+        rows.append(row)
+    return rows
+
+
+def _make_instance_list(context, rows):
+    return instance_obj._make_instance_list(
+        context, objects.InstanceList(), rows, INSTANCE_ATTRS)
+
+
+def _make_compute_node_list(context, rows):
+    return objects_base.obj_make_list(context, objects.ComputeNodeList(),
+                                      objects.ComputeNode, rows)
+
+
+CLASSES = {
+    'Instance': (_instance_rows, _make_instance_list,
+                 {'task_state': 'spawning', 'progress': 10}),
+    'ComputeNode': (_compute_node_rows, _make_compute_node_list,
+                    {'vcpus_used': 4, 'free_ram_mb': 1024}),
+}
+
+
+def _getattr(obj_list):
+    for obj in obj_list:
+        for name in obj.fields:
+            if obj.obj_attr_is_set(name):
+                getattr(obj, name)
+
+
+def _setattr(obj_list, updates):
+    for obj in obj_list:
+        for name, value in updates.items():
+            setattr(obj, name, value)
+
+
+def _what_changed(obj_list):
+    for obj in obj_list:
+        obj.obj_what_changed()
+
+
+def _time(fn, repeat):
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        fn()
+        seconds = time.time() - start
+        best = seconds if best is None else min(best, seconds)
+    return round(best * 1000, 3)
+
+
+def run(context, name, count, repeat):
+    make_rows, make_list, updates = CLASSES[name]
+    rows = make_rows(count)
+    obj_list = make_list(context, rows)
+    primitive = obj_list.obj_to_primitive()
+    return {
+        'from_db': _time(lambda: make_list(context, rows), repeat),
+        'getattr': _time(lambda: _getattr(obj_list), repeat),
+        'setattr': _time(lambda: _setattr(obj_list, updates), repeat),
+        'what_changed': _time(lambda: _what_changed(obj_list), repeat),
+        'to_primitive': _time(obj_list.obj_to_primitive, repeat),
+        'from_primitive': _time(
+            lambda: objects_base.NovaObject.obj_from_primitive(
+                primitive, context), repeat),
+        'clone': _time(obj_list.obj_clone, repeat),
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--objects', type=int, default=500,
+                        help='Number of objects in each list')
+    parser.add_argument('--repeat', type=int, default=10,
+                        help='Number of times each operation is timed, the '
+                             'best time is reported')
+    parser.add_argument('--output', help='File to write the JSON result to, '
+                                         'instead of the standard output')
+    args = parser.parse_args(argv)
+    CONF([], project='nova')
+    objects.register_all()
+    context = nova_context.RequestContext('bench-user', 'bench-project',
+                                          is_admin=False)
+
+    result = {name: run(context, name, args.objects, args.repeat)
+              for name in sorted(CLASSES)}
+
+    output = jsonutils.dumps(result, indent=2, sort_keys=True,
+                             separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
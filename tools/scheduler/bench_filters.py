@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare the per-host and the vectorized scheduler filters.
+
+Runs RamFilter, CoreFilter, DiskFilter, NumInstancesFilter and IoOpsFilter
+over synthetic host states with both evaluation modes, checks they select
+the same hosts and prints the time taken by each.
+
+Usage:
+
+    python tools/scheduler/bench_filters.py [--hosts 1000,5000,10000]
+"""
+
+from __future__ import print_function
+
+import argparse
+import random
+import sys
+import timeit
+
+from oslo_config import cfg
+
+from nova.scheduler import filters
+from nova.scheduler.filters import columnar
+from nova.scheduler.filters import core_filter
+from nova.scheduler.filters import disk_filter
+from nova.scheduler.filters import io_ops_filter
+from nova.scheduler.filters import num_instances_filter
+from nova.scheduler.filters import ram_filter
+from nova.scheduler import host_manager
+
+CONF = cfg.CONF
+
+
+def make_host_states(count, seed=0):
+    rand = random.Random(seed)
+    host_states = []
+    for i in range(count):
+        host_state = host_manager.HostState('host%d' % i, 'node%d' % i)
+        host_state.total_usable_ram_mb = rand.choice([65536, 131072, 262144])
+        host_state.free_ram_mb = rand.randint(-8192,
+                                              host_state.total_usable_ram_mb)
+        host_state.total_usable_disk_gb = rand.choice([500, 1000, 2000])
+        host_state.free_disk_mb = rand.randint(
+            0, host_state.total_usable_disk_gb * 1024)
+        host_state.vcpus_total = rand.choice([16, 32, 48])
+        host_state.vcpus_used = rand.randint(0, host_state.vcpus_total * 16)
+        host_state.num_instances = rand.randint(0, 60)
+        host_state.num_io_ops = rand.randint(0, 10)
+        host_states.append(host_state)
+    return host_states
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--hosts', default='1000,5000,10000',
+                        help='Comma separated numbers of hosts to test')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='Number of runs of each mode, the best is kept')
+    args = parser.parse_args(argv)
+    CONF([], project='nova')
+
+    if columnar.numpy is None:
+        print('numpy is required for the vectorized filters', file=sys.stderr)
+        return 1
+
+    filter_handler = filters.HostFilterHandler()
+    filter_objs = [ram_filter.RamFilter(), core_filter.CoreFilter(),
+                   disk_filter.DiskFilter(),
+                   num_instances_filter.NumInstancesFilter(),
+                   io_ops_filter.IoOpsFilter()]
+    filter_properties = {'instance_type': {'memory_mb': 4096, 'vcpus': 2,
+                                           'root_gb': 40, 'ephemeral_gb': 0,
+                                           'swap': 0}}
+
+    print('%8s %12s %12s %8s %8s' % ('hosts', 'per-host ms', 'vector ms',
+                                     'speedup', 'passed'))
+    for count in [int(count) for count in args.hosts.split(',')]:
+        host_states = make_host_states(count)
+        results = {}
+
+        def _run(vectorized):
+            CONF.set_override('scheduler_use_vectorized_filters', vectorized)
+            results[vectorized] = filter_handler.get_filtered_objects(
+                filter_objs, host_states, filter_properties)
+
+        timings = {}
+        for vectorized in (False, True):
+            timings[vectorized] = min(timeit.repeat(
+                lambda: _run(vectorized), number=1, repeat=args.repeat))
+        if results[False] != results[True]:
+            print('Vectorized filters selected different hosts for %d hosts'
+                  % count, file=sys.stderr)
+            return 1
+        print('%8d %12.2f %12.2f %7.1fx %8d' % (
+            count, timings[False] * 1000, timings[True] * 1000,
+            timings[False] / timings[True], len(results[True])))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
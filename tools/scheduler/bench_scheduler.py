@@ -0,0 +1,495 @@
+#!/usr/bin/env python
+# Copyright (c) 2015 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmark the scheduler drivers against a synthetic cloud.
+
+Builds a fleet of compute nodes, services, aggregates and instances from a
+profile, then calls select_destinations() of the FilterScheduler or of the
+CachingScheduler in-process for a mix of requests. The compute nodes,
+services, aggregates and instances are served by fake ComputeNodeList,
+ServiceList, AggregateList and InstanceList sources, so no database or
+message bus is needed.
+
+The result is printed as JSON: the latency percentiles and the throughput of
+select_destinations(), and the summaries of the time spent in each filter and
+weigher and in get_all_host_states(), as recorded by the scheduler timings.
+Pass the JSON of a previous run with --baseline to compare both runs.
+
+The profile is a JSON file overriding some of the keys of DEFAULT_PROFILE.
+Its 'options' key sets nova options for the run, like
+scheduler_host_subset_size or scheduler_use_vectorized_filters.
+
+Usage:
+
+    python tools/scheduler/bench_scheduler.py [--profile profile.json]
+        [--scheduler filter|caching] [--hosts N] [--requests N]
+        [--output result.json] [--baseline previous.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import collections
+import contextlib
+import copy
+import math
+import random
+import sys
+import time
+
+import mock
+from oslo_config import cfg
+from oslo_serialization import jsonutils
+from oslo_utils import timeutils
+from oslo_utils import uuidutils
+import six
+
+from nova.compute import vm_states
+from nova import context as nova_context
+from nova import exception
+from nova import objects
+from nova import rpc
+from nova.scheduler import caching_scheduler
+from nova.scheduler import filter_scheduler
+from nova.scheduler import host_manager
+from nova.scheduler import utils as scheduler_utils
+from nova.virt import hardware
+
+CONF = cfg.CONF
+# NOTE: The servicegroup API used by the ComputeFilter needs it.
+CONF.import_opt('report_interval', 'nova.service')
+
+DEFAULT_PROFILE = {
+    # Fleet
+    'hosts': 1000,
+    'host_vcpus': [32, 48],
+    'host_ram_mb': [131072, 262144],
+    'host_disk_gb': [1000, 2000],
+    'numa_cells': 2,
+    # Number of PCI device pools per host, each of pci_pool_size devices
+    'pci_pools': 1,
+    'pci_pool_size': 4,
+    # Each host belongs to one of the aggregates, round robin
+    'aggregates': 10,
+    # Average number of instances already running on each host, using
+    # flavors picked from the request mix
+    'instances_per_host': 10,
+    # Requests
+    'requests': 500,
+    'max_instances_per_request': 3,
+    'flavors': [
+        {'name': 'small', 'vcpus': 1, 'memory_mb': 2048, 'root_gb': 20,
+         'weight': 6},
+        {'name': 'large', 'vcpus': 4, 'memory_mb': 8192, 'root_gb': 80,
+         'weight': 3},
+        {'name': 'numa', 'vcpus': 4, 'memory_mb': 8192, 'root_gb': 40,
+         'numa_nodes': 2, 'weight': 1},
+        {'name': 'pci', 'vcpus': 2, 'memory_mb': 4096, 'root_gb': 20,
+         'pci_devices': 1, 'weight': 1},
+        {'name': 'gold', 'vcpus': 2, 'memory_mb': 4096, 'root_gb': 40,
+         'aggregate_metadata': {'tier': 'gold'}, 'weight': 1},
+    ],
+    'filters': ['RetryFilter', 'AvailabilityZoneFilter', 'RamFilter',
+                'CoreFilter', 'DiskFilter', 'ComputeFilter',
+                'ComputeCapabilitiesFilter', 'ImagePropertiesFilter',
+                'AggregateInstanceExtraSpecsFilter',
+                'ServerGroupAntiAffinityFilter', 'ServerGroupAffinityFilter',
+                'NUMATopologyFilter', 'PciPassthroughFilter'],
+    'weighers': ['nova.scheduler.weights.all_weighers'],
+    'options': {},
+    'seed': 0,
+}
+
+# Seconds of scheduler activity kept by the timings, more than any run
+TIMING_WINDOW = 10 ** 7
+
+PCI_VENDOR_ID = '8086'
+PCI_PRODUCT_ID = '1520'
+
+
+def _pick_flavor(rand, flavors):
+    total = sum(flavor.get('weight', 1) for flavor in flavors)
+    point = rand.uniform(0, total)
+    for flavor in flavors:
+        point -= flavor.get('weight', 1)
+        if point <= 0:
+            return flavor
+    return flavors[-1]
+
+
+class FakeCloud(object):
+    """Synthetic compute nodes, services, aggregates and instances, served
+    in place of the database by the fake object sources of patch().
+    """
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.rand = random.Random(profile['seed'])
+        self.now = timeutils.utcnow()
+        self.compute_nodes = []
+        self.services = []
+        self.instances = collections.defaultdict(list)
+        self.aggregates = [
+            objects.Aggregate(id=i + 1, name='agg%d' % i, hosts=[],
+                              metadata={'tier': 'gold' if i % 2 else 'silver'})
+            for i in range(profile['aggregates'])]
+        for i in range(profile['hosts']):
+            self._add_host(i)
+
+    def _add_host(self, i):
+        profile = self.profile
+        host = 'host%d' % i
+        vcpus = self.rand.choice(profile['host_vcpus'])
+        memory_mb = self.rand.choice(profile['host_ram_mb'])
+        local_gb = self.rand.choice(profile['host_disk_gb'])
+
+        vcpus_used = memory_mb_used = local_gb_used = 0
+        num_instances = self.rand.randint(
+            0, 2 * profile['instances_per_host'])
+        for _ in range(num_instances):
+            flavor = _pick_flavor(self.rand, profile['flavors'])
+            if (memory_mb_used + flavor['memory_mb'] > memory_mb or
+                    local_gb_used + flavor['root_gb'] > local_gb):
+                break
+            vcpus_used += flavor['vcpus']
+            memory_mb_used += flavor['memory_mb']
+            local_gb_used += flavor['root_gb']
+            self.instances[host].append(objects.Instance(
+                uuid=uuidutils.generate_uuid(), host=host, node=host,
+                vm_state=vm_states.ACTIVE, task_state=None))
+
+        num_cells = max(profile['numa_cells'], 1)
+        cpus_per_cell = vcpus // num_cells
+        cells = [objects.NUMACell(
+            id=cell,
+            cpuset=set(range(cell * cpus_per_cell,
+                             (cell + 1) * cpus_per_cell)),
+            memory=memory_mb // num_cells,
+            cpu_usage=vcpus_used // num_cells,
+            memory_usage=memory_mb_used // num_cells,
+            mempages=[], siblings=[], pinned_cpus=set())
+            for cell in range(num_cells)]
+        numa_topology = None
+        if profile['numa_cells']:
+            numa_topology = objects.NUMATopology(cells=cells)._to_json()
+
+        pools = [objects.PciDevicePool(
+            vendor_id=PCI_VENDOR_ID, product_id=PCI_PRODUCT_ID,
+            numa_node=pool % num_cells, tags={},
+            count=profile['pci_pool_size'])
+            for pool in range(profile['pci_pools'])]
+
+        self.compute_nodes.append(objects.ComputeNode(
+            id=i + 1, service_id=i + 1, host=host, hypervisor_hostname=host,
+            vcpus=vcpus, memory_mb=memory_mb, local_gb=local_gb,
+            vcpus_used=vcpus_used, memory_mb_used=memory_mb_used,
+            local_gb_used=local_gb_used,
+            free_ram_mb=memory_mb - memory_mb_used,
+            free_disk_gb=local_gb - local_gb_used,
+            disk_available_least=local_gb - local_gb_used,
+            current_workload=0, running_vms=len(self.instances[host]),
+            hypervisor_type='QEMU', hypervisor_version=2001000,
+            host_ip='10.0.%d.%d' % (i // 250, i % 250 + 1),
+            cpu_info='{}', metrics=None, numa_topology=numa_topology,
+            supported_hv_specs=[objects.HVSpec.from_list(
+                ['x86_64', 'kvm', 'hvm'])],
+            pci_device_pools=objects.PciDevicePoolList(objects=pools),
+            stats={'num_instances': str(len(self.instances[host])),
+                   'io_workload': '0'},
+            updated_at=self.now, created_at=self.now, deleted=False))
+        self.services.append(objects.Service(
+            id=i + 1, host=host, binary='nova-compute', topic='compute',
+            report_count=1, disabled=False, disabled_reason=None,
+            availability_zone=None, created_at=self.now,
+            updated_at=self.now, deleted_at=None, deleted=False))
+        if self.aggregates:
+            self.aggregates[i % len(self.aggregates)].hosts.append(host)
+
+    def _get_services(self, context, binary, changed_since=None):
+        # NOTE: The services keep reporting while the benchmark runs, which
+        # keeps them up for the ComputeFilter.
+        now = timeutils.utcnow()
+        for service in self.services:
+            service.updated_at = now
+        return objects.ServiceList(objects=self.services)
+
+    def _get_compute_nodes(self, context, changed_since=None):
+        if changed_since is not None:
+            return objects.ComputeNodeList(objects=[])
+        return objects.ComputeNodeList(objects=self.compute_nodes)
+
+    def _get_compute_nodes_by_host(self, context, host):
+        return objects.ComputeNodeList(objects=[
+            compute for compute in self.compute_nodes
+            if compute.host == host])
+
+    def _get_instances_by_host(self, context, host, expected_attrs=None,
+                               use_slave=False):
+        return objects.InstanceList(objects=self.instances.get(host, []))
+
+    def sync_instances(self, context, manager):
+        """Send the instances of each host to the HostManager, like the
+        compute nodes do when they start.
+        """
+        if not manager.tracks_instance_changes:
+            return
+        for host, instances in six.iteritems(self.instances):
+            manager.update_instance_info(
+                context, host, objects.InstanceList(objects=instances))
+
+    @contextlib.contextmanager
+    def patch(self):
+        patches = [
+            mock.patch.object(objects.ServiceList, 'get_by_binary',
+                              side_effect=self._get_services),
+            mock.patch.object(objects.ServiceList,
+                              'get_by_binary_changed_since',
+                              side_effect=self._get_services),
+            mock.patch.object(objects.ComputeNodeList, 'get_all',
+                              side_effect=self._get_compute_nodes),
+            mock.patch.object(objects.ComputeNodeList,
+                              'get_all_changed_since',
+                              side_effect=self._get_compute_nodes),
+            mock.patch.object(objects.ComputeNodeList, 'get_all_by_host',
+                              side_effect=self._get_compute_nodes_by_host),
+            mock.patch.object(objects.AggregateList, 'get_all',
+                              return_value=objects.AggregateList(
+                                  objects=self.aggregates)),
+            mock.patch.object(objects.InstanceList, 'get_by_host',
+                              side_effect=self._get_instances_by_host),
+            # NOTE: The instances are sent by sync_instances() instead.
+            mock.patch.object(host_manager.HostManager,
+                              '_init_instance_info'),
+            mock.patch.object(rpc, 'get_notifier'),
+        ]
+        with contextlib.nested(*patches):
+            yield
+
+
+def build_requests(profile):
+    """Return a list of (request_spec, filter_properties) tuples like the
+    conductor sends to select_destinations().
+    """
+    rand = random.Random(profile['seed'] + 1)
+    context = nova_context.get_admin_context()
+    requests = []
+    for i in range(profile['requests']):
+        spec = _pick_flavor(rand, profile['flavors'])
+        extra_specs = {}
+        if spec.get('numa_nodes'):
+            extra_specs['hw:numa_nodes'] = str(spec['numa_nodes'])
+        for key, value in six.iteritems(spec.get('aggregate_metadata', {})):
+            extra_specs['aggregate_instance_extra_specs:%s' % key] = value
+        flavor = objects.Flavor(
+            id=i + 1, flavorid=spec['name'], name=spec['name'],
+            vcpus=spec['vcpus'], memory_mb=spec['memory_mb'],
+            root_gb=spec['root_gb'], ephemeral_gb=0, swap=0,
+            rxtx_factor=1.0, vcpu_weight=None, disabled=False,
+            is_public=True, extra_specs=extra_specs)
+
+        instance_uuid = uuidutils.generate_uuid()
+        pci_requests = objects.InstancePCIRequests(
+            instance_uuid=instance_uuid, requests=[])
+        if spec.get('pci_devices'):
+            pci_requests.requests.append(objects.InstancePCIRequest(
+                count=spec['pci_devices'], alias_name='bench',
+                spec=[{'vendor_id': PCI_VENDOR_ID,
+                       'product_id': PCI_PRODUCT_ID}]))
+        instance = objects.Instance(
+            id=i + 1, uuid=instance_uuid, project_id='bench',
+            user_id='bench',
+            os_type='linux', availability_zone=None,
+            vcpus=flavor.vcpus, memory_mb=flavor.memory_mb,
+            root_gb=flavor.root_gb, ephemeral_gb=flavor.ephemeral_gb,
+            vm_state=vm_states.BUILDING, task_state=None,
+            numa_topology=hardware.numa_get_constraints(flavor, {}),
+            pci_requests=pci_requests, flavor=flavor)
+
+        num_instances = rand.randint(1, profile['max_instances_per_request'])
+        request_spec = scheduler_utils.build_request_spec(
+            context, {}, [instance] * num_instances, instance_type=flavor)
+        filter_properties = {'scheduler_hints': {},
+                             'pci_requests': pci_requests}
+        requests.append((request_spec, filter_properties))
+    return requests
+
+
+def _summarize_timings(timings, num_requests):
+    """Return the summaries of the scheduler timings, keyed by step, along
+    with the time spent in each step per request.
+    """
+    summaries = timings.summary()
+    for summary in six.itervalues(summaries):
+        summary['ms_per_request'] = round(
+            summary['mean_ms'] * summary['count'] / max(num_requests, 1), 4)
+    return summaries
+
+
+def _percentile(sorted_values, percent):
+    if not sorted_values:
+        return 0.0
+    rank = int(math.ceil(percent / 100.0 * len(sorted_values))) - 1
+    return sorted_values[max(rank, 0)]
+
+
+def run(profile, scheduler_name):
+    """Run the benchmark described by profile and return its result."""
+    CONF.set_override('scheduler_default_filters', profile['filters'])
+    CONF.set_override('scheduler_weight_classes', profile['weighers'])
+    for name, value in six.iteritems(profile['options']):
+        CONF.set_override(name, value)
+    # NOTE: The time spent in each step is recorded by the HostManager, over
+    # the whole run.
+    CONF.set_override('scheduler_timing_enabled', True)
+    CONF.set_override('scheduler_timing_window', TIMING_WINDOW)
+    # NOTE: The FilterScheduler picks randomly among the best hosts.
+    random.seed(profile['seed'])
+
+    cloud = FakeCloud(profile)
+    requests = build_requests(profile)
+    context = nova_context.get_admin_context()
+    latencies = []
+    failures = 0
+
+    with cloud.patch():
+        if scheduler_name == 'caching':
+            scheduler = caching_scheduler.CachingScheduler()
+        else:
+            scheduler = filter_scheduler.FilterScheduler()
+        manager = scheduler.host_manager
+        cloud.sync_instances(context, manager)
+
+        start = time.time()
+        scheduler.run_periodic_tasks(context)
+        periodic_seconds = time.time() - start
+
+        for request_spec, filter_properties in requests:
+            request_start = time.time()
+            try:
+                scheduler.select_destinations(context, request_spec,
+                                              filter_properties)
+            except exception.NoValidHost:
+                failures += 1
+            latencies.append(time.time() - request_start)
+
+    latencies.sort()
+    timing_dict = _summarize_timings(manager.timings, len(requests))
+    return {
+        'scheduler': scheduler_name,
+        'profile': profile,
+        'requests': len(requests),
+        'no_valid_host': failures,
+        'requests_per_second': round(len(requests) / sum(latencies), 3),
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50) * 1000, 3),
+            'p99': round(_percentile(latencies, 99) * 1000, 3),
+            'mean': round(sum(latencies) * 1000 / len(latencies), 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'periodic_task_ms': round(periodic_seconds * 1000, 3),
+        'get_all_host_states': timing_dict.get(
+            'host_manager.get_all_host_states', {}),
+        'filters': {key.split('.', 1)[1]: value
+                    for key, value in six.iteritems(timing_dict)
+                    if key.startswith('filter.')},
+        'weighers': {key.split('.', 1)[1]: value
+                     for key, value in six.iteritems(timing_dict)
+                     if key.startswith('weigher.')},
+    }
+
+
+def compare(baseline, result, max_regression):
+    """Print the changes from baseline to result, and return False if a
+    latency got worse by more than max_regression percent.
+    """
+    rows = [('latency p50 ms', baseline['latency_ms']['p50'],
+             result['latency_ms']['p50'], True),
+            ('latency p99 ms', baseline['latency_ms']['p99'],
+             result['latency_ms']['p99'], True),
+            ('requests/s', baseline['requests_per_second'],
+             result['requests_per_second'], False)]
+    for kind in ('filters', 'weighers'):
+        for name in sorted(set(baseline[kind]) & set(result[kind])):
+            rows.append(('%s ms/request' % name,
+                         baseline[kind][name]['ms_per_request'],
+                         result[kind][name]['ms_per_request'], False))
+
+    regressed = False
+    print('%-45s %12s %12s %8s' % ('', 'baseline', 'result', 'change'),
+          file=sys.stderr)
+    for name, old, new, checked in rows:
+        change = (new - old) * 100.0 / old if old else 0.0
+        print('%-45s %12.3f %12.3f %+7.1f%%' % (name, old, new, change),
+              file=sys.stderr)
+        if checked and max_regression is not None and change > max_regression:
+            regressed = True
+    if baseline['profile'] != result['profile']:
+        print('Warning: the baseline was run with another profile',
+              file=sys.stderr)
+    return not regressed
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--profile',
+                        help='JSON file overriding keys of the default '
+                             'profile')
+    parser.add_argument('--scheduler', choices=['filter', 'caching'],
+                        default='filter')
+    parser.add_argument('--hosts', type=int,
+                        help='Number of hosts, overrides the profile')
+    parser.add_argument('--requests', type=int,
+                        help='Number of requests, overrides the profile')
+    parser.add_argument('--output', help='File to write the JSON result to, '
+                                         'instead of the standard output')
+    parser.add_argument('--baseline',
+                        help='JSON result of a previous run to compare with')
+    parser.add_argument('--max-regression', type=float,
+                        help='Exit with an error if the p50 or p99 latency '
+                             'is this many percent higher than in the '
+                             'baseline')
+    args = parser.parse_args(argv)
+    CONF([], project='nova')
+    objects.register_all()
+
+    profile = copy.deepcopy(DEFAULT_PROFILE)
+    if args.profile:
+        with open(args.profile) as profile_file:
+            profile.update(jsonutils.load(profile_file))
+    if args.hosts is not None:
+        profile['hosts'] = args.hosts
+    if args.requests is not None:
+        profile['requests'] = args.requests
+
+    result = run(profile, args.scheduler)
+    output = jsonutils.dumps(result, indent=2, sort_keys=True,
+                        separators=(',', ': '))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = jsonutils.load(baseline_file)
+        if not compare(baseline, result, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))